@@ -24,9 +24,12 @@ from CTFd.utils.initialization import (
     init_cli,
     init_events,
     init_logs,
+    init_rate_limits,
     init_request_processors,
+    init_standings,
     init_template_filters,
     init_template_globals,
+    init_tracking,
 )
 from CTFd.utils.migrations import create_database, migrations, stamp_latest_revision
 from CTFd.utils.sessions import CachingSessionInterface
@@ -336,6 +339,9 @@ def create_app(config="CTFd.config.Config"):
 
         init_logs(app)
         init_events(app)
+        init_standings(app)
+        init_rate_limits(app)
+        init_tracking(app)
         init_plugins(app)
         init_cli(app)
 
@@ -212,6 +212,9 @@ def reset():
 
         data = request.form
 
+        # Sightings still waiting in the buffer are written now so the reset sees the whole tracking table
+        app.tracking_buffer.flush()
+
         if data.get("pages"):
             _pages = Pages.query.all()
             for p in _pages:
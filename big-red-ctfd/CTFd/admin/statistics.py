@@ -1,9 +1,9 @@
 from flask import render_template
 
 from CTFd.admin import admin
-from CTFd.models import Challenges, Fails, Solves, Teams, Tracking, Users, db
+from CTFd.models import Teams, Tracking, Users, db
+from CTFd.utils.challenges import get_challenge_statistics
 from CTFd.utils.decorators import admins_only
-from CTFd.utils.modes import get_model
 from CTFd.utils.updates import update_check
 
 
@@ -12,57 +12,29 @@ from CTFd.utils.updates import update_check
 def statistics():
     update_check()
 
-    Model = get_model()
-
     teams_registered = Teams.query.count()
     users_registered = Users.query.count()
 
-    wrong_count = (
-        Fails.query.join(Model, Fails.account_id == Model.id)
-        .filter(Model.banned == False, Model.hidden == False)
-        .count()
-    )
+    challenge_statistics = get_challenge_statistics()
 
-    solve_count = (
-        Solves.query.join(Model, Solves.account_id == Model.id)
-        .filter(Model.banned == False, Model.hidden == False)
-        .count()
-    )
+    wrong_count = challenge_statistics["fails"]
 
-    challenge_count = Challenges.query.count()
+    solve_count = challenge_statistics["solves"]
 
-    total_points = (
-        Challenges.query.with_entities(db.func.sum(Challenges.value).label("sum"))
-        .filter_by(state="visible")
-        .first()
-        .sum
-    ) or 0
+    challenge_count = len(challenge_statistics["challenges"])
 
-    ip_count = Tracking.query.with_entities(Tracking.ip).distinct().count()
-
-    solves_sub = (
-        db.session.query(
-            Solves.challenge_id, db.func.count(Solves.challenge_id).label("solves_cnt")
-        )
-        .join(Model, Solves.account_id == Model.id)
-        .filter(Model.banned == False, Model.hidden == False)
-        .group_by(Solves.challenge_id)
-        .subquery()
+    total_points = sum(
+        c["value"] or 0
+        for c in challenge_statistics["challenges"]
+        if c["state"] == "visible"
     )
 
-    solves = (
-        db.session.query(
-            solves_sub.columns.challenge_id,
-            solves_sub.columns.solves_cnt,
-            Challenges.name,
-        )
-        .join(Challenges, solves_sub.columns.challenge_id == Challenges.id)
-        .all()
-    )
+    ip_count = Tracking.query.with_entities(Tracking.ip).distinct().count()
 
     solve_data = {}
-    for _chal, count, name in solves:
-        solve_data[name] = count
+    for c in challenge_statistics["challenges"]:
+        if c["solves"]:
+            solve_data[c["name"]] = c["solves"]
 
     most_solved = None
     least_solved = None
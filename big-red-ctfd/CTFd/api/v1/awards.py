@@ -6,7 +6,7 @@ from flask_restx import Namespace, Resource
 from CTFd.api.v1.helpers.request import validate_args
 from CTFd.api.v1.helpers.schemas import sqlalchemy_to_pydantic
 from CTFd.api.v1.schemas import APIDetailedSuccessResponse, APIListSuccessResponse
-from CTFd.cache import clear_standings
+from CTFd.cache import invalidate
 from CTFd.constants import RawEnum
 from CTFd.models import Awards, Users, db
 from CTFd.schemas.awards import AwardSchema
@@ -132,8 +132,7 @@ class AwardList(Resource):
         response = schema.dump(response.data)
         db.session.close()
 
-        # Delete standings cache because awards can change scores
-        clear_standings()
+        invalidate("awards")
 
         return {"success": True, "data": response.data}
 
@@ -171,7 +170,6 @@ class Award(Resource):
         db.session.commit()
         db.session.close()
 
-        # Delete standings cache because awards can change scores
-        clear_standings()
+        invalidate("awards")
 
         return {"success": True}
@@ -2,6 +2,7 @@ from flask import request
 from flask_restx import Namespace, Resource
 
 from CTFd.api.v1.helpers.request import validate_args
+from CTFd.cache import invalidate
 from CTFd.constants import RawEnum
 from CTFd.models import Brackets, db
 from CTFd.schemas.brackets import BracketSchema
@@ -77,6 +78,8 @@ class Bracket(Resource):
         response = schema.dump(response.data)
         db.session.close()
 
+        invalidate("brackets")
+
         return {"success": True, "data": response.data}
 
     @admins_only
@@ -86,4 +89,6 @@ class Bracket(Resource):
         db.session.commit()
         db.session.close()
 
+        invalidate("brackets")
+
         return {"success": True}
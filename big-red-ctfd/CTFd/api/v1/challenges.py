@@ -1,13 +1,13 @@
 from typing import List  # noqa: I001
 
-from flask import abort, render_template, request, url_for
+from flask import abort, current_app, render_template, request, url_for
 from flask_restx import Namespace, Resource
 from sqlalchemy.sql import and_
 
 from CTFd.api.v1.helpers.request import validate_args
 from CTFd.api.v1.helpers.schemas import sqlalchemy_to_pydantic
 from CTFd.api.v1.schemas import APIDetailedSuccessResponse, APIListSuccessResponse
-from CTFd.cache import clear_challenges, clear_standings
+from CTFd.cache import invalidate
 from CTFd.constants import RawEnum
 from CTFd.exceptions.challenges import (
     ChallengeCreateException,
@@ -25,11 +25,16 @@ from CTFd.schemas.tags import TagSchema
 from CTFd.utils import config, get_config
 from CTFd.utils import user as current_user
 from CTFd.utils.challenges import (
-    get_all_challenges,
+    anonymized_listing,
+    get_challenge_board,
     get_solve_counts_for_challenges,
     get_solve_ids_for_user_id,
     get_solves_for_challenge_id,
 )
+from CTFd.utils.challenges.prerequisites import (
+    check_prerequisites,
+    get_prerequisite_graph,
+)
 from CTFd.utils.config.visibility import (
     accounts_visible,
     challenges_visible,
@@ -46,6 +51,7 @@ from CTFd.utils.decorators.visibility import (
     check_challenge_visibility,
     check_score_visibility,
 )
+from CTFd.utils.events import account_channel
 from CTFd.utils.humanize.words import pluralize
 from CTFd.utils.logging import log
 from CTFd.utils.security.signing import serialize
@@ -148,7 +154,7 @@ class ChallengeList(Resource):
 
         # Get list of solve_ids for current user
         if authed():
-            user = get_current_user()
+            user = get_current_user_attrs()
             user_solves = get_solve_ids_for_user_id(user_id=user.id)
         else:
             user_solves = set()
@@ -164,64 +170,28 @@ class ChallengeList(Resource):
             # `None` for the solve count if visiblity checks fail
             solve_count_dfl = None
 
-        chal_q = get_all_challenges(admin=admin_view, field=field, q=q, **query_args)
+        # The board is shared by every account, only the solves are laid over it
+        board = get_challenge_board(admin=admin_view, field=field, q=q, **query_args)
 
-        # Iterate through the list of challenges, adding to the object which
-        # will be JSONified back to the client
         response = []
-        tag_schema = TagSchema(view="user", many=True)
-
-        # Gather all challenge IDs so that we can determine invalid challenge prereqs
-        all_challenge_ids = {
-            c.id for c in Challenges.query.with_entities(Challenges.id).all()
-        }
-        for challenge in chal_q:
-            if challenge.requirements:
-                requirements = challenge.requirements.get("prerequisites", [])
-                anonymize = challenge.requirements.get("anonymize")
-                prereqs = set(requirements).intersection(all_challenge_ids)
-                if user_solves >= prereqs or admin_view:
-                    pass
-                else:
-                    if anonymize:
-                        response.append(
-                            {
-                                "id": challenge.id,
-                                "type": "hidden",
-                                "name": "???",
-                                "value": 0,
-                                "solves": None,
-                                "solved_by_me": False,
-                                "category": "???",
-                                "tags": [],
-                                "template": "",
-                                "script": "",
-                            }
-                        )
-                    # Fallthrough to continue
-                    continue
+        for entry in board:
+            if user_solves >= entry.prerequisites or admin_view:
+                pass
+            else:
+                if entry.anonymize:
+                    response.append(anonymized_listing(entry.id))
+                # Fallthrough to continue
+                continue
 
-            try:
-                challenge_type = get_chal_class(challenge.type)
-            except KeyError:
+            if entry.listing is None:
                 # Challenge type does not exist. Fall through to next challenge.
                 continue
 
             # Challenge passes all checks, add it to response
-            response.append(
-                {
-                    "id": challenge.id,
-                    "type": challenge_type.name,
-                    "name": challenge.name,
-                    "value": challenge.value,
-                    "solves": solve_counts.get(challenge.id, solve_count_dfl),
-                    "solved_by_me": challenge.id in user_solves,
-                    "category": challenge.category,
-                    "tags": tag_schema.dump(challenge.tags).data,
-                    "template": challenge_type.templates["view"],
-                    "script": challenge_type.scripts["view"],
-                }
-            )
+            listing = dict(entry.listing)
+            listing["solves"] = solve_counts.get(entry.id, solve_count_dfl)
+            listing["solved_by_me"] = entry.id in user_solves
+            response.append(listing)
 
         db.session.close()
         return {"success": True, "data": response}
@@ -246,6 +216,10 @@ class ChallengeList(Resource):
         if response.errors:
             return {"success": False, "errors": response.errors}, 400
 
+        errors = check_prerequisites(None, data.get("requirements"))
+        if errors:
+            return {"success": False, "errors": {"requirements": errors}}, 400
+
         challenge_type = data.get("type", "standard")
 
         challenge_class = get_chal_class(challenge_type)
@@ -256,7 +230,7 @@ class ChallengeList(Resource):
 
         response = challenge_class.read(challenge)
 
-        clear_challenges()
+        invalidate("challenges")
 
         return {"success": True, "data": response}
 
@@ -314,45 +288,19 @@ class Challenge(Resource):
             )
 
         if chal.requirements:
-            requirements = chal.requirements.get("prerequisites", [])
-            anonymize = chal.requirements.get("anonymize")
-            # Gather all challenge IDs so that we can determine invalid challenge prereqs
-            all_challenge_ids = {
-                c.id for c in Challenges.query.with_entities(Challenges.id).all()
-            }
+            graph = get_prerequisite_graph()
             if challenges_visible():
                 user = get_current_user()
                 if user:
-                    solve_ids = (
-                        Solves.query.with_entities(Solves.challenge_id)
-                        .filter_by(account_id=user.account_id)
-                        .order_by(Solves.challenge_id.asc())
-                        .all()
-                    )
+                    solve_ids = get_solve_ids_for_user_id(user_id=user.id)
                 else:
                     # We need to handle the case where a user is viewing challenges anonymously
-                    solve_ids = []
-                solve_ids = {value for value, in solve_ids}
-                prereqs = set(requirements).intersection(all_challenge_ids)
-                if solve_ids >= prereqs or is_admin():
+                    solve_ids = set()
+                if graph.is_unlocked(chal.id, solve_ids) or is_admin():
                     pass
                 else:
-                    if anonymize:
-                        return {
-                            "success": True,
-                            "data": {
-                                "id": chal.id,
-                                "type": "hidden",
-                                "name": "???",
-                                "value": 0,
-                                "solves": None,
-                                "solved_by_me": False,
-                                "category": "???",
-                                "tags": [],
-                                "template": "",
-                                "script": "",
-                            },
-                        }
+                    if chal.id in graph.anonymized:
+                        return {"success": True, "data": anonymized_listing(chal.id)}
                     abort(403)
             else:
                 abort(403)
@@ -480,6 +428,10 @@ class Challenge(Resource):
         challenge = Challenges.query.filter_by(id=challenge_id).first_or_404()
         challenge_class = get_chal_class(challenge.type)
 
+        errors = check_prerequisites(challenge.id, data.get("requirements"))
+        if errors:
+            return {"success": False, "errors": {"requirements": errors}}, 400
+
         try:
             challenge = challenge_class.update(challenge, request)
         except ChallengeUpdateException as e:
@@ -487,8 +439,7 @@ class Challenge(Resource):
 
         response = challenge_class.read(challenge)
 
-        clear_standings()
-        clear_challenges()
+        invalidate("challenges")
 
         return {"success": True, "data": response}
 
@@ -502,8 +453,7 @@ class Challenge(Resource):
         chal_class = get_chal_class(challenge.type)
         chal_class.delete(challenge)
 
-        clear_standings()
-        clear_challenges()
+        invalidate("challenges", "flags", "solves", "fails", "awards")
 
         return {"success": True}
 
@@ -570,24 +520,13 @@ class ChallengeAttempt(Resource):
         if challenge.state == "locked":
             abort(403)
 
-        if challenge.requirements:
-            requirements = challenge.requirements.get("prerequisites", [])
-            solve_ids = (
-                Solves.query.with_entities(Solves.challenge_id)
-                .filter_by(account_id=user.account_id)
-                .order_by(Solves.challenge_id.asc())
-                .all()
-            )
-            solve_ids = {solve_id for solve_id, in solve_ids}
-            # Gather all challenge IDs so that we can determine invalid challenge prereqs
-            all_challenge_ids = {
-                c.id for c in Challenges.query.with_entities(Challenges.id).all()
-            }
-            prereqs = set(requirements).intersection(all_challenge_ids)
-            if solve_ids >= prereqs:
-                pass
-            else:
-                abort(403)
+        graph = get_prerequisite_graph()
+        # The account's solves only matter to challenges with prerequisites or that unlock others
+        solve_ids = set()
+        if graph.prerequisites_of(challenge.id) or challenge.id in graph.dependents:
+            solve_ids = get_solve_ids_for_user_id(user_id=user.id)
+        if not graph.is_unlocked(challenge.id, solve_ids):
+            abort(403)
 
         chal_class = get_chal_class(challenge.type)
 
@@ -645,8 +584,21 @@ class ChallengeAttempt(Resource):
                     chal_class.solve(
                         user=user, team=team, challenge=challenge, request=request
                     )
-                    clear_standings()
-                    clear_challenges()
+                    invalidate("solves")
+
+                    # Show the challenges this solve opened up without waiting for the next reload
+                    unlocked = graph.newly_unlocked(challenge.id, solve_ids)
+                    unlocked.difference_update(graph.hidden)
+                    if unlocked:
+                        current_app.events_manager.publish(
+                            data={
+                                "user_id": user.id,
+                                "challenge_id": challenge.id,
+                                "unlocked": sorted(unlocked),
+                            },
+                            type="unlock_challenges",
+                            channel=account_channel(user.id, team.id if team else None),
+                        )
 
                 log(
                     "submissions",
@@ -665,8 +617,9 @@ class ChallengeAttempt(Resource):
                     chal_class.fail(
                         user=user, team=team, challenge=challenge, request=request
                     )
-                    clear_standings()
-                    clear_challenges()
+                    # A fail changes no score or solve count, this only refreshes the fail counts of the
+                    # challenge statistics
+                    invalidate("fails")
 
                 log(
                     "submissions",
@@ -6,7 +6,7 @@ from flask_restx import Namespace, Resource
 from CTFd.api.v1.helpers.request import validate_args
 from CTFd.api.v1.helpers.schemas import sqlalchemy_to_pydantic
 from CTFd.api.v1.schemas import APIDetailedSuccessResponse, APIListSuccessResponse
-from CTFd.cache import clear_challenges, clear_config, clear_standings
+from CTFd.cache import invalidate
 from CTFd.constants import RawEnum
 from CTFd.models import Configs, Fields, db
 from CTFd.schemas.config import ConfigSchema
@@ -97,9 +97,7 @@ class ConfigList(Resource):
         response = schema.dump(response.data)
         db.session.close()
 
-        clear_config()
-        clear_standings()
-        clear_challenges()
+        invalidate("config")
 
         return {"success": True, "data": response.data}
 
@@ -118,9 +116,7 @@ class ConfigList(Resource):
                 return {"success": False, "errors": response.errors}, 400
             set_config(key=key, value=value)
 
-        clear_config()
-        clear_standings()
-        clear_challenges()
+        invalidate("config")
 
         return {"success": True}
 
@@ -175,9 +171,7 @@ class Config(Resource):
         response = schema.dump(response.data)
         db.session.close()
 
-        clear_config()
-        clear_standings()
-        clear_challenges()
+        invalidate("config")
 
         return {"success": True, "data": response.data}
 
@@ -193,9 +187,7 @@ class Config(Resource):
         db.session.commit()
         db.session.close()
 
-        clear_config()
-        clear_standings()
-        clear_challenges()
+        invalidate("config")
 
         return {"success": True}
 
@@ -6,9 +6,10 @@ from flask_restx import Namespace, Resource
 from CTFd.api.v1.helpers.request import validate_args
 from CTFd.api.v1.helpers.schemas import sqlalchemy_to_pydantic
 from CTFd.api.v1.schemas import APIDetailedSuccessResponse, APIListSuccessResponse
+from CTFd.cache import invalidate
 from CTFd.constants import RawEnum
 from CTFd.models import Flags, db
-from CTFd.plugins.flags import FLAG_CLASSES, get_flag_class
+from CTFd.plugins.flags import FLAG_CLASSES, FlagException, check_flag, get_flag_class
 from CTFd.schemas.flags import FlagSchema
 from CTFd.utils.decorators import admins_only
 from CTFd.utils.helpers.models import build_model_filters
@@ -96,8 +97,14 @@ class FlagList(Resource):
         if response.errors:
             return {"success": False, "errors": response.errors}, 400
 
+        try:
+            check_flag(response.data)
+        except FlagException as e:
+            return {"success": False, "errors": {"content": [str(e)]}}, 400
+
         db.session.add(response.data)
         db.session.commit()
+        invalidate("flags")
 
         response = schema.dump(response.data)
         db.session.close()
@@ -163,6 +170,7 @@ class Flag(Resource):
 
         db.session.delete(flag)
         db.session.commit()
+        invalidate("flags")
         db.session.close()
 
         return {"success": True}
@@ -188,7 +196,13 @@ class Flag(Resource):
         if response.errors:
             return {"success": False, "errors": response.errors}, 400
 
+        try:
+            check_flag(response.data)
+        except FlagException as e:
+            return {"success": False, "errors": {"content": [str(e)]}}, 400
+
         db.session.commit()
+        invalidate("flags")
 
         response = schema.dump(response.data)
         db.session.close()
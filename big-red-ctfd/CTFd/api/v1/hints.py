@@ -10,6 +10,8 @@ from CTFd.constants import RawEnum
 from CTFd.models import Hints, HintUnlocks, db
 from CTFd.schemas.hints import HintSchema
 from CTFd.utils import get_config
+from CTFd.utils.challenges import get_solve_ids_for_user_id
+from CTFd.utils.challenges.prerequisites import get_prerequisite_graph
 from CTFd.utils.decorators import admins_only, during_ctf_time_only
 from CTFd.utils.decorators.visibility import check_challenge_visibility
 from CTFd.utils.helpers.models import build_model_filters
@@ -122,6 +124,23 @@ class Hint(Resource):
         hint = Hints.query.filter_by(id=hint_id).first_or_404()
         user = get_current_user()
 
+        # Hints are only shown once the challenge they belong to is unlocked
+        if not is_admin():
+            solve_ids = get_solve_ids_for_user_id(user_id=user.id) if user else set()
+            graph = get_prerequisite_graph()
+            if not graph.is_unlocked(hint.challenge_id, solve_ids):
+                return (
+                    {
+                        "success": False,
+                        "errors": {
+                            "requirements": [
+                                "You must solve other challenges before accessing this hint"
+                            ]
+                        },
+                    },
+                    403,
+                )
+
         # We allow public accessing of hints if challenges are visible and there is no cost or prerequisites
         # If there is a cost or a prereq we should block the user from seeing the hint
         if user is None:
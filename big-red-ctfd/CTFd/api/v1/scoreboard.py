@@ -12,8 +12,13 @@ from CTFd.utils.decorators.visibility import (
     check_score_visibility,
 )
 from CTFd.utils.modes import TEAMS_MODE, generate_account_url, get_mode_as_word
-from CTFd.utils.scoreboard import get_scoreboard_detail
+from CTFd.utils.scoreboard import (
+    get_scoreboard_detail,
+    get_scoreboard_series,
+    get_scoreboard_snapshot,
+)
 from CTFd.utils.scores import get_standings, get_user_standings
+from CTFd.utils.scores.standings import get_scoreboard_version
 
 scoreboard_namespace = Namespace(
     "scoreboard", description="Endpoint to retrieve scores"
@@ -97,3 +102,34 @@ class ScoreboardDetail(Resource):
         bracket_id = request.args.get("bracket_id")
         response = get_scoreboard_detail(count=count, bracket_id=bracket_id)
         return {"success": True, "data": response}
+
+
+@scoreboard_namespace.route("/top/<int:count>/series")
+@scoreboard_namespace.param("count", "How many top teams to return")
+@scoreboard_namespace.param(
+    "points", "Downsample every series to at most this many entries"
+)
+class ScoreboardSeries(Resource):
+    @check_account_visibility
+    @check_score_visibility
+    def get(self, count):
+        count = max(1, min(count, 50))
+        bracket_id = request.args.get("bracket_id")
+        points = request.args.get("points", type=int)
+        if points is not None:
+            points = max(2, min(points, 1000))
+        response = get_scoreboard_series(
+            count=count, bracket_id=bracket_id, points=points
+        )
+        return {"success": True, "data": response}
+
+
+@scoreboard_namespace.route("/snapshot")
+class ScoreboardSnapshot(Resource):
+    @check_account_visibility
+    @check_score_visibility
+    def get(self):
+        # Clients apply the "scoreboard" events from /events on top of this and fetch it again when they see a gap
+        # in the version numbers
+        response = get_scoreboard_snapshot(version=get_scoreboard_version())
+        return {"success": True, "data": response}
@@ -1,13 +1,12 @@
 from flask import request
 from flask_restx import Resource
 from sqlalchemy import Integer, func
-from sqlalchemy.sql import and_
 from sqlalchemy.sql.expression import cast
 
 from CTFd.api.v1.statistics import statistics_namespace
-from CTFd.models import Challenges, Solves, db
+from CTFd.models import Challenges
+from CTFd.utils.challenges import get_challenge_statistics
 from CTFd.utils.decorators import admins_only
-from CTFd.utils.modes import get_model
 
 
 @statistics_namespace.route("/challenges/<column>")
@@ -19,12 +18,21 @@ class ChallengePropertyCounts(Resource):
             "count": func.count,
             "sum": func.sum,
         }
-        aggregate_func = funcs[request.args.get("function", "count")]
+        function = request.args.get("function", "count")
+        target = request.args.get("target", "category")
+        aggregate_func = funcs[function]
+
+        # The category totals shown on the statistics page are kept with the other challenge statistics
+        totals = {("count", "category"): "challenges", ("sum", "value"): "value"}
+        if column == "category" and (function, target) in totals:
+            total = totals[(function, target)]
+            categories = get_challenge_statistics()["categories"]
+            data = {category: t[total] for category, t in categories.items()}
+            return {"success": True, "data": data}
+
         if column in Challenges.__table__.columns.keys():
             c1 = getattr(Challenges, column)
-            c2 = getattr(
-                Challenges, request.args.get("target", "category"), Challenges.category
-            )
+            c2 = getattr(Challenges, target, Challenges.category)
             # We cast this to Integer to deal with cases where SQLAlchemy will give us a Decimal instead
             data = (
                 Challenges.query.with_entities(c1, cast(aggregate_func(c2), Integer))
@@ -41,49 +49,13 @@ class ChallengePropertyCounts(Resource):
 class ChallengeSolveStatistics(Resource):
     @admins_only
     def get(self):
-        chals = (
-            Challenges.query.filter(
-                and_(Challenges.state != "hidden", Challenges.state != "locked")
-            )
-            .order_by(Challenges.value)
-            .all()
-        )
-
-        Model = get_model()
-
-        solves_sub = (
-            db.session.query(
-                Solves.challenge_id, db.func.count(Solves.challenge_id).label("solves")
-            )
-            .join(Model, Solves.account_id == Model.id)
-            .filter(Model.banned == False, Model.hidden == False)
-            .group_by(Solves.challenge_id)
-            .subquery()
-        )
-
-        solves = (
-            db.session.query(
-                solves_sub.columns.challenge_id,
-                solves_sub.columns.solves,
-                Challenges.name,
-            )
-            .join(Challenges, solves_sub.columns.challenge_id == Challenges.id)
-            .all()
-        )
-
-        response = []
-        has_solves = []
-
-        for challenge_id, count, name in solves:
-            challenge = {"id": challenge_id, "name": name, "solves": count}
-            response.append(challenge)
-            has_solves.append(challenge_id)
-        for c in chals:
-            if c.id not in has_solves:
-                challenge = {"id": c.id, "name": c.name, "solves": 0}
-                response.append(challenge)
-
-        db.session.close()
+        statistics = get_challenge_statistics()
+        # Hidden and locked challenges are only listed once they have been solved
+        response = [
+            {"id": c["id"], "name": c["name"], "solves": c["solves"]}
+            for c in statistics["challenges"]
+            if c["solves"] or c["state"] not in ("hidden", "locked")
+        ]
         return {"success": True, "data": response}
 
 
@@ -91,47 +63,10 @@ class ChallengeSolveStatistics(Resource):
 class ChallengeSolvePercentages(Resource):
     @admins_only
     def get(self):
-        challenges = (
-            Challenges.query.add_columns(
-                Challenges.id,
-                Challenges.name,
-                Challenges.state,
-                Challenges.max_attempts,
-            )
-            .order_by(Challenges.value)
-            .all()
-        )
-
-        Model = get_model()
-
-        teams_with_points = (
-            db.session.query(Solves.account_id)
-            .join(Model)
-            .filter(Model.banned == False, Model.hidden == False)
-            .group_by(Solves.account_id)
-            .count()
-        )
-
-        percentage_data = []
-        for challenge in challenges:
-            solve_count = (
-                Solves.query.join(Model, Solves.account_id == Model.id)
-                .filter(
-                    Solves.challenge_id == challenge.id,
-                    Model.banned == False,
-                    Model.hidden == False,
-                )
-                .count()
-            )
-
-            if teams_with_points > 0:
-                percentage = float(solve_count) / float(teams_with_points)
-            else:
-                percentage = 0.0
-
-            percentage_data.append(
-                {"id": challenge.id, "name": challenge.name, "percentage": percentage}
-            )
-
+        statistics = get_challenge_statistics()
+        percentage_data = [
+            {"id": c["id"], "name": c["name"], "percentage": c["percentage"]}
+            for c in statistics["challenges"]
+        ]
         response = sorted(percentage_data, key=lambda x: x["percentage"], reverse=True)
         return {"success": True, "data": response}
@@ -9,7 +9,7 @@ from CTFd.api.v1.schemas import (
     APIDetailedSuccessResponse,
     PaginatedAPIListSuccessResponse,
 )
-from CTFd.cache import clear_challenges, clear_standings
+from CTFd.cache import invalidate
 from CTFd.constants import RawEnum
 from CTFd.models import Solves, Submissions, db
 from CTFd.schemas.submissions import SubmissionSchema
@@ -140,10 +140,7 @@ class SubmissionsList(Resource):
         response = schema.dump(response.data)
         db.session.close()
 
-        # Delete standings cache
-        clear_standings()
-        # Delete challenges cache
-        clear_challenges()
+        invalidate("solves", "fails")
 
         return {"success": True, "data": response.data}
 
@@ -202,9 +199,7 @@ class Submission(Resource):
             submission.type = "discard"
             db.session.commit()
 
-            # Delete standings cache
-            clear_standings()
-            clear_challenges()
+            invalidate("solves", "fails")
 
             submission = solve
 
@@ -233,8 +228,6 @@ class Submission(Resource):
         db.session.commit()
         db.session.close()
 
-        # Delete standings cache
-        clear_standings()
-        clear_challenges()
+        invalidate("solves", "fails")
 
         return {"success": True}
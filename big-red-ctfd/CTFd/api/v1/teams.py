@@ -10,12 +10,7 @@ from CTFd.api.v1.schemas import (
     APIDetailedSuccessResponse,
     PaginatedAPIListSuccessResponse,
 )
-from CTFd.cache import (
-    clear_challenges,
-    clear_standings,
-    clear_team_session,
-    clear_user_session,
-)
+from CTFd.cache import clear_team_session, clear_user_session, invalidate
 from CTFd.constants import RawEnum
 from CTFd.models import Awards, Submissions, Teams, Unlocks, Users, db
 from CTFd.schemas.awards import AwardSchema
@@ -168,8 +163,7 @@ class TeamList(Resource):
         response = schema.dump(response.data)
         db.session.close()
 
-        clear_standings()
-        clear_challenges()
+        invalidate("teams")
 
         return {"success": True, "data": response.data}
 
@@ -234,8 +228,7 @@ class TeamPublic(Resource):
         db.session.commit()
 
         clear_team_session(team_id=team.id)
-        clear_standings()
-        clear_challenges()
+        invalidate("teams")
 
         db.session.close()
 
@@ -258,8 +251,7 @@ class TeamPublic(Resource):
         db.session.commit()
 
         clear_team_session(team_id=team_id)
-        clear_standings()
-        clear_challenges()
+        invalidate("teams", "users", "solves", "awards", "fails")
 
         db.session.close()
 
@@ -394,8 +386,7 @@ class TeamPrivate(Resource):
         db.session.commit()
 
         clear_team_session(team_id=team.id)
-        clear_standings()
-        clear_challenges()
+        invalidate("teams", "users", "solves", "awards", "fails")
 
         db.session.close()
 
@@ -1,22 +1,25 @@
 from typing import List
 
-from flask import request
+from flask import current_app, request
 from flask_restx import Namespace, Resource
 
 from CTFd.api.v1.helpers.request import validate_args
 from CTFd.api.v1.helpers.schemas import sqlalchemy_to_pydantic
 from CTFd.api.v1.schemas import APIDetailedSuccessResponse, APIListSuccessResponse
-from CTFd.cache import clear_standings
+from CTFd.cache import invalidate
 from CTFd.constants import RawEnum
 from CTFd.models import Unlocks, db, get_class_by_tablename
 from CTFd.schemas.awards import AwardSchema
 from CTFd.schemas.unlocks import UnlockSchema
+from CTFd.utils.challenges import get_solve_ids_for_user_id
+from CTFd.utils.challenges.prerequisites import get_prerequisite_graph
 from CTFd.utils.decorators import (
     admins_only,
     authed_only,
     during_ctf_time_only,
     require_verified_emails,
 )
+from CTFd.utils.events import account_channel
 from CTFd.utils.helpers.models import build_model_filters
 from CTFd.utils.user import get_current_user
 
@@ -107,6 +110,21 @@ class UnlockList(Resource):
         Model = get_class_by_tablename(req["type"])
         target = Model.query.filter_by(id=req["target"]).first_or_404()
 
+        # Hints of a challenge can't be bought before the challenge is unlocked
+        if req["type"] == "hints":
+            solve_ids = get_solve_ids_for_user_id(user_id=user.id)
+            graph = get_prerequisite_graph()
+            if not graph.is_unlocked(target.challenge_id, solve_ids):
+                return (
+                    {
+                        "success": False,
+                        "errors": {
+                            "target": "You must solve other challenges before unlocking this hint"
+                        },
+                    },
+                    403,
+                )
+
         # We should use the team's score if in teams mode
         # user.account gives the appropriate account based on team mode
         # Use get_score with admin to get the account's full score value
@@ -158,7 +176,13 @@ class UnlockList(Resource):
         award = award_schema.load(award)
         db.session.add(award.data)
         db.session.commit()
-        clear_standings()
+        invalidate("awards")
+
+        current_app.events_manager.publish(
+            data={"user_id": user.id, "target": req["target"], "type": req["type"]},
+            type="unlock",
+            channel=account_channel(user.id, user.team_id),
+        )
 
         response = schema.dump(response.data)
 
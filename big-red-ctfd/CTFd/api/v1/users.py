@@ -9,7 +9,7 @@ from CTFd.api.v1.schemas import (
     APIDetailedSuccessResponse,
     PaginatedAPIListSuccessResponse,
 )
-from CTFd.cache import clear_challenges, clear_standings, clear_user_session
+from CTFd.cache import clear_user_session, invalidate
 from CTFd.constants import RawEnum
 from CTFd.models import (
     Awards,
@@ -173,8 +173,7 @@ class UserList(Resource):
 
             user_created_notification(addr=email, name=name, password=password)
 
-        clear_standings()
-        clear_challenges()
+        invalidate("users")
 
         response = schema.dump(response.data)
 
@@ -251,8 +250,7 @@ class UserPublic(Resource):
         db.session.close()
 
         clear_user_session(user_id=user_id)
-        clear_standings()
-        clear_challenges()
+        invalidate("users")
 
         return {"success": True, "data": response.data}
 
@@ -280,8 +278,7 @@ class UserPublic(Resource):
         db.session.close()
 
         clear_user_session(user_id=user_id)
-        clear_standings()
-        clear_challenges()
+        invalidate("users", "solves", "awards", "fails", "tracking")
 
         return {"success": True}
 
@@ -338,8 +335,7 @@ class UserPrivate(Resource):
         response = schema.dump(response.data)
         db.session.close()
 
-        clear_standings()
-        clear_challenges()
+        invalidate("users")
 
         return {"success": True, "data": response.data}
 
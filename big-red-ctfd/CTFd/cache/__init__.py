@@ -1,12 +1,254 @@
+from collections import OrderedDict
 from functools import lru_cache, wraps
 from hashlib import md5
-from time import monotonic_ns
+from threading import Lock
+from time import monotonic, monotonic_ns
+from uuid import uuid4
 
-from flask import request
-from flask_caching import Cache, make_template_fragment_key
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_caching import Cache, function_namespace, make_template_fragment_key
 
 cache = Cache()
 
+# The kinds of data cached values are built from. Writes invalidate the domains they touched and only the cached
+# values that declared a dependency on one of them are dropped.
+CACHE_DOMAINS = (
+    "awards",
+    "brackets",
+    "challenges",
+    "config",
+    "fails",
+    "flags",
+    "pages",
+    "solves",
+    "teams",
+    "tracking",
+    "users",
+)
+STANDINGS_DOMAINS = (
+    "awards",
+    "brackets",
+    "challenges",
+    "config",
+    "solves",
+    "teams",
+    "users",
+)
+
+_dependents = {domain: [] for domain in CACHE_DOMAINS}
+
+# Names the current generation of every worker's near caches in the shared cache. Replacing it (forget_memoized(),
+# invalidate() or deleting it with a cache.clear()) makes every worker drop its near caches at its next request.
+NEAR_CACHE_TOKEN_KEY = "near_cache_token"
+
+# Where request_cached() keeps values on flask.g, along with the request they belong to. An app context can outlive
+# a request or be shared by several, as it is in the tests.
+REQUEST_CACHE_KEY = "request_cache"
+
+# Near caches by the memoized function they sit in front of, and the token they were last synced with
+_near_caches = {}
+_near_cache_token = None
+
+
+def _check_domains(domains):
+    unknown = set(domains).difference(CACHE_DOMAINS)
+    if unknown:
+        raise ValueError(f"Unknown cache domains: {', '.join(sorted(unknown))}")
+
+
+def depends_on(*domains):
+    """
+    Declare which domains a cached value depends on so that invalidate() drops it when one of them is written to.
+
+    Decorates either a memoized function (all of its memoized versions are dropped) or a function returning plain
+    cache keys such as cached views and template fragments (those keys are deleted).
+
+    Dependencies are registered on import, so they are in place once the app has been created.
+    """
+    _check_domains(domains)
+
+    def decorator(f):
+        for domain in domains:
+            _dependents[domain].append(f)
+        return f
+
+    return decorator
+
+
+def invalidate(*domains):
+    """
+    Drop every cached value that depends on any of the given domains.
+
+    Memoized functions get a new Flask-Caching version, the same thing delete_memoized() does, but all of them are
+    written at once instead of one round trip per function.
+    """
+    _check_domains(domains)
+    dependents = []
+    for domain in domains:
+        for f in _dependents[domain]:
+            if f not in dependents:
+                dependents.append(f)
+
+    versions = {}
+    keys = []
+    for f in dependents:
+        if hasattr(f, "uncached"):
+            versions[function_namespace(f)[0] + "_memver"] = uuid4().hex[:6]
+        else:
+            keys.extend(f())
+    if versions:
+        cache.set_many(versions)
+    if "users" in domains or "teams" in domains:
+        clear_request_cache()
+    if any(f in _near_caches for f in dependents):
+        _forget_near(*(f for f in dependents if f in _near_caches))
+    if current_app.config.get("CACHE_TYPE") == "redis":
+        cache.delete_many(*keys)
+    else:
+        # The other backends delete key by key and delete_many() gives up at the first key that isn't cached
+        for key in keys:
+            cache.delete(key)
+
+
+class NearCache(object):
+    """
+    Per-process LRU of recently read values, kept for `timeout` seconds in front of a memoized function so that hot
+    keys are served without a round trip to the shared cache.
+    """
+
+    def __init__(self, timeout=5, maxsize=1024):
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self.lock = Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        """
+        :return: whether the key was cached and its value
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires <= monotonic():
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (monotonic() + self.timeout, value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def near_cache(timeout=5, maxsize=1024):
+    """
+    Put a NearCache in front of a memoized function. Only reads made while handling a request go through it: every
+    request first checks the shared token with sync_near_caches(), so a write in any worker is seen by the others
+    from their next request on. The timeout bounds how stale a long running request can get.
+
+    None is never kept, the same as Flask-Caching does not cache it. Use forget_memoized() instead of
+    cache.delete_memoized() to drop values of the decorated function.
+    """
+
+    def decorator(f):
+        near = NearCache(timeout=timeout, maxsize=maxsize)
+        _near_caches[f] = near
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not has_request_context() or near.timeout <= 0:
+                return f(*args, **kwargs)
+            key = (args, tuple(sorted(kwargs.items())))
+            hit, value = near.get(key)
+            if hit:
+                return value
+            value = f(*args, **kwargs)
+            if value is not None:
+                near.set(key, value)
+            return value
+
+        wrapper.near_cache = near
+        wrapper.memoized = f
+        # Callers bypass every cache through __wrapped__, as they did before the near cache was added
+        wrapper.__wrapped__ = getattr(f, "uncached", f)
+        return wrapper
+
+    return decorator
+
+
+def _shared_near_cache_token():
+    token = cache.get(NEAR_CACHE_TOKEN_KEY)
+    if token is None:
+        token = uuid4().hex
+        if not cache.add(NEAR_CACHE_TOKEN_KEY, token, timeout=0):
+            token = cache.get(NEAR_CACHE_TOKEN_KEY)
+    return token
+
+
+def _forget_near(*memoized):
+    global _near_cache_token
+    for f in memoized:
+        _near_caches[f].clear()
+    _near_cache_token = uuid4().hex
+    cache.set(NEAR_CACHE_TOKEN_KEY, _near_cache_token, timeout=0)
+
+
+def sync_near_caches():
+    """Drop every near cache of this worker if another worker has written to their functions since the last sync"""
+    global _near_cache_token
+    token = _shared_near_cache_token()
+    if token != _near_cache_token:
+        for near in _near_caches.values():
+            near.clear()
+        _near_cache_token = token
+
+
+def forget_memoized(f, *args, **kwargs):
+    """cache.delete_memoized() that also drops the values near caches of every worker hold for f"""
+    memoized = getattr(f, "memoized", f)
+    cache.delete_memoized(memoized, *args, **kwargs)
+    clear_request_cache()
+    if memoized in _near_caches:
+        _forget_near(memoized)
+
+
+def request_cached(f):
+    """
+    Keep what f returns for the rest of the current request, for lookups like the current user that the request
+    hooks, decorators and views all ask for. The values are dropped when the request ends and by
+    clear_request_cache(), which the writes that change them call. Outside of a request f is always called.
+    """
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if not has_request_context():
+            return f(*args, **kwargs)
+        current = request._get_current_object()
+        owner, values = g.get(REQUEST_CACHE_KEY, (None, None))
+        if owner is not current:
+            values = {}
+            setattr(g, REQUEST_CACHE_KEY, (current, values))
+        key = (f, args, tuple(sorted(kwargs.items())))
+        if key not in values:
+            values[key] = f(*args, **kwargs)
+        return values[key]
+
+    return wrapper
+
+
+def clear_request_cache():
+    if has_app_context():
+        g.pop(REQUEST_CACHE_KEY, None)
+
 
 def timed_lru_cache(timeout: int = 300, maxsize: int = 64, typed: bool = False):
     """
@@ -87,120 +329,64 @@ def calculate_param_hash(params, allowed_params=None):
 
 
 def clear_config():
-    from CTFd.utils import _get_config, get_app_config
-
-    cache.delete_memoized(_get_config)
-    cache.delete_memoized(get_app_config)
+    invalidate("config")
 
 
-def clear_standings():
+@depends_on(*STANDINGS_DOMAINS)
+def _scoreboard_keys():
     from CTFd.api import api
     from CTFd.api.v1.scoreboard import ScoreboardDetail, ScoreboardList
     from CTFd.constants.static import CacheKeys
-    from CTFd.models import Teams, Users  # noqa: I001
-    from CTFd.utils.scoreboard import get_scoreboard_detail
-    from CTFd.utils.scores import get_standings, get_team_standings, get_user_standings
-    from CTFd.utils.user import (
-        get_team_place,
-        get_team_score,
-        get_user_place,
-        get_user_score,
-    )
-
-    # Clear out the bulk standings functions
-    cache.delete_memoized(get_standings)
-    cache.delete_memoized(get_team_standings)
-    cache.delete_memoized(get_user_standings)
-    cache.delete_memoized(get_scoreboard_detail)
-
-    # Clear out the individual helpers for accessing score via the model
-    cache.delete_memoized(Users.get_score)
-    cache.delete_memoized(Users.get_place)
-    cache.delete_memoized(Teams.get_score)
-    cache.delete_memoized(Teams.get_place)
-
-    # Clear the Jinja Attrs constants
-    cache.delete_memoized(get_user_score)
-    cache.delete_memoized(get_user_place)
-    cache.delete_memoized(get_team_score)
-    cache.delete_memoized(get_team_place)
-
-    # Clear out HTTP request responses
-    cache.delete(make_cache_key(path=api.name + "." + ScoreboardList.endpoint))
-    cache.delete(make_cache_key(path=api.name + "." + ScoreboardDetail.endpoint))
-    cache.delete_memoized(ScoreboardList.get)
-    cache.delete_memoized(ScoreboardDetail.get)
-
-    # Clear out scoreboard templates
-    cache.delete(make_template_fragment_key(CacheKeys.PUBLIC_SCOREBOARD_TABLE))
 
+    return [
+        # HTTP request responses
+        make_cache_key(path=api.name + "." + ScoreboardList.endpoint),
+        make_cache_key(path=api.name + "." + ScoreboardDetail.endpoint),
+        # Scoreboard templates
+        make_template_fragment_key(CacheKeys.PUBLIC_SCOREBOARD_TABLE),
+    ]
 
-def clear_challenges():
-    from CTFd.utils.challenges import get_all_challenges  # noqa: I001
-    from CTFd.utils.challenges import (
-        get_solve_counts_for_challenges,
-        get_solve_ids_for_user_id,
-        get_solves_for_challenge_id,
-    )
 
-    cache.delete_memoized(get_all_challenges)
-    cache.delete_memoized(get_solves_for_challenge_id)
-    cache.delete_memoized(get_solve_ids_for_user_id)
-    cache.delete_memoized(get_solve_counts_for_challenges)
+def clear_standings():
+    """Drop everything derived from scores, for writes that changed scores without saying how"""
+    invalidate("solves", "awards")
 
 
-def clear_pages():
-    from CTFd.utils.config.pages import get_page, get_pages
+def clear_challenges():
+    invalidate("challenges")
 
-    cache.delete_memoized(get_pages)
-    cache.delete_memoized(get_page)
+
+def clear_pages():
+    invalidate("pages")
 
 
 def clear_user_recent_ips(user_id):
-    from CTFd.utils.user import get_user_recent_ips
+    from CTFd.utils.user import get_tracked_user_ips
 
-    cache.delete_memoized(get_user_recent_ips, user_id=user_id)
+    cache.delete_memoized(get_tracked_user_ips, user_id=user_id)
 
 
 def clear_user_session(user_id):
-    from CTFd.utils.user import (  # noqa: I001
-        get_user_attrs,
-        get_user_place,
-        get_user_recent_ips,
-        get_user_score,
-    )
+    from CTFd.utils.user import get_tracked_user_ips, get_user_attrs
 
-    cache.delete_memoized(get_user_attrs, user_id=user_id)
-    cache.delete_memoized(get_user_place, user_id=user_id)
-    cache.delete_memoized(get_user_score, user_id=user_id)
-    cache.delete_memoized(get_user_recent_ips, user_id=user_id)
+    forget_memoized(get_user_attrs, user_id=user_id)
+    cache.delete_memoized(get_tracked_user_ips, user_id=user_id)
 
 
 def clear_all_user_sessions():
-    from CTFd.utils.user import (  # noqa: I001
-        get_user_attrs,
-        get_user_place,
-        get_user_recent_ips,
-        get_user_score,
-    )
+    from CTFd.utils.user import get_tracked_user_ips, get_user_attrs
 
-    cache.delete_memoized(get_user_attrs)
-    cache.delete_memoized(get_user_place)
-    cache.delete_memoized(get_user_score)
-    cache.delete_memoized(get_user_recent_ips)
+    forget_memoized(get_user_attrs)
+    cache.delete_memoized(get_tracked_user_ips)
 
 
 def clear_team_session(team_id):
-    from CTFd.utils.user import get_team_attrs, get_team_place, get_team_score
+    from CTFd.utils.user import get_team_attrs
 
-    cache.delete_memoized(get_team_attrs, team_id=team_id)
-    cache.delete_memoized(get_team_place, team_id=team_id)
-    cache.delete_memoized(get_team_score, team_id=team_id)
+    forget_memoized(get_team_attrs, team_id=team_id)
 
 
 def clear_all_team_sessions():
-    from CTFd.utils.user import get_team_attrs, get_team_place, get_team_score
+    from CTFd.utils.user import get_team_attrs
 
-    cache.delete_memoized(get_team_attrs)
-    cache.delete_memoized(get_team_place)
-    cache.delete_memoized(get_team_score)
+    forget_memoized(get_team_attrs)
@@ -244,10 +244,18 @@ class ServerConfig(object):
 
     SERVER_SENT_EVENTS: bool = process_boolean_str(empty_str_cast(config_ini["optional"]["SERVER_SENT_EVENTS"], default=True))
 
+    SERVER_SENT_EVENTS_BUFFER: int = int(empty_str_cast(config_ini["optional"].get("SERVER_SENT_EVENTS_BUFFER", ""), default=1024))
+
     HTML_SANITIZATION: bool = process_boolean_str(empty_str_cast(config_ini["optional"]["HTML_SANITIZATION"], default=False))
 
     SAFE_MODE: bool = process_boolean_str(empty_str_cast(config_ini["optional"].get("SAFE_MODE", False), default=False))
 
+    IMPORT_BATCH_SIZE: int = int(empty_str_cast(config_ini["optional"].get("IMPORT_BATCH_SIZE", ""), default=1000))
+
+    TRACKING_BATCH_SIZE: int = int(empty_str_cast(config_ini["optional"].get("TRACKING_BATCH_SIZE", ""), default=100))
+
+    TRACKING_FLUSH_INTERVAL: int = int(empty_str_cast(config_ini["optional"].get("TRACKING_FLUSH_INTERVAL", ""), default=5))
+
     if DATABASE_URL.startswith("sqlite") is False:
         SQLALCHEMY_ENGINE_OPTIONS = {
             "max_overflow": int(empty_str_cast(config_ini["optional"]["SQLALCHEMY_MAX_OVERFLOW"], default=20)),  # noqa: E131
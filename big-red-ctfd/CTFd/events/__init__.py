@@ -1,8 +1,10 @@
-from flask import Blueprint, Response, current_app, stream_with_context
+from flask import Blueprint, Response, current_app, request, stream_with_context
 
 from CTFd.models import db
 from CTFd.utils import get_app_config
 from CTFd.utils.decorators import authed_only, ratelimit
+from CTFd.utils.events import team_channel, user_channel
+from CTFd.utils.user import get_current_user_attrs
 
 events = Blueprint("events", __name__)
 
@@ -11,9 +13,23 @@ events = Blueprint("events", __name__)
 @authed_only
 @ratelimit(method="GET", limit=150, interval=60)
 def subscribe():
+    # Browsers send the id of the last event they saw when they reconnect
+    try:
+        last_event_id = int(request.headers["Last-Event-ID"])
+    except (KeyError, ValueError):
+        last_event_id = None
+
+    # Besides the broadcast channel users receive the events meant for them and their team
+    user = get_current_user_attrs()
+    channels = ["ctf", user_channel(user.id)]
+    if user.team_id:
+        channels.append(team_channel(user.team_id))
+
     @stream_with_context
     def gen():
-        for event in current_app.events_manager.subscribe():
+        for event in current_app.events_manager.subscribe(
+            channels=channels, last_event_id=last_event_id
+        ):
             yield str(event)
 
     enabled = get_app_config("SERVER_SENT_EVENTS")
@@ -7,8 +7,6 @@ from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import column_property, validates
 
-from CTFd.cache import cache
-
 db = SQLAlchemy()
 ma = Marshmallow()
 
@@ -511,60 +509,23 @@ class Users(db.Model):
             awards = awards.filter(Awards.date < dt)
         return awards.all()
 
-    @cache.memoize()
     def get_score(self, admin=False):
-        score = db.func.sum(Challenges.value).label("score")
-        user = (
-            db.session.query(Solves.user_id, score)
-            .join(Users, Solves.user_id == Users.id)
-            .join(Challenges, Solves.challenge_id == Challenges.id)
-            .filter(Users.id == self.id)
-        )
+        from CTFd.utils.scores import get_account_score
 
-        award_score = db.func.sum(Awards.value).label("award_score")
-        award = db.session.query(award_score).filter_by(user_id=self.id)
-
-        if not admin:
-            freeze = Configs.query.filter_by(key="freeze").first()
-            if freeze and freeze.value:
-                freeze = int(freeze.value)
-                freeze = datetime.datetime.utcfromtimestamp(freeze)
-                user = user.filter(Solves.date < freeze)
-                award = award.filter(Awards.date < freeze)
-
-        user = user.group_by(Solves.user_id).first()
-        award = award.first()
-
-        if user and award:
-            return int(user.score or 0) + int(award.award_score or 0)
-        elif user:
-            return int(user.score or 0)
-        elif award:
-            return int(award.award_score or 0)
-        else:
-            return 0
+        return get_account_score("users", self.id, admin=admin)
 
-    @cache.memoize()
     def get_place(self, admin=False, numeric=False):
         """
-        This method is generally a clone of CTFd.scoreboard.get_standings.
-        The point being that models.py must be self-reliant and have little
-        to no imports within the CTFd application as importing from the
-        application itself will result in a circular import.
+        Models must stay self-reliant so the standings index is imported here rather than at the top of the module,
+        as importing from the application itself would result in a circular import.
         """
         from CTFd.utils.humanize.numbers import ordinalize
-        from CTFd.utils.scores import get_user_standings
+        from CTFd.utils.scores import get_account_place
 
-        standings = get_user_standings(admin=admin)
-
-        for i, user in enumerate(standings):
-            if user.user_id == self.id:
-                n = i + 1
-                if numeric:
-                    return n
-                return ordinalize(n)
-        else:
-            return None
+        n = get_account_place("users", self.id, admin=admin)
+        if n is None or numeric:
+            return n
+        return ordinalize(n)
 
 
 class Admins(Users):
@@ -795,34 +756,27 @@ class Teams(db.Model):
 
         return awards.all()
 
-    @cache.memoize()
     def get_score(self, admin=False):
-        score = 0
-        for member in self.members:
-            score += member.get_score(admin=admin)
-        return score
+        from CTFd.utils.scores import get_account_score
+
+        # A team's score is what its members scored, so awards given to a member count even without the team's ID
+        return sum(
+            get_account_score("users", member.id, admin=admin)
+            for member in self.members
+        )
 
-    @cache.memoize()
     def get_place(self, admin=False, numeric=False):
         """
-        This method is generally a clone of CTFd.scoreboard.get_standings.
-        The point being that models.py must be self-reliant and have little
-        to no imports within the CTFd application as importing from the
-        application itself will result in a circular import.
+        Models must stay self-reliant so the standings index is imported here rather than at the top of the module,
+        as importing from the application itself would result in a circular import.
         """
         from CTFd.utils.humanize.numbers import ordinalize
-        from CTFd.utils.scores import get_team_standings  # noqa: I001
-
-        standings = get_team_standings(admin=admin)
+        from CTFd.utils.scores import get_account_place
 
-        for i, team in enumerate(standings):
-            if team.team_id == self.id:
-                n = i + 1
-                if numeric:
-                    return n
-                return ordinalize(n)
-        else:
-            return None
+        n = get_account_place("teams", self.id, admin=admin)
+        if n is None or numeric:
+            return n
+        return ordinalize(n)
 
 
 class Submissions(db.Model):
@@ -1,4 +1,4 @@
-from flask import Blueprint
+from flask import Blueprint, current_app
 
 from CTFd.models import (
     ChallengeFiles,
@@ -11,7 +11,8 @@ from CTFd.models import (
     db,
 )
 from CTFd.plugins import register_plugin_assets_directory
-from CTFd.plugins.flags import FlagException, get_flag_class
+from CTFd.plugins.flags import FlagException, get_flag_class, get_flags_for_challenge
+from CTFd.utils.events import account_channel
 from CTFd.utils.uploads import delete_file
 from CTFd.utils.user import get_ip
 
@@ -120,7 +121,10 @@ class BaseChallenge(object):
         """
         data = request.form or request.get_json()
         submission = data["submission"].strip()
-        flags = Flags.query.filter_by(challenge_id=challenge.id).all()
+        flags = get_flags_for_challenge(challenge.id)
+        if not all(getattr(get_flag_class(f.type), "cached", False) for f in flags):
+            # Flag types from plugins may read more of the model than the cached columns
+            flags = Flags.query.filter_by(challenge_id=challenge.id).all()
         for flag in flags:
             try:
                 if get_flag_class(flag.type).compare(flag, submission):
@@ -151,6 +155,18 @@ class BaseChallenge(object):
         db.session.add(solve)
         db.session.commit()
 
+        # Let the rest of the team (or the user's other tabs) know without polling
+        current_app.events_manager.publish(
+            data={
+                "user_id": user.id,
+                "user": user.name,
+                "challenge_id": challenge.id,
+                "challenge": challenge.name,
+            },
+            type="solve",
+            channel=account_channel(user.id, team.id if team else None),
+        )
+
     @classmethod
     def fail(cls, user, team, challenge, request):
         """
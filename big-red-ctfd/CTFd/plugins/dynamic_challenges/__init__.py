@@ -1,5 +1,6 @@
 from flask import Blueprint
 
+from CTFd.cache import invalidate
 from CTFd.exceptions.challenges import (
     ChallengeCreateException,
     ChallengeUpdateException,
@@ -112,6 +113,8 @@ class DynamicValueChallenge(BaseChallenge):
         super().solve(user, team, challenge, request)
 
         DynamicValueChallenge.calculate_value(challenge)
+        # Each solve changes the value shown on the challenge board
+        invalidate("challenges")
 
 
 def load(app):
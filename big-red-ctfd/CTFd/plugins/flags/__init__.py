@@ -1,7 +1,32 @@
+import hmac
 import re
+from collections import namedtuple
+from functools import lru_cache
 
+from CTFd.cache import cache, depends_on, near_cache
+from CTFd.models import Flags
 from CTFd.plugins import register_plugin_assets_directory
 
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# A flag as submissions are checked against it, detached from the session so that it can be cached
+Flag = namedtuple("Flag", ["id", "challenge_id", "type", "content", "data"])
+
+# How many compiled regex flags every process keeps. The cache inside `re` only holds 512 patterns, all regexes of
+# the app included, so large CTFs kept compiling the same flags again.
+REGEX_CACHE_SIZE = 4096
+
+REPEATS = tuple(
+    getattr(sre_parse, op)
+    for op in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_parse, op)
+)
+# Anchors and lookarounds, which match without consuming anything
+ZERO_WIDTH = (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT)
+
 
 class FlagException(Exception):
     def __init__(self, message):
@@ -14,6 +39,9 @@ class FlagException(Exception):
 class BaseFlag(object):
     name = None
     templates = {}
+    # Whether compare() only reads the columns kept in the cached Flag tuples. Flag types that don't say so are
+    # given the Flags models from the database, relationships and all.
+    cached = False
 
     @staticmethod
     def compare(self, saved, provided):
@@ -26,23 +54,17 @@ class CTFdStaticFlag(BaseFlag):
         "create": "/plugins/flags/assets/static/create.html",
         "update": "/plugins/flags/assets/static/edit.html",
     }
+    cached = True
 
     @staticmethod
     def compare(chal_key_obj, provided):
         saved = chal_key_obj.content
         data = chal_key_obj.data
 
-        if len(saved) != len(provided):
-            return False
-        result = 0
-
         if data == "case_insensitive":
-            for x, y in zip(saved.lower(), provided.lower()):
-                result |= ord(x) ^ ord(y)
-        else:
-            for x, y in zip(saved, provided):
-                result |= ord(x) ^ ord(y)
-        return result == 0
+            saved = saved.lower()
+            provided = provided.lower()
+        return hmac.compare_digest(saved.encode("utf-8"), provided.encode("utf-8"))
 
 
 class CTFdRegexFlag(BaseFlag):
@@ -51,27 +73,165 @@ class CTFdRegexFlag(BaseFlag):
         "create": "/plugins/flags/assets/regex/create.html",
         "update": "/plugins/flags/assets/regex/edit.html",
     }
+    cached = True
 
     @staticmethod
     def compare(chal_key_obj, provided):
         saved = chal_key_obj.content
         data = chal_key_obj.data
 
-        try:
-            if data == "case_insensitive":
-                res = re.match(saved, provided, re.IGNORECASE)
-            else:
-                res = re.match(saved, provided)
-        # TODO: this needs plugin improvements. See #1425.
-        except re.error as e:
-            raise FlagException("Regex parse error occured") from e
-
+        res = compile_regex(saved, data == "case_insensitive").match(provided)
         return res and res.group() == provided
 
 
 FLAG_CLASSES = {"static": CTFdStaticFlag, "regex": CTFdRegexFlag}
 
 
+def _subpatterns(av):
+    if isinstance(av, sre_parse.SubPattern):
+        yield av
+    elif isinstance(av, (tuple, list)):
+        for value in av:
+            yield from _subpatterns(value)
+
+
+def _can_be_empty(parsed):
+    for op, av in parsed:
+        if op in ZERO_WIDTH:
+            continue
+        if op in REPEATS:
+            if av[0] == 0 or _can_be_empty(av[2]):
+                continue
+        elif op == sre_parse.SUBPATTERN:
+            if _can_be_empty(av[-1]):
+                continue
+        elif op == sre_parse.BRANCH:
+            if any(_can_be_empty(branch) for branch in av[1]):
+                continue
+        return False
+    return True
+
+
+def _first_chars(parsed):
+    """The characters a match of parsed can start with, or None if that is too many to tell"""
+    chars = set()
+    for op, av in parsed:
+        if op in ZERO_WIDTH:
+            continue
+        if op == sre_parse.LITERAL:
+            first = {av}
+        elif op == sre_parse.IN:
+            first = set()
+            for item, value in av:
+                if item == sre_parse.LITERAL:
+                    first.add(value)
+                elif item == sre_parse.RANGE and value[1] - value[0] < 256:
+                    first.update(range(value[0], value[1] + 1))
+                else:
+                    return None
+        elif op in REPEATS:
+            first = _first_chars(av[2])
+        elif op == sre_parse.SUBPATTERN:
+            first = _first_chars(av[-1])
+        elif op == sre_parse.BRANCH:
+            first = set()
+            for branch in av[1]:
+                branch_first = _first_chars(branch)
+                if branch_first is None:
+                    return None
+                first |= branch_first
+        else:
+            return None
+        if first is None:
+            return None
+        chars |= first
+        if not _can_be_empty([(op, av)]):
+            break
+    return chars
+
+
+def _branches_overlap(branches):
+    """Whether a string could start matching more than one of the branches, such as a|aa or a|a?"""
+    seen = set()
+    for branch in branches:
+        first = _first_chars(branch)
+        if first is None or _can_be_empty(branch) or seen & first:
+            return True
+        seen |= first
+    return False
+
+
+def _is_ambiguous(parsed):
+    """Whether parsed contains an unbounded repeat or alternatives that overlap anywhere inside it"""
+    for op, av in parsed:
+        if op in REPEATS and av[1] == sre_parse.MAXREPEAT:
+            return True
+        if op == sre_parse.BRANCH and _branches_overlap(av[1]):
+            return True
+        if any(_is_ambiguous(p) for p in _subpatterns(av)):
+            return True
+    return False
+
+
+def has_nested_quantifiers(parsed):
+    """
+    Look for unbounded repeats of something that can itself match the same text in more than one way, like (a+)+,
+    (\\w+\\s?)+ or (a|aa)+. Those can match a string in exponentially many ways and a submission that almost matches
+    makes `re` try them all. `re` can't be interrupted once it is matching, so such flags are refused when they are
+    saved instead of timed out.
+    """
+    for op, av in parsed:
+        if op in REPEATS and av[1] == sre_parse.MAXREPEAT and _is_ambiguous(av[2]):
+            return True
+        if any(has_nested_quantifiers(p) for p in _subpatterns(av)):
+            return True
+    return False
+
+
+@lru_cache(maxsize=REGEX_CACHE_SIZE)
+def compile_regex(pattern, case_insensitive=False):
+    """
+    Compile a regex flag once per process
+
+    :raises FlagException: if the regex does not parse
+    """
+    try:
+        return re.compile(pattern, re.IGNORECASE if case_insensitive else 0)
+    # TODO: this needs plugin improvements. See #1425.
+    except re.error as e:
+        raise FlagException("Regex parse error occured") from e
+
+
+def check_flag(flag):
+    """
+    Make sure a flag about to be created or edited can be checked against submissions. Regexes that could backtrack
+    catastrophically are only refused here, flags saved before this check are still matched as they always were.
+
+    :raises FlagException: with the reason it can't
+    """
+    if flag.type == "regex":
+        compile_regex(flag.content, flag.data == "case_insensitive")
+        if has_nested_quantifiers(sre_parse.parse(flag.content)):
+            raise FlagException(
+                "Regex has nested quantifiers that are too slow to match"
+            )
+
+
+@near_cache()
+@depends_on("challenges", "flags")
+@cache.memoize(timeout=300)
+def get_flags_for_challenge(challenge_id):
+    flags = (
+        Flags.query.with_entities(
+            Flags.id, Flags.challenge_id, Flags.type, Flags.content, Flags.data
+        )
+        .filter_by(challenge_id=challenge_id)
+        .order_by(Flags.id.asc())
+        .all()
+    )
+    return [Flag(*flag) for flag in flags]
+
+
 def get_flag_class(class_id):
     cls = FLAG_CLASSES.get(class_id)
     if cls is None:
@@ -6,7 +6,7 @@ from cmarkgfm.cmark import Options
 from flask import current_app as app
 
 # isort:imports-firstparty
-from CTFd.cache import cache
+from CTFd.cache import cache, depends_on, forget_memoized, near_cache, request_cached
 from CTFd.models import Configs, db
 
 string_types = (str,)
@@ -40,6 +40,8 @@ def get_asset_json(path):
     return _get_asset_json(path)
 
 
+@near_cache()
+@depends_on("config")
 @cache.memoize()
 def _get_config(key):
     config = db.session.execute(
@@ -86,10 +88,11 @@ def set_config(key, value):
     if isinstance(key, Enum):
         key = str(key)
 
-    cache.delete_memoized(_get_config, key)
+    forget_memoized(_get_config, key)
     return config
 
 
+@request_cached
 def import_in_progress():
     import_status = cache.get(key="import_status")
     import_error = cache.get(key="import_error")
@@ -4,10 +4,11 @@ from collections import namedtuple
 from sqlalchemy import func as sa_func
 from sqlalchemy.sql import and_, false, true
 
-from CTFd.cache import cache
-from CTFd.models import Challenges, Solves, Users, db
+from CTFd.cache import cache, depends_on, near_cache
+from CTFd.models import Challenges, Fails, Solves, Users, db
 from CTFd.schemas.tags import TagSchema
 from CTFd.utils import get_config
+from CTFd.utils.challenges.prerequisites import get_prerequisite_graph
 from CTFd.utils.dates import isoformat, unix_time_to_utc
 from CTFd.utils.helpers.models import build_model_filters
 from CTFd.utils.modes import generate_account_url, get_model
@@ -16,7 +17,28 @@ Challenge = namedtuple(
     "Challenge", ["id", "type", "name", "value", "category", "tags", "requirements"]
 )
 
+# A challenge as the challenge board lists it. `prerequisites` only holds IDs of challenges that exist and `listing`
+# is None when the challenge type is not installed.
+BoardEntry = namedtuple("BoardEntry", ["id", "prerequisites", "anonymize", "listing"])
 
+
+def anonymized_listing(challenge_id):
+    """What the board shows for a locked challenge whose requirements ask to anonymize it"""
+    return {
+        "id": challenge_id,
+        "type": "hidden",
+        "name": "???",
+        "value": 0,
+        "solves": None,
+        "solved_by_me": False,
+        "category": "???",
+        "tags": [],
+        "template": "",
+        "script": "",
+    }
+
+
+@depends_on("challenges")
 @cache.memoize(timeout=60)
 def get_all_challenges(admin=False, field=None, q=None, **query_args):
     filters = build_model_filters(model=Challenges, query=q, field=field)
@@ -48,6 +70,47 @@ def get_all_challenges(admin=False, field=None, q=None, **query_args):
     return results
 
 
+@near_cache()
+@depends_on("challenges")
+@cache.memoize(timeout=60)
+def get_challenge_board(admin=False, field=None, q=None, **query_args):
+    """
+    Everything the challenge list shows that is the same for every account: the listed challenges with their tags,
+    templates and resolved prerequisites. Accounts only differ by which challenges they have solved, which is laid
+    over the board when it is served.
+    """
+    from CTFd.plugins.challenges import get_chal_class
+
+    graph = get_prerequisite_graph()
+    board = []
+    for challenge in get_all_challenges(admin=admin, field=field, q=q, **query_args):
+        try:
+            challenge_type = get_chal_class(challenge.type)
+        except KeyError:
+            listing = None
+        else:
+            listing = {
+                "id": challenge.id,
+                "type": challenge_type.name,
+                "name": challenge.name,
+                "value": challenge.value,
+                "category": challenge.category,
+                "tags": challenge.tags,
+                "template": challenge_type.templates["view"],
+                "script": challenge_type.scripts["view"],
+            }
+        board.append(
+            BoardEntry(
+                id=challenge.id,
+                prerequisites=graph.prerequisites_of(challenge.id),
+                anonymize=challenge.id in graph.anonymized,
+                listing=listing,
+            )
+        )
+    return board
+
+
+@depends_on("solves", "challenges", "config", "users", "teams")
 @cache.memoize(timeout=60)
 def get_solves_for_challenge_id(challenge_id, freeze=False):
     Model = get_model()
@@ -86,6 +149,7 @@ def get_solves_for_challenge_id(challenge_id, freeze=False):
     return results
 
 
+@depends_on("solves", "challenges", "users")
 @cache.memoize(timeout=60)
 def get_solve_ids_for_user_id(user_id):
     user = Users.query.filter_by(id=user_id).first()
@@ -98,6 +162,7 @@ def get_solve_ids_for_user_id(user_id):
     return solve_ids
 
 
+@depends_on("solves", "challenges", "config", "users", "teams")
 @cache.memoize(timeout=60)
 def get_solve_counts_for_challenges(challenge_id=None, admin=False):
     if challenge_id is None:
@@ -128,3 +193,92 @@ def get_solve_counts_for_challenges(challenge_id=None, admin=False):
     for chal_id, solve_count in solves_q:
         solve_counts[chal_id] = solve_count
     return solve_counts
+
+
+@depends_on("solves", "fails", "challenges", "config", "users", "teams")
+@cache.memoize(timeout=60)
+def get_challenge_statistics():
+    """
+    Solve counts, solve percentages, fail counts and first bloods for every challenge along with per category totals.
+
+    Everything is read with the same four queries however many challenges there are. As in the rest of the
+    statistics, submissions from hidden and banned accounts are left out.
+    """
+    AccountModel = get_model()
+    exclude_accounts_cond = and_(
+        AccountModel.banned == false(),
+        AccountModel.hidden == false(),
+    )
+
+    challenges = (
+        db.session.query(
+            Challenges.id,
+            Challenges.name,
+            Challenges.category,
+            Challenges.value,
+            Challenges.state,
+        )
+        .order_by(Challenges.value, Challenges.id)
+        .all()
+    )
+
+    solves_q = (
+        db.session.query(
+            Solves.challenge_id,
+            sa_func.count(Solves.id),
+            sa_func.min(Solves.date),
+        )
+        .join(AccountModel, Solves.account_id == AccountModel.id)
+        .filter(exclude_accounts_cond)
+        .group_by(Solves.challenge_id)
+    )
+    solves = {chal_id: (count, first) for chal_id, count, first in solves_q}
+
+    fails_q = (
+        db.session.query(Fails.challenge_id, sa_func.count(Fails.id))
+        .join(AccountModel, Fails.account_id == AccountModel.id)
+        .filter(exclude_accounts_cond)
+        .group_by(Fails.challenge_id)
+    )
+    fails = dict(fails_q.all())
+
+    accounts = (
+        db.session.query(sa_func.count(sa_func.distinct(Solves.account_id)))
+        .join(AccountModel, Solves.account_id == AccountModel.id)
+        .filter(exclude_accounts_cond)
+        .scalar()
+    )
+
+    results = []
+    categories = {}
+    for chal_id, name, category, value, state in challenges:
+        solve_count, first_blood = solves.get(chal_id, (0, None))
+        fail_count = fails.get(chal_id, 0)
+        results.append(
+            {
+                "id": chal_id,
+                "name": name,
+                "category": category,
+                "value": value,
+                "state": state,
+                "solves": solve_count,
+                "fails": fail_count,
+                "percentage": float(solve_count) / accounts if accounts else 0.0,
+                "first_blood": isoformat(first_blood) if first_blood else None,
+            }
+        )
+        totals = categories.setdefault(
+            category, {"challenges": 0, "value": 0, "solves": 0, "fails": 0}
+        )
+        totals["challenges"] += 1
+        totals["value"] += value or 0
+        totals["solves"] += solve_count
+        totals["fails"] += fail_count
+
+    return {
+        "accounts": accounts,
+        "solves": sum(count for count, _ in solves.values()),
+        "fails": sum(fails.values()),
+        "challenges": results,
+        "categories": categories,
+    }
@@ -0,0 +1,158 @@
+from collections import defaultdict
+
+from CTFd.cache import cache, depends_on, near_cache
+from CTFd.models import Challenges
+
+NO_PREREQUISITES = frozenset()
+
+
+class PrerequisiteGraph(object):
+    """
+    The prerequisites of every challenge compiled into a graph, so that checking whether an account can see a
+    challenge is a subset test against its solves instead of reading every challenge ID from the database.
+
+    Prerequisites naming challenges that do not exist are dropped, the same way they have always been ignored.
+    """
+
+    def __init__(self, challenges):
+        """
+        :param challenges: (id, state, requirements) of every challenge
+        """
+        challenges = list(challenges)
+        self.challenge_ids = frozenset(c_id for c_id, _state, _reqs in challenges)
+        # Challenges players can't see whatever they solve, which unlocks must not give away
+        self.hidden = frozenset(
+            c_id for c_id, state, _reqs in challenges if state in ("hidden", "locked")
+        )
+        self.prerequisites = {}
+        self.anonymized = set()
+        dependents = defaultdict(set)
+        for c_id, _state, requirements in challenges:
+            if not requirements:
+                continue
+            prerequisites = self.challenge_ids.intersection(
+                requirements.get("prerequisites") or ()
+            )
+            if prerequisites:
+                self.prerequisites[c_id] = prerequisites
+                for prerequisite in prerequisites:
+                    dependents[prerequisite].add(c_id)
+            if requirements.get("anonymize"):
+                self.anonymized.add(c_id)
+        self.anonymized = frozenset(self.anonymized)
+        # Challenges by the prerequisites they wait on, to find what a solve unlocks without looking at the rest
+        self.dependents = {c_id: frozenset(ids) for c_id, ids in dependents.items()}
+
+    def prerequisites_of(self, challenge_id):
+        return self.prerequisites.get(challenge_id, NO_PREREQUISITES)
+
+    def is_unlocked(self, challenge_id, solve_ids):
+        return self.prerequisites_of(challenge_id).issubset(solve_ids)
+
+    def unlocked(self, solve_ids):
+        """The challenges whose prerequisites are all in solve_ids"""
+        return {
+            c_id for c_id in self.challenge_ids if self.is_unlocked(c_id, solve_ids)
+        }
+
+    def anonymize(self, solve_ids):
+        """The locked challenges that are still listed, as ??? placeholders"""
+        return {
+            c_id for c_id in self.anonymized if not self.is_unlocked(c_id, solve_ids)
+        }
+
+    def newly_unlocked(self, challenge_id, solve_ids):
+        """
+        The challenges that solving challenge_id unlocks for an account that had already solved solve_ids. Only the
+        challenges depending on challenge_id are looked at.
+        """
+        if challenge_id in solve_ids:
+            return set()
+        solve_ids = set(solve_ids)
+        solve_ids.add(challenge_id)
+        return {
+            c_id
+            for c_id in self.dependents.get(challenge_id, ())
+            if self.prerequisites[c_id].issubset(solve_ids)
+        }
+
+    def path(self, start, goal):
+        """
+        Follow prerequisites from start until goal is reached.
+
+        :return: The challenge IDs from start to goal, or None if start does not (transitively) require goal
+        """
+        parents = {start: None}
+        pending = [start]
+        while pending:
+            c_id = pending.pop()
+            if c_id == goal:
+                path = []
+                while c_id is not None:
+                    path.append(c_id)
+                    c_id = parents[c_id]
+                return path[::-1]
+            for prerequisite in self.prerequisites_of(c_id):
+                if prerequisite not in parents:
+                    parents[prerequisite] = c_id
+                    pending.append(prerequisite)
+        return None
+
+    def check(self, challenge_id, prerequisites):
+        """
+        Find what is wrong with giving a challenge these prerequisites: challenges that do not exist and
+        prerequisites that would end up requiring the challenge itself.
+
+        :param challenge_id: None when the challenge is being created
+        :return: A list of error messages, empty if the prerequisites can be saved
+        """
+        errors = []
+        missing = [str(p) for p in prerequisites if p not in self.challenge_ids]
+        if missing:
+            errors.append(
+                "Challenge requirements reference challenges that do not exist: "
+                + ", ".join(missing)
+            )
+
+        if challenge_id is not None:
+            for prerequisite in prerequisites:
+                path = self.path(prerequisite, challenge_id)
+                if path is not None:
+                    cycle = " requires ".join(
+                        str(c_id) for c_id in [challenge_id] + path
+                    )
+                    errors.append(
+                        f"Challenge requirements cannot form a cycle ({cycle})"
+                    )
+                    break
+        return errors
+
+
+def build_prerequisite_graph():
+    return PrerequisiteGraph(
+        Challenges.query.with_entities(
+            Challenges.id, Challenges.state, Challenges.requirements
+        ).all()
+    )
+
+
+@near_cache()
+@depends_on("challenges")
+@cache.memoize(timeout=300)
+def get_prerequisite_graph():
+    return build_prerequisite_graph()
+
+
+def check_prerequisites(challenge_id, requirements):
+    """
+    Validate the prerequisites of requirements about to be saved against the current challenges
+
+    :return: A list of error messages, empty if the requirements can be saved
+    """
+    if not isinstance(requirements, dict):
+        return []
+    prerequisites = requirements.get("prerequisites") or []
+    if not prerequisites:
+        return []
+    # Saving challenges is rare, so check against the database rather than a graph that may be a little stale
+    return build_prerequisite_graph().check(challenge_id, prerequisites)
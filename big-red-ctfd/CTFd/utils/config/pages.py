@@ -1,6 +1,6 @@
 from flask import current_app
 
-from CTFd.cache import cache
+from CTFd.cache import cache, depends_on
 from CTFd.models import Pages, db
 from CTFd.utils import get_config, markdown
 from CTFd.utils.dates import isoformat, unix_time_to_utc
@@ -57,6 +57,7 @@ def build_markdown(md, sanitize=False):
     return html
 
 
+@depends_on("pages")
 @cache.memoize()
 def get_pages():
     db_pages = Pages.query.filter(
@@ -65,6 +66,7 @@ def get_pages():
     return db_pages
 
 
+@depends_on("pages")
 @cache.memoize()
 def get_page(route):
     page = db.session.execute(
@@ -1,9 +1,8 @@
 import functools
 
-from flask import abort, jsonify, redirect, request, url_for
+from flask import abort, current_app, jsonify, redirect, request, url_for
 from flask_babel import gettext
 
-from CTFd.cache import cache
 from CTFd.utils import config, get_config
 from CTFd.utils import user as current_user
 from CTFd.utils.config import is_teams_mode
@@ -171,12 +170,12 @@ def ratelimit(method="POST", limit=50, interval=300, key_prefix="rl"):
         def ratelimit_function(*args, **kwargs):
             ip_address = current_user.get_ip()
             key = "{}:{}:{}".format(key_prefix, ip_address, request.endpoint)
-            current = cache.get(key)
 
             if request.method == method:
-                if (
-                    current and int(current) > limit - 1
-                ):  # -1 in order to align expected limit with the real value
+                # Checked and counted in one step so concurrent requests can't slip past the limit
+                if not current_app.rate_limiter.hit(
+                    key, interval=interval, limit=limit
+                ):
                     resp = jsonify(
                         {
                             "code": 429,
@@ -186,11 +185,6 @@ def ratelimit(method="POST", limit=50, interval=300, key_prefix="rl"):
                     )
                     resp.status_code = 429
                     return resp
-                else:
-                    if current is None:
-                        cache.set(key, 1, timeout=interval)
-                    else:
-                        cache.set(key, int(current) + 1, timeout=interval)
             return f(*args, **kwargs)
 
         return ratelimit_function
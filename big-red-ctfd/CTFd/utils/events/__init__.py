@@ -1,8 +1,11 @@
 import json
-from collections import defaultdict
-from queue import Queue
+from collections import deque
+from itertools import islice
+from operator import attrgetter
 
-from gevent import Timeout, spawn
+from gevent import sleep, spawn
+from gevent.event import Event
+from gevent.hub import Waiter
 from tenacity import retry, wait_exponential
 
 from CTFd.cache import cache
@@ -14,18 +17,22 @@ class ServerSentEvent(object):
         self.data = data
         self.type = type
         self.id = id
+        self._serialized = None
 
     def __str__(self):
-        if isinstance(self.data, string_types):
-            data = self.data
-        else:
-            data = json.dumps(self.data)
-        lines = ["data:{value}".format(value=line) for line in data.splitlines()]
-        if self.type:
-            lines.insert(0, "event:{value}".format(value=self.type))
-        if self.id:
-            lines.append("id:{value}".format(value=self.id))
-        return "\n".join(lines) + "\n\n"
+        # Events are shared by every subscriber so they are only serialized once
+        if self._serialized is None:
+            if isinstance(self.data, string_types):
+                data = self.data
+            else:
+                data = json.dumps(self.data)
+            lines = ["data:{value}".format(value=line) for line in data.splitlines()]
+            if self.type:
+                lines.insert(0, "event:{value}".format(value=self.type))
+            if self.id:
+                lines.append("id:{value}".format(value=self.id))
+            self._serialized = "\n".join(lines) + "\n\n"
+        return self._serialized
 
     def to_dict(self):
         d = {"data": self.data}
@@ -36,81 +43,238 @@ class ServerSentEvent(object):
         return d
 
 
+PING = ServerSentEvent(data="ping", type="ping")
+
+# Channels every subscriber joins. They are buffered from startup so that events published before anyone connected
+# can still be replayed, while targeted channels only get a buffer while someone is subscribed to them.
+BROADCAST_CHANNELS = ("ctf",)
+
+# Redis pub/sub channels are namespaced so that a single PSUBSCRIBE per worker receives every channel
+REDIS_CHANNEL_PREFIX = "ctfd.events."
+
+
+def user_channel(user_id):
+    return "user:{id}".format(id=user_id)
+
+
+def team_channel(team_id):
+    return "team:{id}".format(id=team_id)
+
+
+def account_channel(user_id, team_id=None):
+    """
+    Channel of the account a user plays as: their team in teams mode, otherwise themselves
+    """
+    if team_id:
+        return team_channel(team_id)
+    return user_channel(user_id)
+
+
+class EventBuffer(object):
+    """
+    Ring buffer holding the most recent events of a channel.
+
+    Subscribers keep a cursor into the buffer instead of a queue of their own, so publishing an event costs the same
+    no matter how many clients are connected. Waiting subscribers all block on one Event which is set and replaced
+    whenever the buffer changes. A subscriber that falls more than `size` events behind skips the ones it missed.
+    """
+
+    def __init__(self, size=1024):
+        self.events = deque(maxlen=size)
+        # Number of events ever appended, used as the cursor position
+        self.head = 0
+        self.changed = Event()
+        self.subscribers = 0
+
+    def append(self, event):
+        str(event)
+        self.events.append(event)
+        self.head += 1
+        self.wake()
+
+    def wake(self):
+        changed, self.changed = self.changed, Event()
+        changed.set()
+
+    def read(self, cursor):
+        """
+        Return the events appended after cursor along with the new cursor
+        """
+        count = min(self.head - cursor, len(self.events))
+        if count <= 0:
+            return [], self.head
+        return list(islice(self.events, len(self.events) - count, None)), self.head
+
+    def since(self, event_id):
+        """
+        Return the buffered events with an id greater than event_id, for Last-Event-ID replay
+        """
+        return [event for event in self.events if event.id > event_id]
+
+
 class EventManager(object):
-    def __init__(self):
+    PING_INTERVAL = 5
+
+    def __init__(self, buffer_size=1024):
+        self.buffer_size = buffer_size
+        self.buffers = {}
         self.clients = {}
+        self.last_id = 0
+        self.beats = 0
+        self.heartbeat = None
+        for channel in BROADCAST_CHANNELS:
+            self.buffer(channel)
+
+    def buffer(self, channel):
+        buffer = self.buffers.get(channel)
+        if buffer is None:
+            buffer = self.buffers[channel] = EventBuffer(size=self.buffer_size)
+        return buffer
+
+    def next_id(self):
+        self.last_id += 1
+        return self.last_id
 
     def publish(self, data, type=None, id=None, channel="ctf"):
-        event = ServerSentEvent(data, type=type, id=id)
-        message = event.to_dict()
-        for client in list(self.clients.values()):
-            client[channel].put(message)
-        return len(self.clients)
+        """
+        Publish an event to the subscribers of channel and return how many there are.
+
+        Events are always numbered by the manager so that clients can resume with Last-Event-ID.
+        """
+        buffer = self.buffers.get(channel)
+        if buffer is None:
+            # Nobody connected to this process has ever subscribed to the channel
+            return 0
+        buffer.append(ServerSentEvent(data, type=type, id=self.next_id()))
+        return buffer.subscribers
+
+    def broadcast(self, event, channel="ctf"):
+        buffer = self.buffers.get(channel)
+        if buffer is not None:
+            buffer.append(event)
 
     def listen(self):
         pass
 
-    def subscribe(self, channel="ctf"):
-        q = defaultdict(Queue)
-        self.clients[id(q)] = q
+    def _heartbeat(self):
+        # A single timer wakes every subscriber to send a ping instead of each client timing out on its own
+        while True:
+            sleep(self.PING_INTERVAL)
+            self.beats += 1
+            for buffer in list(self.buffers.values()):
+                buffer.wake()
+
+    @staticmethod
+    def _wait(buffers):
+        # gevent.wait() would unlink every woken subscriber from every shared Event, which is quadratic in the
+        # number of subscribers. Events that fired are discarded by their buffer, so only unfired ones are unlinked.
+        waiter = Waiter()
+        changed = [buffer.changed for buffer in buffers]
+        for event in changed:
+            event.rawlink(waiter.switch)
+        try:
+            waiter.get()
+        finally:
+            for event in changed:
+                if not event.is_set():
+                    event.unlink(waiter.switch)
+
+    def subscribe(self, channels="ctf", last_event_id=None):
+        """
+        Yield the events published to any of channels, e.g. "ctf" along with the user:<id> and team:<id> channels
+        """
+        if isinstance(channels, string_types):
+            channels = (channels,)
+        if self.heartbeat is None:
+            self.heartbeat = spawn(self._heartbeat)
+
+        channels = set(channels)
+        buffers = [self.buffer(channel) for channel in channels]
+        cursors = [buffer.head for buffer in buffers]
+        beats = self.beats
+        missed = []
+        if last_event_id is not None:
+            for buffer in buffers:
+                missed.extend(buffer.since(last_event_id))
+            missed.sort(key=attrgetter("id"))
+        for buffer in buffers:
+            buffer.subscribers += 1
+        key = object()
+        self.clients[id(key)] = channels
         try:
             # Immediately yield a ping event to force Response headers to be set
             # or else some reverse proxies will incorrectly buffer SSE
-            yield ServerSentEvent(data="ping", type="ping")
+            yield PING
+            for event in missed:
+                yield event
             while True:
-                with Timeout(5, False):
-                    message = q[channel].get()
-                    yield ServerSentEvent(**message)
-                yield ServerSentEvent(data="ping", type="ping")
+                events = []
+                for i, buffer in enumerate(buffers):
+                    new, cursors[i] = buffer.read(cursors[i])
+                    events.extend(new)
+                if events:
+                    if len(buffers) > 1:
+                        events.sort(key=attrgetter("id"))
+                    for event in events:
+                        yield event
+                elif beats != self.beats:
+                    beats = self.beats
+                    yield PING
+                else:
+                    self._wait(buffers)
         finally:
-            del self.clients[id(q)]
-            del q
+            for channel, buffer in zip(channels, buffers):
+                buffer.subscribers -= 1
+                # Account channels are only buffered while someone on this process listens to them
+                if (
+                    buffer.subscribers == 0
+                    and channel not in BROADCAST_CHANNELS
+                    and self.buffers.get(channel) is buffer
+                ):
+                    del self.buffers[channel]
+            del self.clients[id(key)]
 
 
 class RedisEventManager(EventManager):
-    def __init__(self):
-        super(EventManager, self).__init__()
+    def __init__(self, buffer_size=1024):
+        super(RedisEventManager, self).__init__(buffer_size=buffer_size)
         self.client = cache.cache._write_client
-        self.clients = {}
+
+    def next_id(self):
+        # Every worker numbers events from the same counter so Last-Event-ID works across workers
+        return self.client.incr("ctfd_events_last_id")
 
     def publish(self, data, type=None, id=None, channel="ctf"):
-        event = ServerSentEvent(data, type=type, id=id)
+        event = ServerSentEvent(data, type=type, id=self.next_id())
         message = json.dumps(event.to_dict())
-        return self.client.publish(message=message, channel=channel)
+        return self.client.publish(
+            message=message, channel=REDIS_CHANNEL_PREFIX + channel
+        )
 
-    def listen(self, channel="ctf"):
+    def listen(self):
         @retry(wait=wait_exponential(min=1, max=30))
         def _listen():
             while True:
                 pubsub = self.client.pubsub()
-                pubsub.subscribe(channel)
+                # One pattern subscription covers the broadcast and every user and team channel
+                pubsub.psubscribe(REDIS_CHANNEL_PREFIX + "*")
                 try:
                     while True:
                         message = pubsub.get_message(
                             ignore_subscribe_messages=True, timeout=5
                         )
                         if message:
-                            if message["type"] == "message":
-                                event = json.loads(message["data"])
-                                for client in list(self.clients.values()):
-                                    client[channel].put(event)
+                            if message["type"] == "pmessage":
+                                self.receive(message["channel"], message["data"])
                 finally:
                     pubsub.close()
 
         spawn(_listen)
 
-    def subscribe(self, channel="ctf"):
-        q = defaultdict(Queue)
-        self.clients[id(q)] = q
-        try:
-            # Immediately yield a ping event to force Response headers to be set
-            # or else some reverse proxies will incorrectly buffer SSE
-            yield ServerSentEvent(data="ping", type="ping")
-            while True:
-                with Timeout(5, False):
-                    message = q[channel].get()
-                    yield ServerSentEvent(**message)
-                yield ServerSentEvent(data="ping", type="ping")
-        finally:
-            del self.clients[id(q)]
-            del q
+    def receive(self, channel, data):
+        # Events for channels no local client has subscribed to are dropped without being parsed
+        if isinstance(channel, bytes):
+            channel = channel.decode("utf-8")
+        buffer = self.buffers.get(channel[len(REDIS_CHANNEL_PREFIX) :])
+        if buffer is not None:
+            buffer.append(ServerSentEvent(**json.loads(data)))
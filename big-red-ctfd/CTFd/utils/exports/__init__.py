@@ -5,8 +5,9 @@ import re
 import subprocess  # nosec B404
 import sys
 import tempfile
+import time
 import zipfile
-from io import BytesIO, StringIO
+from io import StringIO
 from pathlib import Path
 
 import dataset
@@ -19,7 +20,7 @@ from sqlalchemy.sql import sqltypes
 from CTFd import __version__ as CTFD_VERSION
 from CTFd.cache import cache
 from CTFd.constants.themes import DEFAULT_THEME
-from CTFd.models import db, get_class_by_tablename
+from CTFd.models import db
 from CTFd.plugins import get_plugin_names
 from CTFd.plugins.migrations import current as plugin_current
 from CTFd.plugins.migrations import upgrade as plugin_upgrade
@@ -27,6 +28,7 @@ from CTFd.utils import get_app_config, set_config, string_types
 from CTFd.utils.dates import unix_time
 from CTFd.utils.exports.databases import is_database_mariadb
 from CTFd.utils.exports.freeze import freeze_export
+from CTFd.utils.exports.parsers import JSONParser
 from CTFd.utils.migrations import (
     create_database,
     drop_database,
@@ -36,6 +38,9 @@ from CTFd.utils.migrations import (
 )
 from CTFd.utils.uploads import get_uploader
 
+DATETIME_MICROSECONDS = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d")
+DATETIME_SECONDS = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}")
+
 
 def export_ctf():
     # TODO: For some unknown reason dataset is only able to see alembic_version during tests.
@@ -49,11 +54,13 @@ def export_ctf():
 
     tables = db.tables
     for table in tables:
-        result = db[table].all()
-        result_file = BytesIO()
-        freeze_export(result, fileobj=result_file)
-        result_file.seek(0)
-        backup_zip.writestr("db/{}.json".format(table), result_file.read())
+        # Stream rows through a server side cursor and straight into the zip entry so that large tables like
+        # submissions and tracking are never held in memory at once
+        result = db[table].all(_streamed=True)
+        with backup_zip.open(
+            "db/{}.json".format(table), "w", force_zip64=True
+        ) as result_file:
+            freeze_export(result, fileobj=result_file)
 
     # # Guarantee that alembic_version is saved into the export
     if "alembic_version" not in tables:
@@ -112,18 +119,33 @@ def set_import_end_time(value, timeout=604800, skip_print=False):
         print(value)
 
 
+class ImportProgress(object):
+    """
+    Reports import progress at most once per interval since every status update is a cache write
+    """
+
+    def __init__(self, interval=1):
+        self.interval = interval
+        self.updated = None
+
+    def update(self, value):
+        now = time.monotonic()
+        if self.updated is None or now - self.updated >= self.interval:
+            self.updated = now
+            set_import_status(value)
+
+
 def import_ctf(backup, erase=True):
     # Reset import cache keys and don't print these values
     set_import_error(value=None, skip_print=True)
     set_import_status(value=None, skip_print=True)
 
-    if app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+    url = make_url(get_app_config("SQLALCHEMY_DATABASE_URI"))
+    if url.drivername.startswith("sqlite") and url.database in (None, "", ":memory:"):
         set_import_error(
-            "Exception: Importing not currently supported for SQLite databases. See Github issue #1988."
-        )
-        raise Exception(
-            "Importing not currently supported for SQLite databases. See Github issue #1988."
+            "Exception: Importing into an in-memory SQLite database is not supported"
         )
+        raise Exception("Importing into an in-memory SQLite database is not supported")
 
     if not zipfile.is_zipfile(backup):
         set_import_error("zipfile.BadZipfile: zipfile is invalid")
@@ -206,6 +228,17 @@ def import_ctf(backup, erase=True):
             "The target migration in this backup is not available in this version of CTFd."
         )
 
+    # Alembic can't run most of our migrations on SQLite (see Github issue #1988) so SQLite databases are created at
+    # the latest revision. Backups can only be imported into them if they were taken at that same revision.
+    if sqlite and alembic_version != get_current_revision():
+        set_import_error(
+            "Exception: SQLite can only import backups from the same version of CTFd."
+        )
+        raise Exception(
+            "SQLite can only import backups from the same version of CTFd. "
+            "Import the backup into MySQL or Postgres to upgrade it first."
+        )
+
     if erase:
         set_import_status("erasing")
         # Clear out existing connections to release any locks
@@ -238,14 +271,24 @@ def import_ctf(backup, erase=True):
 
     side_db = dataset.connect(get_app_config("SQLALCHEMY_DATABASE_URI"))
 
-    try:
-        set_import_status("disabling foreign key checks")
-        if postgres:
-            side_db.query("SET session_replication_role=replica;")
-        else:
-            side_db.query("SET FOREIGN_KEY_CHECKS=0;")
-    except Exception:
-        print("Failed to disable foreign key checks. Continuing.")
+    # Foreign key checks are turned off while each table is inserted and back on after it. The setting only applies
+    # to side_db's connection, and tables can reference rows of tables that are inserted after them.
+    foreign_key_checks = {"supported": True}
+
+    def set_foreign_key_checks(enabled):
+        if foreign_key_checks["supported"] is False:
+            return
+        try:
+            if postgres:
+                role = "DEFAULT" if enabled else "replica"
+                side_db.query(f"SET session_replication_role={role};")
+            elif sqlite:
+                side_db.query(f"PRAGMA foreign_keys={'ON' if enabled else 'OFF'};")
+            else:
+                side_db.query(f"SET FOREIGN_KEY_CHECKS={int(enabled)};")
+        except Exception:
+            foreign_key_checks["supported"] = False
+            print("Failed to change foreign key checks. Continuing.")
 
     first = [
         "db/teams.json",
@@ -276,10 +319,46 @@ def import_ctf(backup, erase=True):
             members.remove(item)
 
     # Upgrade the database to the point in time that the import was taken from
-    migration_upgrade(revision=alembic_version)
+    if sqlite:
+        app.db.create_all()
+    else:
+        migration_upgrade(revision=alembic_version)
 
     members.remove("db/alembic_version.json")
 
+    batch_size = get_app_config("IMPORT_BATCH_SIZE") or 1000
+    progress = ImportProgress()
+
+    def insert_rows(table, rows):
+        side_db.begin()
+        try:
+            table.insert_many(rows, chunk_size=len(rows))
+        except Exception:
+            side_db.rollback()
+            raise
+        side_db.commit()
+
+    def insert_batch(member, table, rows):
+        try:
+            insert_rows(table, rows)
+        except ProgrammingError:
+            # MariaDB does not like JSON objects and prefers strings because it internally
+            # represents JSON with LONGTEXT.
+            # See Issue #973
+            for entry in rows:
+                requirements = entry.get("requirements")
+                if requirements and isinstance(requirements, dict):
+                    entry["requirements"] = json.dumps(requirements)
+            insert_rows(table, rows)
+        except IntegrityError:
+            # Catch odd situation where for some reason config keys are reinserted before import completes
+            if member != "db/config.json":
+                raise
+            for entry in rows:
+                config_id = int(entry["id"])
+                side_db.query(f"DELETE FROM config WHERE id={config_id}")  # nosec B608
+            insert_rows(table, rows)
+
     # Combine the database insertion code into a function so that we can pause
     # insertion between official database tables and plugin tables
     def insertion(table_filenames):
@@ -290,120 +369,98 @@ def import_ctf(backup, erase=True):
 
                 try:
                     # Try to open a file but skip if it doesn't exist.
-                    data = backup.open(member).read()
+                    data = backup.open(member)
                 except KeyError:
                     continue
 
-                if data:
-                    table = side_db[table_name]
-
-                    saved = json.loads(data)
-                    count = len(saved["results"])
-                    for i, entry in enumerate(saved["results"]):
-                        set_import_status(f"inserting {member} {i}/{count}")
-                        # This is a hack to get SQLite to properly accept datetime values from dataset
-                        # See Issue #246
-                        if sqlite:
-                            direct_table = get_class_by_tablename(table.name)
-                            for k, v in entry.items():
-                                if isinstance(v, string_types):
-                                    # We only want to apply this hack to columns that are expecting a datetime object
-                                    try:
-                                        is_dt_column = (
-                                            type(getattr(direct_table, k).type)
-                                            == sqltypes.DateTime
-                                        )
-                                    except AttributeError:
-                                        is_dt_column = False
-
-                                    # If the table is expecting a datetime, we should check if the string is one and convert it
-                                    if is_dt_column:
-                                        match = re.match(
-                                            r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d",
-                                            v,
-                                        )
-                                        if match:
-                                            entry[k] = datetime.datetime.strptime(
-                                                v, "%Y-%m-%dT%H:%M:%S.%f"
-                                            )
-                                            continue
-                                        match = re.match(
-                                            r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}", v
-                                        )
-                                        if match:
-                                            entry[k] = datetime.datetime.strptime(
-                                                v, "%Y-%m-%dT%H:%M:%S"
-                                            )
-                                            continue
-                        # From v2.0.0 to v2.1.0 requirements could have been a string or JSON because of a SQLAlchemy issue
-                        # This is a hack to ensure we can still accept older exports. See #867
-                        if member in (
-                            "db/challenges.json",
-                            "db/hints.json",
-                            "db/awards.json",
-                        ):
-                            requirements = entry.get("requirements")
-                            if requirements and isinstance(requirements, string_types):
-                                entry["requirements"] = json.loads(requirements)
-
-                        # From v3.1.0 to v3.5.0 FieldEntries could have been varying levels of JSON'ified strings.
-                        # For example "\"test\"" vs "test". This results in issues with importing backups between
-                        # databases. Specifically between MySQL and MariaDB. Because CTFd standardizes against MySQL
-                        # we need to have an edge case here.
-                        if member == "db/field_entries.json":
-                            value = entry.get("value")
-                            if value is not None:
-                                try:
-                                    # Attempt to convert anything to its original Python value
-                                    entry["value"] = str(json.loads(value))
-                                except (json.JSONDecodeError, TypeError):
-                                    pass
-                                finally:
-                                    # Dump the value into JSON if its mariadb or skip the conversion if not mariadb
-                                    if mariadb:
-                                        entry["value"] = json.dumps(entry["value"])
-
-                        try:
-                            table.insert(entry)
-                        except ProgrammingError:
-                            # MariaDB does not like JSON objects and prefers strings because it internally
-                            # represents JSON with LONGTEXT.
-                            # See Issue #973
-                            requirements = entry.get("requirements")
-                            if requirements and isinstance(requirements, dict):
-                                entry["requirements"] = json.dumps(requirements)
-                            table.insert(entry)
-                        except IntegrityError:
-                            # Catch odd situation where for some reason config keys are reinserted before import completes
-                            if member == "db/config.json":
-                                config_id = int(entry["id"])
-                                side_db.query(  # nosec B608
-                                    f"DELETE FROM config WHERE id={config_id}"
+                table = side_db[table_name]
+
+                # This is a hack to get SQLite to properly accept datetime values from dataset
+                # See Issue #246
+                datetime_columns = set()
+                if sqlite and table.exists:
+                    datetime_columns = {
+                        column.name
+                        for column in table.table.columns
+                        if isinstance(column.type, sqltypes.DateTime)
+                    }
+
+                set_foreign_key_checks(False)
+                saved = JSONParser(data)
+                batch = []
+                inserted = 0
+                for entry in saved:
+                    # If the table is expecting a datetime, we should check if the string is one and convert it
+                    for k in datetime_columns:
+                        v = entry.get(k)
+                        if isinstance(v, string_types):
+                            if DATETIME_MICROSECONDS.match(v):
+                                entry[k] = datetime.datetime.strptime(
+                                    v, "%Y-%m-%dT%H:%M:%S.%f"
                                 )
-                                table.insert(entry)
-                            else:
-                                raise
-
-                        db.session.commit()
-                    if postgres:
-                        # This command is to set the next primary key ID for the re-inserted tables in Postgres. However,
-                        # this command is very difficult to translate into SQLAlchemy code. Because Postgres is not
-                        # officially supported, no major work will go into this functionality.
-                        # https://stackoverflow.com/a/37972960
-                        if '"' not in table_name and "'" not in table_name:
-                            query = "SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), coalesce(max(id)+1,1), false) FROM \"{table_name}\"".format(  # nosec
-                                table_name=table_name
-                            )
-                            side_db.engine.execute(query)
-                        else:
-                            set_import_error(
-                                f"Exception: Table name {table_name} contains quotes"
-                            )
-                            raise Exception(
-                                "Table name {table_name} contains quotes".format(
-                                    table_name=table_name
+                            elif DATETIME_SECONDS.match(v):
+                                entry[k] = datetime.datetime.strptime(
+                                    v, "%Y-%m-%dT%H:%M:%S"
                                 )
+
+                    # From v2.0.0 to v2.1.0 requirements could have been a string or JSON because of a SQLAlchemy issue
+                    # This is a hack to ensure we can still accept older exports. See #867
+                    if member in (
+                        "db/challenges.json",
+                        "db/hints.json",
+                        "db/awards.json",
+                    ):
+                        requirements = entry.get("requirements")
+                        if requirements and isinstance(requirements, string_types):
+                            entry["requirements"] = json.loads(requirements)
+
+                    # From v3.1.0 to v3.5.0 FieldEntries could have been varying levels of JSON'ified strings.
+                    # For example "\"test\"" vs "test". This results in issues with importing backups between
+                    # databases. Specifically between MySQL and MariaDB. Because CTFd standardizes against MySQL
+                    # we need to have an edge case here.
+                    if member == "db/field_entries.json":
+                        value = entry.get("value")
+                        if value is not None:
+                            try:
+                                # Attempt to convert anything to its original Python value
+                                entry["value"] = str(json.loads(value))
+                            except (json.JSONDecodeError, TypeError):
+                                pass
+                            finally:
+                                # Dump the value into JSON if its mariadb or skip the conversion if not mariadb
+                                if mariadb:
+                                    entry["value"] = json.dumps(entry["value"])
+
+                    batch.append(entry)
+                    if len(batch) == batch_size:
+                        insert_batch(member, table, batch)
+                        inserted += len(batch)
+                        batch = []
+                        progress.update(f"inserting {member} {inserted}/{saved.count}")
+                if batch:
+                    insert_batch(member, table, batch)
+                    inserted += len(batch)
+                set_foreign_key_checks(True)
+
+                if inserted and postgres:
+                    # This command is to set the next primary key ID for the re-inserted tables in Postgres. However,
+                    # this command is very difficult to translate into SQLAlchemy code. Because Postgres is not
+                    # officially supported, no major work will go into this functionality.
+                    # https://stackoverflow.com/a/37972960
+                    if '"' not in table_name and "'" not in table_name:
+                        query = "SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), coalesce(max(id)+1,1), false) FROM \"{table_name}\"".format(  # nosec
+                            table_name=table_name
+                        )
+                        side_db.engine.execute(query)
+                    else:
+                        set_import_error(
+                            f"Exception: Table name {table_name} contains quotes"
+                        )
+                        raise Exception(
+                            "Table name {table_name} contains quotes".format(
+                                table_name=table_name
                             )
+                        )
 
     # Insert data from official tables
     set_import_status("inserting tables")
@@ -453,15 +510,6 @@ def import_ctf(backup, erase=True):
         # Create any leftover tables, perhaps from old plugins
         app.db.create_all()
 
-    try:
-        set_import_status("reenabling foreign key checks")
-        if postgres:
-            side_db.query("SET session_replication_role=DEFAULT;")
-        else:
-            side_db.query("SET FOREIGN_KEY_CHECKS=1;")
-    except Exception:
-        print("Failed to enable foreign key checks. Continuing.")
-
     # Invalidate all cached data
     set_import_status("clearing caches")
     cache.clear()
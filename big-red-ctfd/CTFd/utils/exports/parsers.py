@@ -0,0 +1,113 @@
+import codecs
+import json
+
+CHUNK_SIZE = 1024 * 1024
+
+WHITESPACE = " \t\n\r"
+
+
+class JSONParser(object):
+    """
+    Reads the rows of an exported table out of {"count": ..., "results": [...], "meta": {}} one at a time.
+
+    Only the row being decoded and one chunk of the file are held in memory. If "count" comes before "results", as
+    it does in every export CTFd writes, it is available as parser.count while the rows are iterated. Empty files
+    yield no rows.
+    """
+
+    def __init__(self, fileobj, chunk_size=CHUNK_SIZE):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.charset = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.count = None
+
+    def __iter__(self):
+        if self._skip_whitespace() is False:
+            return
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "results":
+                yield from self._results()
+            else:
+                value = self._value()
+                if key == "count":
+                    self.count = value
+            if self._separator("}"):
+                return
+
+    def _results(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._separator("]"):
+                return
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.fileobj.read(self.chunk_size)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.pos :] + self.charset.decode(chunk, self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def _skip_whitespace(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return True
+            if self._fill() is False:
+                return False
+
+    def _peek(self):
+        if self._skip_whitespace() is False:
+            raise ValueError("Unexpected end of JSON input")
+        return self.buffer[self.pos]
+
+    def _next(self):
+        char = self._peek()
+        self.pos += 1
+        return char
+
+    def _expect(self, *chars):
+        found = self._next()
+        if found not in chars:
+            raise ValueError(
+                "Expected {chars} but found {found!r}".format(
+                    chars=" or ".join(repr(c) for c in chars), found=found
+                )
+            )
+        return found
+
+    def _separator(self, close):
+        # Returns whether the object or array was closed instead of continued
+        return self._expect(",", close) == close
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value continues in the next chunk
+                if self._fill() is False:
+                    raise
+                continue
+            # A number at the end of the buffer might have more digits in the next chunk
+            if end == len(self.buffer) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return value
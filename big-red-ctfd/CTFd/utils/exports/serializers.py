@@ -1,11 +1,19 @@
 import json
-from collections import OrderedDict, defaultdict
+import shutil
+import tempfile
 from datetime import date, datetime
 from decimal import Decimal
 
 from CTFd.utils import string_types
 from CTFd.utils.exports.databases import is_database_mariadb
 
+# Rows are encoded into a spool until the table has been read so that the count can be written ahead of them.
+# Tables larger than this are spilled to a temporary file on disk instead of being held in memory.
+SPOOL_SIZE = 16 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+FIELD_ENTRY_KEYS = ["field_id", "id", "team_id", "type", "user_id", "value"]
+
 
 class JSONEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -16,59 +24,56 @@ class JSONEncoder(json.JSONEncoder):
 
 
 class JSONSerializer(object):
+    """
+    Writes a query out as {"count": ..., "results": [...], "meta": {}} one row at a time.
+
+    The output is identical to dumping the whole result at once with compact separators, but only one row is
+    decoded and encoded at a time. Empty queries write nothing, the same as before.
+    """
+
     def __init__(self, query, fileobj):
         self.query = query
         self.fileobj = fileobj
-        self.buckets = defaultdict(list)
+        self.encoder = JSONEncoder(separators=(",", ":"))
+        self.mariadb = is_database_mariadb()
 
     def serialize(self):
-        for row in self.query:
-            self.write(None, row)
-        self.close()
+        count = 0
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as results:
+            for row in self.query:
+                if count:
+                    results.write(b",")
+                results.write(self.encoder.encode(self.clean(row)).encode("utf-8"))
+                count += 1
 
-    def write(self, path, result):
-        self.buckets[path].append(result)
+            if count == 0:
+                return
+            self.fileobj.write(('{"count":%d,"results":[' % count).encode("utf-8"))
+            results.seek(0)
+            shutil.copyfileobj(results, self.fileobj, CHUNK_SIZE)
+            self.fileobj.write(b'],"meta":{}}')
 
-    def wrap(self, result):
-        result = OrderedDict(
-            [("count", len(result)), ("results", result), ("meta", {})]
-        )
-        return result
+    def clean(self, row):
+        # Certain databases (MariaDB) store JSON as LONGTEXT.
+        # Before emitting a file we should standardize to valid JSON (i.e. a dict)
+        # See Issue #973
 
-    def close(self):
-        mariadb = is_database_mariadb()
-        for _path, result in self.buckets.items():
-            result = self.wrap(result)
+        # Handle JSON used in tables that use requirements
+        data = row.get("requirements")
+        if data:
+            try:
+                if isinstance(data, string_types):
+                    row["requirements"] = json.loads(data)
+            except ValueError:
+                pass
 
-            # Certain databases (MariaDB) store JSON as LONGTEXT.
-            # Before emitting a file we should standardize to valid JSON (i.e. a dict)
-            # See Issue #973
-            for i, r in enumerate(result["results"]):
-                # Handle JSON used in tables that use requirements
-                data = r.get("requirements")
-                if data:
+        # Handle JSON used in FieldEntries table
+        if self.mariadb:
+            if sorted(row.keys()) == FIELD_ENTRY_KEYS:
+                value = row.get("value")
+                if value:
                     try:
-                        if isinstance(data, string_types):
-                            result["results"][i]["requirements"] = json.loads(data)
+                        row["value"] = json.loads(value)
                     except ValueError:
                         pass
-
-                # Handle JSON used in FieldEntries table
-                if mariadb:
-                    if sorted(r.keys()) == [
-                        "field_id",
-                        "id",
-                        "team_id",
-                        "type",
-                        "user_id",
-                        "value",
-                    ]:
-                        value = r.get("value")
-                        if value:
-                            try:
-                                result["results"][i]["value"] = json.loads(value)
-                            except ValueError:
-                                pass
-
-            data = json.dumps(result, cls=JSONEncoder, separators=(",", ":"))
-            self.fileobj.write(data.encode("utf-8"))
+        return row
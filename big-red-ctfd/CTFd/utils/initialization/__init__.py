@@ -1,15 +1,12 @@
-import datetime
 import logging
 import os
 import sys
 
 from flask import abort, redirect, render_template, request, session, url_for
-from sqlalchemy.exc import IntegrityError, InvalidRequestError
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 
-from CTFd.cache import clear_user_recent_ips
+from CTFd.cache import clear_request_cache, sync_near_caches
 from CTFd.exceptions import UserNotFoundException, UserTokenExpiredException
-from CTFd.models import Tracking, db
 from CTFd.utils import config, get_app_config, get_config, import_in_progress, markdown
 from CTFd.utils.config import (
     can_send_mail,
@@ -32,8 +29,19 @@ from CTFd.utils.plugins import (
     get_registered_scripts,
     get_registered_stylesheets,
 )
+from CTFd.utils.ratelimit import (
+    RateLimiter,
+    RedisRateLimiter,
+    listen_for_wrong_submissions,
+)
+from CTFd.utils.scores.standings import (
+    RedisStandingsIndex,
+    StandingsIndex,
+    listen_for_standings_changes,
+)
 from CTFd.utils.security.auth import login_user, logout_user, lookup_user_token
 from CTFd.utils.security.csrf import generate_nonce
+from CTFd.utils.tracking import RedisTrackingBuffer, TrackingBuffer
 from CTFd.utils.user import (
     authed,
     get_current_team_attrs,
@@ -186,16 +194,52 @@ def init_logs(app):
 
 
 def init_events(app):
+    buffer_size = app.config.get("SERVER_SENT_EVENTS_BUFFER")
     if app.config.get("CACHE_TYPE") == "redis":
-        app.events_manager = RedisEventManager()
+        app.events_manager = RedisEventManager(buffer_size=buffer_size)
     elif app.config.get("CACHE_TYPE") == "filesystem":
-        app.events_manager = EventManager()
+        app.events_manager = EventManager(buffer_size=buffer_size)
     else:
-        app.events_manager = EventManager()
+        app.events_manager = EventManager(buffer_size=buffer_size)
     app.events_manager.listen()
 
 
+def init_standings(app):
+    if app.config.get("CACHE_TYPE") == "redis":
+        app.standings_index = RedisStandingsIndex()
+    else:
+        app.standings_index = StandingsIndex()
+    listen_for_standings_changes()
+
+
+def init_rate_limits(app):
+    if app.config.get("CACHE_TYPE") == "redis":
+        app.rate_limiter = RedisRateLimiter()
+    else:
+        app.rate_limiter = RateLimiter()
+    listen_for_wrong_submissions()
+
+
+def init_tracking(app):
+    batch_size = app.config.get("TRACKING_BATCH_SIZE")
+    interval = app.config.get("TRACKING_FLUSH_INTERVAL")
+    if app.config.get("CACHE_TYPE") == "redis":
+        app.tracking_buffer = RedisTrackingBuffer(
+            batch_size=batch_size, interval=interval
+        )
+    else:
+        app.tracking_buffer = TrackingBuffer(batch_size=batch_size, interval=interval)
+
+
 def init_request_processors(app):
+    @app.before_request
+    def near_caches():
+        sync_near_caches()
+
+    @app.teardown_request
+    def request_cache(exc):
+        clear_request_cache()
+
     @app.url_defaults
     def inject_theme(endpoint, values):
         if "theme" not in values and app.url_map.is_endpoint_expecting(
@@ -235,34 +279,19 @@ def init_request_processors(app):
                 return "Import currently in progress", 403
 
         if authed():
+            # Sightings are written in batches, so a session whose user has been deleted is caught here instead
+            if get_current_user_attrs() is None:
+                logout_user()
+                return
+
             user_ips = get_current_user_recent_ips()
             ip = get_ip()
-
-            track = None
             if ip not in user_ips or request.method in (
                 "POST",
                 "PATCH",
                 "DELETE",
             ):
-                track = Tracking.query.filter_by(
-                    ip=get_ip(), user_id=session["id"]
-                ).first()
-
-                if track:
-                    track.date = datetime.datetime.utcnow()
-                else:
-                    track = Tracking(ip=get_ip(), user_id=session["id"])
-                    db.session.add(track)
-
-            if track:
-                try:
-                    db.session.commit()
-                except (InvalidRequestError, IntegrityError):
-                    db.session.rollback()
-                    db.session.close()
-                    logout_user()
-                else:
-                    clear_user_recent_ips(user_id=session["id"])
+                app.tracking_buffer.record(session["id"], ip)
 
     @app.before_request
     def banned():
@@ -0,0 +1,161 @@
+import time
+from collections import deque
+from threading import Lock
+from uuid import uuid4
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from CTFd.cache import cache
+from CTFd.models import Fails
+
+# How often the in-process limiter drops the keys whose hits have all left their window
+SWEEP_INTERVAL = 60
+
+# Incorrect flag submissions are counted per account over this many seconds
+WRONG_SUBMISSIONS_INTERVAL = 60
+
+
+def wrong_submissions_key(account_id):
+    return "kpm:{account_id}".format(account_id=account_id)
+
+
+class RateLimiter(object):
+    """
+    Sliding window counters: each key remembers when it was hit and only the hits of the last `interval` seconds
+    count. A hit is checked against the limit and counted in one step under a lock, so concurrent requests can never
+    get more than `limit` hits through.
+
+    This implementation lives in process memory and suits single-worker deployments, like EventManager does.
+    RedisRateLimiter shares the counters between workers.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.windows = {}
+        self.swept = time.monotonic()
+
+    def _window(self, key, now, interval):
+        hits = self.windows.get(key, (interval, deque()))[1]
+        while hits and hits[0] <= now - interval:
+            hits.popleft()
+        return hits
+
+    def _sweep(self, now):
+        self.windows = {
+            key: (interval, hits)
+            for key, (interval, hits) in self.windows.items()
+            if hits and hits[-1] > now - interval
+        }
+        self.swept = now
+
+    def hit(self, key, interval, limit=None):
+        """
+        Count a hit against key unless `limit` hits were already counted in the last `interval` seconds
+
+        :return: whether the hit was counted
+        """
+        now = time.monotonic()
+        with self.lock:
+            if now - self.swept > SWEEP_INTERVAL:
+                self._sweep(now)
+            hits = self._window(key, now, interval)
+            if limit is not None and len(hits) >= limit:
+                return False
+            hits.append(now)
+            self.windows[key] = (interval, hits)
+            return True
+
+    def count(self, key, interval):
+        """Number of hits counted against key in the last `interval` seconds"""
+        now = time.monotonic()
+        with self.lock:
+            return len(self._window(key, now, interval))
+
+
+class RedisRateLimiter(RateLimiter):
+    """
+    RateLimiter kept in Redis so every worker counts against the same limits.
+
+    Each key is a sorted set of hits scored by time. A Lua script drops the hits that left the window, checks the
+    rest against the limit and adds the new hit in one atomic step.
+    """
+
+    prefix = "ctfd_ratelimit:"
+
+    script = """
+        local now = tonumber(ARGV[1])
+        local interval = tonumber(ARGV[2])
+        local limit = tonumber(ARGV[3])
+        redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now - interval)
+        if limit >= 0 and redis.call("ZCARD", KEYS[1]) >= limit then
+            return 0
+        end
+        redis.call("ZADD", KEYS[1], now, ARGV[4])
+        redis.call("PEXPIRE", KEYS[1], interval)
+        return 1
+    """
+
+    def __init__(self):
+        super(RedisRateLimiter, self).__init__()
+        self.client = cache.cache._write_client
+        self._hit = self.client.register_script(self.script)
+
+    def hit(self, key, interval, limit=None):
+        # Milliseconds from the worker's clock, so the script stays deterministic
+        now = int(time.time() * 1000)
+        interval = int(interval * 1000)
+        counted = self._hit(
+            keys=[self.prefix + key],
+            args=[now, interval, -1 if limit is None else limit, uuid4().hex],
+        )
+        return bool(counted)
+
+    def count(self, key, interval):
+        now = int(time.time() * 1000)
+        return self.client.zcount(
+            self.prefix + key, "({}".format(now - int(interval * 1000)), "+inf"
+        )
+
+
+# ORM hooks
+
+WRONG_SUBMISSIONS_KEY = "ratelimit_wrong_submissions"
+
+
+def _current_limiter():
+    if has_app_context():
+        return getattr(current_app, "rate_limiter", None)
+
+
+def collect_wrong_submissions(session, flush_context):
+    if _current_limiter() is None:
+        return
+    fails = [o for o in session.new if isinstance(o, Fails)]
+    if fails:
+        # Resolved now since the user mode cannot be looked up once the transaction has committed
+        accounts = session.info.setdefault(WRONG_SUBMISSIONS_KEY, [])
+        accounts.extend(f.account_id for f in fails if f.account_id is not None)
+
+
+def count_wrong_submissions(session):
+    accounts = session.info.pop(WRONG_SUBMISSIONS_KEY, None)
+    limiter = _current_limiter()
+    if accounts and limiter is not None:
+        for account_id in accounts:
+            limiter.hit(
+                wrong_submissions_key(account_id), interval=WRONG_SUBMISSIONS_INTERVAL
+            )
+
+
+def discard_wrong_submissions(session):
+    session.info.pop(WRONG_SUBMISSIONS_KEY, None)
+
+
+def listen_for_wrong_submissions():
+    """Count every committed Fails row towards its account's submissions per minute"""
+    if not event.contains(Session, "after_flush", collect_wrong_submissions):
+        event.listen(Session, "after_flush", collect_wrong_submissions)
+        event.listen(Session, "after_commit", count_wrong_submissions)
+        event.listen(Session, "after_rollback", discard_wrong_submissions)
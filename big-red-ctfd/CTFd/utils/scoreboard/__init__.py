@@ -1,13 +1,42 @@
 from collections import defaultdict
+from itertools import accumulate, groupby
 
-from CTFd.cache import cache
-from CTFd.models import Awards, Solves
+from sqlalchemy import select, union_all
+
+from CTFd.cache import STANDINGS_DOMAINS, cache, depends_on
+from CTFd.models import Awards, Challenges, Solves, db
 from CTFd.utils import get_config
-from CTFd.utils.dates import isoformat, unix_time_to_utc
+from CTFd.utils.dates import isoformat, unix_time, unix_time_to_utc
 from CTFd.utils.modes import generate_account_url
 from CTFd.utils.scores import get_standings
 
 
+@depends_on(*STANDINGS_DOMAINS)
+@cache.memoize(timeout=60)
+def get_scoreboard_snapshot(version):
+    """
+    Compact standings for clients following the live scoreboard stream, labelled with the scoreboard version.
+
+    The version is read before the standings, so they are at least as new as it and replaying the deltas published
+    since is harmless. get_standings() is skipped because its cached result may predate the version.
+    """
+    standings = get_standings.uncached()
+    return {
+        "version": version,
+        "standings": [
+            {
+                "pos": i + 1,
+                "account_id": x.account_id,
+                "name": x.name,
+                "score": int(x.score),
+                "bracket_id": x.bracket_id,
+            }
+            for i, x in enumerate(standings)
+        ],
+    }
+
+
+@depends_on(*STANDINGS_DOMAINS)
 @cache.memoize(timeout=60)
 def get_scoreboard_detail(count, bracket_id=None):
     response = {}
@@ -16,7 +45,15 @@ def get_scoreboard_detail(count, bracket_id=None):
 
     team_ids = [team.account_id for team in standings]
 
-    solves = Solves.query.filter(Solves.account_id.in_(team_ids))
+    solves = db.session.query(
+        Solves.challenge_id,
+        Solves.account_id,
+        Solves.team_id,
+        Solves.user_id,
+        Solves.date,
+        Challenges.value,
+    ).join(Challenges, Solves.challenge_id == Challenges.id)
+    solves = solves.filter(Solves.account_id.in_(team_ids))
     awards = Awards.query.filter(Awards.account_id.in_(team_ids))
 
     freeze = get_config("freeze")
@@ -37,7 +74,7 @@ def get_scoreboard_detail(count, bracket_id=None):
                 "account_id": solve.account_id,
                 "team_id": solve.team_id,
                 "user_id": solve.user_id,
-                "value": solve.challenge.value,
+                "value": solve.value,
                 "date": isoformat(solve.date),
             }
         )
@@ -70,3 +107,99 @@ def get_scoreboard_detail(count, bracket_id=None):
         }
 
     return response
+
+
+def downsample(dates, scores, start, end, points):
+    """
+    Thin a cumulative score series out to at most one entry per bucket when the time from start to end is cut into
+    the given number of buckets. Each bucket keeps its last entry, so the curve still steps to the right score and
+    the final score is never dropped.
+    """
+    if len(dates) <= points:
+        return dates, scores
+    width = (end - start) / points or 1
+    sampled_dates = []
+    sampled_scores = []
+    last_bucket = None
+    for date, score in zip(dates, scores):
+        bucket = min(int((date - start) / width), points - 1)
+        if bucket == last_bucket:
+            sampled_dates[-1] = date
+            sampled_scores[-1] = score
+        else:
+            sampled_dates.append(date)
+            sampled_scores.append(score)
+            last_bucket = bucket
+    return sampled_dates, sampled_scores
+
+
+@depends_on(*STANDINGS_DOMAINS)
+@cache.memoize(timeout=60)
+def get_scoreboard_series(count, bracket_id=None, points=None):
+    """
+    Score over time of the top accounts as columns: for every account a list of unix timestamps and a list of the
+    account's cumulative score at each of them.
+
+    The (account, date, value) rows of every solve and award are read in a single query ordered by account and date,
+    so each account's scores are a running sum over its slice of the rows. If points is given, each series is
+    downsampled to at most that many entries over the time span of the whole board.
+    """
+    standings = get_standings(count=count, bracket_id=bracket_id)
+    account_ids = [x.account_id for x in standings]
+
+    solves = (
+        select(
+            [
+                Solves.account_id.label("account_id"),
+                Solves.date.label("date"),
+                Challenges.value.label("value"),
+            ]
+        )
+        .join(Challenges, Solves.challenge_id == Challenges.id)
+        .where(Solves.account_id.in_(account_ids))
+    )
+    awards = select([Awards.account_id, Awards.date, Awards.value]).where(
+        Awards.account_id.in_(account_ids)
+    )
+
+    freeze = get_config("freeze")
+    if freeze:
+        solves = solves.where(Solves.date < unix_time_to_utc(freeze))
+        awards = awards.where(Awards.date < unix_time_to_utc(freeze))
+
+    events = union_all(solves, awards).subquery()
+    rows = db.session.execute(
+        select([events.c.account_id, events.c.date, events.c.value]).order_by(
+            events.c.account_id, events.c.date
+        )
+    ).fetchall()
+
+    series = {}
+    for account_id, account_rows in groupby(rows, key=lambda row: row[0]):
+        account_rows = list(account_rows)
+        series[account_id] = (
+            [unix_time(date) for _, date, _ in account_rows],
+            list(accumulate(value or 0 for _, _, value in account_rows)),
+        )
+
+    if points and series:
+        start = min(dates[0] for dates, _ in series.values())
+        end = max(dates[-1] for dates, _ in series.values())
+        for account_id, (dates, scores) in series.items():
+            series[account_id] = downsample(dates, scores, start, end, points)
+
+    response = {}
+    for i, x in enumerate(standings):
+        dates, scores = series.get(x.account_id, ([], []))
+        response[i + 1] = {
+            "id": x.account_id,
+            "account_url": generate_account_url(account_id=x.account_id),
+            "name": x.name,
+            "score": int(x.score),
+            "bracket_id": x.bracket_id,
+            "bracket_name": x.bracket_name,
+            "dates": dates,
+            "scores": scores,
+        }
+
+    return response
@@ -1,333 +1,191 @@
-from sqlalchemy.sql.expression import union_all
+from flask import current_app
 
-from CTFd.cache import cache
-from CTFd.models import Awards, Brackets, Challenges, Solves, Teams, Users, db
-from CTFd.utils import get_config
-from CTFd.utils.dates import unix_time_to_utc
+from CTFd.cache import STANDINGS_DOMAINS, cache, depends_on
+from CTFd.models import Brackets, Teams, Users, db
 from CTFd.utils.modes import get_model
 
 
-@cache.memoize(timeout=60)
-def get_standings(count=None, bracket_id=None, admin=False, fields=None):
+class StandingsRow(object):
+    """
+    One row of standings. Behaves like the SQLAlchemy rows get_standings() used to return: attribute access by
+    column label, indexing, iteration and _asdict().
     """
-    Get standings as a list of tuples containing account_id, name, and score e.g. [(account_id, team_name, score)].
 
-    Ties are broken by who reached a given score first based on the solve ID. Two users can have the same score but one
-    user will have a solve ID that is before the others. That user will be considered the tie-winner.
+    __slots__ = ("_fields", "_values")
 
-    Challenges & Awards with a value of zero are filtered out of the calculations to avoid incorrect tie breaks.
-    """
-    if fields is None:
-        fields = []
-    Model = get_model()
+    def __init__(self, fields, values):
+        self._fields = tuple(fields)
+        self._values = tuple(values)
 
-    scores = (
-        db.session.query(
-            Solves.account_id.label("account_id"),
-            db.func.sum(Challenges.value).label("score"),
-            db.func.max(Solves.id).label("id"),
-            db.func.max(Solves.date).label("date"),
-        )
-        .join(Challenges)
-        .filter(Challenges.value != 0)
-        .group_by(Solves.account_id)
-    )
+    def __getattr__(self, name):
+        try:
+            return self._values[self._fields.index(name)]
+        except ValueError:
+            raise AttributeError(name)
 
-    awards = (
-        db.session.query(
-            Awards.account_id.label("account_id"),
-            db.func.sum(Awards.value).label("score"),
-            db.func.max(Awards.id).label("id"),
-            db.func.max(Awards.date).label("date"),
-        )
-        .filter(Awards.value != 0)
-        .group_by(Awards.account_id)
-    )
+    def __getitem__(self, item):
+        return self._values[item]
 
-    """
-    Filter out solves and awards that are before a specific time point.
-    """
-    freeze = get_config("freeze")
-    if not admin and freeze:
-        scores = scores.filter(Solves.date < unix_time_to_utc(freeze))
-        awards = awards.filter(Awards.date < unix_time_to_utc(freeze))
+    def __iter__(self):
+        return iter(self._values)
 
-    """
-    Combine awards and solves with a union. They should have the same amount of columns
-    """
-    results = union_all(scores, awards).alias("results")
+    def __len__(self):
+        return len(self._values)
 
-    """
-    Sum each of the results by the team id to get their score.
-    """
-    sumscores = (
-        db.session.query(
-            results.columns.account_id,
-            db.func.sum(results.columns.score).label("score"),
-            db.func.max(results.columns.id).label("id"),
-            db.func.max(results.columns.date).label("date"),
-        )
-        .group_by(results.columns.account_id)
-        .subquery()
-    )
+    def __eq__(self, other):
+        return tuple(self) == tuple(other)
 
-    """
-    Admins can see scores for all users but the public cannot see banned users.
+    def __hash__(self):
+        return hash(self._values)
+
+    def __repr__(self):
+        return repr(self._values)
+
+    def __reduce__(self):
+        return StandingsRow, (self._fields, self._values)
 
-    Filters out banned users.
-    Properly resolves value ties by ID.
+    def keys(self):
+        return list(self._fields)
 
-    Different databases treat time precision differently so resolve by the row ID instead.
+    def _asdict(self):
+        return dict(zip(self._fields, self._values))
+
+
+def rank_accounts(
+    kind, Model, columns, fields=(), count=None, bracket_id=None, admin=False
+):
     """
-    if admin:
-        standings_query = (
-            db.session.query(
-                Model.id.label("account_id"),
-                Model.oauth_id.label("oauth_id"),
-                Model.name.label("name"),
-                Model.bracket_id.label("bracket_id"),
-                Brackets.name.label("bracket_name"),
-                Model.hidden,
-                Model.banned,
-                sumscores.columns.score,
-                *fields,
-            )
-            .join(sumscores, Model.id == sumscores.columns.account_id)
-            .join(Brackets, isouter=True)
-            .order_by(
-                sumscores.columns.score.desc(),
-                sumscores.columns.date.asc(),
-                sumscores.columns.id.asc(),
-            )
-        )
-    else:
-        standings_query = (
-            db.session.query(
-                Model.id.label("account_id"),
-                Model.oauth_id.label("oauth_id"),
-                Model.name.label("name"),
-                Model.bracket_id.label("bracket_id"),
-                Brackets.name.label("bracket_name"),
-                sumscores.columns.score,
-                *fields,
-            )
-            .join(sumscores, Model.id == sumscores.columns.account_id)
-            .join(Brackets, isouter=True)
-            .filter(Model.banned == False, Model.hidden == False)
-            .order_by(
-                sumscores.columns.score.desc(),
-                sumscores.columns.date.asc(),
-                sumscores.columns.id.asc(),
-            )
-        )
+    Pair the ranking kept by the standings index with the account columns to show for it.
+
+    Admins can see scores for all accounts but the public cannot see hidden or banned ones. Only the accounts that
+    make the cut are loaded when a count is given.
+    """
+    ranking = current_app.standings_index.ranking(kind, admin=admin)
 
-    # Filter on a bracket if asked
+    query = db.session.query(*columns, *fields).join(Brackets, isouter=True)
+    if not admin:
+        query = query.filter(Model.banned == False, Model.hidden == False)
     if bracket_id is not None:
-        standings_query = standings_query.filter(Model.bracket_id == bracket_id)
+        query = query.filter(Model.bracket_id == bracket_id)
+
+    standings = []
+    split = len(columns)
+
+    def emit(ranked, rows):
+        for account_id, score in ranked:
+            row = rows.get(account_id)
+            if row is None:
+                continue
+            # Score goes between the account columns and any extra fields, as it always has
+            names = row._fields
+            standings.append(
+                StandingsRow(
+                    names[:split] + ("score",) + names[split:],
+                    tuple(row[:split]) + (score,) + tuple(row[split:]),
+                )
+            )
+            if count is not None and len(standings) >= count:
+                return True
+        return False
 
-    # Only select a certain amount of users if asked.
     if count is None:
-        standings = standings_query.all()
+        emit(ranking, {row[0]: row for row in query.all()})
     else:
-        standings = standings_query.limit(count).all()
-
+        chunk = max(count, 50)
+        for start in range(0, len(ranking), chunk):
+            ranked = ranking[start : start + chunk]
+            rows = query.filter(Model.id.in_([a for a, _ in ranked])).all()
+            if emit(ranked, {row[0]: row for row in rows}):
+                break
     return standings
 
 
-@cache.memoize(timeout=60)
-def get_team_standings(count=None, bracket_id=None, admin=False, fields=None):
-    if fields is None:
-        fields = []
-    scores = (
-        db.session.query(
-            Solves.team_id.label("team_id"),
-            db.func.sum(Challenges.value).label("score"),
-            db.func.max(Solves.id).label("id"),
-            db.func.max(Solves.date).label("date"),
-        )
-        .join(Challenges)
-        .filter(Challenges.value != 0)
-        .group_by(Solves.team_id)
-    )
+def get_account_score(kind, account_id, admin=False):
+    """Score of one user or team ("users" or "teams"), read from the standings index"""
+    return current_app.standings_index.score(kind, account_id, admin=admin)
 
-    awards = (
-        db.session.query(
-            Awards.team_id.label("team_id"),
-            db.func.sum(Awards.value).label("score"),
-            db.func.max(Awards.id).label("id"),
-            db.func.max(Awards.date).label("date"),
-        )
-        .filter(Awards.value != 0)
-        .group_by(Awards.team_id)
-    )
 
-    freeze = get_config("freeze")
-    if not admin and freeze:
-        scores = scores.filter(Solves.date < unix_time_to_utc(freeze))
-        awards = awards.filter(Awards.date < unix_time_to_utc(freeze))
-
-    results = union_all(scores, awards).alias("results")
-
-    sumscores = (
-        db.session.query(
-            results.columns.team_id,
-            db.func.sum(results.columns.score).label("score"),
-            db.func.max(results.columns.id).label("id"),
-            db.func.max(results.columns.date).label("date"),
-        )
-        .group_by(results.columns.team_id)
-        .subquery()
+def get_account_place(kind, account_id, admin=False):
+    """
+    Place of one user or team ("users" or "teams") in the standings, read from the standings index.
+
+    Hidden and banned accounts are only placed for admins, the same as in get_user_standings() and
+    get_team_standings().
+    """
+    from CTFd.utils.scores.standings import get_unlisted_account_ids
+
+    unlisted = () if admin else get_unlisted_account_ids(kind)
+    return current_app.standings_index.place(
+        kind, account_id, admin=admin, unlisted=unlisted
     )
 
-    if admin:
-        standings_query = (
-            db.session.query(
-                Teams.id.label("team_id"),
-                Teams.oauth_id.label("oauth_id"),
-                Teams.name.label("name"),
-                Teams.bracket_id.label("bracket_id"),
-                Brackets.name.label("bracket_name"),
-                Teams.hidden,
-                Teams.banned,
-                sumscores.columns.score,
-                *fields,
-            )
-            .join(sumscores, Teams.id == sumscores.columns.team_id)
-            .join(Brackets, isouter=True)
-            .order_by(
-                sumscores.columns.score.desc(),
-                sumscores.columns.date.asc(),
-                sumscores.columns.id.asc(),
-            )
-        )
-    else:
-        standings_query = (
-            db.session.query(
-                Teams.id.label("team_id"),
-                Teams.oauth_id.label("oauth_id"),
-                Teams.name.label("name"),
-                Teams.bracket_id.label("bracket_id"),
-                Brackets.name.label("bracket_name"),
-                sumscores.columns.score,
-                *fields,
-            )
-            .join(sumscores, Teams.id == sumscores.columns.team_id)
-            .join(Brackets, isouter=True)
-            .filter(Teams.banned == False)
-            .filter(Teams.hidden == False)
-            .order_by(
-                sumscores.columns.score.desc(),
-                sumscores.columns.date.asc(),
-                sumscores.columns.id.asc(),
-            )
-        )
 
-    if bracket_id is not None:
-        standings_query = standings_query.filter(Teams.bracket_id == bracket_id)
+@depends_on(*STANDINGS_DOMAINS)
+@cache.memoize(timeout=60)
+def get_standings(count=None, bracket_id=None, admin=False, fields=None):
+    """
+    Get standings as a list of tuples containing account_id, name, and score e.g. [(account_id, team_name, score)].
 
-    if count is None:
-        standings = standings_query.all()
-    else:
-        standings = standings_query.limit(count).all()
+    Ties are broken by who reached a given score first based on the solve ID. Two users can have the same score but one
+    user will have a solve ID that is before the others. That user will be considered the tie-winner.
 
-    return standings
+    Challenges & Awards with a value of zero are filtered out of the calculations to avoid incorrect tie breaks.
+
+    Scores come from the standings index (CTFd.utils.scores.standings), which is kept up to date as solves and
+    awards are recorded instead of summing every solve on each call.
+    """
+    if fields is None:
+        fields = []
+    Model = get_model()
+
+    columns = [
+        Model.id.label("account_id"),
+        Model.oauth_id.label("oauth_id"),
+        Model.name.label("name"),
+        Model.bracket_id.label("bracket_id"),
+        Brackets.name.label("bracket_name"),
+    ]
+    if admin:
+        columns += [Model.hidden, Model.banned]
 
+    kind = "teams" if Model is Teams else "users"
+    return rank_accounts(kind, Model, columns, fields, count, bracket_id, admin)
 
+
+@depends_on(*STANDINGS_DOMAINS)
 @cache.memoize(timeout=60)
-def get_user_standings(count=None, bracket_id=None, admin=False, fields=None):
+def get_team_standings(count=None, bracket_id=None, admin=False, fields=None):
     if fields is None:
         fields = []
-    scores = (
-        db.session.query(
-            Solves.user_id.label("user_id"),
-            db.func.sum(Challenges.value).label("score"),
-            db.func.max(Solves.id).label("id"),
-            db.func.max(Solves.date).label("date"),
-        )
-        .join(Challenges)
-        .filter(Challenges.value != 0)
-        .group_by(Solves.user_id)
-    )
 
-    awards = (
-        db.session.query(
-            Awards.user_id.label("user_id"),
-            db.func.sum(Awards.value).label("score"),
-            db.func.max(Awards.id).label("id"),
-            db.func.max(Awards.date).label("date"),
-        )
-        .filter(Awards.value != 0)
-        .group_by(Awards.user_id)
-    )
+    columns = [
+        Teams.id.label("team_id"),
+        Teams.oauth_id.label("oauth_id"),
+        Teams.name.label("name"),
+        Teams.bracket_id.label("bracket_id"),
+        Brackets.name.label("bracket_name"),
+    ]
+    if admin:
+        columns += [Teams.hidden, Teams.banned]
 
-    freeze = get_config("freeze")
-    if not admin and freeze:
-        scores = scores.filter(Solves.date < unix_time_to_utc(freeze))
-        awards = awards.filter(Awards.date < unix_time_to_utc(freeze))
-
-    results = union_all(scores, awards).alias("results")
-
-    sumscores = (
-        db.session.query(
-            results.columns.user_id,
-            db.func.sum(results.columns.score).label("score"),
-            db.func.max(results.columns.id).label("id"),
-            db.func.max(results.columns.date).label("date"),
-        )
-        .group_by(results.columns.user_id)
-        .subquery()
-    )
+    return rank_accounts("teams", Teams, columns, fields, count, bracket_id, admin)
 
-    if admin:
-        standings_query = (
-            db.session.query(
-                Users.id.label("user_id"),
-                Users.oauth_id.label("oauth_id"),
-                Users.name.label("name"),
-                Users.team_id.label("team_id"),
-                Users.bracket_id.label("bracket_id"),
-                Brackets.name.label("bracket_name"),
-                Users.hidden,
-                Users.banned,
-                sumscores.columns.score,
-                *fields,
-            )
-            .join(sumscores, Users.id == sumscores.columns.user_id)
-            .join(Brackets, isouter=True)
-            .order_by(
-                sumscores.columns.score.desc(),
-                sumscores.columns.date.asc(),
-                sumscores.columns.id.asc(),
-            )
-        )
-    else:
-        standings_query = (
-            db.session.query(
-                Users.id.label("user_id"),
-                Users.oauth_id.label("oauth_id"),
-                Users.name.label("name"),
-                Users.team_id.label("team_id"),
-                Users.bracket_id.label("bracket_id"),
-                Brackets.name.label("bracket_name"),
-                sumscores.columns.score,
-                *fields,
-            )
-            .join(sumscores, Users.id == sumscores.columns.user_id)
-            .join(Brackets, isouter=True)
-            .filter(Users.banned == False, Users.hidden == False)
-            .order_by(
-                sumscores.columns.score.desc(),
-                sumscores.columns.date.asc(),
-                sumscores.columns.id.asc(),
-            )
-        )
 
-    if bracket_id is not None:
-        standings_query = standings_query.filter(Users.bracket_id == bracket_id)
+@depends_on(*STANDINGS_DOMAINS)
+@cache.memoize(timeout=60)
+def get_user_standings(count=None, bracket_id=None, admin=False, fields=None):
+    if fields is None:
+        fields = []
 
-    if count is None:
-        standings = standings_query.all()
-    else:
-        standings = standings_query.limit(count).all()
+    columns = [
+        Users.id.label("user_id"),
+        Users.oauth_id.label("oauth_id"),
+        Users.name.label("name"),
+        Users.team_id.label("team_id"),
+        Users.bracket_id.label("bracket_id"),
+        Brackets.name.label("bracket_name"),
+    ]
+    if admin:
+        columns += [Users.hidden, Users.banned]
 
-    return standings
+    return rank_accounts("users", Users, columns, fields, count, bracket_id, admin)
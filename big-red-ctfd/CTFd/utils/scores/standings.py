@@ -0,0 +1,836 @@
+import datetime
+from bisect import bisect_left, insort
+from collections import defaultdict, namedtuple
+from contextlib import nullcontext
+from threading import RLock
+from uuid import uuid4
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from CTFd.cache import cache, depends_on
+from CTFd.models import Awards, Challenges, Solves, Submissions, Teams, Users, db
+from CTFd.utils import get_config
+from CTFd.utils.dates import isoformat
+from CTFd.utils.modes import TEAMS_MODE
+
+KINDS = ("users", "teams")
+
+# Standings as seen by admins and, when the CTF has a freeze time, as seen by everyone else
+ADMIN_VIEW = "admin"
+PUBLIC_VIEW = "public"
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# Names the current build in the shared cache. Deleting it (invalidate() or a cache.clear() after an import or
+# reset) makes every worker rebuild on its next read.
+TOKEN_KEY = "standings_index_token"
+
+# Counts every committed change to the standings. Scoreboard deltas carry it so that clients notice a gap and resync.
+VERSION_KEY = "scoreboard_version"
+
+
+class Entry(namedtuple("Entry", ["score", "id", "date"])):
+    """
+    An account's line on the scoreboard: total score plus the tie-breakers get_standings() has always used,
+    the highest solve/award ID and the latest solve/award date (as microseconds since the epoch).
+    """
+
+    def merge(self, other):
+        if other is None:
+            return self
+        return Entry(
+            self.score + other.score, max(self.id, other.id), max(self.date, other.date)
+        )
+
+
+def micros(date):
+    return (date - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def sort_key(account_id, entry):
+    # Score descending, then whoever reached it first, then row ID, then account ID so ties stay stable
+    return (-entry.score, entry.date, entry.id, account_id)
+
+
+def aggregate(
+    session,
+    freeze=None,
+    max_solve_id=None,
+    max_award_id=None,
+    user_ids=None,
+    team_ids=None,
+):
+    """
+    Sum solves and awards per user and per team, the same totals get_standings() has always computed.
+
+    Challenges & Awards with a value of zero are left out so they cannot win a tie break. Passing user_ids/team_ids
+    limits the work to those accounts.
+
+    :return: {"users": {user_id: Entry}, "teams": {team_id: Entry}}
+    """
+    solves = (
+        db.select(
+            Solves.user_id,
+            Solves.team_id,
+            db.func.sum(Challenges.value),
+            db.func.max(Solves.id),
+            db.func.max(Solves.date),
+        )
+        .join(Challenges, Solves.challenge_id == Challenges.id)
+        .where(Challenges.value != 0)
+        .group_by(Solves.user_id, Solves.team_id)
+    )
+    awards = (
+        db.select(
+            Awards.user_id,
+            Awards.team_id,
+            db.func.sum(Awards.value),
+            db.func.max(Awards.id),
+            db.func.max(Awards.date),
+        )
+        .where(Awards.value != 0)
+        .group_by(Awards.user_id, Awards.team_id)
+    )
+
+    if freeze:
+        freeze = EPOCH + datetime.timedelta(seconds=freeze)
+        solves = solves.where(Solves.date < freeze)
+        awards = awards.where(Awards.date < freeze)
+    if max_solve_id is not None:
+        solves = solves.where(Solves.id <= max_solve_id)
+    if max_award_id is not None:
+        awards = awards.where(Awards.id <= max_award_id)
+    if user_ids is not None or team_ids is not None:
+        user_ids = set(user_ids or ())
+        team_ids = set(team_ids or ())
+        solves = solves.where(
+            or_(Solves.user_id.in_(user_ids), Solves.team_id.in_(team_ids))
+        )
+        awards = awards.where(
+            or_(Awards.user_id.in_(user_ids), Awards.team_id.in_(team_ids))
+        )
+
+    results = {kind: {} for kind in KINDS}
+    for query in (solves, awards):
+        for user_id, team_id, score, last_id, last_date in session.execute(query):
+            entry = Entry(int(score or 0), last_id, micros(last_date))
+            for kind, account_id, wanted in (
+                ("users", user_id, user_ids),
+                ("teams", team_id, team_ids),
+            ):
+                if account_id is None:
+                    continue
+                if wanted is not None and account_id not in wanted:
+                    continue
+                results[kind][account_id] = entry.merge(results[kind].get(account_id))
+    return results
+
+
+class StandingsIndex(object):
+    """
+    Scoreboard order kept up to date as solves and awards come in, instead of being recomputed with an aggregate
+    over every Solves and Awards row each time the standings are read.
+
+    There is one ranking per kind of account (users and teams) and per view (admin, plus public when a freeze time
+    is set). The ORM hooks at the bottom of this module feed it: every committed Solve or Award is added to its
+    accounts, deleted ones have their accounts recomputed and challenge value changes (e.g. dynamic scoring) are
+    applied to each solver. Anything that cannot be followed row by row (deleting challenges or accounts, bulk
+    queries, imports, a new freeze time) throws the index away and it is rebuilt on the next read.
+
+    This implementation lives in process memory and suits single-worker deployments, like EventManager does.
+    RedisStandingsIndex shares one index between workers.
+    """
+
+    def __init__(self):
+        self.lock = RLock()
+        self.token = None
+        self.freeze = None
+        self.watermarks = {"solves": 0, "awards": 0}
+        self._entries = {}
+        self._order = {}
+
+    # Storage
+
+    def _views(self, freeze):
+        return [ADMIN_VIEW, PUBLIC_VIEW] if freeze else [ADMIN_VIEW]
+
+    def _locked(self):
+        return self.lock
+
+    def _state(self):
+        """(built, freeze, watermarks)"""
+        built = self.token is not None and cache.get(TOKEN_KEY) == self.token
+        return built, self.freeze, self.watermarks
+
+    def _load(self, key, account_ids):
+        entries = self._entries.get(key, {})
+        return {account_id: entries.get(account_id) for account_id in account_ids}
+
+    def _store(self, key, old, new):
+        entries = self._entries.setdefault(key, {})
+        order = self._order.setdefault(key, [])
+        for account_id, entry in new.items():
+            previous = old.get(account_id)
+            if previous == entry:
+                continue
+            if previous is not None:
+                del order[bisect_left(order, sort_key(account_id, previous))]
+            if entry is None:
+                entries.pop(account_id, None)
+            else:
+                entries[account_id] = entry
+                insort(order, sort_key(account_id, entry))
+
+    def _replace(self, views, freeze, watermarks, token):
+        self._entries = views
+        self._order = {
+            key: sorted(sort_key(a, e) for a, e in entries.items())
+            for key, entries in views.items()
+        }
+        self.freeze = freeze
+        self.watermarks = watermarks
+        self.token = token
+
+    def _ranked(self, key):
+        return [(k[3], -k[0]) for k in self._order.get(key, [])]
+
+    def invalidate(self):
+        cache.delete(TOKEN_KEY)
+        with self._locked():
+            self.token = None
+            self._entries = {}
+            self._order = {}
+
+    # Building
+
+    def rebuild(self, freeze=None):
+        with self._locked():
+            self._rebuild(freeze)
+
+    def _rebuild(self, freeze):
+        # Callers hold the lock. Rows past the watermarks are left to the ORM hooks.
+        max_solve_id = db.session.query(db.func.max(Solves.id)).scalar() or 0
+        max_award_id = db.session.query(db.func.max(Awards.id)).scalar() or 0
+        views = {}
+        for view in self._views(freeze):
+            totals = aggregate(
+                db.session,
+                freeze=freeze if view == PUBLIC_VIEW else None,
+                max_solve_id=max_solve_id,
+                max_award_id=max_award_id,
+            )
+            for kind in KINDS:
+                views[(kind, view)] = totals[kind]
+        token = uuid4().hex
+        watermarks = {"solves": max_solve_id, "awards": max_award_id}
+        self._replace(views, freeze, watermarks, token)
+        cache.set(TOKEN_KEY, token, timeout=0)
+
+    def ensure_built(self):
+        freeze = get_config("freeze") or None
+        freeze = int(freeze) if freeze else None
+        built, built_freeze, _ = self._state()
+        if not built or built_freeze != freeze:
+            with self._locked():
+                built, built_freeze, _ = self._state()
+                if not built or built_freeze != freeze:
+                    self._rebuild(freeze)
+        return freeze
+
+    def ranking(self, kind, admin=False):
+        """
+        Accounts of one kind in scoreboard order
+
+        :return: [(account_id, score)]
+        """
+        freeze = self.ensure_built()
+        view = ADMIN_VIEW if admin or not freeze else PUBLIC_VIEW
+        with self._locked():
+            return self._ranked((kind, view))
+
+    # Lookups
+
+    def _reading(self):
+        return self.lock
+
+    def score(self, kind, account_id, admin=False):
+        """An account's score on the scoreboard, 0 if it has not scored"""
+        freeze = self.ensure_built()
+        view = ADMIN_VIEW if admin or not freeze else PUBLIC_VIEW
+        with self._reading():
+            entry = self._load((kind, view), [account_id])[account_id]
+        return entry.score if entry is not None else 0
+
+    def place(self, kind, account_id, admin=False, unlisted=()):
+        """
+        An account's place on the scoreboard, found by a binary search for its entry instead of walking the
+        standings. unlisted accounts hold a position in the index but are not counted ahead of anyone.
+
+        :return: 1 for first place, or None if the account has not scored or is unlisted itself
+        """
+        if account_id in unlisted:
+            return None
+        freeze = self.ensure_built()
+        key = (kind, ADMIN_VIEW if admin or not freeze else PUBLIC_VIEW)
+        with self._reading():
+            entries = self._load(key, {account_id} | set(unlisted))
+            positions = self._positions(key, entries)
+        position = positions.get(account_id)
+        if position is None:
+            return None
+        ahead = sum(1 for a in unlisted if positions.get(a, position) < position)
+        return position - ahead + 1
+
+    # Incremental updates
+
+    def apply(self, changes):
+        """
+        Apply the changes collected by the ORM hooks for one committed transaction. Each change is one of
+
+        ("add", source, row_id, user_id, team_id, value, date, challenge_id)
+                                                                 a new solve or award
+        ("delta", solvers, delta)                                a challenge's value moved by delta for
+                                                                 solvers [(user_id, team_id, date)]
+        ("set", {(kind, view): {account_id: Entry or None}})     recomputed accounts
+        ("invalidate",)                                          rebuild on next read
+        """
+        if any(change[0] == "invalidate" for change in changes):
+            self.invalidate()
+            return
+
+        with self._locked():
+            built, freeze, watermarks = self._state()
+            if not built:
+                return
+            views = self._views(freeze)
+            freeze_date = micros(EPOCH + datetime.timedelta(seconds=freeze or 0))
+
+            def targets(user_id, team_id, date):
+                for view in views:
+                    if view == PUBLIC_VIEW and date >= freeze_date:
+                        continue
+                    if user_id is not None:
+                        yield ("users", view), user_id
+                    if team_id is not None:
+                        yield ("teams", view), team_id
+
+            updates = []
+            for change in changes:
+                if change[0] == "add":
+                    _, source, row_id, user_id, team_id, value, date, _ = change
+                    if row_id <= watermarks[source]:
+                        # Already counted by the rebuild that produced this index
+                        continue
+                    for key, account_id in targets(user_id, team_id, date):
+                        updates.append(
+                            ("merge", key, account_id, Entry(value, row_id, date))
+                        )
+                elif change[0] == "delta":
+                    _, solvers, delta = change
+                    for user_id, team_id, date in solvers:
+                        for key, account_id in targets(user_id, team_id, date):
+                            updates.append(("delta", key, account_id, delta))
+                elif change[0] == "set":
+                    for key, entries in change[1].items():
+                        if key[1] in views:
+                            for account_id, entry in entries.items():
+                                updates.append(("set", key, account_id, entry))
+
+            touched = defaultdict(set)
+            for _, key, account_id, _ in updates:
+                touched[key].add(account_id)
+            old = {key: self._load(key, ids) for key, ids in touched.items()}
+            new = {key: dict(entries) for key, entries in old.items()}
+            for action, key, account_id, value in updates:
+                current = new[key].get(account_id)
+                if action == "merge":
+                    new[key][account_id] = value.merge(current)
+                elif action == "delta" and current is not None:
+                    new[key][account_id] = current._replace(score=current.score + value)
+                elif action == "set":
+                    new[key][account_id] = value
+            for key in touched:
+                self._store(key, old[key], new[key])
+
+    # Live updates
+
+    def _positions(self, key, entries):
+        order = self._order.get(key, [])
+        return {
+            account_id: bisect_left(order, sort_key(account_id, entry))
+            for account_id, entry in entries.items()
+            if entry is not None
+        }
+
+    def deltas(self, changes, kind, unlisted):
+        """
+        Scoreboard updates for the accounts of one kind that gained a solve or award in changes, with the score and
+        place the public scoreboard now shows for them. unlisted are the hidden and banned accounts, which hold a
+        position in the index but not on the scoreboard.
+
+        :return: [{"account_id", "score", "place", "challenge_id", "value", "date"}]
+        """
+        with self._locked():
+            built, freeze, _ = self._state()
+            if not built:
+                return []
+            freeze_date = micros(EPOCH + datetime.timedelta(seconds=freeze or 0))
+
+            added = {}
+            for change in changes:
+                if change[0] != "add":
+                    continue
+                _, _, _, user_id, team_id, value, date, challenge_id = change
+                account_id = team_id if kind == "teams" else user_id
+                if account_id is None or account_id in unlisted:
+                    continue
+                if freeze and date >= freeze_date:
+                    # Hidden from the public until the scoreboard unfreezes
+                    continue
+                added[account_id] = (value, date, challenge_id)
+            if not added:
+                return []
+
+            key = (kind, PUBLIC_VIEW if freeze else ADMIN_VIEW)
+            entries = self._load(key, set(added) | set(unlisted))
+            positions = self._positions(key, entries)
+
+        hidden = sorted(positions[a] for a in unlisted if a in positions)
+        deltas = []
+        for account_id, (value, date, challenge_id) in added.items():
+            position = positions.get(account_id)
+            if position is None:
+                continue
+            deltas.append(
+                {
+                    "account_id": account_id,
+                    "score": entries[account_id].score,
+                    "place": position - bisect_left(hidden, position) + 1,
+                    "challenge_id": challenge_id,
+                    "value": value,
+                    "date": isoformat(EPOCH + datetime.timedelta(microseconds=date)),
+                }
+            )
+        return deltas
+
+
+class RedisStandingsIndex(StandingsIndex):
+    """
+    StandingsIndex kept in Redis so every worker reads and updates the same standings.
+
+    Each view is a hash of account -> "score:id:date" plus a sorted set scored by points whose members encode the
+    tie-breakers, so ZREVRANGE returns scoreboard order. Updates and rebuilds are serialized with a Redis lock.
+    """
+
+    prefix = "ctfd_standings:"
+    date_width = 17
+    id_width = 12
+
+    def __init__(self):
+        super(RedisStandingsIndex, self).__init__()
+        from CTFd.cache import cache
+
+        self.client = cache.cache._write_client
+
+    def _key(self, key, suffix):
+        return "{prefix}{kind}:{view}:{suffix}".format(
+            prefix=self.prefix, kind=key[0], view=key[1], suffix=suffix
+        )
+
+    def _member(self, account_id, entry):
+        # ZREVRANGE orders equal scores by member descending, so invert the ascending tie-breakers
+        return "{date:0{dw}d}:{id:0{iw}d}:{account_id}".format(
+            date=10**self.date_width - 1 - entry.date,
+            id=10**self.id_width - 1 - entry.id,
+            account_id=account_id,
+            dw=self.date_width,
+            iw=self.id_width,
+        )
+
+    def _locked(self):
+        return self.client.lock(self.prefix + "lock", timeout=300, blocking_timeout=60)
+
+    def _state(self):
+        meta = self.client.hgetall(self.prefix + "meta")
+        if not meta or meta[b"token"].decode() != cache.get(TOKEN_KEY):
+            return False, None, None
+        freeze = int(meta[b"freeze"]) or None
+        watermarks = {
+            "solves": int(meta[b"solves"]),
+            "awards": int(meta[b"awards"]),
+        }
+        return True, freeze, watermarks
+
+    def _load(self, key, account_ids):
+        account_ids = list(account_ids)
+        values = self.client.hmget(self._key(key, "entries"), account_ids)
+        return {
+            account_id: Entry(*map(int, value.split(b":"))) if value else None
+            for account_id, value in zip(account_ids, values)
+        }
+
+    def _store(self, key, old, new):
+        entries = self._key(key, "entries")
+        rank = self._key(key, "rank")
+        pipe = self.client.pipeline()
+        for account_id, entry in new.items():
+            previous = old.get(account_id)
+            if previous == entry:
+                continue
+            if previous is not None:
+                pipe.zrem(rank, self._member(account_id, previous))
+            if entry is None:
+                pipe.hdel(entries, account_id)
+            else:
+                pipe.hset(entries, account_id, "{}:{}:{}".format(*entry))
+                pipe.zadd(rank, {self._member(account_id, entry): entry.score})
+        pipe.execute()
+
+    def _replace(self, views, freeze, watermarks, token):
+        pipe = self.client.pipeline()
+        pipe.delete(
+            *[
+                self._key((kind, view), suffix)
+                for kind in KINDS
+                for view in (ADMIN_VIEW, PUBLIC_VIEW)
+                for suffix in ("entries", "rank")
+            ]
+        )
+        for key, entries in views.items():
+            if not entries:
+                continue
+            pipe.hset(
+                self._key(key, "entries"),
+                mapping={a: "{}:{}:{}".format(*e) for a, e in entries.items()},
+            )
+            pipe.zadd(
+                self._key(key, "rank"),
+                {self._member(a, e): e.score for a, e in entries.items()},
+            )
+        pipe.hset(
+            self.prefix + "meta",
+            mapping={
+                "token": token,
+                "freeze": freeze or 0,
+                "solves": watermarks["solves"],
+                "awards": watermarks["awards"],
+            },
+        )
+        pipe.execute()
+
+    def _positions(self, key, entries):
+        entries = [(a, e) for a, e in entries.items() if e is not None]
+        pipe = self.client.pipeline()
+        for account_id, entry in entries:
+            pipe.zrevrank(self._key(key, "rank"), self._member(account_id, entry))
+        return {
+            account_id: position
+            for (account_id, _), position in zip(entries, pipe.execute())
+            if position is not None
+        }
+
+    def _ranked(self, key):
+        ranked = self.client.zrevrange(self._key(key, "rank"), 0, -1, withscores=True)
+        return [
+            (int(member.rsplit(b":", 1)[1]), int(score)) for member, score in ranked
+        ]
+
+    def _reading(self):
+        # HMGET and ZREVRANK see either the old or the new entry of an account, so lookups need no lock
+        return nullcontext()
+
+    def ranking(self, kind, admin=False):
+        freeze = self.ensure_built()
+        view = ADMIN_VIEW if admin or not freeze else PUBLIC_VIEW
+        # Reads need no lock, ZREVRANGE sees either the old or the new ranking
+        return self._ranked((kind, view))
+
+    def invalidate(self):
+        cache.delete(TOKEN_KEY)
+        self.client.delete(self.prefix + "meta")
+
+    def apply(self, changes):
+        from redis.exceptions import LockError
+
+        try:
+            super(RedisStandingsIndex, self).apply(changes)
+        except LockError:
+            # Could not get in line behind a rebuild, so make the next read rebuild instead
+            self.invalidate()
+
+
+# ORM hooks
+
+CHANGES_KEY = "standings_changes"
+VALUES_KEY = "standings_challenge_values"
+LIVE_KEY = "standings_live"
+
+
+def _current_index():
+    if has_app_context():
+        return getattr(current_app, "standings_index", None)
+
+
+def _account_ids(rows):
+    user_ids = {row.user_id for row in rows if row.user_id is not None}
+    team_ids = {row.team_id for row in rows if row.team_id is not None}
+    return user_ids, team_ids
+
+
+def _recompute(session, index, user_ids, team_ids):
+    built, freeze, _ = index._state()
+    entries = {}
+    for view in index._views(freeze):
+        totals = aggregate(
+            session,
+            freeze=freeze if view == PUBLIC_VIEW else None,
+            user_ids=user_ids,
+            team_ids=team_ids,
+        )
+        for kind, ids in (("users", user_ids), ("teams", team_ids)):
+            entries[(kind, view)] = {a: totals[kind].get(a) for a in ids}
+    return ("set", entries)
+
+
+def remember_challenge_values(session, flush_context, instances):
+    """
+    Note the stored value of challenges whose value is about to change. Setting an expired attribute (e.g. after a
+    commit) does not load the old value, and the delta for earlier solvers needs it.
+    """
+    if _current_index() is None:
+        return
+    expired = [
+        o
+        for o in session.dirty
+        if isinstance(o, Challenges)
+        and get_history(o, "value").added
+        and not get_history(o, "value").deleted
+    ]
+    if expired:
+        values = session.info.setdefault(VALUES_KEY, {})
+        values.update(
+            session.execute(
+                db.select(Challenges.id, Challenges.value).where(
+                    Challenges.id.in_([o.id for o in expired])
+                )
+            ).all()
+        )
+
+
+def collect_standings_changes(session, flush_context):
+    """
+    Record what a flush changed about scores, while the rows and their history are still at hand. SQL is fine
+    here but not once the transaction commits, so anything that needs the database is looked up now.
+    """
+    index = _current_index()
+    if index is None:
+        return
+
+    solves = [o for o in session.new if isinstance(o, Solves)]
+    awards = [o for o in session.new if isinstance(o, Awards)]
+    deleted = [o for o in session.deleted if isinstance(o, (Solves, Awards))]
+    dropped = [o for o in session.deleted if isinstance(o, (Challenges, Users, Teams))]
+    edited = [
+        o
+        for o in session.dirty
+        if isinstance(o, (Solves, Awards)) and session.is_modified(o)
+    ]
+    revalued = []
+    stored = session.info.pop(VALUES_KEY, {})
+    for o in session.dirty:
+        if isinstance(o, Challenges):
+            history = get_history(o, "value")
+            if history.added:
+                old = history.deleted[0] if history.deleted else stored.get(o.id)
+                new = history.added[0]
+                if old is None or int(old or 0) != int(new or 0):
+                    revalued.append((o.id, old, new))
+
+    if not (solves or awards or deleted or dropped or edited or revalued):
+        return
+
+    changes = session.info.setdefault(CHANGES_KEY, [])
+    if LIVE_KEY not in session.info:
+        # Looked up now since nothing can be queried once the transaction has committed
+        session.info[LIVE_KEY] = live_scoreboard()
+    built, _, _ = index._state()
+    if not built or dropped or edited or any(old is None for _, old, _ in revalued):
+        # Before the first read there is nothing to update, and a rebuild racing this transaction would miss it
+        changes.append(("invalidate",))
+        return
+
+    if solves:
+        values = dict(
+            session.execute(
+                db.select(Challenges.id, Challenges.value).where(
+                    Challenges.id.in_({s.challenge_id for s in solves})
+                )
+            ).all()
+        )
+        for s in solves:
+            value = int(values.get(s.challenge_id) or 0)
+            if value:
+                changes.append(
+                    (
+                        "add",
+                        "solves",
+                        s.id,
+                        s.user_id,
+                        s.team_id,
+                        value,
+                        micros(s.date),
+                        s.challenge_id,
+                    )
+                )
+    for a in awards:
+        if a.value:
+            changes.append(
+                (
+                    "add",
+                    "awards",
+                    a.id,
+                    a.user_id,
+                    a.team_id,
+                    int(a.value),
+                    micros(a.date),
+                    None,
+                )
+            )
+
+    new_solve_ids = {s.id for s in solves}
+    for challenge_id, old, new in revalued:
+        old, new = int(old or 0), int(new or 0)
+        solvers = [
+            row
+            for row in session.execute(
+                db.select(Solves.id, Solves.user_id, Solves.team_id, Solves.date).where(
+                    Solves.challenge_id == challenge_id
+                )
+            ).all()
+            if row.id not in new_solve_ids
+        ]
+        if not solvers:
+            continue
+        if old and new:
+            changes.append(
+                (
+                    "delta",
+                    [(r.user_id, r.team_id, micros(r.date)) for r in solvers],
+                    new - old,
+                )
+            )
+        else:
+            # A zero-value challenge does not count towards tie breaks, so these accounts are recomputed
+            changes.append(_recompute(session, index, *_account_ids(solvers)))
+
+    if deleted:
+        changes.append(_recompute(session, index, *_account_ids(deleted)))
+
+
+def track_bulk_standings_changes(orm_execute_state):
+    """Bulk UPDATE/DELETE queries skip the flush, so score-related ones rebuild the index"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(
+        mapper.class_, (Submissions, Awards, Challenges, Users, Teams)
+    ):
+        changes = orm_execute_state.session.info.setdefault(CHANGES_KEY, [])
+        changes.append(("invalidate",))
+
+
+def apply_standings_changes(session):
+    changes = session.info.pop(CHANGES_KEY, None)
+    live = session.info.pop(LIVE_KEY, None)
+    index = _current_index()
+    if changes and index is not None:
+        index.apply(changes)
+        publish_standings_changes(index, changes, live)
+
+
+def discard_standings_changes(session):
+    session.info.pop(CHANGES_KEY, None)
+    session.info.pop(LIVE_KEY, None)
+
+
+def listen_for_standings_changes():
+    if not event.contains(Session, "after_flush", collect_standings_changes):
+        event.listen(Session, "before_flush", remember_challenge_values)
+        event.listen(Session, "after_flush", collect_standings_changes)
+        event.listen(Session, "do_orm_execute", track_bulk_standings_changes)
+        event.listen(Session, "after_commit", apply_standings_changes)
+        event.listen(Session, "after_rollback", discard_standings_changes)
+
+
+# Live scoreboard
+
+
+@depends_on("users", "teams")
+@cache.memoize(timeout=300)
+def get_unlisted_account_ids(kind):
+    """IDs of the hidden and banned accounts of one kind, which are left off the public scoreboard"""
+    Model = Teams if kind == "teams" else Users
+    return frozenset(
+        db.session.execute(
+            db.select(Model.id).where(
+                or_(Model.hidden == True, Model.banned == True)  # noqa: E712
+            )
+        ).scalars()
+    )
+
+
+def get_scoreboard_version():
+    return int(cache.get(VERSION_KEY) or 0)
+
+
+def bump_scoreboard_version():
+    if current_app.config.get("CACHE_TYPE") == "redis":
+        # INCR is atomic across workers and the key never expires
+        return cache.cache.inc(VERSION_KEY)
+    version = get_scoreboard_version() + 1
+    cache.set(VERSION_KEY, version, timeout=0)
+    return version
+
+
+def live_scoreboard():
+    """
+    The kind of account the scoreboard lists and which of them are unlisted, or None when players are not allowed to
+    see the scoreboard and so must not be streamed changes to it
+    """
+    from CTFd.constants.config import (
+        AccountVisibilityTypes,
+        ConfigTypes,
+        ScoreVisibilityTypes,
+    )
+
+    if get_config(ConfigTypes.SCORE_VISIBILITY) not in (
+        ScoreVisibilityTypes.PUBLIC,
+        ScoreVisibilityTypes.PRIVATE,
+    ):
+        return None
+    if get_config(ConfigTypes.ACCOUNT_VISIBILITY) == AccountVisibilityTypes.ADMINS:
+        return None
+    kind = "teams" if get_config("user_mode") == TEAMS_MODE else "users"
+    return kind, get_unlisted_account_ids(kind)
+
+
+def publish_standings_changes(index, changes, live):
+    """
+    Bump the scoreboard version and tell subscribers what changed: the new score and place of each account that
+    solved a challenge or got an award, or just the version when scores changed in a way that is not followed account
+    by account (challenge values, deletions, rebuilds) and clients should fetch a new snapshot.
+    """
+    version = bump_scoreboard_version()
+    events = getattr(current_app, "events_manager", None)
+    if live is None or events is None:
+        return
+
+    data = {"version": version}
+    if all(change[0] == "add" for change in changes):
+        data["deltas"] = index.deltas(changes, *live)
+        if not data["deltas"]:
+            return
+    events.publish(data=data, type="scoreboard")
@@ -3,7 +3,7 @@ import os
 
 from flask import session
 
-from CTFd.cache import clear_user_session
+from CTFd.cache import clear_request_cache, clear_user_session
 from CTFd.exceptions import UserNotFoundException, UserTokenExpiredException
 from CTFd.models import UserTokens, db
 from CTFd.utils.encoding import hexencode
@@ -32,6 +32,7 @@ def update_user(user):
 
 def logout_user():
     session.clear()
+    clear_request_cache()
 
 
 def generate_user_token(user, expiration=None, description=None):
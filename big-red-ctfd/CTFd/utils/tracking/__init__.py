@@ -0,0 +1,203 @@
+import datetime
+import time
+from threading import Lock
+
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+
+from CTFd.cache import cache, invalidate
+from CTFd.models import Tracking, Users, db
+
+# Rows are looked up and written this many users at a time so the IN clauses stay under the database's limits
+FLUSH_CHUNK_SIZE = 500
+
+
+def _chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def write_tracking(entries):
+    """
+    Upsert buffered sightings into the tracking table: one row per user and IP carrying the last time it was seen.
+    Sightings of users that no longer exist are dropped.
+
+    :param entries: {user_id: {ip: last_seen}}
+    """
+    for user_ids in _chunks(entries, FLUSH_CHUNK_SIZE):
+        users = {
+            user_id
+            for (user_id,) in db.session.query(Users.id).filter(Users.id.in_(user_ids))
+        }
+        tracked = {
+            (user_id, ip): track_id
+            for track_id, user_id, ip in db.session.query(
+                Tracking.id, Tracking.user_id, Tracking.ip
+            ).filter(Tracking.user_id.in_(users))
+        }
+
+        updates = []
+        inserts = []
+        for user_id in users:
+            for ip, date in entries[user_id].items():
+                track_id = tracked.get((user_id, ip))
+                if track_id:
+                    updates.append({"id": track_id, "date": date})
+                else:
+                    inserts.append({"ip": ip, "user_id": user_id, "date": date})
+        db.session.bulk_update_mappings(Tracking, updates)
+        db.session.bulk_insert_mappings(Tracking, inserts)
+    db.session.commit()
+
+
+class TrackingBuffer(object):
+    """
+    Collects the IP addresses users are seen with and writes them to the tracking table in batches, once
+    `batch_size` sightings are pending or `interval` seconds after the last write, instead of once per request.
+    Repeated sightings of the same user and IP only keep the latest date.
+
+    There is no background writer: a due batch is written by the request that records into it, so the last few
+    seconds of sightings are lost if the process exits before another request comes in.
+
+    This implementation lives in process memory and suits single-worker deployments, like EventManager does.
+    RedisTrackingBuffer shares the pending sightings between workers.
+    """
+
+    def __init__(self, batch_size=100, interval=5):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lock = Lock()
+        self.pending = {}
+        self.size = 0
+        self.flushed = time.monotonic()
+
+    def record(self, user_id, ip):
+        """Note that user_id was seen with ip just now and write the pending sightings if they are due"""
+        with self.lock:
+            ips = self.pending.setdefault(user_id, {})
+            if ip not in ips:
+                self.size += 1
+            ips[ip] = datetime.datetime.utcnow()
+            due = (
+                self.size >= self.batch_size
+                or time.monotonic() - self.flushed >= self.interval
+            )
+        if due:
+            self.flush()
+
+    def recent_ips(self, user_id, since):
+        """IPs user_id was seen with since the given date that have not been written yet"""
+        with self.lock:
+            ips = self.pending.get(user_id, {})
+            return {ip for ip, date in ips.items() if date >= since}
+
+    def _take(self):
+        with self.lock:
+            entries, self.pending, self.size = self.pending, {}, 0
+            self.flushed = time.monotonic()
+        return entries
+
+    def _restore(self, entries):
+        """Put sightings that could not be written back, unless the same user and IP was seen again meanwhile"""
+        with self.lock:
+            for user_id, taken in entries.items():
+                ips = self.pending.setdefault(user_id, {})
+                for ip, date in taken.items():
+                    if ip not in ips:
+                        ips[ip] = date
+                        self.size += 1
+
+    def flush(self):
+        """Write every pending sighting to the tracking table, keeping them for the next batch if that fails"""
+        entries = self._take()
+        if not entries:
+            return
+        try:
+            write_tracking(entries)
+        except SQLAlchemyError:
+            db.session.rollback()
+            current_app.logger.exception(
+                "Could not write %d users' IP tracking, retrying with the next batch",
+                len(entries),
+            )
+            self._restore(entries)
+        else:
+            invalidate("tracking")
+
+
+class RedisTrackingBuffer(TrackingBuffer):
+    """
+    TrackingBuffer kept in Redis so every worker writes the same batches.
+
+    Each user's pending sightings are a hash of IP to time and the users with pending sightings are a set. The worker
+    that takes a user out of the set reads and deletes its hash in one transaction. Only one worker per interval gets
+    to write the batch that is due on time.
+    """
+
+    prefix = "ctfd_tracking:"
+
+    def __init__(self, batch_size=100, interval=5):
+        super(RedisTrackingBuffer, self).__init__(
+            batch_size=batch_size, interval=interval
+        )
+        self.client = cache.cache._write_client
+        self.pending_key = self.prefix + "pending"
+        self.flushing_key = self.prefix + "flushing"
+
+    def _user_key(self, user_id):
+        return "{prefix}user:{user_id}".format(prefix=self.prefix, user_id=user_id)
+
+    def record(self, user_id, ip):
+        pipe = self.client.pipeline()
+        pipe.hset(self._user_key(user_id), ip, time.time())
+        pipe.sadd(self.pending_key, user_id)
+        pipe.scard(self.pending_key)
+        size = pipe.execute()[-1]
+
+        due = size >= self.batch_size
+        # Workers only ask Redis whether the timed write is theirs once their own clock says one is due
+        if not due and time.monotonic() - self.flushed >= self.interval:
+            self.flushed = time.monotonic()
+            due = self.client.set(self.flushing_key, 1, nx=True, ex=self.interval)
+        if due:
+            self.flush()
+
+    def recent_ips(self, user_id, since):
+        since = (since - datetime.datetime(1970, 1, 1)).total_seconds()
+        ips = self.client.hgetall(self._user_key(user_id))
+        return {ip.decode() for ip, seen in ips.items() if float(seen) >= since}
+
+    def _restore(self, entries):
+        pipe = self.client.pipeline()
+        for user_id, ips in entries.items():
+            for ip, date in ips.items():
+                # A sighting recorded since the batch was taken is newer
+                pipe.hsetnx(
+                    self._user_key(user_id),
+                    ip,
+                    (date - datetime.datetime(1970, 1, 1)).total_seconds(),
+                )
+            pipe.sadd(self.pending_key, user_id)
+        pipe.execute()
+
+    def _take(self):
+        size = self.client.scard(self.pending_key)
+        if not size:
+            return {}
+        user_ids = [
+            int(user_id) for user_id in self.client.spop(self.pending_key, size)
+        ]
+        pipe = self.client.pipeline()
+        for user_id in user_ids:
+            pipe.hgetall(self._user_key(user_id))
+            pipe.delete(self._user_key(user_id))
+        results = pipe.execute()[::2]
+        return {
+            user_id: {
+                ip.decode(): datetime.datetime.utcfromtimestamp(float(seen))
+                for ip, seen in ips.items()
+            }
+            for user_id, ips in zip(user_ids, results)
+            if ips
+        }
@@ -1,20 +1,50 @@
 import datetime  # noqa: I001
 import re
+from functools import wraps
 
 from flask import abort
 from flask import current_app as app
 from flask import redirect, request, session, url_for
-
-from CTFd.cache import cache, clear_user_session
+from sqlalchemy import inspect
+
+from CTFd.cache import (
+    cache,
+    clear_request_cache,
+    clear_user_session,
+    depends_on,
+    near_cache,
+    request_cached,
+)
 from CTFd.constants.languages import Languages
 from CTFd.constants.teams import TeamAttrs
 from CTFd.constants.users import UserAttrs
-from CTFd.models import Fails, Teams, Tracking, Users, db
+from CTFd.models import Teams, Tracking, Users
 from CTFd.utils import get_config
+from CTFd.utils.modes import TEAMS_MODE
+from CTFd.utils.ratelimit import WRONG_SUBMISSIONS_INTERVAL, wrong_submissions_key
 from CTFd.utils.security.auth import logout_user
 from CTFd.utils.security.signing import hmac
 
 
+def _request_cached_instance(f):
+    """
+    request_cached() for functions returning a model instance. The instance is loaded again if the database session
+    it came from has been closed since, as its expired attributes could not be loaded any more.
+    """
+    cached = request_cached(f)
+
+    @wraps(f)
+    def wrapper():
+        instance = cached()
+        if instance is not None and inspect(instance).detached:
+            clear_request_cache()
+            instance = cached()
+        return instance
+
+    return wrapper
+
+
+@_request_cached_instance
 def get_current_user():
     if authed():
         user = Users.query.filter_by(id=session["id"]).first()
@@ -35,6 +65,7 @@ def get_current_user():
         return None
 
 
+@request_cached
 def get_current_user_attrs():
     if authed():
         try:
@@ -46,6 +77,8 @@ def get_current_user_attrs():
         return None
 
 
+@near_cache()
+@depends_on("users")
 @cache.memoize(timeout=300)
 def get_user_attrs(user_id):
     user = Users.query.filter_by(id=user_id).first()
@@ -57,31 +90,56 @@ def get_user_attrs(user_id):
     return None
 
 
-@cache.memoize(timeout=300)
+# Scores and places are looked up in the standings index on every call. It answers them without going through the
+# standings, so there is nothing worth caching per account.
+
+
+def _get_account_place(kind, account_id):
+    from CTFd.utils.config.visibility import scores_visible
+    from CTFd.utils.humanize.numbers import ordinalize
+    from CTFd.utils.scores import get_account_place
+
+    if scores_visible():
+        place = get_account_place(kind, account_id)
+        if place is not None:
+            return ordinalize(place)
+    return None
+
+
+def _get_user_score(user_id):
+    from CTFd.utils.config.visibility import scores_visible
+    from CTFd.utils.scores import get_account_score
+
+    if scores_visible():
+        return get_account_score("users", user_id)
+    return None
+
+
 def get_user_place(user_id):
-    user = Users.query.filter_by(id=user_id).first()
+    user = get_user_attrs(user_id=user_id)
     if user:
-        return user.account.place
+        if get_config("user_mode") == TEAMS_MODE:
+            return get_team_place(team_id=user.team_id)
+        return _get_account_place("users", user.id)
     return None
 
 
-@cache.memoize(timeout=300)
 def get_user_score(user_id):
-    user = Users.query.filter_by(id=user_id).first()
+    user = get_user_attrs(user_id=user_id)
     if user:
-        return user.account.score
+        if get_config("user_mode") == TEAMS_MODE:
+            return get_team_score(team_id=user.team_id)
+        return _get_user_score(user.id)
     return None
 
 
-@cache.memoize(timeout=300)
 def get_team_place(team_id):
-    team = Teams.query.filter_by(id=team_id).first()
+    team = get_team_attrs(team_id=team_id)
     if team:
-        return team.place
+        return _get_account_place("teams", team.id)
     return None
 
 
-@cache.memoize(timeout=300)
 def get_team_score(team_id):
     team = Teams.query.filter_by(id=team_id).first()
     if team:
@@ -89,6 +147,7 @@ def get_team_score(team_id):
     return None
 
 
+@_request_cached_instance
 def get_current_team():
     if authed():
         user = get_current_user()
@@ -97,6 +156,7 @@ def get_current_team():
         return None
 
 
+@request_cached
 def get_current_team_attrs():
     if authed():
         try:
@@ -109,6 +169,8 @@ def get_current_team_attrs():
     return None
 
 
+@near_cache()
+@depends_on("teams")
 @cache.memoize(timeout=300)
 def get_team_attrs(team_id):
     team = Teams.query.filter_by(id=team_id).first()
@@ -205,8 +267,20 @@ def get_current_user_recent_ips():
         return None
 
 
-@cache.memoize(timeout=300)
 def get_user_recent_ips(user_id):
+    """
+    IPs the user was seen with in the last hour, including the sightings that are still waiting in the tracking
+    buffer to be written to the database
+    """
+    hour_ago = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    return get_tracked_user_ips(user_id=user_id) | app.tracking_buffer.recent_ips(
+        user_id, since=hour_ago
+    )
+
+
+@depends_on("tracking")
+@cache.memoize(timeout=300)
+def get_tracked_user_ips(user_id):
     hour_ago = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
     addrs = (
         Tracking.query.with_entities(Tracking.ip.distinct())
@@ -218,15 +292,12 @@ def get_user_recent_ips(user_id):
 
 def get_wrong_submissions_per_minute(account_id):
     """
-    Get incorrect submissions per minute.
+    Get incorrect submissions per minute. Every Fails row counts towards the rate limiter as it is committed, so this
+    is read from its counters instead of the database.
 
     :param account_id:
     :return:
     """
-    one_min_ago = datetime.datetime.utcnow() + datetime.timedelta(minutes=-1)
-    fails = (
-        db.session.query(Fails)
-        .filter(Fails.account_id == account_id, Fails.date >= one_min_ago)
-        .all()
+    return app.rate_limiter.count(
+        wrong_submissions_key(account_id), interval=WRONG_SUBMISSIONS_INTERVAL
     )
-    return len(fails)
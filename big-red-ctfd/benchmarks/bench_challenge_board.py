@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+"""
+Challenge board benchmark
+
+Fills a SQLite database with challenges (a third of them behind prerequisites), tags and players with random solves,
+using the filesystem cache. It times how the challenge list used to be put together, with its uncached query for
+every challenge ID and tags serialized again, against laying a player's solves over the shared board. It then
+reports p50/p99 of whole GET /api/v1/challenges requests from many players.
+
+    python benchmarks/bench_challenge_board.py --challenges 300 --players 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_standings import populate  # noqa: E402
+
+from CTFd import create_app  # noqa: E402
+from CTFd.config import TestingConfig  # noqa: E402
+from CTFd.models import Challenges, Solves, Tags, Users, db  # noqa: E402
+from CTFd.schemas.tags import TagSchema  # noqa: E402
+from CTFd.utils.security.signing import hmac  # noqa: E402
+
+# CTFd.utils.challenges and the challenge plugins can only be imported once the app exists
+
+
+def legacy_list(user_id):
+    """The body of ChallengeList.get before the board"""
+    from CTFd.plugins.challenges import get_chal_class
+    from CTFd.utils.challenges import (
+        anonymized_listing,
+        get_all_challenges,
+        get_solve_counts_for_challenges,
+        get_solve_ids_for_user_id,
+    )
+
+    solve_counts = get_solve_counts_for_challenges(admin=False)
+    user_solves = get_solve_ids_for_user_id(user_id=user_id)
+    response = []
+    tag_schema = TagSchema(view="user", many=True)
+    all_challenge_ids = {
+        c.id for c in Challenges.query.with_entities(Challenges.id).all()
+    }
+    for challenge in get_all_challenges(admin=False):
+        if challenge.requirements:
+            requirements = challenge.requirements.get("prerequisites", [])
+            prereqs = set(requirements).intersection(all_challenge_ids)
+            if not user_solves >= prereqs:
+                if challenge.requirements.get("anonymize"):
+                    response.append(anonymized_listing(challenge.id))
+                continue
+        challenge_type = get_chal_class(challenge.type)
+        response.append(
+            {
+                "id": challenge.id,
+                "type": challenge_type.name,
+                "name": challenge.name,
+                "value": challenge.value,
+                "solves": solve_counts.get(challenge.id, 0),
+                "solved_by_me": challenge.id in user_solves,
+                "category": challenge.category,
+                "tags": tag_schema.dump(challenge.tags).data,
+                "template": challenge_type.templates["view"],
+                "script": challenge_type.scripts["view"],
+            }
+        )
+    return response
+
+
+def board_list(user_id):
+    """The body of ChallengeList.get now"""
+    from CTFd.utils.challenges import (
+        anonymized_listing,
+        get_challenge_board,
+        get_solve_counts_for_challenges,
+        get_solve_ids_for_user_id,
+    )
+
+    solve_counts = get_solve_counts_for_challenges(admin=False)
+    user_solves = get_solve_ids_for_user_id(user_id=user_id)
+    response = []
+    for entry in get_challenge_board(admin=False):
+        if not user_solves >= entry.prerequisites:
+            if entry.anonymize:
+                response.append(anonymized_listing(entry.id))
+            continue
+        listing = dict(entry.listing)
+        listing["solves"] = solve_counts.get(entry.id, 0)
+        listing["solved_by_me"] = entry.id in user_solves
+        response.append(listing)
+    return response
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (
+        samples[len(samples) // 2] * 1000,
+        samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--challenges", type=int, default=300)
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--solves", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+
+    class BenchConfig(TestingConfig):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(directory, "board.db")
+        CACHE_TYPE = "filesystem"
+        CACHE_DIR = os.path.join(directory, "cache")
+        CACHE_THRESHOLD = 0
+
+    rng = random.Random(0)
+    app = create_app(BenchConfig)
+    with app.app_context():
+        populate(args.players, args.challenges, args.players * args.solves)
+        # Every third challenge requires two earlier ones, every other one of those anonymized
+        for challenge in Challenges.query.order_by(Challenges.id):
+            challenge.category = f"cat{challenge.id % 10}"
+            if challenge.id > 2 and challenge.id % 3 == 0:
+                challenge.requirements = {
+                    "prerequisites": rng.sample(range(1, challenge.id), 2),
+                    "anonymize": challenge.id % 2 == 0,
+                }
+            db.session.add(
+                Tags(challenge_id=challenge.id, value=f"tag{challenge.id % 7}")
+            )
+            db.session.add(
+                Tags(challenge_id=challenge.id, value=f"tag{challenge.id % 11}")
+            )
+        Users.query.update({"password": "x", "type": "user", "verified": True})
+        db.session.commit()
+
+        client = app.test_client()
+        client.get("/setup")
+        with client.session_transaction() as sess:
+            setup = {
+                "ctf_name": "Bench",
+                "ctf_description": "",
+                "name": "admin",
+                "email": "admin@examplectf.com",
+                "password": "password",
+                "user_mode": "users",
+                "ctf_theme": "core",
+                "nonce": sess.get("nonce"),
+            }
+        client.post("/setup", data=setup)
+        users = Users.query.filter(Users.type == "user").all()
+        print(
+            f"{args.challenges} challenges, {args.players} players, "
+            f"{Solves.query.count()} solves"
+        )
+
+        players = rng.sample(users, min(200, len(users)))
+        clients = []
+        for user in players:
+            player = app.test_client()
+            with player.session_transaction() as sess:
+                sess["id"] = user.id
+                sess["nonce"] = "nonce"
+                sess["hash"] = hmac(user.password)
+            clients.append(player)
+        player_ids = [user.id for user in players]
+        db.session.expunge_all()
+
+        for name, handler in (("legacy list", legacy_list), ("board", board_list)):
+            samples = []
+            with app.test_request_context("/api/v1/challenges"):
+                for user_id in player_ids:
+                    handler(user_id)
+                for i in range(args.requests):
+                    started = time.perf_counter()
+                    handler(player_ids[i % len(player_ids)])
+                    samples.append(time.perf_counter() - started)
+            p50, p99 = percentiles(samples)
+            print(f"  {name:<34} p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+
+        samples = []
+        for player in clients:
+            assert player.get("/api/v1/challenges").status_code == 200
+        for i in range(args.requests):
+            started = time.perf_counter()
+            clients[i % len(clients)].get("/api/v1/challenges")
+            samples.append(time.perf_counter() - started)
+        p50, p99 = percentiles(samples)
+        print(
+            f"  GET /api/v1/challenges            p50 {p50:7.2f} ms  p99 {p99:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
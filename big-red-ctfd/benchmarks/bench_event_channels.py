@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Event channel load test
+
+Connects N simulated players as greenlets, each subscribed to "ctf", their user:<id> channel and the team:<id>
+channel of a team of --team-size. It then measures how long it takes until everyone who should get an event has it,
+for team events, user events and broadcasts. Only the recipients of a targeted event are woken, so its latency
+should stay flat as the number of connected players grows.
+
+    python benchmarks/bench_event_channels.py --subscribers 1000 5000 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gevent import joinall, sleep, spawn  # noqa: E402
+
+from CTFd.utils.events import EventManager, team_channel, user_channel  # noqa: E402
+
+
+def run(subscribers, team_size, publishes):
+    manager = EventManager()
+    received = [0]
+
+    def player(user_id):
+        channels = ["ctf", user_channel(user_id), team_channel(user_id // team_size)]
+        for event in manager.subscribe(channels=channels):
+            str(event)
+            if event.type != "ping":
+                received[0] += 1
+
+    players = [spawn(player, user_id) for user_id in range(subscribers)]
+    sleep(0)
+
+    def measure(channel, recipients):
+        latencies = []
+        for i in range(publishes):
+            expected = received[0] + recipients
+            started = time.perf_counter()
+            assert (
+                manager.publish(data={"n": i}, type="event", channel=channel(i))
+                == recipients
+            )
+            while received[0] < expected:
+                sleep(0)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        return latencies[len(latencies) // 2]
+
+    teams = subscribers // team_size
+    results = {
+        "user event": measure(lambda i: user_channel(i * 7 % subscribers), 1),
+        "team event": measure(lambda i: team_channel(i * 7 % teams), team_size),
+        "broadcast": measure(lambda i: "ctf", subscribers),
+    }
+
+    for p in players:
+        p.kill(block=False)
+    joinall(players)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--subscribers", type=int, nargs="+", default=[1000, 5000, 10000]
+    )
+    parser.add_argument("--team-size", type=int, default=4)
+    parser.add_argument("--publishes", type=int, default=50)
+    args = parser.parse_args()
+
+    for subscribers in args.subscribers:
+        print(f"{subscribers} subscribers, teams of {args.team_size}")
+        for name, median in run(subscribers, args.team_size, args.publishes).items():
+            print(f"  {name:<12} median {median * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
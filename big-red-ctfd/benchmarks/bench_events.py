@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+Server-Sent Events benchmark
+
+Connects N subscribers as greenlets and measures how long a publish takes until every subscriber has the serialized
+event, and how much memory each connected subscriber holds. The ring buffer broadcaster is compared against the
+queue per client that EventManager used before, where publishing put the event into every client's queue and every
+client serialized it on its own.
+
+    python benchmarks/bench_events.py --subscribers 1000 10000
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gevent import joinall, sleep, spawn  # noqa: E402
+from gevent.queue import Queue  # noqa: E402
+
+from CTFd.utils.events import EventManager, ServerSentEvent  # noqa: E402
+
+DATA = {
+    "title": "Hint released",
+    "content": "A hint has been released for the crypto challenge",
+    "type": "toast",
+    "sound": True,
+}
+
+
+class QueueEventManager(object):
+    """The previous EventManager, with a queue per connected client"""
+
+    def __init__(self):
+        self.clients = {}
+
+    def publish(self, data, type=None, id=None, channel="ctf"):
+        message = ServerSentEvent(data, type=type, id=id).to_dict()
+        for client in list(self.clients.values()):
+            client[channel].put(message)
+        return len(self.clients)
+
+    def subscribe(self, channel="ctf"):
+        q = defaultdict(Queue)
+        self.clients[id(q)] = q
+        try:
+            yield ServerSentEvent(data="ping", type="ping")
+            while True:
+                message = q[channel].get()
+                yield ServerSentEvent(**message)
+        finally:
+            del self.clients[id(q)]
+
+
+def run(manager, subscribers, publishes):
+    received = [0]
+
+    def client():
+        for event in manager.subscribe():
+            # Stands in for writing the event to the response
+            str(event)
+            if event.type == "notification":
+                received[0] += 1
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    clients = [spawn(client) for _ in range(subscribers)]
+    sleep(0)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    memory = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    latencies = []
+    for _ in range(publishes):
+        expected = received[0] + subscribers
+        started = time.perf_counter()
+        manager.publish(data=DATA, type="notification")
+        while received[0] < expected:
+            sleep(0)
+        latencies.append(time.perf_counter() - started)
+
+    for c in clients:
+        c.kill(block=False)
+    joinall(clients)
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[-1], memory / subscribers
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--publishes", type=int, default=20)
+    args = parser.parse_args()
+
+    for subscribers in args.subscribers:
+        print(f"{subscribers} subscribers, {args.publishes} publishes")
+        for name, manager in (
+            ("queue per client", QueueEventManager()),
+            ("ring buffer", EventManager()),
+        ):
+            median, worst, memory = run(manager, subscribers, args.publishes)
+            print(
+                f"  {name:<18} median {median * 1000:8.2f} ms  "
+                f"max {worst * 1000:8.2f} ms  {memory / 1024:6.2f} KiB/client"
+            )
+
+
+if __name__ == "__main__":
+    main()
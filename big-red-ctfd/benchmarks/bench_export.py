@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Export memory benchmark
+
+Fills a SQLite database with N submissions and exports it, once with the streaming exporter and once the way
+export_ctf() used to: loading every table, wrapping all of its rows in one dict and dumping that to a single string
+before writing it to the zip. Each export runs in a fresh process so that its peak RSS can be compared.
+
+    python benchmarks/bench_export.py --submissions 5000000
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess  # nosec B404
+import sys
+import tempfile
+import time
+import zipfile
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dataset  # noqa: E402
+
+from CTFd import create_app  # noqa: E402
+from CTFd.config import TestingConfig  # noqa: E402
+from CTFd.models import Challenges, Submissions, Users, db  # noqa: E402
+from CTFd.utils import get_app_config  # noqa: E402
+from CTFd.utils.exports import export_ctf  # noqa: E402
+from CTFd.utils.exports.serializers import JSONEncoder  # noqa: E402
+
+BATCH = 100000
+
+
+def legacy_export():
+    """export_ctf() before rows were streamed, without the uploads"""
+    side_db = dataset.connect(get_app_config("SQLALCHEMY_DATABASE_URI"))
+    backup = tempfile.NamedTemporaryFile()
+    backup_zip = zipfile.ZipFile(backup, "w")
+    for table in side_db.tables:
+        rows = list(side_db[table].all())
+        if rows:
+            result = OrderedDict(
+                [("count", len(rows)), ("results", rows), ("meta", {})]
+            )
+            data = json.dumps(result, cls=JSONEncoder, separators=(",", ":"))
+            backup_zip.writestr("db/{}.json".format(table), data.encode("utf-8"))
+    backup_zip.close()
+    backup.seek(0)
+    side_db.close()
+    return backup
+
+
+def populate(submissions):
+    db.session.execute(
+        Users.__table__.insert(),
+        [{"id": 1, "name": "user1", "email": "user1@examplectf.com"}],
+    )
+    db.session.execute(
+        Challenges.__table__.insert(),
+        [{"id": 1, "name": "chal1", "value": 100, "type": "standard"}],
+    )
+    start = datetime(2017, 10, 3)
+    for offset in range(0, submissions, BATCH):
+        db.session.execute(
+            Submissions.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "user_id": 1,
+                    "challenge_id": 1,
+                    "ip": "127.0.0.1",
+                    "provided": "flag{%d}" % i,
+                    "type": "incorrect",
+                    "date": start + timedelta(seconds=i),
+                }
+                for i in range(offset + 1, min(offset + BATCH, submissions) + 1)
+            ],
+        )
+        db.session.commit()
+
+
+def config(path):
+    class BenchConfig(TestingConfig):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + path
+
+    return BenchConfig
+
+
+def run(path, mode):
+    app = create_app(config(path))
+    with app.app_context():
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        backup = export_ctf() if mode == "streaming" else legacy_export()
+        elapsed = time.perf_counter() - started
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        size = os.fstat(backup.fileno()).st_size
+    print(
+        f"  {mode:<10} {elapsed:8.1f} s  peak RSS +{(peak - baseline) / 1024:8.1f} MiB  "
+        f"zip {size / 1024 / 1024:8.1f} MiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--submissions", type=int, default=1000000)
+    parser.add_argument("--database")
+    parser.add_argument("--mode", choices=("streaming", "legacy"))
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args.database, args.mode)
+        return
+
+    path = os.path.join(tempfile.mkdtemp(), "export.db")
+    app = create_app(config(path))
+    with app.app_context():
+        populate(args.submissions)
+    print(f"{args.submissions} submissions")
+    for mode in ("streaming", "legacy"):
+        subprocess.run(  # nosec B603
+            [sys.executable, __file__, "--database", path, "--mode", mode],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""
+Flag matching benchmark
+
+Fills a SQLite database with challenges that each have a static and a regex flag, using the filesystem cache. It
+counts how many submissions a single worker checks per second the way BaseChallenge.attempt used to (every flag read
+from the database, regexes compiled through the 512 entry cache inside `re`, static flags compared character by
+character) against the cached flags and compiled regexes it uses now.
+
+    python benchmarks/bench_flag_matching.py --challenges 1000 --submissions 20000
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CTFd import create_app  # noqa: E402
+from CTFd.config import TestingConfig  # noqa: E402
+from CTFd.models import Challenges, Flags, db  # noqa: E402
+from CTFd.plugins.challenges import CTFdStandardChallenge  # noqa: E402
+
+
+class Submission(object):
+    """Just enough of a request for BaseChallenge.attempt()"""
+
+    form = None
+
+    def __init__(self, submission):
+        self.data = {"submission": submission}
+
+    def get_json(self):
+        return self.data
+
+
+def legacy_attempt(challenge, request):
+    """BaseChallenge.attempt and the flag classes before the flag cache"""
+    submission = request.get_json()["submission"].strip()
+    for flag in Flags.query.filter_by(challenge_id=challenge.id).all():
+        if flag.type == "static":
+            saved, provided = flag.content, submission
+            if flag.data == "case_insensitive":
+                saved, provided = saved.lower(), provided.lower()
+            if len(saved) != len(provided):
+                continue
+            result = 0
+            for x, y in zip(saved, provided):
+                result |= ord(x) ^ ord(y)
+            if result == 0:
+                return True, "Correct"
+        else:
+            flags = re.IGNORECASE if flag.data == "case_insensitive" else 0
+            res = re.match(flag.content, submission, flags)
+            if res and res.group() == submission:
+                return True, "Correct"
+    return False, "Incorrect"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--challenges", type=int, default=1000)
+    parser.add_argument("--submissions", type=int, default=20000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+
+    class BenchConfig(TestingConfig):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(directory, "flags.db")
+        CACHE_TYPE = "filesystem"
+        CACHE_DIR = os.path.join(directory, "cache")
+        CACHE_THRESHOLD = 0
+
+    rng = random.Random(0)
+    app = create_app(BenchConfig)
+    with app.app_context():
+        for i in range(args.challenges):
+            challenge = Challenges(name=f"chal{i}", value=100, category="bench")
+            db.session.add(challenge)
+            db.session.flush()
+            db.session.add(
+                Flags(
+                    challenge_id=challenge.id,
+                    type="static",
+                    content=f"flag{{static_{i}_{'x' * 32}}}",
+                    data="case_insensitive" if i % 2 else None,
+                )
+            )
+            db.session.add(
+                Flags(
+                    challenge_id=challenge.id,
+                    type="regex",
+                    content=rf"flag\{{regex_{i}_[0-9a-f]{{8}}\}}",
+                )
+            )
+        db.session.commit()
+        challenges = Challenges.query.all()
+        db.session.expunge_all()
+
+        # Mostly wrong guesses, like a real CTF gets
+        submissions = []
+        for _ in range(args.submissions):
+            challenge = rng.choice(challenges)
+            i = challenge.id - 1
+            guess = rng.random()
+            if guess < 0.1:
+                flag = f"flag{{static_{i}_{'x' * 32}}}"
+            elif guess < 0.2:
+                flag = f"flag{{regex_{i}_{rng.getrandbits(32):08x}}}"
+            else:
+                flag = f"flag{{guess_{rng.getrandbits(64):x}}}"
+            submissions.append((challenge, Submission(flag)))
+
+        print(
+            f"{args.challenges} challenges with a static and a regex flag, "
+            f"{args.submissions} submissions"
+        )
+        results = {}
+        for name, attempt in (
+            ("legacy attempt", legacy_attempt),
+            ("cached flags", CTFdStandardChallenge.attempt),
+        ):
+            with app.test_request_context("/api/v1/challenges/attempt"):
+                for challenge, request in submissions[: args.challenges]:
+                    attempt(challenge, request)
+                started = time.perf_counter()
+                results[name] = [
+                    attempt(challenge, request)[0] for challenge, request in submissions
+                ]
+                elapsed = time.perf_counter() - started
+            print(f"  {name:<16} {args.submissions / elapsed:10.0f} submissions/s")
+        assert results["legacy attempt"] == results["cached flags"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Import benchmark
+
+Exports a SQLite database with N submissions and times import_ctf() on it. For comparison the submissions are also
+inserted the way import_ctf() used to: loading the whole member with json.loads and then, for every row, setting the
+import status, inserting it on its own and committing. Only the submissions table is timed for the old loop, so it
+understates how long the whole import used to take.
+
+    python benchmarks/bench_import.py --submissions 1000000
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dataset  # noqa: E402
+from bench_export import config, populate  # noqa: E402
+from sqlalchemy.sql import sqltypes  # noqa: E402
+
+from CTFd import create_app  # noqa: E402
+from CTFd.models import Submissions, db, get_class_by_tablename  # noqa: E402
+from CTFd.utils import get_app_config, string_types  # noqa: E402
+from CTFd.utils.exports import export_ctf, import_ctf, set_import_status  # noqa: E402
+
+
+def legacy_insert(backup, member):
+    """The insertion loop import_ctf() ran for every member before it was batched"""
+    side_db = dataset.connect(get_app_config("SQLALCHEMY_DATABASE_URI"))
+    table = side_db[member[3:-5]]
+    saved = json.loads(zipfile.ZipFile(backup).open(member).read())
+    count = len(saved["results"])
+    for i, entry in enumerate(saved["results"]):
+        set_import_status(f"inserting {member} {i}/{count}", skip_print=True)
+        direct_table = get_class_by_tablename(table.name)
+        for k, v in entry.items():
+            if isinstance(v, string_types):
+                try:
+                    is_dt_column = (
+                        type(getattr(direct_table, k).type) == sqltypes.DateTime
+                    )
+                except AttributeError:
+                    is_dt_column = False
+                if is_dt_column:
+                    match = re.match(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}", v)
+                    if match:
+                        entry[k] = datetime.datetime.strptime(v, "%Y-%m-%dT%H:%M:%S")
+        table.insert(entry)
+        db.session.commit()
+    side_db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--submissions", type=int, default=100000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    backup = os.path.join(directory, "backup.zip")
+    app = create_app(config(os.path.join(directory, "export.db")))
+    with app.app_context():
+        populate(args.submissions)
+        with open(backup, "wb") as f:
+            f.write(export_ctf().read())
+    print(f"{args.submissions} submissions")
+
+    app = create_app(config(os.path.join(directory, "import.db")))
+    with app.app_context():
+        started = time.perf_counter()
+        import_ctf(backup)
+        elapsed = time.perf_counter() - started
+        assert Submissions.query.count() == args.submissions
+        print(f"  import_ctf()                      {elapsed:8.1f} s")
+
+        Submissions.query.delete()
+        db.session.commit()
+        started = time.perf_counter()
+        legacy_insert(backup, "db/submissions.json")
+        elapsed = time.perf_counter() - started
+        print(f"  row by row, submissions only      {elapsed:8.1f} s")
+
+
+if __name__ == "__main__":
+    main()
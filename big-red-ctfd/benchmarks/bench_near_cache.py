@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Near cache benchmark
+
+Logs a user in on a CTF using the filesystem cache, the default without Redis, and counts how many times each page
+goes to the shared cache with the near caches in front of get_config(), get_user_attrs() and get_team_attrs() turned
+off and on. Every call into the cache backend is a round trip to Redis or a file open plus unpickle.
+
+    python benchmarks/bench_near_cache.py --challenges 50
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CTFd import create_app  # noqa: E402
+from CTFd.cache import _near_caches, cache  # noqa: E402
+from CTFd.config import TestingConfig  # noqa: E402
+from CTFd.models import Challenges, Flags, Users, db  # noqa: E402
+
+URLS = ("/challenges", "/api/v1/challenges", "/scoreboard", "/api/v1/users/me")
+
+BACKEND_CALLS = ("get", "get_many", "set", "set_many", "add", "delete", "has")
+
+
+def count_backend_calls(backend):
+    """Wrap the backend methods that reach the shared cache and return the counter they add to"""
+    calls = Counter()
+    for name in BACKEND_CALLS:
+        method = getattr(backend, name)
+
+        def counted(*args, _name=name, _method=method, **kwargs):
+            calls[_name] += 1
+            return _method(*args, **kwargs)
+
+        setattr(backend, name, counted)
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--challenges", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+
+    class BenchConfig(TestingConfig):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(directory, "near.db")
+        CACHE_TYPE = "filesystem"
+        CACHE_DIR = os.path.join(directory, "cache")
+        CACHE_THRESHOLD = 0
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        client = app.test_client()
+        client.get("/setup")
+        with client.session_transaction() as sess:
+            setup = {
+                "ctf_name": "Bench",
+                "ctf_description": "",
+                "name": "admin",
+                "email": "admin@examplectf.com",
+                "password": "password",
+                "user_mode": "users",
+                "ctf_theme": "core",
+                "nonce": sess.get("nonce"),
+            }
+        client.post("/setup", data=setup)
+
+        for i in range(args.challenges):
+            challenge = Challenges(name=f"chal{i}", value=100, category="bench")
+            db.session.add(challenge)
+            db.session.flush()
+            db.session.add(Flags(challenge_id=challenge.id, content="flag"))
+        db.session.add(Users(name="user", email="user@examplectf.com", password="pw"))
+        db.session.commit()
+
+        client = app.test_client()
+        client.get("/login")
+        with client.session_transaction() as sess:
+            nonce = sess.get("nonce")
+        client.post("/login", data={"name": "user", "password": "pw", "nonce": nonce})
+
+        calls = count_backend_calls(cache.cache)
+        print(f"{args.challenges} challenges, cache round trips per request")
+        for enabled in (False, True):
+            timeout = 5 if enabled else 0
+            for near in _near_caches.values():
+                near.timeout = timeout
+                near.clear()
+            print(f"  near caches {'on' if enabled else 'off'}")
+            for url in URLS:
+                # Warm up so both runs start from a populated shared cache
+                assert client.get(url).status_code == 200
+                calls.clear()
+                started = time.perf_counter()
+                for _ in range(args.repeat):
+                    client.get(url)
+                elapsed = (time.perf_counter() - started) / args.repeat
+                trips = sum(calls.values()) / args.repeat
+                print(f"    {url:<22} {trips:6.1f} trips  {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Scoreboard graph benchmark
+
+Fills a SQLite database with N solves spread over the accounts and times the data behind the top 50 scoreboard
+graph: the way get_scoreboard_detail() used to build it, loading every solve with its challenge one at a time, the
+detail as it is built now, and the columnar series from get_scoreboard_series() with and without downsampling.
+
+    python benchmarks/bench_scoreboard_series.py --solves 100000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_standings import populate, timed  # noqa: E402
+
+from CTFd import create_app  # noqa: E402
+from CTFd.config import TestingConfig  # noqa: E402
+from CTFd.models import Solves, db  # noqa: E402
+from CTFd.utils import set_config  # noqa: E402
+from CTFd.utils.dates import isoformat  # noqa: E402
+from CTFd.utils.scoreboard import (  # noqa: E402
+    get_scoreboard_detail,
+    get_scoreboard_series,
+)
+from CTFd.utils.scores import get_standings  # noqa: E402
+
+
+def legacy_detail(count):
+    """The solves half of get_scoreboard_detail() before it joined the challenge values"""
+    standings = get_standings(count=count)
+    account_ids = [x.account_id for x in standings]
+    solves_mapper = defaultdict(list)
+    for solve in Solves.query.filter(Solves.account_id.in_(account_ids)).all():
+        solves_mapper[solve.account_id].append(
+            {
+                "challenge_id": solve.challenge_id,
+                "account_id": solve.account_id,
+                "team_id": solve.team_id,
+                "user_id": solve.user_id,
+                "value": solve.challenge.value,
+                "date": isoformat(solve.date),
+            }
+        )
+    for account_id in solves_mapper:
+        solves_mapper[account_id] = sorted(
+            solves_mapper[account_id], key=lambda k: k["date"]
+        )
+    db.session.expunge_all()
+    return solves_mapper
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--challenges", type=int, default=1000)
+    parser.add_argument("--solves", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    args.solves = min(args.solves, args.accounts * args.challenges)
+
+    class BenchConfig(TestingConfig):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(
+            tempfile.mkdtemp(), "series.db"
+        )
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        set_config("user_mode", "users")
+        populate(args.accounts, args.challenges, args.solves)
+        top = Solves.query.filter(
+            Solves.account_id.in_([x.account_id for x in get_standings(count=50)])
+        ).count()
+        print(
+            f"{args.accounts} accounts, {args.challenges} challenges, {args.solves} solves, "
+            f"{top} of them by the top 50"
+        )
+
+        def size(response):
+            return len(json.dumps(response)) / 1024 / 1024
+
+        legacy = timed(lambda: legacy_detail(50), args.repeat)
+        print(f"  lazy loaded detail            {legacy * 1000:10.1f} ms")
+
+        detail = timed(lambda: get_scoreboard_detail.uncached(50), args.repeat)
+        print(
+            f"  joined detail                 {detail * 1000:10.1f} ms  "
+            f"{size(get_scoreboard_detail.uncached(50)):6.1f} MiB"
+        )
+
+        for points in (None, 500):
+            series = timed(
+                lambda points=points: get_scoreboard_series.uncached(50, points=points),
+                args.repeat,
+            )
+            response = get_scoreboard_series.uncached(50, points=points)
+            print(
+                f"  series, points={str(points):<5}        {series * 1000:10.1f} ms  "
+                f"{size(response):6.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Standings benchmark
+
+Compares ranking every account from scratch with the UNION ALL over all solves and awards that get_standings() used
+to run on every cache miss, against reading the standings index after recording one more solve.
+
+    python benchmarks/bench_standings.py --accounts 10000 --solves 500000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.sql.expression import union_all  # noqa: E402
+
+from CTFd import create_app  # noqa: E402
+from CTFd.cache import clear_standings  # noqa: E402
+from CTFd.config import TestingConfig  # noqa: E402
+from CTFd.models import Challenges, Solves, Submissions, Users, db  # noqa: E402
+from CTFd.utils import set_config  # noqa: E402
+from CTFd.utils.scores import get_standings  # noqa: E402
+
+
+def union_standings():
+    """The query get_standings() ran before the standings index (no awards are generated, so only solves)"""
+    scores = (
+        db.session.query(
+            Solves.account_id.label("account_id"),
+            db.func.sum(Challenges.value).label("score"),
+            db.func.max(Solves.id).label("id"),
+            db.func.max(Solves.date).label("date"),
+        )
+        .join(Challenges)
+        .filter(Challenges.value != 0)
+        .group_by(Solves.account_id)
+    )
+    results = union_all(scores).alias("results")
+    sumscores = (
+        db.session.query(
+            results.columns.account_id,
+            db.func.sum(results.columns.score).label("score"),
+            db.func.max(results.columns.id).label("id"),
+            db.func.max(results.columns.date).label("date"),
+        )
+        .group_by(results.columns.account_id)
+        .subquery()
+    )
+    return (
+        db.session.query(Users.id, Users.name, sumscores.columns.score)
+        .join(sumscores, Users.id == sumscores.columns.account_id)
+        .filter(Users.banned == False, Users.hidden == False)  # noqa: E712
+        .order_by(
+            sumscores.columns.score.desc(),
+            sumscores.columns.date.asc(),
+            sumscores.columns.id.asc(),
+        )
+        .all()
+    )
+
+
+def populate(accounts, challenges, solves, seed=1):
+    rng = random.Random(seed)
+    db.session.execute(
+        Users.__table__.insert(),
+        [
+            {"id": i, "name": f"user{i}", "email": f"user{i}@examplectf.com"}
+            for i in range(1, accounts + 1)
+        ],
+    )
+    db.session.execute(
+        Challenges.__table__.insert(),
+        [
+            {
+                "id": i,
+                "name": f"chal{i}",
+                "value": rng.choice((50, 100, 200, 500)),
+                "type": "standard",
+                "state": "visible",
+            }
+            for i in range(1, challenges + 1)
+        ],
+    )
+    pairs = set()
+    while len(pairs) < solves:
+        pairs.add((rng.randint(1, accounts), rng.randint(1, challenges)))
+    start = datetime(2017, 10, 3)
+    rows = [
+        {
+            "id": i,
+            "user_id": user_id,
+            "challenge_id": challenge_id,
+            "date": start + timedelta(seconds=i),
+        }
+        for i, (user_id, challenge_id) in enumerate(sorted(pairs), start=1)
+    ]
+    db.session.execute(
+        Submissions.__table__.insert(),
+        [dict(row, ip="127.0.0.1", provided="flag", type="correct") for row in rows],
+    )
+    db.session.execute(Solves.__table__.insert(), rows)
+    db.session.commit()
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, default=2000)
+    parser.add_argument("--challenges", type=int, default=100)
+    parser.add_argument("--solves", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    args.solves = min(args.solves, args.accounts * args.challenges)
+
+    class BenchConfig(TestingConfig):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(
+            tempfile.mkdtemp(), "standings.db"
+        )
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        set_config("user_mode", "users")
+        populate(args.accounts, args.challenges, args.solves)
+        print(
+            f"{args.accounts} accounts, {args.challenges} challenges, {args.solves} solves"
+        )
+
+        full = timed(union_standings, args.repeat)
+        print(f"  UNION ALL ranking          {full * 1000:10.1f} ms")
+
+        rebuild = timed(app.standings_index.rebuild, args.repeat)
+        print(f"  index rebuild              {rebuild * 1000:10.1f} ms")
+
+        free = [
+            (u, c)
+            for u in range(1, args.accounts + 1)
+            for c in range(1, args.challenges + 1)
+        ]
+        taken = {(s.user_id, s.challenge_id) for s in Solves.query.all()}
+        free = iter([p for p in free if p not in taken])
+
+        def solve():
+            user_id, challenge_id = next(free)
+            db.session.add(
+                Solves(
+                    user_id=user_id,
+                    challenge_id=challenge_id,
+                    ip="127.0.0.1",
+                    provided="flag",
+                )
+            )
+            db.session.commit()
+
+        def solve_and_rank():
+            solve()
+            union_standings()
+
+        def solve_and_read():
+            solve()
+            clear_standings()
+            get_standings(count=10)
+
+        legacy = timed(solve_and_rank, args.repeat)
+        print(f"  solve + UNION ALL ranking  {legacy * 1000:10.1f} ms")
+        incremental = timed(solve_and_read, args.repeat)
+        print(f"  solve + top 10 from index  {incremental * 1000:10.1f} ms")
+
+        def rank_all():
+            clear_standings()
+            get_standings()
+
+        print(
+            f"  all standings from index   {timed(rank_all, args.repeat) * 1000:10.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
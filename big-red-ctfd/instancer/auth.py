@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+CTFd Auth Bridge
+Signs users in with their CTFd password, API token or CTFd session, caching verified identities
+"""
+
+import hashlib
+import hmac
+import io
+import json
+import pickle
+import secrets
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from passlib.hash import bcrypt_sha256
+
+from db import InstanceStore, UserRow
+
+# Where CTFd's CachingSessionInterface keeps sessions: Flask-Caching's default
+# key prefix followed by the interface's own "session" prefix and the sid
+CTFD_SESSION_KEY_PREFIX = 'flask_cache_session'
+
+
+def verify_ctfd_password(password: str, stored_hash: str) -> bool:
+    """Verify password against CTFd's bcrypt-sha256 hash using the same method as CTFd"""
+    try:
+        return bcrypt_sha256.verify(password, stored_hash)
+    except Exception as e:
+        print(f"Error verifying password: {e}")
+        return False
+
+
+def identity(user: UserRow) -> Dict:
+    return {
+        'id': user.id,
+        'username': user.name,
+        'email': user.email,
+        'type': user.type
+    }
+
+
+class IdentityCache:
+    """Thread-safe TTL cache of credential digest -> identity (or None for a rejected one).
+
+    Entries live `ttl` seconds, rejections only `negative_ttl`, and the
+    least recently used entry goes once `max_entries` is reached.
+    """
+
+    def __init__(self, ttl: float = 60, negative_ttl: float = 10, max_entries: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: 'OrderedDict[bytes, Tuple[float, Optional[Dict]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Tuple[bool, Optional[Dict]]:
+        """(hit, identity); a hit with identity None is a cached rejection"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: bytes, value: Optional[Dict]):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget_user(self, user_id: int):
+        """Drop every cached identity for a user (e.g. after a password change)"""
+        with self._lock:
+            for key in [k for k, (_, v) in self._entries.items() if v and v['id'] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class _StringUnpickler(pickle.Unpickler):
+    """Unpickler for Flask-Caching values that refuses to load any class"""
+
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"refusing to load {module}.{name}")
+
+
+class RedisSessionReader:
+    """Reads CTFd sessions out of the Redis cache CTFd is configured with (REDIS_URL).
+
+    CTFd stores each session as Flask's tagged JSON, which Flask-Caching
+    pickles behind a '!' marker; only plain strings are accepted here.
+    """
+
+    def __init__(self, url: str, key_prefix: str = CTFD_SESSION_KEY_PREFIX, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def __call__(self, sid: str) -> Optional[Dict]:
+        value = self.client.get(self.key_prefix + sid)
+        if value is None:
+            return None
+        if value.startswith(b'!'):
+            value = _StringUnpickler(io.BytesIO(value[1:])).load()
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        data = json.loads(value)
+        return data if isinstance(data, dict) else None
+
+
+class AuthBridge:
+    """Turns CTFd credentials into instancer identities without re-checking them every time.
+
+    Passwords are checked with bcrypt-sha256 (deliberately slow) and API
+    tokens and sessions need a database round trip, so every verdict is
+    cached under a keyed digest of the credential: bcrypt runs at most once
+    per credential per TTL window, and the plaintext is never kept.
+
+    Failed password logins are also counted per username and client
+    address; after `max_failures` within `failure_window` seconds further
+    attempts from that address are rejected without running bcrypt, so
+    guessing cannot pin the CPU, while the player can still log in from
+    their own address.
+
+    A CTFd session cookie is the sid signed with CTFd's SECRET_KEY. The
+    session itself holds the user id and an HMAC of the user's password
+    hash, which is checked the same way get_current_user() does so that a
+    password change in CTFd ends bridged sessions too.
+    """
+
+    def __init__(self, store: InstanceStore, secret_key: Optional[str] = None,
+                 session_reader: Optional[Callable[[str], Optional[Dict]]] = None,
+                 ttl: float = 60, negative_ttl: float = 10, max_entries: int = 10000,
+                 max_failures: int = 10, failure_window: float = 300,
+                 clock: Callable[[], float] = time.monotonic):
+        self.store = store
+        self.secret_key = secret_key
+        self.session_reader = session_reader
+        self.max_failures = max_failures
+        self.failure_window = failure_window
+        self.clock = clock
+        self.cache = IdentityCache(ttl, negative_ttl, max_entries, clock)
+        # Per-process key so cached digests are useless outside this process
+        self._digest_key = secrets.token_bytes(32)
+        self._failures: Dict[Tuple[str, Optional[str]], Deque[float]] = {}
+        self._inflight: Dict[bytes, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.counters = Counter()
+
+    def _digest(self, kind: str, *parts: str) -> bytes:
+        message = '\0'.join((kind,) + parts).encode('utf-8')
+        return hmac.new(self._digest_key, message, hashlib.sha256).digest()
+
+    def _cached(self, key: bytes, verify: Callable[[], Optional[Dict]]) -> Optional[Dict]:
+        """Cached verdict for a credential, verifying it once even under concurrent requests"""
+        while True:
+            hit, value = self.cache.get(key)
+            if hit:
+                self.counters['hits'] += 1
+                return value
+            with self._lock:
+                pending = self._inflight.get(key)
+                if pending is None:
+                    pending = self._inflight[key] = threading.Event()
+                    break
+            # Someone else is checking the same credential; use their verdict
+            pending.wait()
+
+        try:
+            self.counters['misses'] += 1
+            value = verify()
+            self.cache.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            pending.set()
+
+    # Passwords
+
+    def login(self, username: str, password: str, client_ip: Optional[str] = None) -> Optional[Dict]:
+        """Identity for a CTFd username and password, or None"""
+        # Checked before the verdict cache so a refusal is never cached for the other addresses
+        if self._throttled(username, client_ip):
+            self.counters['throttled'] += 1
+            return None
+
+        def verify():
+            try:
+                user = self.store.get_user_by_name(username)
+            except Exception as e:
+                print(f"Error authenticating user: {e}")
+                return None
+            if user is not None:
+                self.counters['bcrypt'] += 1
+                if verify_ctfd_password(password, user.password):
+                    return identity(user)
+            self._record_failure(username, client_ip)
+            return None
+
+        return self._cached(self._digest('password', username, password), verify)
+
+    def _throttled(self, username: str, client_ip: Optional[str]) -> bool:
+        key = (username, client_ip)
+        with self._lock:
+            failures = self._failures.get(key)
+            if not failures:
+                return False
+            while failures and failures[0] <= self.clock() - self.failure_window:
+                failures.popleft()
+            if not failures:
+                del self._failures[key]
+            return len(failures) >= self.max_failures
+
+    def _record_failure(self, username: str, client_ip: Optional[str]):
+        with self._lock:
+            self._failures.setdefault((username, client_ip), deque()).append(self.clock())
+
+    # CTFd API tokens
+
+    def from_token(self, token: str) -> Optional[Dict]:
+        """Identity for a CTFd API token (ctfd_...), or None if unknown or expired"""
+        if not token:
+            return None
+
+        def verify():
+            try:
+                user = self.store.get_user_by_token(token)
+            except Exception as e:
+                print(f"Error looking up API token: {e}")
+                return None
+            return identity(user) if user else None
+
+        return self._cached(self._digest('token', token), verify)
+
+    # CTFd sessions
+
+    def from_session_cookie(self, cookie: str) -> Optional[Dict]:
+        """Identity for a signed CTFd session cookie, or None"""
+        if not cookie or not self.secret_key or self.session_reader is None:
+            return None
+        return self._cached(self._digest('session', cookie), lambda: self._verify_session(cookie))
+
+    def _verify_session(self, cookie: str) -> Optional[Dict]:
+        from itsdangerous import BadSignature, Signer
+
+        try:
+            sid = Signer(self.secret_key).unsign(cookie).decode('utf-8')
+            data = self.session_reader(sid)
+            if not data or 'id' not in data:
+                return None
+            user = self.store.get_user_by_id(int(data['id']))
+        except BadSignature:
+            return None
+        except Exception as e:
+            print(f"Error reading CTFd session: {e}")
+            return None
+        if user is None:
+            return None
+
+        # Same check CTFd's get_current_user() makes: the session dies with the password
+        session_hash = data.get('hash')
+        if session_hash:
+            expected = hmac.new(self.secret_key.encode('utf-8'), user.password.encode('utf-8'),
+                                hashlib.sha1).hexdigest()
+            if not hmac.compare_digest(session_hash, expected):
+                return None
+        return identity(user)
+
+    def stats(self) -> Dict:
+        return {**self.counters, 'cached': len(self.cache)}
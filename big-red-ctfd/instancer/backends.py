@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+Container Backends
+Pluggable drivers that create and delete challenge containers for the instancer
+"""
+
+import base64
+import http.client
+import json
+import random
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, List, Optional, Union
+from urllib.parse import quote, urlencode
+
+# Normalized container states reported by every backend
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_STOPPED = 'stopped'
+STATUS_FAILED = 'failed'
+STATUS_MISSING = 'missing'
+
+# Tag every backend puts on the containers it creates
+MANAGED_TAG = ('created_by', 'challenge_instancer')
+
+
+class BackendError(Exception):
+    """A backend could not complete a container operation"""
+
+
+@dataclass(frozen=True)
+class ContainerSpec:
+    """What to run for one challenge instance"""
+    name: str
+    image: Optional[str]
+    port: int
+    tags: Dict[str, str] = field(default_factory=dict)
+    cpu: float = 0.1
+    memory_gb: float = 0.1
+
+
+@dataclass(frozen=True)
+class ContainerInfo:
+    """A container as seen by a backend"""
+    name: str
+    status: str
+    url: Optional[str] = None
+    tags: Dict[str, str] = field(default_factory=dict)
+
+
+class ContainerBackend(ABC):
+    """Interface the instancer uses to run challenge containers.
+
+    create() and delete() block until the operation is finished (or, for
+    delete(wait=False), has been accepted), so callers decide which thread
+    pays for the latency. The batch variants fan out over a bounded thread
+    pool by default; drivers with native async operations override them.
+    """
+
+    name = 'backend'
+
+    def url_for(self, spec: ContainerSpec) -> Optional[str]:
+        """URL the container will have, if it can be known before creation"""
+        return None
+
+    @abstractmethod
+    def create(self, spec: ContainerSpec) -> ContainerInfo:
+        """Start a container and return once it is running"""
+
+    @abstractmethod
+    def delete(self, name: str, wait: bool = True) -> None:
+        """Remove a container. Deleting one that does not exist is not an error."""
+
+    @abstractmethod
+    def status(self, name: str) -> ContainerInfo:
+        """Current state of a container (STATUS_MISSING if it does not exist)"""
+
+    @abstractmethod
+    def list(self, tags: Optional[Dict[str, str]] = None) -> List[ContainerInfo]:
+        """Containers created by the instancer, optionally filtered by tags"""
+
+    @abstractmethod
+    def retag(self, name: str, tags: Dict[str, str]) -> None:
+        """Replace a running container's tags. Backends whose labels are fixed at creation raise NotImplementedError."""
+
+    def create_many(self, specs: Iterable[ContainerSpec],
+                    max_workers: int = 8) -> Dict[str, Union[ContainerInfo, Exception]]:
+        """Create several containers, returning each one's info or the error it raised"""
+        return self._fan_out(self.create, {spec.name: spec for spec in specs}, max_workers)
+
+    def delete_many(self, names: Iterable[str], wait: bool = True,
+                    max_workers: int = 8) -> Dict[str, Optional[Exception]]:
+        """Delete several containers, returning None or the error for each"""
+        results = self._fan_out(lambda name: self.delete(name, wait=wait), {n: n for n in names}, max_workers)
+        return {name: (result if isinstance(result, Exception) else None) for name, result in results.items()}
+
+    @staticmethod
+    def _fan_out(fn, items: Dict, max_workers: int) -> Dict:
+        def call(item):
+            try:
+                return fn(item)
+            except Exception as e:
+                return e
+
+        if not items:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+            return dict(zip(items.keys(), pool.map(call, items.values())))
+
+
+def _matches(container_tags: Dict[str, str], tags: Optional[Dict[str, str]]) -> bool:
+    return all(container_tags.get(k) == v for k, v in (tags or {}).items())
+
+
+class AzureBackend(ContainerBackend):
+    """Azure Container Instances, one container group per instance"""
+
+    name = 'azure'
+
+    def __init__(self, config: Dict, credential=None, timeout: int = 300):
+        from azure.identity import DefaultAzureCredential
+        from azure.mgmt.containerinstance import ContainerInstanceManagementClient
+
+        self.config = config
+        self.timeout = timeout
+        self.client = ContainerInstanceManagementClient(
+            credential=credential or DefaultAzureCredential(),
+            subscription_id=config['subscription_id']
+        )
+
+    def url_for(self, spec: ContainerSpec) -> str:
+        fqdn = f"{spec.name}.{self.config['location'].lower().replace(' ', '')}.azurecontainer.io"
+        return f"http://{fqdn}:{spec.port}"
+
+    def _container_group(self, spec: ContainerSpec):
+        """Build the Azure Container Group configuration for a spec"""
+        from azure.mgmt.containerinstance.models import (
+            ContainerGroup, Container, ContainerGroupRestartPolicy,
+            ResourceRequirements, ResourceRequests, ContainerPort,
+            IpAddress, Port, OperatingSystemTypes, ImageRegistryCredential
+        )
+
+        container = Container(
+            name=spec.name,
+            image=spec.image,
+            resources=ResourceRequirements(
+                requests=ResourceRequests(memory_in_gb=spec.memory_gb, cpu=spec.cpu)
+            ),
+            ports=[ContainerPort(port=spec.port)]
+        )
+
+        # Container group with public IP and DNS
+        container_group = ContainerGroup(
+            location=self.config['location'],
+            containers=[container],
+            os_type=OperatingSystemTypes.linux,
+            restart_policy=ContainerGroupRestartPolicy.never,
+            ip_address=IpAddress(
+                type="Public",
+                ports=[Port(protocol="TCP", port=spec.port)],
+                dns_name_label=spec.name
+            ),
+            tags={'environment': 'ctf', MANAGED_TAG[0]: MANAGED_TAG[1], **spec.tags}
+        )
+
+        # Only add registry credentials for ACR images
+        acr_server = self.config.get('acr_server')
+        if acr_server and spec.image and acr_server in spec.image:
+            container_group.image_registry_credentials = [
+                ImageRegistryCredential(
+                    server=acr_server,
+                    username=self.config['acr_username'],
+                    password=self.config['acr_password']
+                )
+            ]
+
+        return container_group
+
+    def _begin_create(self, spec: ContainerSpec):
+        return self.client.container_groups.begin_create_or_update(
+            resource_group_name=self.config['resource_group'],
+            container_group_name=spec.name,
+            container_group=self._container_group(spec)
+        )
+
+    def _begin_delete(self, name: str):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            return self.client.container_groups.begin_delete(
+                resource_group_name=self.config['resource_group'],
+                container_group_name=name
+            )
+        except ResourceNotFoundError:
+            return None
+
+    def _wait(self, poller, what: str):
+        poller.result(timeout=self.timeout)
+        if not poller.done():
+            raise BackendError(f'{what} did not finish within {self.timeout}s')
+
+    def create(self, spec: ContainerSpec) -> ContainerInfo:
+        self._wait(self._begin_create(spec), f'Creating {spec.name}')
+        return ContainerInfo(spec.name, STATUS_RUNNING, self.url_for(spec), dict(spec.tags))
+
+    def delete(self, name: str, wait: bool = True) -> None:
+        poller = self._begin_delete(name)
+        if poller is not None and wait:
+            self._wait(poller, f'Deleting {name}')
+
+    def create_many(self, specs: Iterable[ContainerSpec],
+                    max_workers: int = 8) -> Dict[str, Union[ContainerInfo, Exception]]:
+        """Start every create first, then wait on the pollers, so Azure works on them in parallel"""
+        pollers, results = {}, {}
+        for spec in specs:
+            try:
+                pollers[spec.name] = (spec, self._begin_create(spec))
+            except Exception as e:
+                results[spec.name] = e
+        for name, (spec, poller) in pollers.items():
+            try:
+                self._wait(poller, f'Creating {name}')
+                results[name] = ContainerInfo(name, STATUS_RUNNING, self.url_for(spec), dict(spec.tags))
+            except Exception as e:
+                results[name] = e
+        return results
+
+    def delete_many(self, names: Iterable[str], wait: bool = True,
+                    max_workers: int = 8) -> Dict[str, Optional[Exception]]:
+        """Start every delete first, then wait on the pollers"""
+        pollers, results = {}, {}
+        for name in names:
+            try:
+                pollers[name] = self._begin_delete(name)
+                results[name] = None
+            except Exception as e:
+                results[name] = e
+        if wait:
+            for name, poller in pollers.items():
+                if poller is None:
+                    continue
+                try:
+                    self._wait(poller, f'Deleting {name}')
+                except Exception as e:
+                    results[name] = e
+        return results
+
+    def retag(self, name: str, tags: Dict[str, str]) -> None:
+        from azure.mgmt.containerinstance.models import Resource
+
+        self.client.container_groups.update(
+            resource_group_name=self.config['resource_group'],
+            container_group_name=name,
+            resource=Resource(tags={'environment': 'ctf', MANAGED_TAG[0]: MANAGED_TAG[1], **tags})
+        )
+
+    def _info(self, group) -> ContainerInfo:
+        state = (getattr(group, 'provisioning_state', None) or '').lower()
+        if group.instance_view is not None and group.instance_view.state:
+            state = group.instance_view.state.lower()
+        status = {
+            'running': STATUS_RUNNING, 'succeeded': STATUS_RUNNING,
+            'pending': STATUS_PENDING, 'creating': STATUS_PENDING, 'updating': STATUS_PENDING,
+            'stopped': STATUS_STOPPED, 'terminated': STATUS_STOPPED,
+            'failed': STATUS_FAILED,
+        }.get(state, STATUS_PENDING)
+        fqdn = group.ip_address.fqdn if group.ip_address else None
+        port = group.ip_address.ports[0].port if group.ip_address and group.ip_address.ports else None
+        url = f"http://{fqdn}:{port}" if fqdn and port else None
+        return ContainerInfo(group.name, status, url, dict(group.tags or {}))
+
+    def status(self, name: str) -> ContainerInfo:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            group = self.client.container_groups.get(self.config['resource_group'], name)
+        except ResourceNotFoundError:
+            return ContainerInfo(name, STATUS_MISSING)
+        return self._info(group)
+
+    def list(self, tags: Optional[Dict[str, str]] = None) -> List[ContainerInfo]:
+        wanted = {MANAGED_TAG[0]: MANAGED_TAG[1], **(tags or {})}
+        return [
+            self._info(group)
+            for group in self.client.container_groups.list_by_resource_group(self.config['resource_group'])
+            if _matches(group.tags or {}, wanted)
+        ]
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP over the Docker daemon's unix socket"""
+
+    def __init__(self, socket_path: str, timeout: float = 60):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerBackend(ContainerBackend):
+    """Local Docker Engine, talked to directly over /var/run/docker.sock.
+
+    Each instance is one container with its challenge port published on a
+    random host port, so the URL is only known once it has started.
+    """
+
+    name = 'docker'
+    API_VERSION = 'v1.41'
+
+    def __init__(self, socket_path: str = '/var/run/docker.sock', public_host: str = 'localhost',
+                 registry_auth: Optional[Dict] = None, timeout: float = 120):
+        self.socket_path = socket_path
+        self.public_host = public_host
+        self.registry_auth = registry_auth
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, body: Optional[Dict] = None, headers: Optional[Dict] = None):
+        conn = _UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        try:
+            payload = json.dumps(body) if body is not None else None
+            all_headers = {'Content-Type': 'application/json', **(headers or {})}
+            conn.request(method, f'/{self.API_VERSION}{path}', body=payload, headers=all_headers)
+            response = conn.getresponse()
+            raw = response.read()
+        finally:
+            conn.close()
+        try:
+            data = json.loads(raw) if raw else None
+        except ValueError:
+            # Image pulls stream one JSON document per line
+            data = [json.loads(line) for line in raw.splitlines() if line.strip()]
+        return response.status, data
+
+    def _check(self, status: int, data, what: str, ok=(200, 201, 204, 304)):
+        if status not in ok:
+            message = data.get('message') if isinstance(data, dict) else data
+            raise BackendError(f'{what} failed ({status}): {message}')
+
+    def _pull(self, image: str):
+        headers = {}
+        if self.registry_auth:
+            headers['X-Registry-Auth'] = base64.urlsafe_b64encode(json.dumps(self.registry_auth).encode()).decode()
+        status, data = self._request('POST', f'/images/create?{urlencode({"fromImage": image})}', headers=headers)
+        self._check(status, data, f'Pulling {image}')
+        for event in data if isinstance(data, list) else []:
+            if 'error' in event:
+                raise BackendError(f"Pulling {image} failed: {event['error']}")
+
+    def create(self, spec: ContainerSpec) -> ContainerInfo:
+        port_key = f'{spec.port}/tcp'
+        body = {
+            'Image': spec.image,
+            'Labels': {MANAGED_TAG[0]: MANAGED_TAG[1], **spec.tags},
+            'ExposedPorts': {port_key: {}},
+            'HostConfig': {
+                'PortBindings': {port_key: [{'HostPort': ''}]},
+                'Memory': int(spec.memory_gb * 1024 ** 3),
+                'NanoCpus': int(spec.cpu * 1e9),
+            },
+        }
+        path = f'/containers/create?{urlencode({"name": spec.name})}'
+        status, data = self._request('POST', path, body)
+        if status == 404:
+            self._pull(spec.image)
+            status, data = self._request('POST', path, body)
+        self._check(status, data, f'Creating {spec.name}')
+
+        status, data = self._request('POST', f'/containers/{quote(spec.name)}/start')
+        self._check(status, data, f'Starting {spec.name}')
+        return self.status(spec.name)
+
+    def delete(self, name: str, wait: bool = True) -> None:
+        status, data = self._request('DELETE', f'/containers/{quote(name)}?force=1')
+        self._check(status, data, f'Deleting {name}', ok=(200, 204, 404))
+
+    def _info(self, name: str, state: str, labels: Dict, ports: Dict) -> ContainerInfo:
+        status = {
+            'running': STATUS_RUNNING, 'created': STATUS_PENDING, 'restarting': STATUS_PENDING,
+            'exited': STATUS_STOPPED, 'paused': STATUS_STOPPED, 'dead': STATUS_FAILED,
+        }.get(state, STATUS_PENDING)
+        url = None
+        for binding in (ports or {}).values():
+            if binding:
+                url = f"http://{self.public_host}:{binding[0]['HostPort']}"
+                break
+        return ContainerInfo(name, status, url, dict(labels or {}))
+
+    def status(self, name: str) -> ContainerInfo:
+        status, data = self._request('GET', f'/containers/{quote(name)}/json')
+        if status == 404:
+            return ContainerInfo(name, STATUS_MISSING)
+        self._check(status, data, f'Inspecting {name}')
+        return self._info(
+            data['Name'].lstrip('/'),
+            data['State']['Status'],
+            data['Config'].get('Labels'),
+            data['NetworkSettings'].get('Ports'),
+        )
+
+    def list(self, tags: Optional[Dict[str, str]] = None) -> List[ContainerInfo]:
+        wanted = {MANAGED_TAG[0]: MANAGED_TAG[1], **(tags or {})}
+        filters = json.dumps({'label': [f'{k}={v}' for k, v in wanted.items()]})
+        status, data = self._request('GET', f'/containers/json?{urlencode({"all": 1, "filters": filters})}')
+        self._check(status, data, 'Listing containers')
+        containers = []
+        for item in data:
+            ports = {}
+            for port in item.get('Ports', []):
+                if port.get('PublicPort'):
+                    ports.setdefault(f"{port['PrivatePort']}/tcp", []).append({'HostPort': str(port['PublicPort'])})
+            containers.append(self._info(item['Names'][0].lstrip('/'), item['State'], item.get('Labels'), ports))
+        return containers
+
+    def retag(self, name: str, tags: Dict[str, str]) -> None:
+        """Docker labels are fixed when a container is created. Handed-out pool containers keep pool=ready;
+        ChallengeInstancer.adopt_warm_pool() skips them while their instance is active."""
+        raise NotImplementedError('Docker cannot change the labels of a running container')
+
+
+class FakeBackend(ContainerBackend):
+    """In-process backend for tests, load tests and running without a cloud account.
+
+    Creation and deletion sleep for a configurable latency (plus uniform
+    jitter), and creation can be made to fail a fraction of the time.
+    """
+
+    name = 'fake'
+
+    def __init__(self, create_latency: float = 0.0, delete_latency: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0, url_template: str = 'http://{name}.fake.local:{port}',
+                 seed: Optional[int] = None):
+        self.create_latency = create_latency
+        self.delete_latency = delete_latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.url_template = url_template
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._containers: Dict[str, ContainerInfo] = {}
+        self.created = 0
+        self.deleted = 0
+        self.peak = 0
+
+    def _sleep(self, base: float):
+        with self._lock:
+            delay = base + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def url_for(self, spec: ContainerSpec) -> str:
+        return self.url_template.format(name=spec.name, port=spec.port)
+
+    def create(self, spec: ContainerSpec) -> ContainerInfo:
+        self._sleep(self.create_latency)
+        with self._lock:
+            if self.failure_rate and self._random.random() < self.failure_rate:
+                raise BackendError(f'Simulated failure creating {spec.name}')
+            info = ContainerInfo(spec.name, STATUS_RUNNING, self.url_for(spec), dict(spec.tags))
+            self._containers[spec.name] = info
+            self.created += 1
+            self.peak = max(self.peak, len(self._containers))
+        return info
+
+    def delete(self, name: str, wait: bool = True) -> None:
+        if wait:
+            self._sleep(self.delete_latency)
+        with self._lock:
+            if self._containers.pop(name, None) is not None:
+                self.deleted += 1
+
+    def status(self, name: str) -> ContainerInfo:
+        with self._lock:
+            return self._containers.get(name) or ContainerInfo(name, STATUS_MISSING)
+
+    def list(self, tags: Optional[Dict[str, str]] = None) -> List[ContainerInfo]:
+        with self._lock:
+            return [info for info in self._containers.values() if _matches(info.tags, tags)]
+
+    def retag(self, name: str, tags: Dict[str, str]) -> ContainerInfo:
+        """Replace a container's tags"""
+        with self._lock:
+            info = replace(self._containers[name], tags=dict(tags))
+            self._containers[name] = info
+            return info
+
+    @property
+    def running(self) -> int:
+        with self._lock:
+            return len(self._containers)
+
+
+def create_backend(kind: str, azure_config: Optional[Dict] = None, **options) -> ContainerBackend:
+    """Build a backend by name: 'azure', 'docker' or 'fake'"""
+    if kind == 'azure':
+        return AzureBackend(azure_config, **options)
+    if kind == 'docker':
+        return DockerBackend(**options)
+    if kind == 'fake':
+        return FakeBackend(**options)
+    raise ValueError(f"Unknown container backend: {kind}")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Instancer DB Benchmark
+Compares queries/sec of the old subprocess-per-query access path against the
+pooled InstanceStore.
+
+By default both paths run against a local SQLite stand-in for the CTFd
+database. The "before" path spawns a fresh interpreter per query, which is
+the same fork+exec+login cost as `docker exec big-red-ctfd-db-1 mysql -e ...`.
+Pass --mysql to benchmark against a real database using the CTFD_DB_*
+environment variables (the "before" path then uses docker exec directly).
+
+Usage:
+    python benchmarks/bench_db.py [--queries 200] [--threads 8] [--mysql]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import InstanceStore, utcnow  # noqa: E402
+
+# Runs one query in a brand new process and prints TSV, like `mysql --batch`
+SQLITE_CLI = '''
+import sqlite3, sys
+conn = sqlite3.connect(sys.argv[1])
+for row in conn.execute(sys.argv[2]):
+    print("\\t".join(str(c) for c in row))
+'''
+
+# Representative read mix of a dashboard render
+QUERIES = [
+    "SELECT COUNT(*) FROM instancer_instances WHERE status IN ('creating', 'running')",
+    "SELECT challenge_id, container_name, fqdn, status, created_at, expires_at "
+    "FROM instancer_instances WHERE user_id = 7 AND status != 'deleted'",
+    "SELECT id, name, email, password, type FROM users WHERE name = 'user7' LIMIT 1",
+]
+
+
+def seed(store: InstanceStore, users: int = 500, instances: int = 2000):
+    store.execute('CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, password TEXT, type TEXT)')
+    store.init_schema()
+    with store.connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            store._sql('INSERT INTO users (id, name, email, password, type) VALUES (%s, %s, %s, %s, %s)'),
+            [(i, f'user{i}', f'user{i}@example.com', 'x', 'user') for i in range(1, users + 1)]
+        )
+        expires_at = utcnow() + timedelta(minutes=15)
+        cursor.executemany(
+            store._sql('INSERT INTO {table} (user_id, challenge_id, container_name, fqdn, status, expires_at) VALUES (%s, %s, %s, %s, %s, %s)'),
+            [(i % users + 1, 'eaas', f'cornell-eaas-{i}', f'http://eaas-{i}.example.com:1337', 'running', expires_at)
+             for i in range(instances)]
+        )
+        cursor.close()
+
+
+def run_subprocess(total: int, threads: int, command) -> float:
+    def one(i):
+        subprocess.run(command(QUERIES[i % len(QUERIES)]), capture_output=True, text=True, check=True)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(total)))
+    return total / (time.perf_counter() - start)
+
+
+def run_pooled(store: InstanceStore, total: int, threads: int) -> float:
+    def one(i):
+        store.fetchall(QUERIES[i % len(QUERIES)])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(total)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queries', type=int, default=200, help='Queries to issue per access path')
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent callers')
+    parser.add_argument('--mysql', action='store_true', help='Benchmark against the real CTFd database')
+    args = parser.parse_args()
+
+    if args.mysql:
+        config = {
+            'host': os.getenv('CTFD_DB_HOST', 'localhost'),
+            'port': int(os.getenv('CTFD_DB_PORT', '3306')),
+            'user': os.getenv('CTFD_DB_USER', 'ctfd'),
+            'password': os.getenv('CTFD_DB_PASSWORD', 'ctfd'),
+            'database': os.getenv('CTFD_DB_NAME', 'ctfd'),
+        }
+        store = InstanceStore.from_mysql_config(config, pool_size=args.threads)
+
+        def command(sql):
+            return ['docker', 'exec', 'big-red-ctfd-db-1', 'mysql', '-u', config['user'],
+                    f"-p{config['password']}", config['database'], '-e', sql, '--batch', '--raw']
+    else:
+        tmp = tempfile.NamedTemporaryFile(suffix='.sqlite', delete=False)
+        tmp.close()
+        store = InstanceStore.from_sqlite(tmp.name, pool_size=args.threads)
+        seed(store)
+
+        def command(sql):
+            return [sys.executable, '-c', SQLITE_CLI, tmp.name, sql]
+
+    print(f"📊 {args.queries} queries, {args.threads} threads, backend={store.dialect}")
+    before = run_subprocess(args.queries, args.threads, command)
+    print(f"   before (subprocess per query): {before:10.1f} queries/sec")
+    after = run_pooled(store, args.queries * 10, args.threads)
+    print(f"   after  (pooled InstanceStore): {after:10.1f} queries/sec")
+    print(f"   speedup: {after / before:.1f}x")
+
+    if not args.mysql:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(tmp.name + suffix):
+                os.unlink(tmp.name + suffix)
+
+
+if __name__ == '__main__':
+    main()
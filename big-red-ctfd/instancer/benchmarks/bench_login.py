@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Login Throughput Benchmark
+Measures logins per second with and without the identity cache in AuthBridge.
+
+Each simulated user logs in repeatedly (page reloads, scripts re-authenticating),
+which is the case the cache is for: bcrypt-sha256 runs once per credential per
+TTL window instead of on every attempt. Users come from a SQLite stand-in for
+the CTFd users table with real bcrypt-sha256 hashes.
+
+Usage:
+    python benchmarks/bench_login.py [--users 20] [--logins 100] [--threads 8]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passlib.hash import bcrypt_sha256  # noqa: E402
+
+from auth import AuthBridge  # noqa: E402
+from db import InstanceStore  # noqa: E402
+
+
+def make_store(path: str, users: int) -> InstanceStore:
+    store = InstanceStore.from_sqlite(path, pool_size=16)
+    store.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, password TEXT, type TEXT)')
+    password_hash = bcrypt_sha256.hash('password')
+    with store.connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            store._sql('INSERT INTO users (id, name, email, password, type) VALUES (%s, %s, %s, %s, %s)'),
+            [(i, f'user{i}', f'user{i}@example.com', password_hash, 'user') for i in range(1, users + 1)]
+        )
+        cursor.close()
+    return store
+
+
+def run(auth: AuthBridge, args) -> float:
+    rng = random.Random(3)
+    names = [f'user{rng.randint(1, args.users)}' for _ in range(args.logins)]
+
+    def login(name):
+        if auth.login(name, 'password') is None:
+            raise RuntimeError(f'login failed for {name}')
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(login, names))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20, help='Distinct users logging in')
+    parser.add_argument('--logins', type=int, default=100, help='Total login attempts')
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent login requests')
+    args = parser.parse_args()
+
+    store = make_store(os.path.join(tempfile.mkdtemp(), 'ctfd.sqlite'), args.users)
+    print(f"📊 {args.logins} logins from {args.users} users on {args.threads} threads")
+    for label, ttl in (('no cache', 0), ('60s cache', 60)):
+        auth = AuthBridge(store, ttl=ttl, negative_ttl=0)
+        elapsed = run(auth, args)
+        print(f"   {label:10s}: {args.logins / elapsed:9.1f} logins/s   "
+              f"bcrypt runs {auth.counters['bcrypt']:4d}   {elapsed:6.2f}s")
+
+
+if __name__ == '__main__':
+    main()
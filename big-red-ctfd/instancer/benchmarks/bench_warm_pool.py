@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Warm Pool Simulation Benchmark
+Measures time-to-URL (request until the instance is running) for a burst of
+users, once with cold provisioning only and once with the warm pool.
+
+Containers come from the in-process FakeBackend, whose create latency stands
+in for the 1-2 minutes Azure Container Instances takes (scaled down so the
+run finishes in seconds). Requests arrive as a Poisson process spread over
+the challenges, each from a different user.
+
+Usage:
+    python benchmarks/bench_warm_pool.py [--users 120] [--rate 3] [--create-latency 1.5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import FakeBackend  # noqa: E402
+from challenge_instancer import ChallengeInstancer  # noqa: E402
+from db import InstanceStore  # noqa: E402
+
+CHALLENGES = {
+    'eaas': {'name': 'EaaS', 'port': 1337},
+    'vuln-app': {'name': 'Vulnerable Web App', 'port': 1337},
+}
+
+
+def make_store(path: str, users: int) -> InstanceStore:
+    store = InstanceStore.from_sqlite(path, pool_size=16)
+    store.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, password TEXT, type TEXT)')
+    with store.connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            store._sql('INSERT INTO users (id, name, email, password, type) VALUES (%s, %s, %s, %s, %s)'),
+            [(i, f'user{i}', f'user{i}@example.com', 'x', 'user') for i in range(1, users + 1)]
+        )
+        cursor.close()
+    return store
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def simulate(args, pool_max: int) -> list:
+    tmp = tempfile.mkdtemp()
+    store = make_store(os.path.join(tmp, 'ctfd.sqlite'), args.users)
+    backend = FakeBackend(create_latency=args.create_latency, jitter=args.jitter, seed=1)
+    instancer = ChallengeInstancer(
+        store, backend, CHALLENGES, {'max_global_instances': args.users + 2 * pool_max * len(CHALLENGES)},
+        timedelta(hours=1), provision_workers=args.workers,
+        warm_pool_min=args.pool_min if pool_max else 0, warm_pool_max=pool_max,
+        resync_interval=None
+    )
+    if instancer.pool:
+        instancer.pool.autosize_interval = 1
+        instancer.pool.demand_window = 5
+        # Start from a warmed-up pool, as a running deployment would be
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and any(
+            s['ready'] < s['target'] for s in instancer.pool.stats().values()
+        ):
+            time.sleep(0.05)
+
+    rng = random.Random(7)
+    challenge_ids = list(CHALLENGES)
+
+    def one_user(user_id: int) -> float:
+        started = time.perf_counter()
+        result = instancer.create_challenge_instance(user_id, f'u{user_id:07d}', rng.choice(challenge_ids))
+        if not result['success']:
+            raise RuntimeError(result['error'])
+        while result['status'] != 'running':
+            time.sleep(0.01)
+            result = instancer.get_job_status(user_id, result['job_id'])
+        return time.perf_counter() - started
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        for user_id in range(1, args.users + 1):
+            futures.append(pool.submit(one_user, user_id))
+            time.sleep(rng.expovariate(args.rate))
+    latencies = [f.result() for f in futures]
+
+    instancer.scheduler.stop()
+    if instancer.pool:
+        print(f"   pool: {instancer.pool.stats()}")
+        instancer.pool.stop(drain=True)
+    instancer.provisioner.shutdown()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=120, help='Users requesting an instance')
+    parser.add_argument('--rate', type=float, default=3, help='Mean arrivals per second')
+    parser.add_argument('--create-latency', type=float, default=1.5, help='Seconds to create a container')
+    parser.add_argument('--jitter', type=float, default=0.5, help='Extra random create latency (seconds)')
+    parser.add_argument('--workers', type=int, default=8, help='Provisioning workers')
+    parser.add_argument('--pool-min', type=int, default=8, help='Warm pool floor per challenge')
+    parser.add_argument('--pool-max', type=int, default=20, help='Warm pool ceiling per challenge')
+    args = parser.parse_args()
+
+    print(f"📊 {args.users} users at {args.rate}/s, create latency {args.create_latency}s "
+          f"+ up to {args.jitter}s, {args.workers} provisioning workers")
+    for label, pool_max in (('without pool', 0), ('with pool', args.pool_max)):
+        latencies = simulate(args, pool_max)
+        print(f"   {label:12s}: p50 {percentile(latencies, 50) * 1000:8.1f} ms   "
+              f"p99 {percentile(latencies, 99) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
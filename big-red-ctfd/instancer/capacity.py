@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Instance Capacity Accounting
+O(1) admission control for global, per-challenge and per-user instance quotas
+"""
+
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from db import InstanceStore
+
+
+class CapacityExceeded(Exception):
+    """Raised when admitting an instance would break one of the quotas"""
+
+    def __init__(self, scope: str, used: int, limit: int, message: str):
+        super().__init__(message)
+        self.scope = scope
+        self.used = used
+        self.limit = limit
+
+
+@dataclass(frozen=True)
+class Reservation:
+    """A slot held for one container between admission and its DB row existing"""
+    container_name: str
+    user_id: int
+    challenge_id: str
+
+
+class CapacityManager:
+    """In-memory token counters for active instances, reconciled with the DB.
+
+    Every admission and release is a handful of dict/counter updates under
+    one short lock, so checking all quotas costs the same no matter how many
+    instances are running. The counters are only this process's view: the
+    row itself is written with a conditional insert under the database's
+    admission lock (see InstanceStore.insert_instance_if_capacity) so that
+    several replicas sharing one database still cannot overshoot the global
+    limit, and reconcile() periodically reloads the counters from the table.
+    """
+
+    def __init__(self, max_global: int, max_per_user: Optional[int] = None,
+                 per_challenge: Optional[Dict[str, int]] = None):
+        self.max_global = max_global
+        self.max_per_user = max_per_user
+        self.per_challenge = dict(per_challenge or {})
+        self._lock = threading.Lock()
+        # container_name -> (user_id, challenge_id) for every slot held
+        self._holders: Dict[str, tuple] = {}
+        # Reservations whose row has not been written yet survive reconcile()
+        self._pending: Dict[str, tuple] = {}
+        self._by_user = Counter()
+        self._by_challenge = Counter()
+        self._by_user_challenge = Counter()
+        # Slots taken by containers that belong to no one yet (the warm pool)
+        self._standby = 0
+
+    # Admission
+
+    def reserve(self, user_id: int, challenge_id: str, container_name: str) -> Reservation:
+        """Take a slot for a new container or raise CapacityExceeded"""
+        with self._lock:
+            used = len(self._holders) + self._standby
+            if used >= self.max_global:
+                raise CapacityExceeded(
+                    'global', used, self.max_global,
+                    f'Server at capacity! {used}/{self.max_global} containers running. '
+                    f'Please wait for a slot to open up.'
+                )
+            if self._by_user_challenge[(user_id, challenge_id)] > 0:
+                raise CapacityExceeded(
+                    'duplicate', 1, 1,
+                    'You already have an active instance of this challenge. Please delete it first.'
+                )
+            challenge_limit = self.per_challenge.get(challenge_id)
+            if challenge_limit is not None and self._by_challenge[challenge_id] >= challenge_limit:
+                raise CapacityExceeded(
+                    'challenge', self._by_challenge[challenge_id], challenge_limit,
+                    f'This challenge is at capacity ({challenge_limit} instances). Please try again later.'
+                )
+            if self.max_per_user is not None and self._by_user[user_id] >= self.max_per_user:
+                raise CapacityExceeded(
+                    'user', self._by_user[user_id], self.max_per_user,
+                    f'You can only run {self.max_per_user} instances at once. Please delete one first.'
+                )
+
+            self._hold(container_name, user_id, challenge_id)
+            self._pending[container_name] = (user_id, challenge_id)
+            return Reservation(container_name, user_id, challenge_id)
+
+    def confirm(self, reservation: Reservation):
+        """The reservation's row now exists, so the DB will account for it"""
+        with self._lock:
+            self._pending.pop(reservation.container_name, None)
+
+    def release(self, container_name: str) -> bool:
+        """Give back the slot held by a container. Safe to call more than once."""
+        with self._lock:
+            self._pending.pop(container_name, None)
+            holder = self._holders.pop(container_name, None)
+            if holder is None:
+                return False
+            self._drop(*holder)
+            return True
+
+    def admit(self, store: InstanceStore, user_id: int, challenge_id: str, container_name: str,
+              fqdn: str, expires_at: Optional[datetime], status: str) -> int:
+        """Reserve a slot and write the instance row, returning its id.
+
+        Raises CapacityExceeded if either the in-memory counters or the
+        database (other replicas) say there is no room.
+        """
+        reservation = self.reserve(user_id, challenge_id, container_name)
+        try:
+            instance_id = store.insert_instance_if_capacity(
+                user_id, challenge_id, container_name, fqdn, expires_at,
+                max_global=self.max_global, status=status
+            )
+            # Only refusals pay for finding out which of the two checks failed
+            duplicate = instance_id is None and store.has_active_instance(user_id, challenge_id)
+        except Exception:
+            self.release(container_name)
+            raise
+        if instance_id is None:
+            self.release(container_name)
+            if duplicate:
+                raise CapacityExceeded(
+                    'duplicate', 1, 1,
+                    'You already have an active instance of this challenge. Please delete it first.'
+                )
+            raise CapacityExceeded(
+                'global', self.max_global, self.max_global,
+                f'Server at capacity! {self.max_global}/{self.max_global} containers running. '
+                f'Please wait for a slot to open up.'
+            )
+        self.confirm(reservation)
+        return instance_id
+
+    # Bookkeeping
+
+    def _hold(self, container_name: str, user_id: int, challenge_id: str):
+        self._holders[container_name] = (user_id, challenge_id)
+        self._by_user[user_id] += 1
+        self._by_challenge[challenge_id] += 1
+        self._by_user_challenge[(user_id, challenge_id)] += 1
+
+    def _drop(self, user_id: int, challenge_id: str):
+        for counter, key in ((self._by_user, user_id),
+                             (self._by_challenge, challenge_id),
+                             (self._by_user_challenge, (user_id, challenge_id))):
+            counter[key] -= 1
+            if counter[key] <= 0:
+                del counter[key]
+
+    def reconcile(self, active_rows: Iterable):
+        """Rebuild the counters from the active rows in the database"""
+        with self._lock:
+            pending = dict(self._pending)
+            self._holders.clear()
+            self._by_user.clear()
+            self._by_challenge.clear()
+            self._by_user_challenge.clear()
+            for row in active_rows:
+                self._hold(row.container_name, row.user_id, row.challenge_id)
+                pending.pop(row.container_name, None)
+            for container_name, (user_id, challenge_id) in pending.items():
+                self._hold(container_name, user_id, challenge_id)
+            self._pending = pending
+
+    def set_standby(self, count: int):
+        """Number of slots held by pre-provisioned containers not yet handed to a user"""
+        with self._lock:
+            self._standby = count
+
+    def available(self) -> int:
+        """Slots left for new containers, instances and standby alike"""
+        with self._lock:
+            return max(0, self.max_global - len(self._holders) - self._standby)
+
+    @property
+    def used(self) -> int:
+        return len(self._holders)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'used': len(self._holders),
+                'max': self.max_global,
+                'pending': len(self._pending),
+                'standby': self._standby,
+                'by_challenge': dict(self._by_challenge),
+            }
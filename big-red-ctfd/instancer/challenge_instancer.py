@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Challenge Instancer
+Instance lifecycle shared by every instancer app, independent of where containers run
+"""
+
+import secrets
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from auth import AuthBridge, verify_ctfd_password
+from backends import ContainerBackend, ContainerSpec
+from capacity import CapacityExceeded, CapacityManager
+from db import InstanceStore, utcnow
+from events import CTFdEventPublisher
+from provisioning import JOB_QUEUED, JOB_RUNNING, ProvisioningJob, ProvisioningQueue, job_status
+from reaper import Reaper
+from scheduler import ExpiryScheduler
+from warm_pool import POOL_READY, WarmPool
+
+# Scheduler key used to rerun the reaper after deletes that failed
+REAP_RETRY_KEY = '__reap_retry__'
+REAP_RETRY_DELAY = timedelta(seconds=30)
+# Shortest gap between two resyncs, however often one is requested
+RESYNC_COOLDOWN = 10  # seconds
+
+
+class ChallengeInstancer:
+    """Creates, tracks and expires challenge instances on a ContainerBackend.
+
+    `limits` uses the CONTAINER_LIMITS keys from app.py. A backend of None
+    means it could not be set up (e.g. Azure login failed); users can still
+    log in and see their instances but cannot create new ones.
+    """
+
+    def __init__(self, store: InstanceStore, backend: Optional[ContainerBackend], challenges: Dict,
+                 limits: Dict, lifetime: timedelta, provision_workers: int = 8,
+                 user_foreign_key: bool = True, reaper_workers: int = 8,
+                 warm_pool_min: int = 0, warm_pool_max: int = 0,
+                 background: bool = True, resync_interval: Optional[int] = 300,
+                 auth: Optional[AuthBridge] = None, events: Optional[CTFdEventPublisher] = None):
+        self.store = store
+        # Logins and CTFd tokens/sessions, with verified identities cached
+        self.auth = auth or AuthBridge(store)
+        self.backend = backend
+        self.challenges = challenges
+        self.limits = limits
+        self.lifetime = lifetime
+        self.user_foreign_key = user_foreign_key
+        # Tells players over CTFd's event stream when their instance is up
+        self.events = events
+
+        # Initialize database (only instances table, users come from CTFd)
+        self.init_db()
+
+        # O(1) admission control, seeded from the instances already running
+        self.capacity = CapacityManager(
+            limits['max_global_instances'],
+            max_per_user=limits.get('max_instances_per_user'),
+            per_challenge={cid: c['max_instances'] for cid, c in challenges.items() if 'max_instances' in c}
+        )
+        self.reconcile_capacity()
+        # Set when the counters may be stale, so the resync thread reloads them early
+        self._resync_requested = threading.Event()
+
+        # Container creation runs on worker threads, off the request path
+        self.provisioner = ProvisioningQueue(
+            self.store,
+            self._provision_container,
+            lifetime=lifetime,
+            workers=provision_workers,
+            on_failure=self._abort_provisioning,
+            on_running=self._on_running
+        )
+
+        # Expired instances are claimed in batches and deleted in parallel,
+        # triggered by a timer at each instance's deadline
+        self.reaper = Reaper(self.store, backend, self.capacity, workers=reaper_workers) if backend else None
+        self.scheduler = ExpiryScheduler(self._expire_due)
+        self.load_expiry_schedule()
+        self.recover_provisioning_jobs()
+
+        # Ready containers per challenge, sized from demand between the two bounds
+        self.pool = None
+        if backend and warm_pool_max:
+            self.pool = WarmPool(backend, self.capacity, self.container_spec, challenges,
+                                 min_size=warm_pool_min, max_size=warm_pool_max)
+            self.adopt_warm_pool()
+
+        if background:
+            self.scheduler.start()
+            if self.pool:
+                self.pool.start()
+            if resync_interval:
+                self.start_resync_thread(resync_interval)
+
+    def init_db(self):
+        """Initialize database for tracking instances (users come from CTFd)"""
+        try:
+            print(f"🗄️  Initializing {self.store.table} table...")
+            self.store.init_schema(with_user_fk=self.user_foreign_key)
+            print("✅ Database table created successfully")
+        except Exception as e:
+            print(f"❌ Error initializing database: {e}")
+            print("💡 Continuing without database table creation...")
+
+    def authenticate_user(self, username: str, password: str, client_ip: Optional[str] = None) -> Optional[Dict]:
+        """Authenticate user against CTFd database and return user info if successful"""
+        return self.auth.login(username, password, client_ip=client_ip)
+
+    def verify_ctfd_password(self, password: str, stored_hash: str) -> bool:
+        """Verify password against CTFd's bcrypt-sha256 hash using the same method as CTFd"""
+        return verify_ctfd_password(password, stored_hash)
+
+    def generate_hex_suffix(self) -> str:
+        """Generate a random 16-character hex string"""
+        return secrets.token_hex(8)  # 8 bytes = 16 hex characters
+
+    def container_spec(self, challenge_id: str, container_name: str) -> ContainerSpec:
+        """What the backend should run for an instance of a challenge"""
+        challenge = self.challenges[challenge_id]
+        return ContainerSpec(
+            name=container_name,
+            image=challenge.get('image'),
+            port=challenge['port'],
+            tags={'challenge': challenge_id},
+            cpu=challenge.get('cpu', 0.1),
+            memory_gb=challenge.get('memory_gb', 0.1)
+        )
+
+    def create_challenge_instance(self, user_id: int, user_uuid: str, challenge_id: str) -> Dict:
+        """Give the user a new challenge instance.
+
+        If the challenge's warm pool has a ready container it is handed out
+        and the instance is running immediately. Otherwise the job is queued,
+        a provisioning worker creates the container and the client polls
+        get_job_status() for progress.
+        """
+        if challenge_id not in self.challenges:
+            return {'success': False, 'error': 'Invalid challenge ID'}
+
+        if not self.backend:
+            return {'success': False, 'error': 'Container backend not available'}
+
+        challenge = self.challenges[challenge_id]
+        warm = self.pool.take(challenge_id) if self.pool else None
+        if warm:
+            container_name, challenge_url, status = warm.name, warm.url or '', JOB_RUNNING
+        else:
+            hex_suffix = self.generate_hex_suffix()
+
+            # Generate unique container name and DNS name
+            container_name = f"cornell-{challenge_id}-{user_uuid}-{hex_suffix}"
+            # Empty until the container starts if the backend cannot know it up front
+            challenge_url = self.backend.url_for(self.container_spec(challenge_id, container_name)) or ''
+            status = JOB_QUEUED
+
+        # For queued jobs this is provisional, so a job that never finishes is
+        # still cleaned up; it is pushed out again when the container reaches running
+        expires_at = utcnow() + self.lifetime
+
+        # Reserve a slot against the global, per-challenge and per-user quotas
+        # and write the row in one step, so concurrent requests cannot overshoot
+        try:
+            job_id = self.capacity.admit(self.store, user_id, challenge_id, container_name, challenge_url,
+                                         expires_at, status=status)
+        except CapacityExceeded as e:
+            if warm:
+                self.pool.put_back(challenge_id, warm)
+            if e.scope == 'duplicate':
+                return {'success': False, 'error': str(e)}
+            # Other replicas may have freed slots since the counters were last reloaded
+            self.request_resync()
+            return {
+                'success': False,
+                'error': str(e),
+                'error_type': 'capacity_limit',
+                'retry_suggested': True
+            }
+        except Exception as e:
+            if warm:
+                self.pool.put_back(challenge_id, warm)
+            print(f"❌ Error queueing container: {e}")
+            return {'success': False, 'error': f'Container creation failed: {str(e)}'}
+
+        self.scheduler.schedule(container_name, expires_at)
+        if warm:
+            self.pool.assign(warm, {'challenge': challenge_id, 'user_id': str(user_id)})
+        else:
+            self.provisioner.submit(ProvisioningJob(job_id, user_id, challenge_id, container_name))
+        current_global_count = self.capacity.used
+
+        if warm:
+            print(f"⚡ Handed out warm {self.backend.name} container to user {user_uuid}")
+        else:
+            print(f"📥 Queued {self.backend.name} container instance for user {user_uuid}")
+        print(f"   Challenge: {challenge['name']}")
+        print(f"   Container: {container_name}")
+        print(f"   Job: {job_id}")
+        print(f"   Global usage: {current_global_count}/{self.limits['max_global_instances']}")
+
+        return {
+            'success': True,
+            'job_id': job_id,
+            'status': status,
+            'url': challenge_url or None,
+            'container_name': container_name,
+            'expires_at': expires_at.isoformat(),
+            'global_usage': {
+                'current': current_global_count,
+                'max': self.limits['max_global_instances']
+            }
+        }
+
+    def _provision_container(self, job: ProvisioningJob) -> Optional[str]:
+        """Create the container and wait for it to run (runs on a provisioning worker)"""
+        if not self.backend:
+            raise RuntimeError('Container backend not available')
+        return self.backend.create(self.container_spec(job.challenge_id, job.container_name)).url
+
+    def _abort_provisioning(self, job: ProvisioningJob, error: Exception):
+        """Tear down a container whose provisioning failed or was cancelled"""
+        self.capacity.release(job.container_name)
+        self.scheduler.cancel(job.container_name)
+        if self.backend:
+            self.backend.delete(job.container_name, wait=False)
+            print(f"🗑️  Removed half-provisioned container {job.container_name}")
+
+    def _on_running(self, job: ProvisioningJob, expires_at):
+        """The instance is running, so its lifetime now counts from here"""
+        self.scheduler.schedule(job.container_name, expires_at)
+        if self.events:
+            row = self.store.get_instance(job.job_id)
+            if row is not None:
+                self.events.publish(job.user_id, 'instance', job_status(row, self.challenges))
+
+    def adopt_warm_pool(self):
+        """Reuse ready pool containers left running by a previous process"""
+        try:
+            in_use = {row.container_name for row in self.store.get_active_instances()}
+            self.pool.adopt(c for c in self.backend.list({'pool': POOL_READY}) if c.name not in in_use)
+        except Exception as e:
+            print(f"❌ Error adopting warm pool containers: {e}")
+
+    def recover_provisioning_jobs(self):
+        """Resume jobs that were queued or provisioning when the instancer last stopped"""
+        try:
+            self.provisioner.recover()
+        except Exception as e:
+            print(f"❌ Error resuming provisioning jobs: {e}")
+
+    def get_job_status(self, user_id: int, job_id: int) -> Optional[Dict]:
+        """Current state of one of the user's provisioning jobs"""
+        row = self.store.get_instance(job_id, user_id=user_id)
+        if row is None:
+            return None
+        return job_status(row, self.challenges)
+
+    def get_global_instance_count(self) -> int:
+        """Get the total number of active instances across all users"""
+        count = self.capacity.used
+        print(f"🌐 Global instance count: {count}/{self.limits['max_global_instances']}")
+        return count
+
+    def reconcile_capacity(self):
+        """Resync the in-memory capacity counters with the instances table"""
+        try:
+            self.capacity.reconcile(self.store.get_active_instances())
+        except Exception as e:
+            print(f"❌ Error reconciling capacity: {e}")
+
+    def get_all_instances_admin(self) -> List[Dict]:
+        """Get all active instances across all users for admin view"""
+        try:
+            instances = []
+            for row in self.store.get_active_instances_with_users():
+                instance = row.to_dict(self.challenges)
+                instance.update({
+                    'user_id': row.user_id,
+                    'username': row.username,
+                    'email': row.email,
+                    'fqdn': row.fqdn,
+                    # Only link instances that are reachable
+                    'url': row.fqdn if row.status == 'running' and row.fqdn else None,
+                })
+                instances.append(instance)
+            return instances
+
+        except Exception as e:
+            print(f"Error getting all instances for admin: {e}")
+            return []
+
+    def delete_instance_admin(self, container_name: str, user_id: int) -> bool:
+        """Admin method to delete any user's instance"""
+        try:
+            print(f"🔧 Admin deleting instance: {container_name} for user {user_id}")
+
+            # Use the same deletion logic as regular delete - pass both user_id and container_name
+            success = self.delete_instance(user_id, container_name)
+
+            if success:
+                print(f"✅ Admin successfully deleted instance {container_name}")
+            else:
+                print(f"❌ Admin failed to delete instance {container_name}")
+
+            return success
+
+        except Exception as e:
+            print(f"❌ Error in admin delete: {e}")
+            return False
+
+    def get_instance_stats(self) -> Dict:
+        """Get detailed statistics about current container usage"""
+        max_allowed = self.limits['max_global_instances']
+        try:
+            stats = self.store.get_stats()
+            total_count = stats.active_count
+
+            return {
+                'active_count': total_count,
+                # Everything that has not reached running yet
+                'creating_count': sum(stats.by_status.get(s, 0) for s in ('queued', 'provisioning', 'creating')),
+                'queued_count': stats.by_status.get('queued', 0),
+                'running_count': stats.by_status.get('running', 0),
+                'active_users': stats.active_users,
+                'total_users': stats.total_users,
+                'max_allowed': max_allowed,
+                'available_slots': max(0, max_allowed - total_count),
+                'usage_percentage': round((total_count / max_allowed) * 100, 1),
+                'by_challenge': stats.by_challenge,
+                'by_status': stats.by_status,
+                'is_at_capacity': total_count >= max_allowed,
+                'is_near_capacity': total_count >= self.limits.get('warning_threshold', max_allowed)
+            }
+
+        except Exception as e:
+            print(f"Error getting instance stats: {e}")
+            return {
+                'active_count': 0,
+                'creating_count': 0,
+                'queued_count': 0,
+                'running_count': 0,
+                'active_users': 0,
+                'total_users': 0,
+                'max_allowed': max_allowed,
+                'available_slots': max_allowed,
+                'usage_percentage': 0,
+                'by_challenge': {},
+                'by_status': {},
+                'is_at_capacity': False,
+                'is_near_capacity': False
+            }
+
+    def get_user_instances(self, user_id: int) -> List[Dict]:
+        """Get all active instances for a user from CTFd database"""
+        try:
+            return [row.to_dict(self.challenges) for row in self.store.get_user_instances(user_id)]
+        except Exception as e:
+            print(f"❌ Error getting user instances: {e}")
+            return []
+
+    def delete_instance(self, user_id: int, container_name: str) -> bool:
+        """Delete a challenge instance from the backend and update database"""
+        try:
+            print(f"🗑️  Deleting container instance: {container_name}")
+
+            if self.backend:
+                # Don't hold the request open while the backend tears it down
+                try:
+                    self.backend.delete(container_name, wait=False)
+                    print(f"✅ Container deletion initiated")
+                except Exception as backend_error:
+                    print(f"⚠️  Backend deletion warning: {backend_error}")
+                    print("💡 Container might already be deleted or not exist")
+            else:
+                print("⚠️  Container backend not available, skipping container deletion")
+
+            # Update database
+            if self.store.mark_deleted(container_name, user_id=user_id):
+                self.capacity.release(container_name)
+                self.scheduler.cancel(container_name)
+
+            print(f"✅ Instance {container_name} deleted successfully")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error deleting instance: {e}")
+            return False
+
+    def extend_instance(self, user_id: int, container_name: str) -> Dict:
+        """Reset a running instance's lifetime so it expires a full lifetime from now"""
+        expires_at = utcnow() + self.lifetime
+        try:
+            if not self.store.extend_instance(container_name, user_id, expires_at):
+                return {'success': False, 'error': 'Only your running instances can be extended'}
+        except Exception as e:
+            print(f"❌ Error extending instance: {e}")
+            return {'success': False, 'error': 'Failed to extend instance'}
+
+        self.scheduler.schedule(container_name, expires_at)
+        print(f"⏰ Extended {container_name} until {expires_at}")
+        return {'success': True, 'container_name': container_name, 'expires_at': expires_at.isoformat()}
+
+    def cleanup_expired_instances(self):
+        """Delete expired instances from the backend and mark them deleted in the database"""
+        if not self.reaper:
+            print("⚠️  Container backend not available, skipping cleanup")
+            return None
+        try:
+            result = self.reaper.reap()
+            if result.deleted or result.failed:
+                print(f"🧹 Cleanup completed: {result.deleted} expired instances deleted, {result.failed} to retry")
+            return result
+        except Exception as e:
+            print(f"❌ Error during cleanup: {e}")
+            return None
+
+    def _expire_due(self, container_names: List[str]):
+        """Called by the scheduler when instances reach their deadline"""
+        result = self.cleanup_expired_instances()
+        if result is None or result.failed:
+            # Deletes that failed are left claimable; come back for them
+            self.scheduler.schedule(REAP_RETRY_KEY, utcnow() + REAP_RETRY_DELAY)
+
+    def load_expiry_schedule(self):
+        """Schedule the deadlines of every active instance in the database"""
+        try:
+            self.scheduler.load(self.store.get_active_instances())
+            # Pick up anything that expired while the instancer was down
+            self.scheduler.schedule(REAP_RETRY_KEY, utcnow())
+        except Exception as e:
+            print(f"❌ Error loading expiry schedule: {e}")
+
+    def request_resync(self):
+        """Have the resync thread reload from the table without waiting out its interval"""
+        self._resync_requested.set()
+
+    def resync(self) -> bool:
+        """Reload capacity and deadlines written by other replicas.
+
+        Skipped while nothing is scheduled to expire here, unless a resync was
+        requested, so an idle instancer does not read the table every interval.
+        Returns whether the table was read.
+        """
+        requested = self._resync_requested.is_set()
+        self._resync_requested.clear()
+        if not requested and not len(self.scheduler):
+            return False
+        rows = self.store.get_active_instances()
+        self.capacity.reconcile(rows)
+        self.scheduler.load(rows)
+        return True
+
+    def start_resync_thread(self, interval: int = 300):
+        """Periodically reload capacity and deadlines written by other replicas"""
+        def resync_worker():
+            last = time.monotonic()
+            while True:
+                try:
+                    self._resync_requested.wait(max(0, last + interval - time.monotonic()))
+                    # A burst of refused admissions asks for one resync, not one each
+                    time.sleep(max(0, last + RESYNC_COOLDOWN - time.monotonic()))
+                    last = time.monotonic()
+                    self.resync()
+                except Exception as e:
+                    print(f"❌ Resync thread error: {e}")
+
+        resync_thread = threading.Thread(target=resync_worker, daemon=True)
+        resync_thread.start()
+        print(f"🔁 Started replica resync thread (every {interval} seconds)")
@@ -0,0 +1,634 @@
+#!/usr/bin/env python3
+"""
+Instancer Data Access Layer
+Pooled, parameterized access to the CTFd database for the challenge instancer
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Instance states that count as "alive" (holding or about to hold a container)
+ACTIVE_STATUSES = ('queued', 'provisioning', 'creating', 'running')
+
+# Expired instance claimed by a reaper whose container is being torn down
+DELETING_STATUS = 'deleting'
+
+# Columns selected into InstanceRow, in field order
+INSTANCE_COLUMNS = 'user_id, challenge_id, container_name, fqdn, status, created_at, expires_at, id, error'
+
+# MySQL errors after which the admission transaction is rolled back and can simply be run again:
+# ER_LOCK_DEADLOCK and ER_LOCK_WAIT_TIMEOUT
+DEADLOCK_ERRNOS = (1213, 1205)
+DEADLOCK_RETRIES = 3
+DEADLOCK_BACKOFF = 0.01  # seconds, doubled on every retry
+
+# Format used by the templates (matches what the mysql CLI used to print)
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def format_timestamp(value) -> Optional[str]:
+    """Render a DB timestamp (datetime or string) the way the templates expect"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime(TIMESTAMP_FORMAT)
+    return str(value)
+
+
+def is_deadlock(error: Exception) -> bool:
+    """Whether a database error is a deadlock or lock wait timeout worth retrying"""
+    return getattr(error, 'errno', None) in DEADLOCK_ERRNOS
+
+
+def utcnow() -> datetime:
+    """Naive UTC timestamp, which is how expires_at is stored"""
+    return datetime.utcnow().replace(microsecond=0)
+
+
+@dataclass(frozen=True)
+class UserRow:
+    """A row from the CTFd users table"""
+    id: int
+    name: str
+    email: str
+    password: str
+    type: str
+
+
+@dataclass(frozen=True)
+class InstanceRow:
+    """A row from the instancer instances table"""
+    user_id: int
+    challenge_id: str
+    container_name: str
+    fqdn: str
+    status: str
+    created_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    id: Optional[int] = None
+    error: Optional[str] = None
+    username: Optional[str] = None
+    email: Optional[str] = None
+
+    def to_dict(self, challenges: Dict) -> Dict:
+        """Dict shape used by the dashboard templates and JSON endpoints"""
+        return {
+            'job_id': self.id,
+            'challenge_id': self.challenge_id,
+            'challenge_name': challenges.get(self.challenge_id, {}).get('name', 'Unknown'),
+            'container_name': self.container_name,
+            'url': self.fqdn,
+            'status': self.status,
+            'created_at': format_timestamp(self.created_at),
+            'expires_at': format_timestamp(self.expires_at),
+            'error': self.error,
+        }
+
+
+@dataclass(frozen=True)
+class InstanceStats:
+    """Aggregate counts over active instances"""
+    active_count: int = 0
+    active_users: int = 0
+    total_users: int = 0
+    by_challenge: Dict[str, int] = field(default_factory=dict)
+    by_status: Dict[str, int] = field(default_factory=dict)
+
+
+class _PooledSQLiteConnection:
+    """Connection handle whose close() hands the connection back to its pool"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def cursor(self):
+        return self._conn.cursor()
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        if self._conn is not None:
+            self._pool._release(self._conn)
+            self._conn = None
+
+
+class SQLiteConnectionPool:
+    """Bounded SQLite connection pool exposing the same get_connection() interface
+    as mysql.connector.pooling.MySQLConnectionPool. Used as a local stand-in for the
+    CTFd database in tests and benchmarks."""
+
+    def __init__(self, path: str, pool_size: int = 5):
+        self.path = path
+        self.pool_size = pool_size
+        self._idle = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._idle.put(self._connect())
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            timeout=30,
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def get_connection(self):
+        return _PooledSQLiteConnection(self, self._idle.get())
+
+    def _release(self, conn):
+        self._idle.put(conn)
+
+
+class InstanceStore:
+    """Data access for the instancer, backed by a bounded connection pool.
+
+    All queries are parameterized. SQL is written with %s placeholders (the
+    mysql.connector paramstyle) and rewritten for SQLite when needed.
+    """
+
+    def __init__(self, pool, pool_size: int, dialect: str = 'mysql', table: str = 'instancer_instances'):
+        # Either a pool object or a zero-argument callable that builds one on first use
+        self._pool = pool
+        self._pool_lock = threading.Lock()
+        self.dialect = dialect
+        self.table = table
+        # mysql.connector raises PoolError instead of waiting when the pool is
+        # exhausted, so callers queue on this semaphore rather than failing.
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    @classmethod
+    def from_mysql_config(cls, config: Dict, pool_size: int = 10, table: str = 'instancer_instances'):
+        """Build a store backed by a mysql.connector connection pool"""
+        from mysql.connector import pooling
+        from mysql.connector.constants import ClientFlag
+
+        def build_pool():
+            return pooling.MySQLConnectionPool(
+                pool_name=f"instancer_{table}",
+                pool_size=pool_size,
+                pool_reset_session=False,
+                # Report matched rather than changed rows, like SQLite does
+                client_flags=[ClientFlag.FOUND_ROWS],
+                **config
+            )
+
+        # Connect lazily so the app can start before the database is reachable
+        return cls(build_pool, pool_size, dialect='mysql', table=table)
+
+    @classmethod
+    def from_sqlite(cls, path: str, pool_size: int = 5, table: str = 'instancer_instances'):
+        """Build a store backed by a local SQLite database"""
+        pool = SQLiteConnectionPool(path, pool_size=pool_size)
+        return cls(pool, pool_size, dialect='sqlite', table=table)
+
+    # Low level helpers
+
+    @property
+    def pool(self):
+        if callable(self._pool):
+            with self._pool_lock:
+                if callable(self._pool):
+                    self._pool = self._pool()
+        return self._pool
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of one unit of work"""
+        with self._slots:
+            conn = self.pool.get_connection()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+    def _sql(self, sql: str) -> str:
+        sql = sql.format(table=self.table, columns=INSTANCE_COLUMNS)
+        if self.dialect == 'sqlite':
+            sql = sql.replace('%s', '?')
+        return sql
+
+    def execute(self, sql: str, params: Sequence = ()) -> int:
+        """Run a write statement and return the affected row count"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._sql(sql), tuple(params))
+                return cursor.rowcount
+            finally:
+                cursor.close()
+
+    def fetchall(self, sql: str, params: Sequence = ()) -> List[Tuple]:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._sql(sql), tuple(params))
+                return list(cursor.fetchall())
+            finally:
+                cursor.close()
+
+    def fetchone(self, sql: str, params: Sequence = ()) -> Optional[Tuple]:
+        rows = self.fetchall(sql, params)
+        return rows[0] if rows else None
+
+    def _placeholders(self, values: Sequence) -> str:
+        return ', '.join(['%s'] * len(values))
+
+    # Schema
+
+    def init_schema(self, with_user_fk: bool = True):
+        """Create the instances table and its admission lock row if they do not exist yet"""
+        if self.dialect == 'sqlite':
+            ddl = '''
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                challenge_id VARCHAR(255) NOT NULL,
+                container_name VARCHAR(255) UNIQUE NOT NULL,
+                fqdn TEXT NOT NULL,
+                status VARCHAR(50) DEFAULT 'creating',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP NULL
+            )
+            '''
+            self.execute(ddl)
+            self.execute('CREATE INDEX IF NOT EXISTS idx_{table}_user_challenge ON {table} (user_id, challenge_id)')
+            self.execute('CREATE INDEX IF NOT EXISTS idx_{table}_status_expires ON {table} (status, expires_at)')
+            self.execute('CREATE TABLE IF NOT EXISTS {table}_slots (id INTEGER PRIMARY KEY, admitted_at TIMESTAMP NULL)')
+            self.execute('INSERT OR IGNORE INTO {table}_slots (id) VALUES (1)')
+        else:
+            foreign_key = ',\n                FOREIGN KEY (user_id) REFERENCES users(id)' if with_user_fk else ''
+            ddl = '''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    user_id INT NOT NULL,
+                    challenge_id VARCHAR(255) NOT NULL,
+                    container_name VARCHAR(255) UNIQUE NOT NULL,
+                    fqdn TEXT NOT NULL,
+                    status VARCHAR(50) DEFAULT 'creating',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    expires_at TIMESTAMP NULL,
+                    INDEX idx_user_challenge (user_id, challenge_id),
+                    INDEX idx_container_name (container_name),
+                    INDEX idx_status_expires (status, expires_at)''' + foreign_key + '''
+                )
+                '''
+            self.execute(ddl)
+            self.execute('CREATE TABLE IF NOT EXISTS {table}_slots (id INT PRIMARY KEY, admitted_at TIMESTAMP NULL)')
+            self.execute('INSERT IGNORE INTO {table}_slots (id) VALUES (1)')
+
+        # Columns added after the table was first deployed
+        self.ensure_column('error', 'TEXT NULL')
+        self.ensure_column('claimed_by', 'VARCHAR(64) NULL')
+        self.ensure_column('claimed_at', 'TIMESTAMP NULL')
+
+    def ensure_column(self, column: str, definition: str):
+        """Add a column to an existing instances table if it is missing"""
+        if self.dialect == 'sqlite':
+            existing = {row[1] for row in self.fetchall('PRAGMA table_info({table})')}
+        else:
+            existing = {
+                row[0] for row in self.fetchall(
+                    '''
+                    SELECT COLUMN_NAME FROM information_schema.COLUMNS
+                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+                    ''',
+                    (self.table,)
+                )
+            }
+        if column not in existing:
+            self.execute(f'ALTER TABLE {{table}} ADD COLUMN {column} {definition}')
+
+    # Users
+
+    def get_user_by_name(self, name: str) -> Optional[UserRow]:
+        row = self.fetchone(
+            'SELECT id, name, email, password, type FROM users WHERE name = %s LIMIT 1',
+            (name,)
+        )
+        return UserRow(*row) if row else None
+
+    def get_user_by_id(self, user_id: int) -> Optional[UserRow]:
+        row = self.fetchone(
+            'SELECT id, name, email, password, type FROM users WHERE id = %s LIMIT 1',
+            (user_id,)
+        )
+        return UserRow(*row) if row else None
+
+    def get_user_by_token(self, value: str, now: Optional[datetime] = None) -> Optional[UserRow]:
+        """Owner of an unexpired CTFd API token (the tokens table), like lookup_user_token"""
+        row = self.fetchone(
+            '''
+            SELECT u.id, u.name, u.email, u.password, u.type
+            FROM tokens t JOIN users u ON u.id = t.user_id
+            WHERE t.value = %s AND t.type = 'user' AND (t.expiration IS NULL OR t.expiration > %s)
+            LIMIT 1
+            ''',
+            (value, now or utcnow())
+        )
+        return UserRow(*row) if row else None
+
+    def count_users(self) -> int:
+        row = self.fetchone('SELECT COUNT(*) FROM users')
+        return int(row[0]) if row else 0
+
+    # Instances
+
+    def insert_instance(self, user_id: int, challenge_id: str, container_name: str, fqdn: str,
+                        expires_at: Optional[datetime], status: str = 'running') -> int:
+        """Insert an instance row and return its id"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    self._sql('''
+                    INSERT INTO {table} (user_id, challenge_id, container_name, fqdn, status, expires_at)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    '''),
+                    (user_id, challenge_id, container_name, fqdn, status, expires_at)
+                )
+                return cursor.lastrowid
+            finally:
+                cursor.close()
+
+    def insert_instance_if_capacity(self, user_id: int, challenge_id: str, container_name: str, fqdn: str,
+                                    expires_at: Optional[datetime], max_global: int,
+                                    status: str = 'running') -> Optional[int]:
+        """Insert an instance row only while fewer than max_global instances are active
+        and the user has no active instance of this challenge. Returns the new id,
+        or None if the conditions did not hold.
+
+        Every admission first writes the single row of {table}_slots, so the
+        count and the insert run while holding its lock and replicas sharing
+        the database admit one at a time instead of racing for the last slot.
+        The count is a plain read taken after the lock, so it sees every
+        admission committed before it and holds no gap locks on the instances
+        table. Deadlocks and lock wait timeouts are retried.
+        """
+        active = self._placeholders(ACTIVE_STATUSES)
+        from_dual = ' FROM DUAL' if self.dialect == 'mysql' else ''
+        lock_sql = self._sql('UPDATE {table}_slots SET admitted_at = %s WHERE id = 1')
+        count_sql = self._sql(f'SELECT COUNT(*) FROM {{table}} WHERE status IN ({active})')
+        insert_sql = self._sql(f'''
+            INSERT INTO {{table}} (user_id, challenge_id, container_name, fqdn, status, expires_at)
+            SELECT %s, %s, %s, %s, %s, %s{from_dual}
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {{table}}
+                WHERE user_id = %s AND challenge_id = %s AND status IN ({active})
+            )
+            ''')
+        insert_params = (user_id, challenge_id, container_name, fqdn, status, expires_at,
+                         user_id, challenge_id, *ACTIVE_STATUSES)
+        for attempt in range(DEADLOCK_RETRIES + 1):
+            try:
+                with self.connection() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        cursor.execute(lock_sql, (utcnow(),))
+                        cursor.execute(count_sql, ACTIVE_STATUSES)
+                        if int(cursor.fetchone()[0]) >= max_global:
+                            return None
+                        cursor.execute(insert_sql, insert_params)
+                        return cursor.lastrowid if cursor.rowcount == 1 else None
+                    finally:
+                        cursor.close()
+            except Exception as e:
+                if attempt == DEADLOCK_RETRIES or not is_deadlock(e):
+                    raise
+                # The transaction was rolled back; back off a little before running it again
+                time.sleep(DEADLOCK_BACKOFF * (2 ** attempt))
+
+    def has_active_instance(self, user_id: int, challenge_id: str) -> bool:
+        row = self.fetchone(
+            f'''
+            SELECT 1 FROM {{table}}
+            WHERE user_id = %s AND challenge_id = %s AND status IN ({self._placeholders(ACTIVE_STATUSES)})
+            LIMIT 1
+            ''',
+            (user_id, challenge_id, *ACTIVE_STATUSES)
+        )
+        return row is not None
+
+    def count_active(self) -> int:
+        row = self.fetchone(
+            f'SELECT COUNT(*) FROM {{table}} WHERE status IN ({self._placeholders(ACTIVE_STATUSES)})',
+            ACTIVE_STATUSES
+        )
+        return int(row[0]) if row else 0
+
+    def get_user_instances(self, user_id: int, include_deleted: bool = False) -> List[InstanceRow]:
+        """Instances for a user, newest first"""
+        status_filter = '' if include_deleted else "AND status != 'deleted'"
+        rows = self.fetchall(
+            f'''
+            SELECT {{columns}}
+            FROM {{table}}
+            WHERE user_id = %s {status_filter}
+            ORDER BY created_at DESC, id DESC
+            ''',
+            (user_id,)
+        )
+        return [InstanceRow(*row) for row in rows]
+
+    def get_active_instances(self) -> List[InstanceRow]:
+        return self.get_instances_by_status(ACTIVE_STATUSES)
+
+    def get_active_instances_with_users(self) -> List[InstanceRow]:
+        """All active instances joined with their owners, for the admin view"""
+        rows = self.fetchall(
+            f'''
+            SELECT ii.user_id, ii.challenge_id, ii.container_name, ii.fqdn, ii.status,
+                   ii.created_at, ii.expires_at, ii.id, ii.error, u.name, u.email
+            FROM {{table}} ii
+            JOIN users u ON ii.user_id = u.id
+            WHERE ii.status IN ({self._placeholders(ACTIVE_STATUSES)})
+            ORDER BY ii.created_at DESC, ii.id DESC
+            ''',
+            ACTIVE_STATUSES
+        )
+        return [InstanceRow(*row) for row in rows]
+
+    def get_expired_instances(self, now: Optional[datetime] = None) -> List[InstanceRow]:
+        rows = self.fetchall(
+            f'''
+            SELECT {{columns}}
+            FROM {{table}}
+            WHERE status IN ({self._placeholders(ACTIVE_STATUSES)}) AND expires_at <= %s
+            ''',
+            (*ACTIVE_STATUSES, now or utcnow())
+        )
+        return [InstanceRow(*row) for row in rows]
+
+    def get_instance(self, instance_id: int, user_id: Optional[int] = None) -> Optional[InstanceRow]:
+        """Look up one instance by id, optionally scoped to its owner"""
+        if user_id is None:
+            row = self.fetchone('SELECT {columns} FROM {table} WHERE id = %s', (instance_id,))
+        else:
+            row = self.fetchone('SELECT {columns} FROM {table} WHERE id = %s AND user_id = %s', (instance_id, user_id))
+        return InstanceRow(*row) if row else None
+
+    def get_instances_by_status(self, statuses: Sequence[str]) -> List[InstanceRow]:
+        rows = self.fetchall(
+            f'SELECT {{columns}} FROM {{table}} WHERE status IN ({self._placeholders(statuses)}) ORDER BY id',
+            tuple(statuses)
+        )
+        return [InstanceRow(*row) for row in rows]
+
+    def set_job_status(self, instance_id: int, status: str, from_statuses: Sequence[str],
+                       expires_at: Optional[datetime] = None, error: Optional[str] = None,
+                       fqdn: Optional[str] = None) -> bool:
+        """Move an instance to `status` if it is currently in one of `from_statuses`.
+
+        Returns False when the row was changed underneath us (e.g. deleted by
+        the user or the cleanup thread while it was still provisioning).
+        """
+        assignments = ['status = %s', 'error = %s']
+        params = [status, error]
+        if expires_at is not None:
+            assignments.append('expires_at = %s')
+            params.append(expires_at)
+        if fqdn is not None:
+            assignments.append('fqdn = %s')
+            params.append(fqdn)
+        updated = self.execute(
+            f'''
+            UPDATE {{table}} SET {', '.join(assignments)}
+            WHERE id = %s AND status IN ({self._placeholders(from_statuses)})
+            ''',
+            (*params, instance_id, *from_statuses)
+        )
+        return updated == 1
+
+    def extend_instance(self, container_name: str, user_id: int, expires_at: datetime) -> bool:
+        """Move a running instance's expiry. Returns False if it is not the user's or not running."""
+        updated = self.execute(
+            "UPDATE {table} SET expires_at = %s WHERE user_id = %s AND container_name = %s AND status = 'running'",
+            (expires_at, user_id, container_name)
+        )
+        return updated == 1
+
+    def mark_deleted(self, container_name: str, user_id: Optional[int] = None) -> int:
+        """Flag an instance as deleted. Scoped to user_id when one is given."""
+        if user_id is None:
+            return self.execute(
+                "UPDATE {table} SET status = 'deleted' WHERE container_name = %s",
+                (container_name,)
+            )
+        return self.execute(
+            "UPDATE {table} SET status = 'deleted' WHERE user_id = %s AND container_name = %s",
+            (user_id, container_name)
+        )
+
+    # Reaping
+
+    def claim_expired(self, token: str, now: Optional[datetime] = None, limit: int = 100,
+                      stale_before: Optional[datetime] = None) -> List[InstanceRow]:
+        """Take ownership of up to `limit` expired instances and return them.
+
+        MariaDB has no UPDATE ... RETURNING, so the rows are stamped with a
+        per-sweep token in a single UPDATE and then read back by token.
+        Row locking makes each stamp exclusive, so replicas sweeping at the
+        same time never claim the same instance. Rows left 'deleting' by a
+        sweep that gave them back (release_claims) or whose claim is older
+        than `stale_before` (its replica died) are claimed again.
+        """
+        now = now or utcnow()
+        condition = f'''
+            (status IN ({self._placeholders(ACTIVE_STATUSES)}) AND expires_at <= %s)
+            OR (status = %s AND (claimed_by IS NULL OR claimed_at <= %s))
+        '''
+        params = (*ACTIVE_STATUSES, now, DELETING_STATUS, stale_before or now)
+        if self.dialect == 'sqlite':
+            # SQLite is not built with UPDATE ... LIMIT by default
+            where = f'id IN (SELECT id FROM {{table}} WHERE {condition} ORDER BY expires_at LIMIT {int(limit)})'
+            order = ''
+        else:
+            where = condition
+            order = f'ORDER BY expires_at LIMIT {int(limit)}'
+        claimed = self.execute(
+            f'UPDATE {{table}} SET status = %s, claimed_by = %s, claimed_at = %s WHERE {where} {order}',
+            (DELETING_STATUS, token, now, *params)
+        )
+        if not claimed:
+            return []
+        rows = self.fetchall(
+            'SELECT {columns} FROM {table} WHERE claimed_by = %s AND status = %s ORDER BY id',
+            (token, DELETING_STATUS)
+        )
+        return [InstanceRow(*row) for row in rows]
+
+    def finish_claims(self, instance_ids: Sequence[int], token: str) -> int:
+        """Mark claimed instances whose containers are gone as deleted, in one statement"""
+        if not instance_ids:
+            return 0
+        return self.execute(
+            f'''
+            UPDATE {{table}} SET status = 'deleted', claimed_by = NULL
+            WHERE claimed_by = %s AND id IN ({self._placeholders(instance_ids)})
+            ''',
+            (token, *instance_ids)
+        )
+
+    def release_claims(self, instance_ids: Sequence[int], token: str) -> int:
+        """Give claimed instances back so the next sweep, on any replica, retries them"""
+        if not instance_ids:
+            return 0
+        return self.execute(
+            f'''
+            UPDATE {{table}} SET claimed_by = NULL
+            WHERE claimed_by = %s AND id IN ({self._placeholders(instance_ids)})
+            ''',
+            (token, *instance_ids)
+        )
+
+    def get_stats(self) -> InstanceStats:
+        """Active instance counts grouped by challenge and status, in two queries"""
+        grouped = self.fetchall(
+            f'''
+            SELECT challenge_id, status, COUNT(*)
+            FROM {{table}}
+            WHERE status IN ({self._placeholders(ACTIVE_STATUSES)})
+            GROUP BY challenge_id, status
+            ''',
+            ACTIVE_STATUSES
+        )
+        by_challenge: Dict[str, int] = {}
+        by_status: Dict[str, int] = {}
+        for challenge_id, status, count in grouped:
+            by_challenge[challenge_id] = by_challenge.get(challenge_id, 0) + int(count)
+            by_status[status] = by_status.get(status, 0) + int(count)
+
+        totals = self.fetchone(
+            f'''
+            SELECT
+                (SELECT COUNT(DISTINCT user_id) FROM {{table}}
+                 WHERE status IN ({self._placeholders(ACTIVE_STATUSES)})),
+                (SELECT COUNT(*) FROM users)
+            ''',
+            ACTIVE_STATUSES
+        )
+        active_users, total_users = (int(totals[0]), int(totals[1])) if totals else (0, 0)
+
+        return InstanceStats(
+            active_count=sum(by_status.values()),
+            active_users=active_users,
+            total_users=total_users,
+            by_challenge=by_challenge,
+            by_status=by_status,
+        )
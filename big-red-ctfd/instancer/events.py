@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+CTFd Event Publisher
+Pushes instance notifications to players over CTFd's Server-Sent Events bus
+"""
+
+import json
+from typing import Dict
+
+# Must match REDIS_CHANNEL_PREFIX and the event id counter in CTFd/utils/events
+CTFD_CHANNEL_PREFIX = 'ctfd.events.'
+CTFD_EVENT_ID_KEY = 'ctfd_events_last_id'
+
+
+class CTFdEventPublisher:
+    """Publishes events to a user's channel through the Redis CTFd is configured with (REDIS_URL).
+
+    Every CTFd worker receives them on its single pattern subscription and
+    forwards them to that user's open /events streams, so the page learns its
+    instance is up without polling the job status endpoint.
+    """
+
+    def __init__(self, url: str, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    def publish(self, user_id: int, type: str, data: Dict) -> int:
+        """Send an event to one user, returning how many CTFd workers received it"""
+        event = {'data': data, 'type': type, 'id': self.client.incr(CTFD_EVENT_ID_KEY)}
+        return self.client.publish(f"{CTFD_CHANNEL_PREFIX}user:{user_id}", json.dumps(event))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Instance Provisioning Pipeline
+Runs container creation off the request path on a bounded worker pool
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from db import InstanceStore, utcnow
+
+# Job lifecycle, persisted in the instances table status column
+JOB_QUEUED = 'queued'
+JOB_PROVISIONING = 'provisioning'
+JOB_RUNNING = 'running'
+JOB_FAILED = 'failed'
+
+# Statuses a job can be resumed from after a restart
+PENDING_STATUSES = (JOB_QUEUED, JOB_PROVISIONING)
+
+
+class JobCancelled(Exception):
+    """The instance row left the provisioning state while its container was being created"""
+
+
+@dataclass(frozen=True)
+class ProvisioningJob:
+    """Everything a worker needs to create one container"""
+    job_id: int
+    user_id: int
+    challenge_id: str
+    container_name: str
+
+
+class ProvisioningQueue:
+    """Hands provisioning jobs to a pool of workers.
+
+    `provision` is called on a worker thread with the job and must block until
+    the container is up (e.g. by waiting on the Azure LRO poller). On success it
+    may return the instance URL when the backend only learns it once the
+    container has started; it raises on failure, in which case `on_failure` gets a
+    chance to tear down whatever was half created. Job state is written to the
+    instances table at every step, so `recover()` can pick up queued and
+    in-flight jobs after a restart.
+    """
+
+    def __init__(self, store: InstanceStore, provision: Callable[[ProvisioningJob], Optional[str]],
+                 lifetime: timedelta, workers: int = 8,
+                 on_failure: Optional[Callable[[ProvisioningJob, Exception], None]] = None,
+                 on_running: Optional[Callable[[ProvisioningJob, datetime], None]] = None):
+        self.store = store
+        self.provision = provision
+        self.lifetime = lifetime
+        self.on_failure = on_failure
+        self.on_running = on_running
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='provisioner')
+        self._inflight = set()
+        self._lock = threading.Lock()
+
+    def submit(self, job: ProvisioningJob) -> int:
+        """Queue a job whose row already exists with status 'queued'"""
+        with self._lock:
+            if job.job_id in self._inflight:
+                return job.job_id
+            self._inflight.add(job.job_id)
+        self.executor.submit(self._run, job)
+        return job.job_id
+
+    def _run(self, job: ProvisioningJob):
+        try:
+            if not self.store.set_job_status(job.job_id, JOB_PROVISIONING, from_statuses=PENDING_STATUSES):
+                print(f"⚠️  Job {job.job_id} was cancelled before provisioning started")
+                return
+
+            print(f"⏳ Provisioning job {job.job_id}: {job.container_name}")
+            url = self.provision(job)
+
+            # The instance lifetime starts once it is reachable, not when it was queued
+            expires_at = utcnow() + self.lifetime
+            if not self.store.set_job_status(job.job_id, JOB_RUNNING, from_statuses=(JOB_PROVISIONING,),
+                                             expires_at=expires_at, fqdn=url):
+                raise JobCancelled(f"Instance {job.container_name} was removed while provisioning")
+            print(f"✅ Job {job.job_id} running: {job.container_name}")
+            if self.on_running:
+                try:
+                    self.on_running(job, expires_at)
+                except Exception as handler_error:
+                    print(f"⚠️  Running handler error for job {job.job_id}: {handler_error}")
+
+        except Exception as e:
+            print(f"❌ Job {job.job_id} failed: {e}")
+            if not isinstance(e, JobCancelled):
+                try:
+                    self.store.set_job_status(job.job_id, JOB_FAILED, from_statuses=PENDING_STATUSES, error=str(e))
+                except Exception as db_error:
+                    print(f"❌ Could not record failure for job {job.job_id}: {db_error}")
+            if self.on_failure:
+                try:
+                    self.on_failure(job, e)
+                except Exception as cleanup_error:
+                    print(f"⚠️  Failure handler error for job {job.job_id}: {cleanup_error}")
+        finally:
+            with self._lock:
+                self._inflight.discard(job.job_id)
+
+    def recover(self) -> int:
+        """Re-queue jobs left queued or provisioning by a previous process"""
+        resumed = 0
+        for row in self.store.get_instances_by_status(PENDING_STATUSES):
+            self.submit(ProvisioningJob(row.id, row.user_id, row.challenge_id, row.container_name))
+            resumed += 1
+        if resumed:
+            print(f"🔁 Resumed {resumed} provisioning jobs")
+        return resumed
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+
+def job_status(row, challenges: Dict) -> Dict:
+    """Public view of a job for the status endpoint"""
+    data = row.to_dict(challenges)
+    if row.status != JOB_RUNNING:
+        data['url'] = None
+    return data
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Expired Instance Reaper
+Claims expired instances in bulk and deletes their containers in parallel
+"""
+
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from backends import ContainerBackend
+from capacity import CapacityManager
+from db import InstanceStore, utcnow
+
+
+@dataclass(frozen=True)
+class ReapResult:
+    """Outcome of one reaper pass"""
+    deleted: int = 0
+    failed: int = 0
+
+
+class Reaper:
+    """Tears down expired instances.
+
+    A sweep claims a batch of expired rows with one UPDATE (see
+    InstanceStore.claim_expired), deletes all of their containers through the
+    backend's batch API, retries the ones that failed with exponential
+    backoff, then marks the survivors deleted in one statement. Containers
+    that still could not be deleted are handed back so a later sweep retries
+    them instead of leaking. Claims are per sweep, so any number of replicas
+    can run reapers against the same table.
+    """
+
+    def __init__(self, store: InstanceStore, backend: ContainerBackend,
+                 capacity: Optional[CapacityManager] = None, workers: int = 8, batch_size: int = 100,
+                 attempts: int = 4, backoff: float = 1.0, claim_timeout: timedelta = timedelta(minutes=15),
+                 sleep: Callable[[float], None] = time.sleep):
+        self.store = store
+        self.backend = backend
+        self.capacity = capacity
+        self.workers = workers
+        self.batch_size = batch_size
+        self.attempts = attempts
+        self.backoff = backoff
+        # Longer than a sweep can take, so a live replica's claims are never stolen
+        self.claim_timeout = claim_timeout
+        self.sleep = sleep
+        self.replica = f"{socket.gethostname()[:32]}-{os.getpid()}"
+
+    def reap(self, now: Optional[datetime] = None) -> ReapResult:
+        """Sweep until no expired instances are left"""
+        deleted = failed = 0
+        while True:
+            result, claimed = self.sweep(now)
+            deleted += result.deleted
+            failed += result.failed
+            if claimed < self.batch_size or result.deleted == 0:
+                return ReapResult(deleted, failed)
+
+    def sweep(self, now: Optional[datetime] = None):
+        """Claim and delete one batch, returning (result, number of rows claimed)"""
+        now = now or utcnow()
+        token = f"{self.replica}-{uuid.uuid4().hex[:16]}"
+        rows = self.store.claim_expired(token, now, limit=self.batch_size,
+                                        stale_before=now - self.claim_timeout)
+        if not rows:
+            return ReapResult(), 0
+
+        print(f"🧹 Reaping {len(rows)} expired instances")
+        errors = self.delete_containers(row.container_name for row in rows)
+
+        done = [row for row in rows if row.container_name not in errors]
+        self.store.finish_claims([row.id for row in done], token)
+        self.store.release_claims([row.id for row in rows if row.container_name in errors], token)
+
+        if self.capacity:
+            for row in done:
+                self.capacity.release(row.container_name)
+        for name, error in errors.items():
+            print(f"   ⚠️  Could not delete {name}, will retry: {error}")
+        return ReapResult(len(done), len(errors)), len(rows)
+
+    def delete_containers(self, names: Iterable[str]) -> Dict[str, Exception]:
+        """Delete containers and wait for each, retrying failures with backoff.
+
+        Returns the containers that were still failing after the last attempt.
+        """
+        pending = list(names)
+        errors: Dict[str, Exception] = {}
+        for attempt in range(self.attempts):
+            results = self.backend.delete_many(pending, wait=True, max_workers=self.workers)
+            errors = {name: error for name, error in results.items() if error is not None}
+            if not errors:
+                return {}
+            pending = list(errors)
+            if attempt + 1 < self.attempts:
+                self.sleep(self.backoff * 2 ** attempt)
+        return errors
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Instance Expiry Scheduler
+Fires expiry at each instance's deadline instead of polling the database
+"""
+
+import heapq
+import itertools
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class ExpiryScheduler:
+    """Min-heap of instance deadlines served by one timer thread.
+
+    The thread sleeps until the earliest deadline (or indefinitely when
+    nothing is scheduled), then calls `on_expired` with every key that is
+    due. Rescheduling or cancelling a key only updates `_deadlines`; the old
+    heap entry is skipped when it surfaces, so both are O(log n).
+    """
+
+    def __init__(self, on_expired: Callable[[List[str]], None],
+                 clock: Callable[[], datetime] = datetime.utcnow):
+        self.on_expired = on_expired
+        self.clock = clock
+        self._heap: List[Tuple[datetime, int, str]] = []
+        # key -> (deadline, sequence) of its one live heap entry
+        self._deadlines: Dict[str, Tuple[datetime, int]] = {}
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='expiry-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+
+    def schedule(self, key: str, deadline: datetime):
+        """Expire `key` at `deadline`, replacing any earlier schedule for it"""
+        with self._cond:
+            self._push(key, deadline)
+            # Only wake the timer thread if its next deadline moved earlier
+            if self._heap[0][2] == key:
+                self._cond.notify()
+
+    def load(self, rows: Iterable):
+        """Schedule every row with an expires_at (e.g. the active instances at startup)"""
+        with self._cond:
+            for row in rows:
+                if row.expires_at is not None:
+                    self._push(row.container_name, row.expires_at)
+            self._cond.notify()
+
+    def cancel(self, key: str):
+        with self._cond:
+            self._deadlines.pop(key, None)
+            if not self._deadlines:
+                self._heap.clear()
+
+    def deadline(self, key: str) -> Optional[datetime]:
+        with self._cond:
+            entry = self._deadlines.get(key)
+            return entry[0] if entry else None
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._deadlines)
+
+    def _push(self, key: str, deadline: datetime):
+        sequence = next(self._sequence)
+        self._deadlines[key] = (deadline, sequence)
+        heapq.heappush(self._heap, (deadline, sequence, key))
+
+    def _is_live(self, entry: Tuple[datetime, int, str]) -> bool:
+        deadline, sequence, key = entry
+        return self._deadlines.get(key) == (deadline, sequence)
+
+    def pop_due(self, now: Optional[datetime] = None) -> List[str]:
+        """Remove and return every key whose deadline has passed"""
+        now = now or self.clock()
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                if self._is_live(entry):
+                    del self._deadlines[entry[2]]
+                    due.append(entry[2])
+        return due
+
+    def _wait_for_due(self) -> Optional[List[str]]:
+        with self._cond:
+            while not self._stopped:
+                while self._heap and not self._is_live(self._heap[0]):
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = (self._heap[0][0] - self.clock()).total_seconds()
+                if delay <= 0:
+                    return self.pop_due()
+                self._cond.wait(delay)
+            return None
+
+    def _run(self):
+        while True:
+            due = self._wait_for_due()
+            if due is None:
+                return
+            if not due:
+                continue
+            try:
+                self.on_expired(due)
+            except Exception as e:
+                print(f"❌ Expiry handler error: {e}")
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# The instancer runs as a flat set of modules from its own directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import InstanceStore  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    """InstanceStore backed by a SQLite stand-in for the CTFd database"""
+    store = InstanceStore.from_sqlite(str(tmp_path / "ctfd.sqlite"), pool_size=4)
+    store.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, password TEXT, type TEXT)"
+    )
+    store.init_schema()
+    return store
+
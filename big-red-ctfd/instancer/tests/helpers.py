@@ -0,0 +1,6 @@
+def create_user(store, user_id, name=None, password="x", type="user"):
+    name = name or f"user{user_id}"
+    store.execute(
+        "INSERT INTO users (id, name, email, password, type) VALUES (%s, %s, %s, %s, %s)",
+        (user_id, name, f"{name}@examplectf.com", password, type),
+    )
@@ -0,0 +1,121 @@
+import hashlib
+import hmac
+import json
+import pickle
+from datetime import datetime, timedelta
+
+import pytest
+from itsdangerous import Signer
+from passlib.hash import bcrypt_sha256
+
+from auth import AuthBridge, RedisSessionReader
+from helpers import create_user
+
+SECRET = "ctfd-secret"
+
+
+def test_password_verified_once_per_window(store):
+    create_user(store, 1, name="alice", password=bcrypt_sha256.hash("hunter2"))
+    now = [0.0]
+    auth = AuthBridge(store, ttl=60, negative_ttl=10, clock=lambda: now[0])
+
+    for _ in range(5):
+        assert auth.login("alice", "hunter2")["id"] == 1
+    assert auth.counters["bcrypt"] == 1
+
+    # Wrong passwords are cached too, for the shorter negative TTL
+    assert auth.login("alice", "wrong") is None
+    assert auth.login("alice", "wrong") is None
+    assert auth.counters["bcrypt"] == 2
+
+    now[0] += 61
+    assert auth.login("alice", "hunter2")["username"] == "alice"
+    assert auth.login("alice", "wrong") is None
+    assert auth.counters["bcrypt"] == 4
+
+
+def test_repeated_failures_are_throttled_without_bcrypt(store):
+    create_user(store, 1, name="alice", password=bcrypt_sha256.hash("hunter2"))
+    now = [0.0]
+    auth = AuthBridge(store, max_failures=3, failure_window=300, clock=lambda: now[0])
+
+    for guess in ("a", "b", "c", "d", "hunter2"):
+        assert auth.login("alice", guess) is None
+    assert auth.counters["bcrypt"] == 3
+    assert auth.counters["throttled"] == 2
+
+    now[0] += 301
+    assert auth.login("alice", "hunter2")["id"] == 1
+
+
+def test_failures_from_one_address_do_not_lock_out_another(store):
+    create_user(store, 1, name="alice", password=bcrypt_sha256.hash("hunter2"))
+    auth = AuthBridge(store, max_failures=3, failure_window=300)
+
+    for guess in ("a", "b", "c", "d", "hunter2"):
+        assert auth.login("alice", guess, client_ip="203.0.113.7") is None
+    assert auth.counters["throttled"] == 2
+
+    assert auth.login("alice", "hunter2", client_ip="198.51.100.2")["id"] == 1
+    # The refused attempt with the right password was not cached for everyone
+    assert auth.counters["throttled"] == 2
+
+
+def test_api_tokens_resolve_to_their_owner_until_expiry(store):
+    create_user(store, 1)
+    store.execute(
+        "CREATE TABLE tokens (id INTEGER PRIMARY KEY, type TEXT, user_id INTEGER, "
+        "expiration TIMESTAMP, value TEXT)"
+    )
+    store.execute(
+        "INSERT INTO tokens (type, user_id, expiration, value) VALUES (%s, %s, %s, %s), (%s, %s, %s, %s)",
+        (
+            "user", 1, datetime.utcnow() + timedelta(days=1), "ctfd_live",
+            "user", 1, datetime.utcnow() - timedelta(days=1), "ctfd_old",
+        ),
+    )
+    auth = AuthBridge(store)
+
+    assert auth.from_token("ctfd_live")["username"] == "user1"
+    assert auth.from_token("ctfd_old") is None
+    assert auth.from_token("ctfd_unknown") is None
+    assert auth.from_token("ctfd_live")["id"] == 1
+    assert auth.counters["hits"] == 1
+
+
+def test_ctfd_session_cookie(store):
+    create_user(store, 1, password="$bcrypt-sha256$stored")
+    session_hash = hmac.new(SECRET.encode(), b"$bcrypt-sha256$stored", hashlib.sha1).hexdigest()
+    sessions = {
+        "good": {"id": 1, "nonce": "n", "hash": session_hash},
+        "stale": {"id": 1, "nonce": "n", "hash": "from-an-old-password"},
+    }
+    auth = AuthBridge(store, secret_key=SECRET, session_reader=sessions.get)
+
+    def cookie(sid, secret=SECRET):
+        return Signer(secret).sign(sid.encode()).decode()
+
+    assert auth.from_session_cookie(cookie("good"))["id"] == 1
+    assert auth.from_session_cookie(cookie("stale")) is None
+    assert auth.from_session_cookie(cookie("missing")) is None
+    assert auth.from_session_cookie(cookie("good", secret="forged")) is None
+    assert auth.from_session_cookie("good") is None
+
+
+def test_redis_reader_decodes_flask_caching_values():
+    class FakeRedis(dict):
+        pass
+
+    value = json.dumps({"id": 7, "hash": "h"})
+    client = FakeRedis(
+        {
+            "flask_cache_sessionabc": b"!" + pickle.dumps(value),
+            "flask_cache_sessionevil": b"!" + pickle.dumps(datetime.utcnow()),
+        }
+    )
+    reader = RedisSessionReader(None, client=client)
+
+    assert reader("abc") == {"id": 7, "hash": "h"}
+    assert reader("nothing") is None
+    with pytest.raises(pickle.UnpicklingError):
+        reader("evil")
@@ -0,0 +1,227 @@
+import json
+import socketserver
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from backends import (
+    STATUS_MISSING,
+    STATUS_RUNNING,
+    ContainerInfo,
+    ContainerSpec,
+    DockerBackend,
+    FakeBackend,
+)
+from challenge_instancer import ChallengeInstancer
+from events import CTFdEventPublisher
+from helpers import create_user
+
+CHALLENGES = {
+    "eaas": {"name": "EaaS", "image": "registry/eaas:latest", "port": 1337},
+}
+LIMITS = {"max_global_instances": 5, "warning_threshold": 4}
+
+
+def make_instancer(store, backend):
+    return ChallengeInstancer(
+        store, backend, CHALLENGES, LIMITS, timedelta(minutes=15), background=False
+    )
+
+
+def test_fake_backend_batches_and_filters():
+    """Batch create/delete report per-container results and list() filters by tag"""
+    backend = FakeBackend(failure_rate=0.5, seed=3)
+    specs = [
+        ContainerSpec(f"c{i}", None, 1337, tags={"challenge": "eaas" if i % 2 else "web"})
+        for i in range(20)
+    ]
+    results = backend.create_many(specs, max_workers=4)
+
+    created = [name for name, result in results.items() if not isinstance(result, Exception)]
+    assert 0 < len(created) < 20
+    assert backend.running == len(created) == backend.peak
+    assert {c.name for c in backend.list({"challenge": "eaas"})} == {
+        name for name in created if int(name[1:]) % 2
+    }
+
+    assert backend.delete_many(created + ["never-existed"]) == {
+        name: None for name in created + ["never-existed"]
+    }
+    assert backend.running == 0
+    assert backend.status("c1").status == STATUS_MISSING
+
+
+def test_instancer_runs_instances_on_backend(store):
+    """Creating and deleting an instance goes through the configured backend"""
+    create_user(store, 1)
+    backend = FakeBackend()
+    instancer = make_instancer(store, backend)
+
+    result = instancer.create_challenge_instance(1, "abcd1234", "eaas")
+    assert result["success"]
+    instancer.provisioner.shutdown()
+
+    status = instancer.get_job_status(1, result["job_id"])
+    assert status["status"] == "running"
+    assert status["url"] == f"http://{result['container_name']}.fake.local:1337"
+    assert backend.status(result["container_name"]).tags == {"challenge": "eaas"}
+
+    assert instancer.delete_instance(1, result["container_name"])
+    assert backend.running == 0
+    assert instancer.capacity.used == 0
+
+
+def test_running_instances_are_announced_to_ctfd(store):
+    """Once a queued instance runs, an event goes to the owner's CTFd channel"""
+    create_user(store, 1)
+
+    class FakeRedis:
+        def __init__(self):
+            self.counter = 0
+            self.published = []
+
+        def incr(self, key):
+            self.counter += 1
+            return self.counter
+
+        def publish(self, channel, message):
+            self.published.append((channel, json.loads(message)))
+            return 1
+
+    client = FakeRedis()
+    instancer = ChallengeInstancer(
+        store,
+        FakeBackend(),
+        CHALLENGES,
+        LIMITS,
+        timedelta(minutes=15),
+        background=False,
+        events=CTFdEventPublisher(None, client=client),
+    )
+    result = instancer.create_challenge_instance(1, "abcd1234", "eaas")
+    instancer.provisioner.shutdown()
+
+    [(channel, event)] = client.published
+    assert channel == "ctfd.events.user:1"
+    assert event["type"] == "instance"
+    assert event["id"] == 1
+    assert event["data"]["status"] == "running"
+    assert event["data"]["url"] == f"http://{result['container_name']}.fake.local:1337"
+
+
+def test_url_assigned_at_start_is_stored(store):
+    """Backends that only learn the URL once the container runs fill it in afterwards"""
+    create_user(store, 1)
+
+    class LatePortBackend(FakeBackend):
+        def url_for(self, spec):
+            return None
+
+        def create(self, spec):
+            super().create(spec)
+            return ContainerInfo(spec.name, STATUS_RUNNING, "http://localhost:49153")
+
+    backend = LatePortBackend()
+    instancer = make_instancer(store, backend)
+    result = instancer.create_challenge_instance(1, "abcd1234", "eaas")
+    assert result["url"] is None
+    instancer.provisioner.shutdown()
+
+    assert instancer.get_job_status(1, result["job_id"])["url"] == "http://localhost:49153"
+
+
+def test_instancer_without_backend_refuses_to_create(store):
+    create_user(store, 1)
+    instancer = make_instancer(store, None)
+    result = instancer.create_challenge_instance(1, "abcd1234", "eaas")
+    assert not result["success"]
+    assert instancer.capacity.used == 0
+
+
+class FakeDockerDaemon(BaseHTTPRequestHandler):
+    """Just enough of the Docker Engine API to create, inspect and remove a container"""
+
+    images = set()
+    containers = {}
+    calls = []
+
+    def log_message(self, *args):
+        pass
+
+    def address_string(self):
+        return "docker"
+
+    def reply(self, status, body=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        path = self.path.split("/", 2)[2]
+        self.calls.append(("POST", path))
+        if path.startswith("images/create"):
+            self.images.add("registry/eaas:latest")
+            self.reply(200, {"status": "Downloaded newer image"})
+        elif path.startswith("containers/create"):
+            if body["Image"] not in self.images:
+                return self.reply(404, {"message": "No such image"})
+            name = path.split("name=")[1]
+            self.containers[name] = {"body": body, "state": "created"}
+            self.reply(201, {"Id": name})
+        elif path.endswith("/start"):
+            self.containers[path.split("/")[1]]["state"] = "running"
+            self.reply(204)
+
+    def do_GET(self):
+        name = self.path.split("/")[3]
+        container = self.containers.get(name)
+        if container is None:
+            return self.reply(404, {"message": "No such container"})
+        self.reply(200, {
+            "Name": f"/{name}",
+            "State": {"Status": container["state"]},
+            "Config": {"Labels": container["body"]["Labels"]},
+            "NetworkSettings": {"Ports": {"1337/tcp": [{"HostIp": "0.0.0.0", "HostPort": "49153"}]}},
+        })
+
+    def do_DELETE(self):
+        name = self.path.split("/")[3].split("?")[0]
+        self.calls.append(("DELETE", name))
+        self.reply(204 if self.containers.pop(name, None) else 404, None)
+
+
+@pytest.fixture
+def docker_socket(tmp_path):
+    FakeDockerDaemon.images = set()
+    FakeDockerDaemon.containers = {}
+    FakeDockerDaemon.calls = []
+    path = str(tmp_path / "docker.sock")
+    server = socketserver.ThreadingUnixStreamServer(path, FakeDockerDaemon)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+def test_docker_backend_pulls_starts_and_removes(docker_socket):
+    backend = DockerBackend(socket_path=docker_socket, public_host="ctf.local")
+    spec = ContainerSpec("cornell-eaas-1", "registry/eaas:latest", 1337, tags={"challenge": "eaas"})
+
+    info = backend.create(spec)
+    assert info.status == STATUS_RUNNING
+    assert info.url == "http://ctf.local:49153"
+    assert info.tags == {"created_by": "challenge_instancer", "challenge": "eaas"}
+    # The image was missing, so it was pulled and the create retried
+    assert [call[1].split("?")[0] for call in FakeDockerDaemon.calls] == [
+        "containers/create", "images/create", "containers/create", "containers/cornell-eaas-1/start"
+    ]
+
+    backend.delete("cornell-eaas-1")
+    backend.delete("cornell-eaas-1")
+    assert backend.status("cornell-eaas-1").status == STATUS_MISSING
@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+
+from capacity import CapacityExceeded, CapacityManager
+from db import utcnow
+from helpers import create_user
+from provisioning import ProvisioningJob, ProvisioningQueue
+
+
+class FakeAzureContainerGroups:
+    """Stands in for ContainerInstanceManagementClient.container_groups"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.live = set()
+        self.peak = 0
+
+    def begin_create_or_update(self, container_group_name, **kwargs):
+        time.sleep(random.uniform(0, 0.005))
+        with self.lock:
+            self.live.add(container_group_name)
+            self.peak = max(self.peak, len(self.live))
+
+    def begin_delete(self, container_group_name, **kwargs):
+        with self.lock:
+            self.live.discard(container_group_name)
+
+
+def test_reserve_enforces_each_quota():
+    """Global, per-challenge, per-user and duplicate limits are all checked"""
+    capacity = CapacityManager(3, max_per_user=2, per_challenge={"eaas": 1})
+
+    capacity.reserve(1, "eaas", "a")
+    capacity.reserve(1, "vuln-app", "b")
+    with pytest.raises(CapacityExceeded) as e:
+        capacity.reserve(1, "pwn", "c")
+    assert e.value.scope == "user"
+
+    with pytest.raises(CapacityExceeded) as e:
+        capacity.reserve(2, "eaas", "d")
+    assert e.value.scope == "challenge"
+
+    with pytest.raises(CapacityExceeded) as e:
+        capacity.reserve(1, "vuln-app", "e")
+    assert e.value.scope == "duplicate"
+
+    capacity.reserve(3, "web", "f")
+    with pytest.raises(CapacityExceeded) as e:
+        capacity.reserve(4, "web2", "g")
+    assert e.value.scope == "global"
+
+    # Releasing is idempotent and frees the slot for everyone
+    assert capacity.release("a")
+    assert not capacity.release("a")
+    capacity.reserve(2, "eaas", "h")
+    assert capacity.used == 3
+
+
+def test_reconcile_keeps_unwritten_reservations(store):
+    """Reconciling with the DB does not drop slots whose rows are still being written"""
+    create_user(store, 1)
+    create_user(store, 2)
+    capacity = CapacityManager(10)
+    store.insert_instance(1, "eaas", "in-db", "u", utcnow(), status="running")
+    capacity.reserve(2, "eaas", "in-flight")
+
+    capacity.reconcile(store.get_active_instances())
+    assert capacity.used == 2
+
+    capacity.confirm(capacity.reserve(2, "vuln-app", "confirmed"))
+    capacity.reconcile(store.get_active_instances())
+    # "confirmed" never reached the table, so it is dropped once confirmed
+    assert capacity.used == 2
+
+
+def test_database_guard_blocks_other_replicas(store):
+    """The guarded insert holds the line even when in-memory counters disagree"""
+    for user_id in range(1, 4):
+        create_user(store, user_id)
+    replica_a = CapacityManager(2)
+    replica_b = CapacityManager(2)
+
+    replica_a.admit(store, 1, "eaas", "a", "u", utcnow(), status="queued")
+    with pytest.raises(CapacityExceeded) as e:
+        replica_b.admit(store, 1, "eaas", "b", "u", utcnow(), status="queued")
+    assert e.value.scope == "duplicate"
+
+    replica_b.admit(store, 2, "eaas", "c", "u", utcnow(), status="queued")
+    with pytest.raises(CapacityExceeded) as e:
+        replica_a.admit(store, 3, "eaas", "d", "u", utcnow(), status="queued")
+    assert e.value.scope == "global"
+
+    # The failed admissions gave their in-memory slots back
+    assert (replica_a.used, replica_b.used) == (1, 1)
+    assert store.count_active() == 2
+
+
+def test_parallel_creates_never_exceed_cap(store):
+    """Hundreds of concurrent creates across several replicas never pass the global cap"""
+    max_global = 25
+    users = 200
+    for user_id in range(1, users + 1):
+        create_user(store, user_id)
+
+    azure = FakeAzureContainerGroups()
+    replicas = [CapacityManager(max_global) for _ in range(3)]
+    stop = threading.Event()
+    observed = []
+
+    def watch_db():
+        while not stop.is_set():
+            observed.append(store.count_active())
+
+    def provision(job):
+        azure.begin_create_or_update(container_group_name=job.container_name)
+
+    def abort(job, error):
+        # Mirrors ChallengeInstancer._abort_provisioning for rows deleted mid-provisioning
+        azure.begin_delete(container_group_name=job.container_name)
+
+    queue = ProvisioningQueue(
+        store, provision, lifetime=timedelta(minutes=15), workers=16, on_failure=abort
+    )
+
+    def create(i):
+        capacity = replicas[i % len(replicas)]
+        user_id = i % users + 1
+        challenge_id = random.choice(["eaas", "vuln-app"])
+        name = f"cornell-{challenge_id}-{i}"
+        try:
+            job_id = capacity.admit(store, user_id, challenge_id, name, "u", utcnow(), status="queued")
+        except CapacityExceeded:
+            return False
+        queue.submit(ProvisioningJob(job_id, user_id, challenge_id, name))
+        # Free some slots again so admission keeps contending on a moving count
+        if random.random() < 0.3:
+            while store.get_instance(job_id).status != "running":
+                time.sleep(0.001)
+            if store.mark_deleted(name, user_id=user_id):
+                capacity.release(name)
+                azure.begin_delete(container_group_name=name)
+        return True
+
+    watcher = threading.Thread(target=watch_db)
+    watcher.start()
+    with ThreadPoolExecutor(max_workers=64) as pool:
+        admitted = sum(pool.map(create, range(400)))
+    queue.shutdown()
+    stop.set()
+    watcher.join()
+
+    assert admitted >= max_global
+    assert max(observed) <= max_global
+    assert store.count_active() <= max_global
+    assert azure.peak <= max_global
@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+import pytest
+
+from db import UserRow, utcnow
+from helpers import create_user
+
+
+def test_get_user_by_name_is_parameterized(store):
+    """Usernames are bound as parameters, not interpolated into SQL"""
+    create_user(store, 1, name="alice")
+    assert store.get_user_by_name("alice") == UserRow(
+        1, "alice", "alice@examplectf.com", "x", "user"
+    )
+    assert store.get_user_by_name("alice' OR '1'='1") is None
+
+
+def test_instance_lifecycle(store):
+    """Inserted instances show up as active until they are marked deleted"""
+    create_user(store, 1)
+    expires_at = utcnow() + timedelta(minutes=15)
+    store.insert_instance(1, "eaas", "cornell-eaas-1", "http://eaas-1:1337", expires_at)
+
+    assert store.has_active_instance(1, "eaas")
+    assert not store.has_active_instance(1, "vuln-app")
+    assert store.count_active() == 1
+
+    rows = store.get_user_instances(1)
+    assert [r.container_name for r in rows] == ["cornell-eaas-1"]
+    data = rows[0].to_dict({"eaas": {"name": "EaaS"}})
+    assert data["challenge_name"] == "EaaS"
+    assert data["expires_at"] == expires_at.strftime("%Y-%m-%d %H:%M:%S")
+
+    # Deletes are scoped to the owning user when a user_id is given
+    assert store.mark_deleted("cornell-eaas-1", user_id=2) == 0
+    assert store.mark_deleted("cornell-eaas-1", user_id=1) == 1
+    assert store.count_active() == 0
+    assert store.get_user_instances(1) == []
+    assert len(store.get_user_instances(1, include_deleted=True)) == 1
+
+
+def test_expired_instances_and_stats(store):
+    """Expiry and aggregate stats are computed from bound timestamps"""
+    create_user(store, 1)
+    create_user(store, 2)
+    now = utcnow()
+    store.insert_instance(1, "eaas", "expired", "u", now - timedelta(minutes=1))
+    store.insert_instance(2, "eaas", "live", "u", now + timedelta(minutes=5))
+    store.insert_instance(2, "vuln-app", "creating", "u", now + timedelta(minutes=5), status="creating")
+
+    assert [r.container_name for r in store.get_expired_instances(now)] == ["expired"]
+
+    stats = store.get_stats()
+    assert stats.active_count == 3
+    assert stats.active_users == 2
+    assert stats.total_users == 2
+    assert stats.by_challenge == {"eaas": 2, "vuln-app": 1}
+    assert stats.by_status == {"running": 2, "creating": 1}
+
+    admin_rows = store.get_active_instances_with_users()
+    assert {r.username for r in admin_rows} == {"user1", "user2"}
+
+
+class LockError(Exception):
+    def __init__(self, errno):
+        super().__init__(errno)
+        self.errno = errno
+
+
+def test_insert_instance_if_capacity_retries_deadlocks(store, monkeypatch):
+    """Deadlocks are retried, other errors and refusals are not"""
+    create_user(store, 1)
+    connection = store.connection
+    errors = [LockError(1213), LockError(1205)]
+
+    def flaky_connection():
+        if errors:
+            raise errors.pop(0)
+        return connection()
+
+    monkeypatch.setattr(store, "connection", flaky_connection)
+    monkeypatch.setattr("db.DEADLOCK_BACKOFF", 0)
+    assert store.insert_instance_if_capacity(1, "eaas", "a", "u", utcnow(), max_global=2) is not None
+    assert store.insert_instance_if_capacity(1, "eaas", "b", "u", utcnow(), max_global=2) is None
+    assert store.insert_instance_if_capacity(1, "vuln-app", "b", "u", utcnow(), max_global=1) is None
+
+    errors.append(LockError(1062))
+    with pytest.raises(LockError):
+        store.insert_instance_if_capacity(1, "vuln-app", "c", "u", utcnow(), max_global=2)
+    assert store.count_active() == 1
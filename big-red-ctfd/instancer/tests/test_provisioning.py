@@ -0,0 +1,106 @@
+import threading
+from datetime import timedelta
+
+from db import utcnow
+from helpers import create_user
+from provisioning import ProvisioningJob, ProvisioningQueue
+
+
+def queue_job(store, user_id=1, name="cornell-eaas-1"):
+    job_id = store.insert_instance(
+        user_id, "eaas", name, "http://eaas:1337", utcnow(), status="queued"
+    )
+    return ProvisioningJob(job_id, user_id, "eaas", name)
+
+
+def test_job_moves_from_queued_to_running(store):
+    """A successful job ends up running with its lifetime starting at that point"""
+    create_user(store, 1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def provision(job):
+        started.set()
+        release.wait(5)
+
+    queue = ProvisioningQueue(store, provision, lifetime=timedelta(minutes=15), workers=2)
+    job = queue_job(store)
+    assert queue.submit(job) == job.job_id
+
+    assert started.wait(5)
+    assert store.get_instance(job.job_id).status == "provisioning"
+    release.set()
+    queue.shutdown()
+
+    row = store.get_instance(job.job_id, user_id=1)
+    assert row.status == "running"
+    assert row.expires_at > utcnow() + timedelta(minutes=14)
+    assert store.get_instance(job.job_id, user_id=2) is None
+
+
+def test_failed_job_is_recorded_and_cleaned_up(store):
+    """Provisioning errors mark the job failed and run the failure handler"""
+    create_user(store, 1)
+    aborted = []
+
+    def provision(job):
+        raise RuntimeError("quota exceeded")
+
+    queue = ProvisioningQueue(
+        store,
+        provision,
+        lifetime=timedelta(minutes=15),
+        on_failure=lambda job, error: aborted.append(job.container_name),
+    )
+    job = queue_job(store)
+    queue.submit(job)
+    queue.shutdown()
+
+    row = store.get_instance(job.job_id)
+    assert row.status == "failed"
+    assert row.error == "quota exceeded"
+    assert aborted == ["cornell-eaas-1"]
+    assert not store.has_active_instance(1, "eaas")
+
+
+def test_instance_deleted_while_provisioning_is_torn_down(store):
+    """A row deleted mid-provisioning never flips back to running"""
+    create_user(store, 1)
+    aborted = []
+
+    def provision(job):
+        store.mark_deleted(job.container_name, user_id=job.user_id)
+
+    queue = ProvisioningQueue(
+        store,
+        provision,
+        lifetime=timedelta(minutes=15),
+        on_failure=lambda job, error: aborted.append(job.container_name),
+    )
+    job = queue_job(store)
+    queue.submit(job)
+    queue.shutdown()
+
+    assert store.get_instance(job.job_id).status == "deleted"
+    assert aborted == ["cornell-eaas-1"]
+
+
+def test_recover_resumes_pending_jobs(store):
+    """Jobs left queued or provisioning by a previous process are re-run"""
+    create_user(store, 1)
+    queued = queue_job(store, name="queued")
+    in_flight = queue_job(store, name="in-flight")
+    store.set_job_status(in_flight.job_id, "provisioning", from_statuses=("queued",))
+    done = queue_job(store, name="done")
+    store.set_job_status(done.job_id, "running", from_statuses=("queued",))
+
+    provisioned = []
+    queue = ProvisioningQueue(
+        store, lambda job: provisioned.append(job.container_name), lifetime=timedelta(minutes=15)
+    )
+    assert queue.recover() == 2
+    queue.shutdown()
+
+    assert sorted(provisioned) == ["in-flight", "queued"]
+    assert store.get_instance(queued.job_id).status == "running"
+    assert store.get_instance(in_flight.job_id).status == "running"
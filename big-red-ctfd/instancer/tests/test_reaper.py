@@ -0,0 +1,92 @@
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from backends import ContainerSpec, FakeBackend
+from capacity import CapacityManager
+from db import utcnow
+from helpers import create_user
+from reaper import Reaper
+
+
+class RecordingBackend(FakeBackend):
+    """Counts delete calls and can fail the first few deletes of chosen containers"""
+
+    def __init__(self, fail_times=None, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_times = Counter(fail_times or {})
+        self.delete_calls = Counter()
+        self.calls_lock = threading.Lock()
+
+    def delete(self, name, wait=True):
+        with self.calls_lock:
+            self.delete_calls[name] += 1
+            if self.fail_times[name] > 0:
+                self.fail_times[name] -= 1
+                raise RuntimeError("Azure said no")
+        super().delete(name, wait=wait)
+
+
+def expire(store, backend, count, user_id=1):
+    past = utcnow() - timedelta(minutes=1)
+    for i in range(count):
+        store.insert_instance(user_id, f"chal{i}", f"c{i}", "u", past, status="running")
+        backend.create(ContainerSpec(f"c{i}", None, 1337))
+
+
+def test_replicas_never_delete_the_same_instance(store):
+    """Reapers racing on one table split the expired rows between them"""
+    create_user(store, 1)
+    backend = RecordingBackend(delete_latency=0.001)
+    store.insert_instance(1, "live", "live", "u", utcnow() + timedelta(hours=1), status="running")
+    expire(store, backend, 60)
+
+    reapers = [Reaper(store, backend, workers=4, batch_size=7) for _ in range(4)]
+    threads = [threading.Thread(target=reaper.reap) for reaper in reapers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(backend.delete_calls) == {f"c{i}" for i in range(60)}
+    assert max(backend.delete_calls.values()) == 1
+    assert [row.container_name for row in store.get_active_instances()] == ["live"]
+    assert store.get_instances_by_status(["deleting"]) == []
+
+
+def test_failed_deletes_are_retried_then_handed_back(store):
+    """Transient failures are retried with backoff; persistent ones stay claimable"""
+    create_user(store, 1)
+    backend = RecordingBackend(fail_times={"c0": 2, "c1": 10})
+    expire(store, backend, 3)
+    capacity = CapacityManager(10)
+    capacity.reconcile(store.get_active_instances())
+    sleeps = []
+
+    reaper = Reaper(store, backend, capacity, attempts=3, backoff=0.5, sleep=sleeps.append)
+    result = reaper.reap()
+
+    assert (result.deleted, result.failed) == (2, 1)
+    assert sleeps == [0.5, 1.0]
+    assert backend.delete_calls == {"c0": 3, "c1": 3, "c2": 1}
+    assert capacity.used == 1
+
+    # The leftover is still marked for deletion and the next pass picks it up
+    (row,) = store.get_instances_by_status(["deleting"])
+    assert row.container_name == "c1"
+    backend.fail_times.clear()
+    assert reaper.reap().deleted == 1
+    assert backend.running == 0
+
+
+def test_stale_claims_are_taken_over(store):
+    """Rows claimed by a replica that died mid-sweep are reaped after the claim timeout"""
+    create_user(store, 1)
+    backend = RecordingBackend()
+    expire(store, backend, 2)
+    now = utcnow()
+    assert len(store.claim_expired("dead-replica", now)) == 2
+
+    reaper = Reaper(store, backend, claim_timeout=timedelta(minutes=15))
+    assert reaper.reap(now).deleted == 0
+    assert reaper.reap(now + timedelta(minutes=16)).deleted == 2
@@ -0,0 +1,115 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from backends import FakeBackend
+from challenge_instancer import ChallengeInstancer
+from helpers import create_user
+from scheduler import ExpiryScheduler
+
+CHALLENGES = {"eaas": {"name": "EaaS", "image": "registry/eaas:latest", "port": 1337}}
+LIMITS = {"max_global_instances": 5}
+
+
+def soon(seconds):
+    return datetime.utcnow() + timedelta(seconds=seconds)
+
+
+def test_fires_at_deadline_and_honours_cancel_and_reschedule():
+    fired = []
+    done = threading.Event()
+
+    def on_expired(keys):
+        fired.append((keys, time.monotonic()))
+        done.set()
+
+    scheduler = ExpiryScheduler(on_expired)
+    scheduler.start()
+    started = time.monotonic()
+
+    scheduler.schedule("a", soon(0.05))
+    scheduler.schedule("b", soon(0.1))
+    scheduler.cancel("b")
+    scheduler.schedule("a", soon(0.2))
+    assert len(scheduler) == 1
+
+    assert done.wait(2)
+    time.sleep(0.2)
+    scheduler.stop()
+
+    assert [keys for keys, _ in fired] == [["a"]]
+    assert fired[0][1] - started >= 0.19
+    assert len(scheduler) == 0
+
+
+def test_idle_scheduler_wakes_for_new_deadlines():
+    """With nothing scheduled the timer thread just waits to be told about work"""
+    done = threading.Event()
+    scheduler = ExpiryScheduler(lambda keys: done.set())
+    scheduler.start()
+    time.sleep(0.05)
+    assert not done.is_set()
+
+    scheduler.schedule("a", soon(0))
+    assert done.wait(1)
+    scheduler.stop()
+
+
+def make_instancer(store, backend, lifetime):
+    return ChallengeInstancer(store, backend, CHALLENGES, LIMITS, lifetime, resync_interval=None)
+
+
+def test_instances_are_reaped_when_they_expire(store):
+    create_user(store, 1)
+    backend = FakeBackend()
+    instancer = make_instancer(store, backend, timedelta(seconds=1))
+
+    assert instancer.create_challenge_instance(1, "aaaa", "eaas")["success"]
+    deadline = time.monotonic() + 5
+    while (backend.created == 0 or instancer.capacity.used) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    instancer.scheduler.stop()
+
+    assert (backend.created, backend.running) == (1, 0)
+    assert store.get_active_instances() == []
+    assert instancer.capacity.used == 0
+
+
+def test_extend_reschedules_running_instances(store):
+    create_user(store, 1)
+    instancer = make_instancer(store, FakeBackend(), timedelta(minutes=15))
+    result = instancer.create_challenge_instance(1, "aaaa", "eaas")
+    instancer.provisioner.shutdown()
+    before = instancer.scheduler.deadline(result["container_name"])
+
+    instancer.lifetime = timedelta(minutes=30)
+    extended = instancer.extend_instance(1, result["container_name"])
+    assert extended["success"]
+    assert instancer.scheduler.deadline(result["container_name"]) > before
+    assert not instancer.extend_instance(2, result["container_name"])["success"]
+    instancer.scheduler.stop()
+
+
+def test_idle_instancer_skips_resync_until_requested(store):
+    """Nothing scheduled means no table reads, until a refused create asks for one"""
+    for user_id in (1, 2):
+        create_user(store, user_id)
+    instancer = make_instancer(store, FakeBackend(), timedelta(minutes=15))
+    deadline = time.monotonic() + 5
+    while len(instancer.scheduler) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not instancer.resync()
+
+    # Another replica fills the cap, which this one only learns about from the table
+    for i in range(LIMITS["max_global_instances"]):
+        store.insert_instance(1, f"other-{i}", f"other-{i}", "u", soon(900))
+    instancer.request_resync()
+    assert instancer.resync()
+    assert instancer.capacity.used == LIMITS["max_global_instances"]
+    # Those deadlines are now scheduled here, so later intervals resync again
+    assert instancer.resync()
+
+    result = instancer.create_challenge_instance(2, "bbbb", "eaas")
+    assert result["error_type"] == "capacity_limit"
+    assert instancer._resync_requested.is_set()
+    instancer.scheduler.stop()
@@ -0,0 +1,124 @@
+import time
+from datetime import timedelta
+
+from backends import ContainerSpec, FakeBackend
+from capacity import CapacityManager
+from challenge_instancer import ChallengeInstancer
+from helpers import create_user
+from warm_pool import POOL_ASSIGNED, WarmPool
+
+CHALLENGES = {
+    "eaas": {"name": "EaaS", "image": "registry/eaas:latest", "port": 1337},
+    "vuln-app": {"name": "Vulnerable Web App", "image": "registry/vuln-app:latest", "port": 1337},
+}
+
+
+def spec_for(challenge_id, name):
+    return ContainerSpec(name, None, 1337, tags={"challenge": challenge_id})
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_ready_container_is_handed_out_and_pool_refilled(store):
+    create_user(store, 1)
+    backend = FakeBackend()
+    instancer = ChallengeInstancer(
+        store,
+        backend,
+        CHALLENGES,
+        {"max_global_instances": 10},
+        timedelta(minutes=15),
+        warm_pool_min=2,
+        warm_pool_max=4,
+        background=False,
+    )
+    instancer.pool.refill()
+    wait_until(lambda: instancer.pool.stats()["eaas"]["ready"] == 2)
+
+    result = instancer.create_challenge_instance(1, "abcd1234", "eaas")
+    assert result["status"] == "running"
+    assert result["url"] == f"http://{result['container_name']}.fake.local:1337"
+    assert "-pool-" in result["container_name"]
+    assert store.get_instance(result["job_id"]).status == "running"
+    wait_until(lambda: backend.status(result["container_name"]).tags["pool"] == POOL_ASSIGNED)
+
+    # The handed-out container is an instance now; the pool makes a new one
+    instancer.pool.refill()
+    wait_until(lambda: instancer.pool.stats()["eaas"]["ready"] == 2)
+    assert instancer.pool.stats()["eaas"]["hits"] == 1
+    assert instancer.capacity.snapshot()["standby"] == 4
+    assert backend.running == 5
+
+    # A restarted instancer adopts the ready containers but not the assigned one
+    instancer.pool.stop()
+    restarted = ChallengeInstancer(
+        store,
+        backend,
+        CHALLENGES,
+        {"max_global_instances": 10},
+        timedelta(minutes=15),
+        warm_pool_max=4,
+        background=False,
+    )
+    assert {cid: s["ready"] for cid, s in restarted.pool.stats().items()} == {
+        "eaas": 2,
+        "vuln-app": 2,
+    }
+
+
+def test_pool_counts_against_global_capacity():
+    """Standby containers take real slots, and refills never exceed the limit"""
+    backend = FakeBackend()
+    capacity = CapacityManager(3)
+    pool = WarmPool(backend, capacity, spec_for, CHALLENGES, min_size=2)
+    pool.refill()
+    pool.stop()
+
+    assert sum(s["ready"] for s in pool.stats().values()) == 3
+    assert backend.running == 3
+    assert capacity.available() == 0
+
+    assert pool.take("eaas") is not None
+    assert capacity.available() == 1
+    capacity.reserve(1, "eaas", "user-container")
+    assert capacity.available() == 0
+
+
+def test_autosize_follows_demand():
+    now = [0.0]
+
+    class SlowBackend(FakeBackend):
+        def create(self, spec):
+            now[0] += 20  # every create "takes" 20 seconds
+            return super().create(spec)
+
+    pool = WarmPool(
+        SlowBackend(),
+        CapacityManager(100),
+        spec_for,
+        CHALLENGES,
+        min_size=1,
+        max_size=8,
+        workers=1,
+        demand_window=60,
+        clock=lambda: now[0],
+    )
+    pool.refill()
+    pool.executor.shutdown(wait=True)
+
+    # 12 requests a minute with 20s creates: 4 in flight, plus 50% headroom
+    for _ in range(12):
+        pool.take("eaas")
+    assert pool.autosize() == {"eaas": 6, "vuln-app": 1}
+
+    # Demand ages out of the window and the pool falls back to its floor
+    now[0] += 120
+    assert pool.autosize() == {"eaas": 1, "vuln-app": 1}
+
+    pool.set_target("vuln-app", 50)
+    assert pool.stats()["vuln-app"]["target"] == 8
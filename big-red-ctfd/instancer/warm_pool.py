@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Warm Container Pool
+Keeps ready containers per challenge so instances can be handed out instantly
+"""
+
+import math
+import secrets
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, List, Optional
+
+from backends import ContainerBackend, ContainerInfo, ContainerSpec
+from capacity import CapacityManager
+
+# Tag values marking where a pooled container is in its life
+POOL_READY = 'ready'
+POOL_ASSIGNED = 'assigned'
+
+
+class WarmPool:
+    """Per-challenge pools of running containers that nobody owns yet.
+
+    take() pops a ready container in O(1); the caller records it as the
+    user's instance and re-tags it. A background thread refills each pool
+    up to its target, and autosize() moves the targets to follow demand:
+    with requests arriving at rate r and a container taking t seconds to
+    create, about r * t requests land while one refill is in flight
+    (Little's law), so that many containers (plus headroom) are kept ready.
+
+    Pooled containers take global capacity slots like any other container
+    (CapacityManager.set_standby), so the pool never pushes the deployment
+    past max_global_instances; it only shrinks the share left for cold starts.
+    """
+
+    def __init__(self, backend: ContainerBackend, capacity: CapacityManager,
+                 spec_for: Callable[[str, str], ContainerSpec], challenge_ids: Iterable[str],
+                 min_size: int = 0, max_size: int = 10, workers: int = 4, demand_window: float = 600,
+                 headroom: float = 1.5, autosize_interval: float = 60,
+                 clock: Callable[[], float] = time.monotonic):
+        self.backend = backend
+        self.capacity = capacity
+        self.spec_for = spec_for
+        self.min_size = min_size
+        self.max_size = max_size
+        self.demand_window = demand_window
+        self.headroom = headroom
+        self.autosize_interval = autosize_interval
+        self.clock = clock
+
+        self._cond = threading.Condition()
+        self._ready: Dict[str, Deque[ContainerInfo]] = {cid: deque() for cid in challenge_ids}
+        self._creating = Counter()
+        self._targets: Dict[str, int] = {cid: min_size for cid in self._ready}
+        self._demand: Dict[str, Deque[float]] = {cid: deque() for cid in self._ready}
+        self._hits = Counter()
+        self._misses = Counter()
+        # Moving average of how long a pooled container takes to create
+        self._create_seconds: Optional[float] = None
+        self._dirty = True
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='warm-pool')
+
+    # Handout
+
+    def take(self, challenge_id: str) -> Optional[ContainerInfo]:
+        """Pop a ready container for the challenge, or None if its pool is empty"""
+        with self._cond:
+            if challenge_id not in self._ready:
+                return None
+            self._demand[challenge_id].append(self.clock())
+            pool = self._ready[challenge_id]
+            if not pool:
+                self._misses[challenge_id] += 1
+                return None
+            info = pool.popleft()
+            self._hits[challenge_id] += 1
+            self._sync_standby()
+            self._wake()
+            return info
+
+    def put_back(self, challenge_id: str, info: ContainerInfo):
+        """Return a container that could not be handed out after all"""
+        with self._cond:
+            self._ready[challenge_id].appendleft(info)
+            self._hits[challenge_id] -= 1
+            self._sync_standby()
+
+    def assign(self, info: ContainerInfo, tags: Dict[str, str]):
+        """Re-tag a handed-out container as belonging to its user, off the request path"""
+        def retag():
+            try:
+                self.backend.retag(info.name, {**tags, 'pool': POOL_ASSIGNED})
+            except Exception as e:
+                print(f"⚠️  Could not re-tag {info.name}: {e}")
+        self.executor.submit(retag)
+
+    # Sizing
+
+    def set_target(self, challenge_id: str, size: int):
+        with self._cond:
+            if challenge_id not in self._targets:
+                raise KeyError(challenge_id)
+            self._targets[challenge_id] = max(0, min(self.max_size, size))
+            self._wake()
+
+    def autosize(self) -> Dict[str, int]:
+        """Set every pool's target from recent demand and creation time"""
+        now = self.clock()
+        with self._cond:
+            create_seconds = self._create_seconds
+            for cid, requests in self._demand.items():
+                while requests and requests[0] < now - self.demand_window:
+                    requests.popleft()
+                if create_seconds is None:
+                    continue
+                rate = len(requests) / self.demand_window
+                wanted = math.ceil(rate * create_seconds * self.headroom)
+                self._targets[cid] = max(self.min_size, min(self.max_size, wanted))
+            self._wake()
+            return dict(self._targets)
+
+    # Refill
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='warm-pool', daemon=True)
+        self._thread.start()
+
+    def stop(self, drain: bool = False):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+        self.executor.shutdown(wait=True)
+        if drain:
+            with self._cond:
+                names = [info.name for pool in self._ready.values() for info in pool]
+                for pool in self._ready.values():
+                    pool.clear()
+                self._sync_standby()
+            self.backend.delete_many(names)
+
+    def adopt(self, containers: Iterable[ContainerInfo]):
+        """Take over ready containers left by a previous process"""
+        with self._cond:
+            for info in containers:
+                cid = info.tags.get('challenge')
+                if cid in self._ready and info.tags.get('pool') == POOL_READY:
+                    self._ready[cid].append(info)
+            self._sync_standby()
+            self._wake()
+
+    def refill(self):
+        """Start creating containers for pools below target and trim pools above it"""
+        to_create: List[str] = []
+        to_delete: List[str] = []
+        with self._cond:
+            self._dirty = False
+            available = self.capacity.available()
+            for cid, target in self._targets.items():
+                pool = self._ready[cid]
+                while len(pool) > target:
+                    to_delete.append(pool.pop().name)
+                missing = target - len(pool) - self._creating[cid]
+                for _ in range(max(0, min(missing, available))):
+                    self._creating[cid] += 1
+                    available -= 1
+                    to_create.append(cid)
+            self._sync_standby()
+
+        for cid in to_create:
+            self.executor.submit(self._create, cid)
+        if to_delete:
+            self.executor.submit(self.backend.delete_many, to_delete)
+
+    def _create(self, challenge_id: str):
+        name = f"cornell-{challenge_id}-pool-{secrets.token_hex(8)}"
+        spec = self.spec_for(challenge_id, name)
+        spec = ContainerSpec(spec.name, spec.image, spec.port, {**spec.tags, 'pool': POOL_READY},
+                             spec.cpu, spec.memory_gb)
+        started = self.clock()
+        try:
+            info = self.backend.create(spec)
+        except Exception as e:
+            print(f"❌ Warm pool container for {challenge_id} failed: {e}")
+            info = None
+        elapsed = self.clock() - started
+
+        with self._cond:
+            self._creating[challenge_id] -= 1
+            if info is not None:
+                self._ready[challenge_id].append(info)
+                self._create_seconds = elapsed if self._create_seconds is None else (
+                    0.8 * self._create_seconds + 0.2 * elapsed
+                )
+            self._sync_standby()
+
+    def _run(self):
+        last_autosize = self.clock()
+        while True:
+            with self._cond:
+                while not self._dirty and not self._stopped:
+                    timeout = last_autosize + self.autosize_interval - self.clock()
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                if self._stopped:
+                    return
+            if self.clock() >= last_autosize + self.autosize_interval:
+                self.autosize()
+                last_autosize = self.clock()
+            try:
+                self.refill()
+            except Exception as e:
+                print(f"❌ Warm pool refill error: {e}")
+
+    def _wake(self):
+        self._dirty = True
+        self._cond.notify_all()
+
+    def _sync_standby(self):
+        self.capacity.set_standby(sum(len(p) for p in self._ready.values()) + sum(self._creating.values()))
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._cond:
+            return {
+                cid: {
+                    'ready': len(self._ready[cid]),
+                    'creating': self._creating[cid],
+                    'target': self._targets[cid],
+                    'hits': self._hits[cid],
+                    'misses': self._misses[cid],
+                }
+                for cid in self._ready
+            }
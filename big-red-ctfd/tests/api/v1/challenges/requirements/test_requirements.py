@@ -3,10 +3,13 @@
 
 from CTFd.models import Users
 from CTFd.utils import set_config
+from CTFd.utils.events import user_channel
 from tests.helpers import (
     create_ctfd,
     destroy_ctfd,
     gen_challenge,
+    gen_flag,
+    gen_hint,
     gen_solve,
     login_as_user,
     register_user,
@@ -169,3 +172,136 @@ def test_api_challenges_challenge_with_requirements_no_user():
             assert r.status_code == 200
             assert r.get_json()["data"] == initial_data
     destroy_ctfd(app)
+
+
+def test_prerequisite_graph():
+    """Does the prerequisite graph work out unlocks from a set of solves?"""
+    from CTFd.utils.challenges.prerequisites import PrerequisiteGraph
+
+    graph = PrerequisiteGraph(
+        [
+            (1, "visible", None),
+            (2, "visible", {"prerequisites": [1, 1234]}),
+            (3, "visible", {"prerequisites": [1, 2], "anonymize": True}),
+            (4, "hidden", {"prerequisites": [2]}),
+        ]
+    )
+    assert graph.prerequisites_of(2) == {1}
+    assert graph.unlocked(set()) == {1}
+    assert graph.unlocked({1}) == {1, 2}
+    assert graph.anonymize({1}) == {3}
+    assert graph.anonymize({1, 2}) == set()
+    assert graph.newly_unlocked(2, {1}) == {3, 4}
+    assert graph.newly_unlocked(1, set()) == {2}
+    assert graph.newly_unlocked(1, {1}) == set()
+    assert graph.hidden == {4}
+    assert graph.check(None, [1, 1234]) == [
+        "Challenge requirements reference challenges that do not exist: 1234"
+    ]
+    assert graph.check(1, [3]) == [
+        "Challenge requirements cannot form a cycle (1 requires 3 requires 1)"
+    ]
+    assert graph.check(2, [2]) == [
+        "Challenge requirements cannot form a cycle (2 requires 2)"
+    ]
+    assert graph.check(4, [3]) == []
+
+
+def test_api_challenges_requirements_are_checked_on_save():
+    """Are requirements with cycles or missing challenges rejected when a challenge is saved?"""
+    app = create_ctfd()
+    with app.app_context():
+        chal1 = gen_challenge(app.db).id
+        chal2 = gen_challenge(app.db, requirements={"prerequisites": [chal1]}).id
+        with login_as_user(app, "admin") as client:
+            r = client.patch(
+                f"/api/v1/challenges/{chal1}",
+                json={"requirements": {"prerequisites": [chal2]}},
+            )
+            assert r.status_code == 400
+            assert r.get_json()["errors"] == {
+                "requirements": [
+                    f"Challenge requirements cannot form a cycle ({chal1} requires {chal2} requires {chal1})"
+                ]
+            }
+
+            r = client.post(
+                "/api/v1/challenges",
+                json={
+                    "name": "chal",
+                    "category": "cate",
+                    "description": "desc",
+                    "value": "100",
+                    "state": "visible",
+                    "type": "standard",
+                    "requirements": {"prerequisites": [chal1, 1234]},
+                },
+            )
+            assert r.status_code == 400
+            assert r.get_json()["errors"] == {
+                "requirements": [
+                    "Challenge requirements reference challenges that do not exist: 1234"
+                ]
+            }
+
+            r = client.patch(
+                f"/api/v1/challenges/{chal2}",
+                json={"requirements": {"prerequisites": [chal1], "anonymize": True}},
+            )
+            assert r.status_code == 200
+    destroy_ctfd(app)
+
+
+def test_api_challenges_solve_publishes_unlocked_challenges():
+    """Does solving a prerequisite tell the account which challenges it unlocked?"""
+    app = create_ctfd()
+    with app.app_context():
+        prereq_id = gen_challenge(app.db).id
+        gen_flag(app.db, challenge_id=prereq_id, content="flag")
+        chal_id = gen_challenge(app.db, requirements={"prerequisites": [prereq_id]}).id
+        gen_challenge(
+            app.db, state="hidden", requirements={"prerequisites": [prereq_id]}
+        )
+        register_user(app)
+        events = app.events_manager.subscribe(channels=user_channel(2))
+        next(events)
+
+        with login_as_user(app) as client:
+            assert client.get(f"/api/v1/challenges/{chal_id}").status_code == 403
+            data = {"submission": "flag", "challenge_id": prereq_id}
+            r = client.post("/api/v1/challenges/attempt", json=data)
+            assert r.get_json()["data"]["status"] == "correct"
+            assert client.get(f"/api/v1/challenges/{chal_id}").status_code == 200
+
+        assert next(events).type == "solve"
+        event = next(events)
+        assert event.type == "unlock_challenges"
+        assert event.data == {
+            "user_id": 2,
+            "challenge_id": prereq_id,
+            "unlocked": [chal_id],
+        }
+    destroy_ctfd(app)
+
+
+def test_api_hints_require_challenge_prerequisites():
+    """Are the hints of a locked challenge kept from players?"""
+    app = create_ctfd()
+    with app.app_context():
+        prereq_id = gen_challenge(app.db).id
+        chal_id = gen_challenge(app.db, requirements={"prerequisites": [prereq_id]}).id
+        hint_id = gen_hint(app.db, challenge_id=chal_id).id
+        register_user(app)
+        with login_as_user(app) as client:
+            r = client.get(f"/api/v1/hints/{hint_id}")
+            assert r.status_code == 403
+            r = client.post(
+                "/api/v1/unlocks", json={"target": hint_id, "type": "hints"}
+            )
+            assert r.status_code == 403
+
+        gen_solve(app.db, user_id=2, challenge_id=prereq_id)
+        with login_as_user(app) as client:
+            r = client.get(f"/api/v1/hints/{hint_id}")
+            assert r.status_code == 200
+    destroy_ctfd(app)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from CTFd.cache import clear_challenges
+from tests.helpers import (
+    create_ctfd,
+    destroy_ctfd,
+    gen_challenge,
+    gen_fail,
+    gen_flag,
+    gen_solve,
+    gen_user,
+    login_as_user,
+)
+
+
+@contextmanager
+def count_queries(db):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def test_challenge_statistics_values():
+    """Test that get_challenge_statistics counts solves, fails and first bloods of visible accounts only"""
+    app = create_ctfd()
+    with app.app_context():
+        from CTFd.utils.challenges import get_challenge_statistics
+
+        chal1 = gen_challenge(app.db, name="chal1", value=100, category="web").id
+        chal2 = gen_challenge(app.db, name="chal2", value=200, category="web").id
+        chal3 = gen_challenge(app.db, name="chal3", value=300, category="pwn").id
+        user1 = gen_user(app.db, name="user1", email="user1@examplectf.com").id
+        user2 = gen_user(app.db, name="user2", email="user2@examplectf.com").id
+        hidden = gen_user(
+            app.db, name="hidden", email="hidden@examplectf.com", hidden=True
+        ).id
+
+        gen_solve(app.db, user_id=user1, challenge_id=chal1)
+        gen_solve(app.db, user_id=user2, challenge_id=chal1)
+        gen_solve(app.db, user_id=user1, challenge_id=chal2)
+        gen_solve(app.db, user_id=hidden, challenge_id=chal3)
+        gen_fail(app.db, user_id=user2, challenge_id=chal2)
+        gen_fail(app.db, user_id=user2, challenge_id=chal2)
+        gen_fail(app.db, user_id=hidden, challenge_id=chal3)
+        clear_challenges()
+
+        statistics = get_challenge_statistics()
+        assert statistics["accounts"] == 2
+        assert statistics["solves"] == 3
+        assert statistics["fails"] == 2
+        challenges = {c["name"]: c for c in statistics["challenges"]}
+        assert challenges["chal1"]["solves"] == 2
+        assert challenges["chal1"]["percentage"] == 1.0
+        assert challenges["chal1"]["first_blood"] is not None
+        assert challenges["chal2"]["solves"] == 1
+        assert challenges["chal2"]["fails"] == 2
+        assert challenges["chal2"]["percentage"] == 0.5
+        assert challenges["chal3"]["solves"] == 0
+        assert challenges["chal3"]["fails"] == 0
+        assert challenges["chal3"]["first_blood"] is None
+        assert statistics["categories"]["web"] == {
+            "challenges": 2,
+            "value": 300,
+            "solves": 3,
+            "fails": 2,
+        }
+
+        with login_as_user(app, name="admin") as client:
+            r = client.get("/api/v1/statistics/challenges/solves/percentages")
+            data = r.get_json()["data"]
+            assert [c["name"] for c in data] == ["chal1", "chal2", "chal3"]
+            assert data[1]["percentage"] == 0.5
+
+            r = client.get("/api/v1/statistics/challenges/category")
+            assert r.get_json()["data"] == {"web": 2, "pwn": 1}
+    destroy_ctfd(app)
+
+
+def test_challenge_statistics_query_count_is_constant():
+    """Test that challenge statistics take the same number of queries for any number of challenges"""
+    app = create_ctfd()
+    with app.app_context():
+        from CTFd.utils.challenges import get_challenge_statistics
+
+        user = gen_user(app.db, name="user1", email="user1@examplectf.com").id
+
+        def add_challenges(count):
+            for _ in range(count):
+                chal = gen_challenge(app.db).id
+                gen_solve(app.db, user_id=user, challenge_id=chal)
+                gen_fail(app.db, user_id=user, challenge_id=chal)
+            clear_challenges()
+
+        def queries():
+            with count_queries(app.db) as statements:
+                get_challenge_statistics.uncached()
+            return len(statements)
+
+        add_challenges(2)
+        small = queries()
+        add_challenges(20)
+        assert queries() == small
+
+        with login_as_user(app, name="admin") as client:
+
+            def endpoint_queries(url):
+                with count_queries(app.db) as statements:
+                    r = client.get(url)
+                assert r.status_code == 200
+                return len(statements)
+
+            urls = (
+                "/api/v1/statistics/challenges/solves",
+                "/api/v1/statistics/challenges/solves/percentages",
+                "/admin/statistics",
+            )
+            add_challenges(2)
+            # Warm up the per-request lookups that have nothing to do with the statistics
+            for url in urls:
+                client.get(url)
+            clear_challenges()
+            small = [endpoint_queries(url) for url in urls]
+            add_challenges(20)
+            assert [endpoint_queries(url) for url in urls] == small
+    destroy_ctfd(app)
+
+
+def test_challenge_statistics_invalidated_by_solves():
+    """Test that a new solve shows up in the cached challenge statistics"""
+    app = create_ctfd()
+    with app.app_context():
+        from CTFd.utils.challenges import get_challenge_statistics
+
+        chal = gen_challenge(app.db).id
+        gen_flag(app.db, challenge_id=chal, content="flag")
+        gen_user(app.db, name="user1", email="user1@examplectf.com")
+        assert get_challenge_statistics()["solves"] == 0
+
+        with login_as_user(app, name="user1") as client:
+            r = client.post(
+                "/api/v1/challenges/attempt",
+                json={"challenge_id": chal, "submission": "flag"},
+            )
+            assert r.get_json()["data"]["status"] == "correct"
+
+        assert get_challenge_statistics()["solves"] == 1
+        assert get_challenge_statistics()["challenges"][0]["percentage"] == 1.0
+    destroy_ctfd(app)
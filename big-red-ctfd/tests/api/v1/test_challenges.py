@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from freezegun import freeze_time
+from sqlalchemy import event
 
 from CTFd.models import Challenges, Flags, Hints, Solves, Tags, Users
 from CTFd.utils import set_config
@@ -407,6 +408,59 @@ def test_api_challenges_get_solve_count_banned_user():
     destroy_ctfd(app)
 
 
+def test_api_challenges_get_board_is_shared():
+    """Does the challenge list serve every account from one board that follows challenge edits?"""
+    app = create_ctfd()
+    with app.app_context():
+        chal1 = gen_challenge(app.db, name="chal1").id
+        chal2 = gen_challenge(
+            app.db,
+            name="chal2",
+            requirements={"prerequisites": [chal1, 1234], "anonymize": True},
+        ).id
+        gen_tag(app.db, challenge_id=chal1, value="web")
+        register_user(app)
+        register_user(app, name="user2", email="user2@examplectf.com")
+        gen_solve(app.db, user_id=2, challenge_id=chal1)
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        user1 = login_as_user(app)
+        user2 = login_as_user(app, name="user2")
+        user1.get("/api/v1/challenges")
+
+        event.listen(app.db.engine, "before_cursor_execute", before_cursor_execute)
+        data = user1.get("/api/v1/challenges").get_json()["data"]
+        assert [c["name"] for c in data] == ["chal1", "chal2"]
+        assert data[0]["tags"] == [{"value": "web"}]
+        assert data[0]["solved_by_me"] is True
+        data = user2.get("/api/v1/challenges").get_json()["data"]
+        assert data[1] == {
+            "id": chal2,
+            "type": "hidden",
+            "name": "???",
+            "value": 0,
+            "solves": None,
+            "solved_by_me": False,
+            "category": "???",
+            "tags": [],
+            "template": "",
+            "script": "",
+        }
+        event.remove(app.db.engine, "before_cursor_execute", before_cursor_execute)
+        assert not [s for s in statements if "FROM challenges" in s]
+
+        with login_as_user(app, name="admin") as admin:
+            r = admin.patch(f"/api/v1/challenges/{chal1}", json={"name": "renamed"})
+            assert r.status_code == 200
+        data = user1.get("/api/v1/challenges").get_json()["data"]
+        assert data[0]["name"] == "renamed"
+    destroy_ctfd(app)
+
+
 def test_api_challenges_post_admin():
     """Can a user post /api/v1/challenges if admin"""
     app = create_ctfd()
@@ -1,12 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from unittest.mock import patch
+
 from tests.helpers import (
     create_ctfd,
     destroy_ctfd,
     gen_challenge,
     gen_flag,
     login_as_user,
+    register_user,
 )
 
 
@@ -124,3 +127,101 @@ def test_api_flag_delete_admin():
             assert r.status_code == 200
             assert r.get_json().get("data") is None
     destroy_ctfd(app)
+
+
+def test_api_flag_edits_apply_to_submissions():
+    """Are submissions checked against flags as they are after being edited through the API?"""
+    app = create_ctfd()
+    with app.app_context():
+        gen_challenge(app.db)
+        gen_flag(app.db, 1, content="flag")
+        register_user(app)
+        with login_as_user(app) as user, login_as_user(app, "admin") as admin:
+            data = {"submission": "flag{edited}", "challenge_id": 1}
+            r = user.post("/api/v1/challenges/attempt", json=data)
+            assert r.get_json()["data"]["status"] == "incorrect"
+
+            r = admin.patch(
+                "/api/v1/flags/1",
+                json={"content": "flag{[a-z]+}", "data": "", "type": "regex"},
+            )
+            assert r.status_code == 200
+            r = user.post("/api/v1/challenges/attempt", json=data)
+            assert r.get_json()["data"]["status"] == "correct"
+    destroy_ctfd(app)
+
+
+def test_api_flags_reject_slow_regexes():
+    """Are regex flags that would backtrack catastrophically refused?"""
+    app = create_ctfd()
+    with app.app_context():
+        gen_challenge(app.db)
+        with login_as_user(app, "admin") as client:
+            for content in (
+                "flag{(a+)+}",
+                "flag{(\\w+\\s?)+}",
+                "flag{(\\w+_)+}",
+                "flag{(a|aa)+}",
+                "flag{(a|a?)+}",
+            ):
+                r = client.post(
+                    "/api/v1/flags",
+                    json={"content": content, "type": "regex", "challenge": 1},
+                )
+                assert r.status_code == 400
+                assert r.get_json()["errors"] == {
+                    "content": [
+                        "Regex has nested quantifiers that are too slow to match"
+                    ]
+                }
+
+            for content in ("flag{([a-z0-9]_)+}", "flag{(foo|bar)+}", "flag{[a-z_]+}"):
+                r = client.post(
+                    "/api/v1/flags",
+                    json={"content": content, "type": "regex", "challenge": 1},
+                )
+                assert r.status_code == 200
+    destroy_ctfd(app)
+
+
+def test_stored_slow_regex_flags_still_match():
+    """Are regex flags saved before nested quantifiers were refused still solvable?"""
+    app = create_ctfd()
+    with app.app_context():
+        gen_challenge(app.db)
+        gen_flag(app.db, 1, content="flag{(a+)+}", type="regex")
+        register_user(app)
+        with login_as_user(app) as client:
+            data = {"submission": "flag{b}", "challenge_id": 1}
+            r = client.post("/api/v1/challenges/attempt", json=data)
+            assert r.get_json()["data"]["status"] == "incorrect"
+            data = {"submission": "flag{aaa}", "challenge_id": 1}
+            r = client.post("/api/v1/challenges/attempt", json=data)
+            assert r.get_json()["data"]["status"] == "correct"
+    destroy_ctfd(app)
+
+
+def test_plugin_flag_types_compare_flag_models():
+    """Do flag types from plugins still get the Flags model to compare against?"""
+    from CTFd.models import Flags
+    from CTFd.plugins.flags import FLAG_CLASSES, BaseFlag
+
+    class ChallengeNameFlag(BaseFlag):
+        name = "challenge_name"
+
+        @staticmethod
+        def compare(chal_key_obj, provided):
+            assert isinstance(chal_key_obj, Flags)
+            return chal_key_obj.challenge.name == provided
+
+    app = create_ctfd()
+    with app.app_context():
+        gen_challenge(app.db, name="chal")
+        gen_flag(app.db, 1, content="unused", type="challenge_name")
+        register_user(app)
+        with patch.dict(FLAG_CLASSES, {"challenge_name": ChallengeNameFlag}):
+            with login_as_user(app) as client:
+                data = {"submission": "chal", "challenge_id": 1}
+                r = client.post("/api/v1/challenges/attempt", json=data)
+                assert r.get_json()["data"]["status"] == "correct"
+    destroy_ctfd(app)
@@ -1,12 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import datetime
+
 from flask import jsonify
 from flask_caching import make_template_fragment_key
 
 from CTFd.cache import clear_standings
 from CTFd.models import Users
-from CTFd.utils.scoreboard import get_scoreboard_detail
+from CTFd.utils.dates import unix_time
+from CTFd.utils.scoreboard import downsample, get_scoreboard_detail
 from tests.helpers import (
     create_ctfd,
     destroy_ctfd,
@@ -204,3 +207,87 @@ def test_scoreboard_detail_returns_different_counts():
             assert top_1_resp == client.get("/api/v1/scoreboard/top/1").get_json()
 
     destroy_ctfd(app)
+
+
+def test_scoreboard_snapshot_is_versioned():
+    """Test that /api/v1/scoreboard/snapshot returns compact standings labelled with the scoreboard version"""
+    app = create_ctfd()
+    with app.app_context():
+        register_user(app)
+        gen_challenge(app.db, value=100)
+        gen_solve(app.db, user_id=2, challenge_id=1)
+
+        with login_as_user(app) as client:
+            first = client.get("/api/v1/scoreboard/snapshot").get_json()["data"]
+            assert first["standings"] == [
+                {
+                    "pos": 1,
+                    "account_id": 2,
+                    "name": "user",
+                    "score": 100,
+                    "bracket_id": None,
+                }
+            ]
+
+            gen_award(app.db, user_id=2, value=50)
+            second = client.get("/api/v1/scoreboard/snapshot").get_json()["data"]
+            assert second["version"] > first["version"]
+            assert second["standings"][0]["score"] == 150
+    destroy_ctfd(app)
+
+
+def test_scoreboard_series():
+    """Test that /api/v1/scoreboard/top/<count>/series returns cumulative scores as columns"""
+    app = create_ctfd()
+    with app.app_context():
+        register_user(app, name="user1", email="user1@examplectf.com")
+        register_user(app, name="user2", email="user2@examplectf.com")
+        start = datetime.datetime(2017, 10, 3)
+        for i, value in enumerate((100, 200, 300)):
+            chal_id = gen_challenge(app.db, value=value).id
+            solve = gen_solve(app.db, user_id=2, challenge_id=chal_id)
+            solve.date = start + datetime.timedelta(minutes=i)
+        gen_solve(app.db, user_id=3, challenge_id=1).date = start
+        award = gen_award(app.db, user_id=2, value=50)
+        award.date = start + datetime.timedelta(seconds=90)
+        app.db.session.commit()
+        clear_standings()
+
+        with login_as_user(app, "user1") as client:
+            data = client.get("/api/v1/scoreboard/top/10/series").get_json()["data"]
+            assert data["1"]["name"] == "user1"
+            assert data["1"]["score"] == 650
+            assert data["1"]["dates"] == [
+                unix_time(start),
+                unix_time(start) + 60,
+                unix_time(start) + 90,
+                unix_time(start) + 120,
+            ]
+            assert data["1"]["scores"] == [100, 300, 350, 650]
+            assert data["2"]["dates"] == [unix_time(start)]
+            assert data["2"]["scores"] == [100]
+
+            # The detailed scoreboard still lists the same events one by one
+            detail = client.get("/api/v1/scoreboard/top/10").get_json()["data"]
+            assert [s["value"] for s in detail["1"]["solves"]] == [100, 200, 50, 300]
+
+            data = client.get("/api/v1/scoreboard/top/10/series?points=2").get_json()[
+                "data"
+            ]
+            assert data["1"]["dates"] == [unix_time(start), unix_time(start) + 120]
+            assert data["1"]["scores"] == [100, 650]
+    destroy_ctfd(app)
+
+
+def test_scoreboard_series_downsample():
+    """Test that downsampling keeps the last entry of every bucket"""
+    dates = list(range(100))
+    scores = [i * 10 for i in range(100)]
+    assert downsample(dates, scores, 0, 99, 200) == (dates, scores)
+
+    sampled_dates, sampled_scores = downsample(dates, scores, 0, 99, 10)
+    assert len(sampled_dates) == 10
+    assert sampled_dates[-1] == 99
+    assert sampled_scores[-1] == 990
+    assert sampled_scores == [score * 10 for score in sampled_dates]
+    assert downsample([5, 5, 5], [1, 2, 3], 5, 5, 2) == ([5], [3])
@@ -1,11 +1,34 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from CTFd.cache import clear_all_user_sessions, clear_user_session
-from CTFd.models import Users
+import pytest
+from sqlalchemy import event
+
+from CTFd.cache import (
+    NEAR_CACHE_TOKEN_KEY,
+    cache,
+    clear_all_user_sessions,
+    clear_user_session,
+    invalidate,
+    sync_near_caches,
+)
+from CTFd.models import Configs, Users
+from CTFd.utils import _get_config, get_config, set_config
 from CTFd.utils.security.auth import login_user
 from CTFd.utils.user import get_current_user, is_admin
-from tests.helpers import create_ctfd, destroy_ctfd, register_user
+from tests.helpers import (
+    create_ctfd,
+    destroy_ctfd,
+    gen_challenge,
+    gen_flag,
+    gen_team,
+    gen_user,
+    login_as_user,
+    register_user,
+)
+
+STANDINGS_VERSION = "CTFd.utils.scores.get_standings_memver"
+CHALLENGES_VERSION = "CTFd.utils.challenges.get_all_challenges_memver"
 
 
 def test_clear_user_session():
@@ -64,3 +87,186 @@ def test_clear_all_user_sessions():
             # Should now return True after clearing cache
             assert is_admin() is True
     destroy_ctfd(app)
+
+
+def test_invalidate_only_drops_dependents():
+    """Test that invalidating a domain only drops the cached values that depend on it"""
+    app = create_ctfd()
+    with app.app_context():
+        from CTFd.utils.challenges import get_all_challenges
+        from CTFd.utils.scores import get_standings
+
+        get_standings()
+        get_all_challenges()
+        standings = app.cache.get(STANDINGS_VERSION)
+        challenges = app.cache.get(CHALLENGES_VERSION)
+        assert standings and challenges
+
+        invalidate("pages", "fails")
+        assert app.cache.get(STANDINGS_VERSION) == standings
+        assert app.cache.get(CHALLENGES_VERSION) == challenges
+
+        invalidate("awards")
+        assert app.cache.get(STANDINGS_VERSION) != standings
+        assert app.cache.get(CHALLENGES_VERSION) == challenges
+
+        invalidate("challenges")
+        assert app.cache.get(CHALLENGES_VERSION) != challenges
+
+        with pytest.raises(ValueError):
+            invalidate("solve")
+    destroy_ctfd(app)
+
+
+def test_wrong_submissions_keep_standings_cached():
+    """Test that an incorrect flag leaves standings and challenge caches alone while a correct one drops standings"""
+    app = create_ctfd()
+    with app.app_context():
+        register_user(app)
+        gen_challenge(app.db)
+        gen_flag(app.db, challenge_id=1, content="flag")
+
+        with login_as_user(app) as client:
+            client.get("/api/v1/scoreboard")
+            client.get("/api/v1/challenges")
+            standings = app.cache.get(STANDINGS_VERSION)
+            challenges = app.cache.get(CHALLENGES_VERSION)
+            assert app.cache.get("view/api.scoreboard_scoreboard_list")
+
+            data = {"submission": "wrong", "challenge_id": 1}
+            r = client.post("/api/v1/challenges/attempt", json=data)
+            assert r.get_json()["data"]["status"] == "incorrect"
+            assert app.cache.get(STANDINGS_VERSION) == standings
+            assert app.cache.get(CHALLENGES_VERSION) == challenges
+            assert app.cache.get("view/api.scoreboard_scoreboard_list")
+
+            data = {"submission": "flag", "challenge_id": 1}
+            r = client.post("/api/v1/challenges/attempt", json=data)
+            assert r.get_json()["data"]["status"] == "correct"
+            assert app.cache.get(STANDINGS_VERSION) != standings
+            assert app.cache.get(CHALLENGES_VERSION) == challenges
+            assert app.cache.get("view/api.scoreboard_scoreboard_list") is None
+    destroy_ctfd(app)
+
+
+def test_near_cache_serves_hot_keys_from_process_memory():
+    """Test that config reads in a request only go to the shared cache once per key and see local writes"""
+    app = create_ctfd()
+    with app.app_context():
+        backend = cache.cache
+        get = backend.get
+        keys = []
+
+        def counting_get(key):
+            keys.append(key)
+            return get(key)
+
+        backend.get = counting_get
+        with app.test_request_context("/"):
+            sync_near_caches()
+            del keys[:]
+            for _ in range(10):
+                assert get_config("ctf_name") == "CTFd"
+            assert len(keys) == 2  # memoize version and value
+
+            set_config("ctf_name", "Near")
+            assert get_config("ctf_name") == "Near"
+        backend.get = get
+    destroy_ctfd(app)
+
+
+def test_near_cache_follows_other_workers():
+    """Test that a write made by another worker is seen from the next request on"""
+    app = create_ctfd()
+    with app.app_context():
+        with app.test_request_context("/"):
+            sync_near_caches()
+            assert get_config("ctf_name") == "CTFd"
+
+            # What set_config() does in another worker: the database, the shared cache and the token change
+            Configs.query.filter_by(key="ctf_name").update({"value": "Elsewhere"})
+            app.db.session.commit()
+            cache.delete_memoized(_get_config.memoized, "ctf_name")
+            cache.set(NEAR_CACHE_TOKEN_KEY, "elsewhere")
+
+            assert get_config("ctf_name") == "CTFd"
+
+        with app.test_request_context("/"):
+            sync_near_caches()
+            assert get_config("ctf_name") == "Elsewhere"
+
+            # As does a cache.clear()
+            Configs.query.filter_by(key="ctf_name").update({"value": "Cleared"})
+            app.db.session.commit()
+            cache.clear()
+            assert get_config("ctf_name") == "Elsewhere"
+
+        with app.test_request_context("/"):
+            sync_near_caches()
+            assert get_config("ctf_name") == "Cleared"
+    destroy_ctfd(app)
+
+
+def test_attempt_loads_the_current_account_once():
+    """Test that an attempt request loads the user and team once however many hooks and decorators ask for them"""
+    app = create_ctfd(user_mode="teams")
+    with app.app_context():
+        user = gen_user(app.db, name="user1", email="user1@examplectf.com")
+        team = gen_team(app.db, member_count=0)
+        user.team_id = team.id
+        team.captain_id = user.id
+        app.db.session.commit()
+        chal = gen_challenge(app.db).id
+        gen_flag(app.db, challenge_id=chal, content="flag")
+        # A timed flush of the IP tracking in between would invalidate the cached IPs on a slow run
+        app.tracking_buffer.interval = 3600
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        backend = cache.cache
+        get = backend.get
+        keys = []
+
+        def counting_get(key):
+            keys.append(key)
+            return get(key)
+
+        with login_as_user(app, name="user1") as client:
+            with client.session_transaction() as sess:
+                nonce = sess.get("nonce")
+
+            def attempt(submission):
+                del statements[:]
+                del keys[:]
+                r = client.post(
+                    "/api/v1/challenges/attempt",
+                    data={
+                        "challenge_id": chal,
+                        "submission": submission,
+                        "nonce": nonce,
+                    },
+                )
+                assert r.status_code == 200
+                return r.get_json()["data"]["status"]
+
+            # Fill the shared and near caches
+            assert attempt("wrong") == "incorrect"
+
+            event.listen(app.db.engine, "before_cursor_execute", before_cursor_execute)
+            backend.get = counting_get
+            assert attempt("wrong") == "incorrect"
+            backend.get = get
+            event.remove(app.db.engine, "before_cursor_execute", before_cursor_execute)
+
+        # One load of the user and one of their team, then the attempt itself with its flags cached
+        selects = [s for s in statements if s.startswith("SELECT")]
+        assert len([s for s in selects if "FROM (SELECT users." in s]) == 1
+        assert len([s for s in selects if "FROM teams" in s]) == 1
+        assert not [s for s in selects if "FROM flags" in s]
+        assert len(statements) == 7
+        # The session, the near cache token, the import status and the recently seen IPs
+        assert len(keys) == 6
+    destroy_ctfd(app)
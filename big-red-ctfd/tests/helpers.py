@@ -1,5 +1,6 @@
 import datetime
 import gc
+import os
 import random
 import string
 import uuid
@@ -144,7 +145,10 @@ def create_ctfd(
     config.APPLICATION_ROOT = application_root
     url = make_url(config.SQLALCHEMY_DATABASE_URI)
     if url.database:
-        url = url.set(database=str(uuid.uuid4()))
+        # Keep the directory of SQLite file databases
+        url = url.set(
+            database=os.path.join(os.path.dirname(url.database), str(uuid.uuid4()))
+        )
     config.SQLALCHEMY_DATABASE_URI = str(url)
 
     app = create_app(config)
@@ -399,6 +403,7 @@ def gen_flag(db, challenge_id, content="flag", type="static", data=None, **kwarg
         flag.data = data
     db.session.add(flag)
     db.session.commit()
+    clear_challenges()
     return flag
 
 
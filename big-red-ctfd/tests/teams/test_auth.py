@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import datetime
+
+from freezegun import freeze_time
+
 from CTFd.models import Teams, Users, db
 from tests.helpers import (
     create_ctfd,
@@ -132,14 +136,16 @@ def test_team_join_ratelimited():
                     "password": "wrong_password",
                     "nonce": sess.get("nonce"),
                 }
-            for _ in range(10):
-                r = client.post("/teams/join", data=data)
-
-            data["password"] = "password"
-            for _ in range(10):
-                r = client.post("/teams/join", data=data)
-                assert r.status_code == 429
-                assert Users.query.filter_by(id=2).first().team_id is None
+            # Frozen so that a slow test run can't let the first attempts slide out of the window
+            with freeze_time(datetime.datetime.utcnow()):
+                for _ in range(10):
+                    r = client.post("/teams/join", data=data)
+
+                data["password"] = "password"
+                for _ in range(10):
+                    r = client.post("/teams/join", data=data)
+                    assert r.status_code == 429
+                    assert Users.query.filter_by(id=2).first().team_id is None
     destroy_ctfd(app)
 
 
@@ -1,12 +1,24 @@
-from collections import defaultdict
 from queue import Queue
 from unittest.mock import patch
 
 from redis.exceptions import ConnectionError
 
 from CTFd.config import TestingConfig
-from CTFd.utils.events import EventManager, RedisEventManager, ServerSentEvent
-from tests.helpers import create_ctfd, destroy_ctfd, login_as_user, register_user
+from CTFd.utils.events import (
+    EventManager,
+    RedisEventManager,
+    ServerSentEvent,
+    team_channel,
+    user_channel,
+)
+from tests.helpers import (
+    create_ctfd,
+    destroy_ctfd,
+    gen_challenge,
+    gen_flag,
+    login_as_user,
+    register_user,
+)
 
 
 def test_event_manager_installed():
@@ -18,33 +30,36 @@ def test_event_manager_installed():
 
 def test_event_manager_subscription():
     """Test that EventManager subscribing works"""
-    with patch.object(Queue, "get") as fake_queue:
-        saved_data = {
-            "user_id": None,
-            "title": "asdf",
-            "content": "asdf",
-            "team_id": None,
-            "user": None,
-            "team": None,
-            "date": "2019-01-28T01:20:46.017649+00:00",
-            "id": 10,
-        }
-        saved_event = {"type": "notification", "data": saved_data}
+    saved_data = {
+        "user_id": None,
+        "title": "asdf",
+        "content": "asdf",
+        "team_id": None,
+        "user": None,
+        "team": None,
+        "date": "2019-01-28T01:20:46.017649+00:00",
+        "id": 10,
+    }
+    saved_event = {"type": "notification", "data": saved_data, "id": 1}
 
-        fake_queue.return_value = saved_event
-        event_manager = EventManager()
-        events = event_manager.subscribe()
-        message = next(events)
-        assert isinstance(message, ServerSentEvent)
-        assert message.to_dict() == {"data": "ping", "type": "ping"}
-        assert message.__str__().startswith("event:ping")
-        assert len(event_manager.clients) == 1
+    event_manager = EventManager()
+    events = event_manager.subscribe()
+    message = next(events)
+    assert isinstance(message, ServerSentEvent)
+    assert message.to_dict() == {"data": "ping", "type": "ping"}
+    assert message.__str__().startswith("event:ping")
+    assert len(event_manager.clients) == 1
 
-        message = next(events)
-        assert isinstance(message, ServerSentEvent)
-        assert message.to_dict() == saved_event
-        assert message.__str__().startswith("event:notification\ndata:")
-        assert len(event_manager.clients) == 1
+    event_manager.publish(data=saved_data, type="notification")
+    message = next(events)
+    assert isinstance(message, ServerSentEvent)
+    assert message.to_dict() == saved_event
+    assert message.__str__().startswith("event:notification\ndata:")
+    assert message.__str__().endswith("id:1\n\n")
+    assert len(event_manager.clients) == 1
+
+    events.close()
+    assert len(event_manager.clients) == 0
 
 
 def test_event_manager_publish():
@@ -61,13 +76,107 @@ def test_event_manager_publish():
     }
 
     event_manager = EventManager()
-    q = defaultdict(Queue)
-    event_manager.clients[id(q)] = q
-    event_manager.publish(data=saved_data, type="notification", channel="ctf")
+    subscribers = [event_manager.subscribe() for _ in range(3)]
+    for events in subscribers:
+        next(events)
+    assert (
+        event_manager.publish(data=saved_data, type="notification", channel="ctf") == 3
+    )
+
+    # Every subscriber is handed the same event, serialized once
+    received = [next(events) for events in subscribers]
+    assert received[0].data == saved_data
+    assert all(event is received[0] for event in received)
+
+
+def test_event_manager_buffer_overflow():
+    """Test that a subscriber that falls behind skips the events dropped from the buffer"""
+    event_manager = EventManager(buffer_size=3)
+    events = event_manager.subscribe()
+    next(events)
+    for i in range(5):
+        event_manager.publish(data=str(i), type="notification")
+    assert [next(events).data for _ in range(3)] == ["2", "3", "4"]
+
+
+def test_event_manager_last_event_id_replay():
+    """Test that subscribing with a Last-Event-ID replays the buffered events after it"""
+    event_manager = EventManager()
+    for i in range(4):
+        event_manager.publish(data=str(i), type="notification")
+
+    events = event_manager.subscribe(last_event_id=2)
+    assert next(events).type == "ping"
+    assert [next(events).id for _ in range(2)] == [3, 4]
+
+    event_manager.publish(data="live", type="notification")
+    assert next(events).data == "live"
+
+
+def test_event_manager_channels():
+    """Test that events published to a user or team channel only reach its subscribers"""
+    event_manager = EventManager()
+    first = event_manager.subscribe(channels=["ctf", user_channel(1), team_channel(1)])
+    second = event_manager.subscribe(channels=["ctf", user_channel(2), team_channel(1)])
+    next(first)
+    next(second)
 
-    event = event_manager.clients[id(q)]["ctf"].get()
-    event = ServerSentEvent(**event)
-    assert event.data == saved_data
+    assert event_manager.publish(data="mine", channel=user_channel(1)) == 1
+    assert event_manager.publish(data="ours", channel=team_channel(1)) == 2
+    assert event_manager.publish(data="all", channel="ctf") == 2
+    # Channels nobody subscribed to are not buffered
+    assert event_manager.publish(data="nobody", channel=user_channel(3)) == 0
+    assert user_channel(3) not in event_manager.buffers
+
+    assert [next(first).data for _ in range(3)] == ["mine", "ours", "all"]
+    assert [next(second).data for _ in range(2)] == ["ours", "all"]
+
+    second.close()
+    assert user_channel(2) not in event_manager.buffers
+    assert event_manager.buffers[team_channel(1)].subscribers == 1
+
+
+def test_event_manager_drops_unused_channel_buffers():
+    """Test that account channels stop being buffered once their last subscriber disconnects"""
+    event_manager = EventManager()
+    clients = [
+        event_manager.subscribe(channels=["ctf", user_channel(i), team_channel(1)])
+        for i in range(1, 4)
+    ]
+    for client in clients:
+        next(client)
+    assert len(event_manager.buffers) == 5
+
+    for client in clients[:2]:
+        client.close()
+    assert set(event_manager.buffers) == {"ctf", user_channel(3), team_channel(1)}
+
+    clients[2].close()
+    assert set(event_manager.buffers) == {"ctf"}
+    assert event_manager.publish(data="gone", channel=team_channel(1)) == 0
+    assert event_manager.clients == {}
+
+
+def test_solve_publishes_to_account_channel():
+    """Test that solving a challenge publishes a solve event to the solver's account channel"""
+    app = create_ctfd()
+    with app.app_context():
+        register_user(app)
+        gen_challenge(app.db)
+        gen_flag(app.db, challenge_id=1, content="flag")
+        events = app.events_manager.subscribe(channels=user_channel(2))
+        next(events)
+
+        with login_as_user(app) as client:
+            data = {"submission": "flag", "challenge_id": 1}
+            r = client.post("/api/v1/challenges/attempt", json=data)
+            assert r.get_json()["data"]["status"] == "correct"
+
+        event = next(events)
+        assert event.type == "solve"
+        assert event.data["user_id"] == 2
+        assert event.data["challenge_id"] == 1
+    destroy_ctfd(app)
 
 
 def test_event_endpoint_is_event_stream():
@@ -139,20 +248,20 @@ def test_redis_event_manager_subscription():
             }
             saved_event = {"type": "notification", "data": saved_data}
 
-            with patch.object(Queue, "get") as fake_queue:
-                fake_queue.return_value = saved_event
-                event_manager = RedisEventManager()
-
-                events = event_manager.subscribe()
-                message = next(events)
-                assert isinstance(message, ServerSentEvent)
-                assert message.to_dict() == {"data": "ping", "type": "ping"}
-                assert message.__str__().startswith("event:ping")
+            event_manager = RedisEventManager()
 
-                message = next(events)
-                assert isinstance(message, ServerSentEvent)
-                assert message.to_dict() == saved_event
-                assert message.__str__().startswith("event:notification\ndata:")
+            events = event_manager.subscribe()
+            message = next(events)
+            assert isinstance(message, ServerSentEvent)
+            assert message.to_dict() == {"data": "ping", "type": "ping"}
+            assert message.__str__().startswith("event:ping")
+
+            # Stand in for the listener receiving the event from Redis
+            event_manager.broadcast(ServerSentEvent(**saved_event))
+            message = next(events)
+            assert isinstance(message, ServerSentEvent)
+            assert message.to_dict() == saved_event
+            assert message.__str__().startswith("event:notification\ndata:")
         destroy_ctfd(app)
 
 
@@ -1,15 +1,26 @@
 # -*- coding: utf-8 -*-
 import json
 import os
+import tempfile
+import tracemalloc
 import zipfile
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from io import BytesIO
+from unittest.mock import patch
 
-from CTFd.models import Challenges, Flags, Teams, Users
+from CTFd.config import TestingConfig
+from CTFd.models import Challenges, Flags, Submissions, Teams, Users
 from CTFd.utils import text_type
 from CTFd.utils.exports import export_ctf, import_ctf
+from CTFd.utils.exports.freeze import freeze_export
+from CTFd.utils.exports.serializers import JSONEncoder
 from tests.helpers import (
     create_ctfd,
     destroy_ctfd,
     gen_challenge,
+    gen_fail,
     gen_flag,
     gen_hint,
     gen_team,
@@ -102,3 +113,153 @@ def test_import_ctf():
                 chal = Challenges.query.filter_by(name="chal_name10").first()
                 assert chal.requirements == {"prerequisites": [1]}
     destroy_ctfd(app)
+
+
+def test_import_ctf_sqlite():
+    """Test that a CTF exported from SQLite can be imported back into SQLite in batches"""
+
+    class SQLiteFileConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(
+            tempfile.mkdtemp(), "ctfd.db"
+        )
+        IMPORT_BATCH_SIZE = 7
+
+    app = create_ctfd(config=SQLiteFileConfig)
+    if not app.config.get("SQLALCHEMY_DATABASE_URI").startswith("sqlite"):
+        destroy_ctfd(app)
+        return
+    with app.app_context():
+        for x in range(10):
+            gen_user(
+                app.db, name="user{}".format(x), email="user{}@examplectf.com".format(x)
+            )
+        gen_challenge(app.db, name="chal_name1")
+        chal = gen_challenge(
+            app.db, name="chal_name2", requirements={"prerequisites": [1]}
+        )
+        gen_flag(app.db, challenge_id=chal.id, content="flag")
+        for _ in range(50):
+            gen_fail(app.db, user_id=2, challenge_id=chal.id)
+        date = Submissions.query.first().date
+        app.db.session.commit()
+
+        backup = export_ctf()
+        with open("export.test_import_ctf_sqlite.zip", "wb") as f:
+            f.write(backup.read())
+    destroy_ctfd(app)
+
+    app = create_ctfd(config=SQLiteFileConfig, setup=False)
+    with app.app_context():
+        with patch("CTFd.utils.exports.set_import_status") as set_import_status:
+            import_ctf("export.test_import_ctf_sqlite.zip")
+        # Progress is throttled rather than reported for every row
+        assert set_import_status.call_count < 50
+
+        assert Users.query.count() == 11
+        assert Challenges.query.count() == 2
+        assert Flags.query.count() == 1
+        assert Submissions.query.count() == 50
+        assert Submissions.query.first().date == date
+        chal = Challenges.query.filter_by(name="chal_name2").first()
+        assert chal.requirements == {"prerequisites": [1]}
+    os.remove("export.test_import_ctf_sqlite.zip")
+    destroy_ctfd(app)
+
+
+def test_import_ctf_rejects_in_memory_sqlite():
+    """Test that importing into an in-memory SQLite database is refused"""
+    app = create_ctfd()
+    if app.config.get("SQLALCHEMY_DATABASE_URI") == "sqlite://":
+        with app.app_context():
+            try:
+                import_ctf(BytesIO())
+            except Exception as e:
+                assert "in-memory" in str(e)
+            else:
+                raise AssertionError("import_ctf did not raise")
+    destroy_ctfd(app)
+
+
+def test_export_serializer_is_byte_compatible():
+    """Test that streamed table exports are byte for byte what dumping the whole table produced"""
+    app = create_ctfd()
+    with app.app_context():
+        rows = [
+            OrderedDict(
+                [
+                    ("id", i),
+                    ("name", text_type("🐺 {}").format(i)),
+                    ("value", Decimal("1.5")),
+                    ("date", datetime(2017, 10, 3, 12, 0, i)),
+                    ("requirements", '{"prerequisites": [1]}' if i else None),
+                ]
+            )
+            for i in range(3)
+        ]
+        expected = json.dumps(
+            OrderedDict([("count", 3), ("results", rows), ("meta", {})]),
+            cls=JSONEncoder,
+            separators=(",", ":"),
+        )
+        # The old serializer decoded requirements before dumping
+        for row in rows[1:]:
+            expected = expected.replace(
+                json.dumps(row["requirements"]), '{"prerequisites":[1]}', 1
+            )
+
+        result = BytesIO()
+        freeze_export(iter([OrderedDict(row) for row in rows]), fileobj=result)
+        assert result.getvalue() == expected.encode("utf-8")
+        data = json.loads(result.getvalue())
+        assert data["count"] == 3
+        assert data["results"][1]["requirements"] == {"prerequisites": [1]}
+
+        # Empty tables are written as empty files
+        result = BytesIO()
+        freeze_export(iter([]), fileobj=result)
+        assert result.getvalue() == b""
+    destroy_ctfd(app)
+
+
+def test_export_serializer_memory_is_bounded():
+    """Test that exporting a table does not hold its rows in memory"""
+    app = create_ctfd()
+    with app.app_context():
+
+        def submissions(count):
+            for i in range(count):
+                yield OrderedDict(
+                    [
+                        ("id", i),
+                        ("challenge_id", 1),
+                        ("user_id", 1),
+                        ("ip", "127.0.0.1"),
+                        ("provided", "flag{%d}" % i),
+                        ("type", "incorrect"),
+                        ("date", datetime(2017, 10, 3)),
+                    ]
+                )
+
+        backup = tempfile.TemporaryFile()
+        backup_zip = zipfile.ZipFile(backup, "w")
+        with patch("CTFd.utils.exports.serializers.SPOOL_SIZE", 64 * 1024):
+            tracemalloc.start()
+            try:
+                with backup_zip.open(
+                    "db/submissions.json", "w", force_zip64=True
+                ) as result_file:
+                    freeze_export(submissions(50000), fileobj=result_file)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        backup_zip.close()
+
+        size = backup_zip.getinfo("db/submissions.json").file_size
+        assert size > 6 * 1024 * 1024
+        # Only the spool and the chunk being copied into the zip are held in memory
+        assert peak < 3 * 1024 * 1024
+        data = json.loads(zipfile.ZipFile(backup).read("db/submissions.json"))
+        assert data["count"] == 50000
+        assert data["results"][-1]["provided"] == "flag{49999}"
+        backup.close()
+    destroy_ctfd(app)
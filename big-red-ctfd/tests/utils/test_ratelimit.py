@@ -1,4 +1,18 @@
-from tests.helpers import create_ctfd, destroy_ctfd, register_user
+import datetime
+import threading
+
+from freezegun import freeze_time
+from sqlalchemy import event
+
+from CTFd.models import Fails
+from CTFd.utils.ratelimit import RateLimiter
+from tests.helpers import (
+    create_ctfd,
+    destroy_ctfd,
+    gen_challenge,
+    gen_fail,
+    register_user,
+)
 
 
 def test_ratelimit_on_auth():
@@ -14,11 +28,87 @@ def test_ratelimit_on_auth():
                     "password": "wrong_password",
                     "nonce": sess.get("nonce"),
                 }
-            for _ in range(10):
-                r = client.post("/login", data=data)
-                assert r.status_code == 200
+            # Frozen so that a slow test run can't let the first attempts slide out of the window
+            with freeze_time(datetime.datetime.utcnow()):
+                for _ in range(10):
+                    r = client.post("/login", data=data)
+                    assert r.status_code == 200
+
+                for _ in range(5):
+                    r = client.post("/login", data=data)
+                    assert r.status_code == 429
+    destroy_ctfd(app)
+
+
+def test_ratelimiter_sliding_window():
+    """Test that only the hits of the last interval count against the limit"""
+    limiter = RateLimiter()
+    with freeze_time("2017-10-03 00:00:00") as frozen:
+        for _ in range(3):
+            assert limiter.hit("key", interval=10, limit=3)
+            frozen.tick(datetime.timedelta(seconds=3))
+        # Hits at 0s, 3s and 6s are all within 10 seconds of 9s
+        assert limiter.hit("key", interval=10, limit=3) is False
+        assert limiter.count("key", interval=10) == 3
+        # The first hit leaves the window at 10s
+        frozen.tick(datetime.timedelta(seconds=1))
+        assert limiter.count("key", interval=10) == 2
+        assert limiter.hit("key", interval=10, limit=3)
+        assert limiter.hit("key", interval=10, limit=3) is False
+        # Keys are counted separately and a hit without a limit is always counted
+        assert limiter.hit("other", interval=10, limit=1)
+        assert limiter.hit("other", interval=10)
+        assert limiter.count("other", interval=10) == 2
+
+
+def test_ratelimiter_is_exact_under_concurrency():
+    """Test that concurrent hits never get more than the limit through"""
+    limiter = RateLimiter()
+    start = threading.Barrier(16)
+    counted = []
+
+    def worker():
+        start.wait()
+        counted.extend(limiter.hit("key", interval=60, limit=100) for _ in range(50))
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counted.count(True) == 100
+    assert counted.count(False) == 16 * 50 - 100
+    assert limiter.count("key", interval=60) == 100
+
+
+def test_wrong_submissions_per_minute_are_counted_without_queries():
+    """Test that committed fails count towards the kpm limit and reading it runs no SQL"""
+    app = create_ctfd()
+    with app.app_context():
+        from CTFd.utils.user import get_wrong_submissions_per_minute
+
+        register_user(app)
+        chal_id = gen_challenge(app.db).id
+        with freeze_time("2017-10-03 00:00:00") as frozen:
+            for _ in range(3):
+                gen_fail(app.db, user_id=2, challenge_id=chal_id)
+
+            statements = []
+
+            def before_cursor_execute(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            event.listen(app.db.engine, "before_cursor_execute", before_cursor_execute)
+            assert get_wrong_submissions_per_minute(2) == 3
+            event.remove(app.db.engine, "before_cursor_execute", before_cursor_execute)
+            assert statements == []
+
+            # Rolled back fails are not counted
+            app.db.session.add(Fails(user_id=2, challenge_id=chal_id, provided="x"))
+            app.db.session.flush()
+            app.db.session.rollback()
+            assert get_wrong_submissions_per_minute(2) == 3
 
-            for _ in range(5):
-                r = client.post("/login", data=data)
-                assert r.status_code == 429
+            frozen.tick(datetime.timedelta(seconds=61))
+            assert get_wrong_submissions_per_minute(2) == 0
     destroy_ctfd(app)
@@ -0,0 +1,312 @@
+import datetime
+
+from freezegun import freeze_time
+
+from CTFd.cache import clear_standings, invalidate
+from CTFd.models import Awards, Challenges, Solves, Users
+from CTFd.utils import set_config
+from CTFd.utils.scores import get_standings, get_team_standings, get_user_standings
+from CTFd.utils.scores.standings import StandingsIndex, get_scoreboard_version
+from tests.helpers import (
+    create_ctfd,
+    destroy_ctfd,
+    gen_award,
+    gen_challenge,
+    gen_flag,
+    gen_solve,
+    gen_team,
+    gen_user,
+    login_as_user,
+    register_user,
+)
+
+
+def rebuilt_ranking(kind, admin=False):
+    """Ranking computed from scratch, to compare the incrementally maintained index against"""
+    index = StandingsIndex()
+    return index.ranking(kind, admin=admin)
+
+
+def assert_index_matches_rebuild(app):
+    for kind in ("users", "teams"):
+        for admin in (True, False):
+            assert app.standings_index.ranking(kind, admin=admin) == rebuilt_ranking(
+                kind, admin=admin
+            )
+
+
+def test_standings_index_installed():
+    """Test that the in-memory StandingsIndex is installed when not using Redis"""
+    app = create_ctfd()
+    assert type(app.standings_index) == StandingsIndex
+    destroy_ctfd(app)
+
+
+def test_standings_index_follows_solves_and_awards_without_rebuilding():
+    app = create_ctfd()
+    with app.app_context():
+        for i in range(3):
+            gen_user(app.db, name=f"user{i}", email=f"user{i}@examplectf.com")
+        chal = gen_challenge(app.db, value=100)
+        gen_challenge(app.db, value=50)
+        gen_solve(app.db, user_id=2, challenge_id=1)
+
+        assert [s.name for s in get_standings()] == ["user0"]
+        token = app.standings_index.token
+
+        gen_solve(app.db, user_id=3, challenge_id=1)
+        gen_solve(app.db, user_id=3, challenge_id=2)
+        gen_solve(app.db, user_id=4, challenge_id=2)
+        award = gen_award(app.db, user_id=4, value=100)
+        gen_award(app.db, user_id=2, value=-10)
+
+        standings = get_user_standings(admin=True)
+        assert [(s.name, s.score) for s in standings] == [
+            ("user1", 150),
+            ("user2", 150),
+            ("user0", 90),
+        ]
+
+        # Deleting an award recomputes only the accounts it belonged to
+        app.db.session.delete(award)
+        app.db.session.commit()
+        # A challenge dropping to zero no longer counts towards scores or tie breaks
+        chal.value = 0
+        app.db.session.commit()
+
+        assert app.standings_index.token == token
+        assert_index_matches_rebuild(app)
+        assert [(s.user_id, s.score) for s in get_user_standings()] == [
+            (3, 50),
+            (4, 50),
+            (2, -10),
+        ]
+    destroy_ctfd(app)
+
+
+def test_standings_index_breaks_ties_by_first_to_reach_the_score():
+    app = create_ctfd()
+    with app.app_context():
+        for i in range(3):
+            gen_user(app.db, name=f"user{i}", email=f"user{i}@examplectf.com")
+        gen_challenge(app.db, value=100)
+        get_standings()
+
+        with freeze_time("2017-10-03 03:21:34"):
+            gen_solve(app.db, user_id=4, challenge_id=1)
+        with freeze_time("2017-10-04 03:21:34"):
+            gen_solve(app.db, user_id=2, challenge_id=1)
+        with freeze_time("2017-10-04 03:21:34"):
+            gen_solve(app.db, user_id=3, challenge_id=1)
+
+        assert [s.account_id for s in get_standings()] == [4, 2, 3]
+        assert_index_matches_rebuild(app)
+    destroy_ctfd(app)
+
+
+def test_standings_index_respects_freeze():
+    app = create_ctfd()
+    with app.app_context():
+        gen_user(app.db, name="user0", email="user0@examplectf.com")
+        gen_challenge(app.db, value=100)
+        gen_challenge(app.db, value=200)
+        with freeze_time("2017-10-03 03:21:34"):
+            gen_solve(app.db, user_id=2, challenge_id=1)
+        set_config("freeze", 1507262400)  # 2017-10-06
+        get_standings()
+
+        with freeze_time("2017-10-08 03:21:34"):
+            gen_solve(app.db, user_id=2, challenge_id=2)
+
+        assert get_standings()[0].score == 100
+        assert get_standings(admin=True)[0].score == 300
+        assert_index_matches_rebuild(app)
+    destroy_ctfd(app)
+
+
+def test_standings_index_rebuilds_after_bulk_changes():
+    app = create_ctfd(user_mode="teams")
+    with app.app_context():
+        user = gen_user(app.db)
+        team = gen_team(app.db)
+        user.team_id = team.id
+        app.db.session.commit()
+        gen_challenge(app.db, value=100)
+        gen_solve(app.db, user_id=user.id, team_id=team.id, challenge_id=1)
+        gen_award(app.db, user_id=user.id, team_id=team.id, value=5)
+        assert get_team_standings()[0].score == 105
+
+        Awards.query.delete()
+        app.db.session.commit()
+        clear_standings()
+        assert app.standings_index.token is None
+        assert get_team_standings()[0].score == 100
+
+        app.db.session.delete(Challenges.query.filter_by(id=1).first())
+        app.db.session.commit()
+        clear_standings()
+        assert Solves.query.count() == 0
+        assert get_standings() == []
+    destroy_ctfd(app)
+
+
+def test_dynamic_solves_update_earlier_solvers():
+    """Each solve of a dynamic challenge lowers its value for everyone who solved it before"""
+    app = create_ctfd(enable_plugins=True)
+    with app.app_context():
+        register_user(app)
+        register_user(app, name="user2", email="user2@examplectf.com")
+        client = login_as_user(app, name="admin", password="password")
+        challenge_data = {
+            "name": "name",
+            "category": "category",
+            "description": "description",
+            "initial": 100,
+            "decay": 1,
+            "minimum": 1,
+            "state": "visible",
+            "type": "dynamic",
+            "function": "linear",
+        }
+        client.post("/api/v1/challenges", json=challenge_data)
+        gen_flag(app.db, 1, content="flag")
+        get_standings()
+
+        for name in ("user", "user2"):
+            with login_as_user(app, name=name) as client:
+                data = {"challenge_id": 1, "submission": "flag"}
+                with freeze_time(datetime.datetime.utcnow()):
+                    client.post("/api/v1/challenges/attempt", json=data)
+
+        value = Challenges.query.filter_by(id=1).first().value
+        assert value < 100
+        assert [s.score for s in get_standings()] == [value, value]
+        assert_index_matches_rebuild(app)
+    destroy_ctfd(app)
+
+
+def test_solves_and_awards_publish_scoreboard_deltas():
+    """Test that committed solves and awards stream each account's new score and place to subscribers"""
+    app = create_ctfd()
+    with app.app_context():
+        for i in range(3):
+            gen_user(app.db, name=f"user{i}", email=f"user{i}@examplectf.com")
+        gen_challenge(app.db, value=100)
+        gen_challenge(app.db, value=200)
+        gen_solve(app.db, user_id=3, challenge_id=1)
+        get_standings()
+
+        events = app.events_manager.subscribe()
+        next(events)
+        version = get_scoreboard_version()
+
+        gen_solve(app.db, user_id=2, challenge_id=2)
+        event = next(events)
+        assert event.type == "scoreboard"
+        assert event.data["version"] == version + 1
+        [delta] = event.data["deltas"]
+        assert delta["account_id"] == 2
+        assert delta["score"] == 200
+        assert delta["place"] == 1
+        assert delta["challenge_id"] == 2
+
+        # Hidden accounts ranked ahead do not count towards the place shown
+        user = Users.query.filter_by(id=2).first()
+        user.hidden = True
+        app.db.session.commit()
+        invalidate("users")
+        gen_award(app.db, user_id=4, value=150)
+        event = next(events)
+        [delta] = event.data["deltas"]
+        assert delta["account_id"] == 4
+        assert delta["place"] == 1
+        assert delta["challenge_id"] is None
+    destroy_ctfd(app)
+
+
+def test_scoreboard_deltas_respect_freeze_and_visibility():
+    """Test that solves past the freeze time or with hidden scores only bump the version"""
+    app = create_ctfd()
+    with app.app_context():
+        gen_user(app.db, name="user0", email="user0@examplectf.com")
+        gen_challenge(app.db, value=100)
+        gen_challenge(app.db, value=200)
+        set_config("freeze", 1507262400)  # 2017-10-06
+        get_standings()
+
+        events = app.events_manager.subscribe()
+        next(events)
+        version = get_scoreboard_version()
+
+        with freeze_time("2017-10-08 03:21:34"):
+            gen_solve(app.db, user_id=2, challenge_id=1)
+        set_config("score_visibility", "hidden")
+        with freeze_time("2017-10-03 03:21:34"):
+            gen_solve(app.db, user_id=2, challenge_id=2)
+
+        assert get_scoreboard_version() == version + 2
+        assert app.events_manager.buffer("ctf").read(0)[0] == []
+    destroy_ctfd(app)
+
+
+def test_score_and_place_come_from_the_standings_index():
+    """Test that Users/Teams score and place match the standings they are looked up in"""
+    app = create_ctfd()
+    with app.app_context():
+        for i in range(4):
+            gen_user(app.db, name=f"user{i}", email=f"user{i}@examplectf.com")
+        gen_challenge(app.db, value=100)
+        gen_challenge(app.db, value=200)
+        gen_solve(app.db, user_id=2, challenge_id=1)
+        gen_solve(app.db, user_id=3, challenge_id=2)
+        gen_solve(app.db, user_id=4, challenge_id=1)
+        gen_solve(app.db, user_id=4, challenge_id=2)
+
+        users = {u.id: u for u in Users.query.all()}
+        for admin in (True, False):
+            standings = get_user_standings(admin=admin)
+            for i, row in enumerate(standings):
+                user = users[row.user_id]
+                assert user.get_place(admin=admin, numeric=True) == i + 1
+                assert user.get_score(admin=admin) == row.score
+        assert users[4].get_place() == "1st"
+        assert users[5].get_place() is None
+        assert users[5].get_score() == 0
+
+        # Hidden accounts keep their place in the index but are not counted ahead of anyone else
+        users[4].hidden = True
+        app.db.session.commit()
+        invalidate("users")
+        assert users[4].get_place() is None
+        assert users[4].get_place(admin=True) == "1st"
+        assert users[3].get_place() == "1st"
+        assert users[2].get_place() == "2nd"
+
+        # Scores and places follow new solves without clearing anything
+        gen_award(app.db, user_id=2, value=150)
+        assert users[2].get_score() == 250
+        assert users[2].get_place() == "1st"
+        assert users[3].get_place(numeric=True) == 2
+    destroy_ctfd(app)
+
+
+def test_team_score_and_place_come_from_the_standings_index():
+    app = create_ctfd(user_mode="teams")
+    with app.app_context():
+        team1 = gen_team(app.db, name="team1", email="team1@examplectf.com")
+        team2 = gen_team(app.db, name="team2", email="team2@examplectf.com")
+        gen_challenge(app.db, value=100)
+        gen_solve(app.db, user_id=team2.captain_id, team_id=team2.id, challenge_id=1)
+        # Awarded to a member only, which still counts towards the team's score
+        gen_award(app.db, user_id=team1.captain_id, value=50)
+
+        assert team2.get_place() == "1st"
+        assert team2.get_score() == 100
+        assert team1.get_place() is None
+        assert team1.get_score() == 50
+
+        gen_award(app.db, user_id=team1.captain_id, team_id=team1.id, value=200)
+        assert team1.get_place() == "1st"
+        assert team2.get_place(numeric=True) == 2
+        assert team1.get_score() == 250
+    destroy_ctfd(app)
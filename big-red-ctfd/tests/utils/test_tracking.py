@@ -0,0 +1,97 @@
+import datetime
+from unittest.mock import patch
+
+from sqlalchemy.exc import OperationalError
+
+from CTFd.models import Tracking, Users
+from tests.helpers import (
+    create_ctfd,
+    destroy_ctfd,
+    gen_tracking,
+    gen_user,
+    login_as_user,
+)
+
+
+def test_tracking_is_buffered_until_flushed():
+    """Test that requests record IPs in the buffer and a flush writes one row per user and IP"""
+    app = create_ctfd()
+    with app.app_context():
+        from CTFd.utils.user import get_user_recent_ips
+
+        app.tracking_buffer.interval = 3600
+        user_id = gen_user(app.db, name="user1", email="user1@examplectf.com").id
+        old = datetime.datetime.utcnow() - datetime.timedelta(hours=2)
+        gen_tracking(app.db, user_id=user_id, ip="1.1.1.1", date=old)
+        with login_as_user(app, name="user1") as client:
+            for ip in ("1.1.1.1", "2.2.2.2", "2.2.2.2", "3.3.3.3"):
+                client.get("/challenges", environ_base={"REMOTE_ADDR": ip})
+
+        assert Tracking.query.filter_by(user_id=user_id).count() == 1
+        assert get_user_recent_ips(user_id=user_id) == {"1.1.1.1", "2.2.2.2", "3.3.3.3"}
+
+        app.tracking_buffer.flush()
+        app.db.session.expire_all()
+        tracked = {
+            t.ip: t.date for t in Tracking.query.filter_by(user_id=user_id).all()
+        }
+        assert set(tracked) == {"1.1.1.1", "2.2.2.2", "3.3.3.3"}
+        assert tracked["1.1.1.1"] > old
+        assert get_user_recent_ips(user_id=user_id) == set(tracked)
+        assert app.tracking_buffer.recent_ips(user_id, since=old) == set()
+    destroy_ctfd(app)
+
+
+def test_tracking_flushes_full_batches():
+    """Test that the buffer writes its sightings once a batch is full"""
+    app = create_ctfd()
+    with app.app_context():
+        app.tracking_buffer.interval = 3600
+        app.tracking_buffer.batch_size = 2
+        gen_user(app.db, name="user1", email="user1@examplectf.com")
+        with login_as_user(app, name="user1") as client:
+            client.get("/challenges", environ_base={"REMOTE_ADDR": "1.1.1.1"})
+            assert Tracking.query.count() == 0
+            client.get("/challenges", environ_base={"REMOTE_ADDR": "2.2.2.2"})
+            assert Tracking.query.count() == 2
+    destroy_ctfd(app)
+
+
+def test_tracking_keeps_sightings_when_a_write_fails():
+    """Test that sightings a flush could not write stay buffered for the next one"""
+    app = create_ctfd()
+    with app.app_context():
+        from CTFd.utils.user import get_user_recent_ips
+
+        app.tracking_buffer.interval = 3600
+        user_id = gen_user(app.db, name="user1", email="user1@examplectf.com").id
+        with login_as_user(app, name="user1") as client:
+            client.get("/challenges", environ_base={"REMOTE_ADDR": "1.1.1.1"})
+
+        error = OperationalError("INSERT", {}, Exception("database is locked"))
+        with patch("CTFd.utils.tracking.write_tracking", side_effect=error):
+            app.tracking_buffer.flush()
+        assert Tracking.query.count() == 0
+        assert get_user_recent_ips(user_id=user_id) == {"1.1.1.1"}
+
+        app.tracking_buffer.flush()
+        assert [t.ip for t in Tracking.query.filter_by(user_id=user_id)] == ["1.1.1.1"]
+    destroy_ctfd(app)
+
+
+def test_tracking_drops_deleted_users():
+    """Test that sightings of deleted users are not written and their sessions are logged out"""
+    app = create_ctfd()
+    with app.app_context():
+        app.tracking_buffer.interval = 3600
+        user_id = gen_user(app.db, name="user1", email="user1@examplectf.com").id
+        with login_as_user(app, name="user1") as client:
+            Users.query.filter_by(id=user_id).delete()
+            app.db.session.commit()
+            app.tracking_buffer.flush()
+            assert Tracking.query.count() == 0
+
+            client.get("/challenges")
+            with client.session_transaction() as sess:
+                assert sess.get("id") is None
+    destroy_ctfd(app)